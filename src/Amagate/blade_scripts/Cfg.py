@@ -22,7 +22,13 @@ execfile("../../Scripts/sys_init.py")
 
 Bladex.ReadLevel("AG_dome.lvl")
 #
-AG_MapCfg = eval(open("AG_MapCfg.json", "r").read())
+# A preview export leaves a one-shot config pointing at the preview bw.
+# It is removed once loaded, so the next run loads the full map again.
+if os.path.exists("AG_PreviewCfg.json"):
+    AG_MapCfg = eval(open("AG_PreviewCfg.json", "r").read())
+    os.remove("AG_PreviewCfg.json")
+else:
+    AG_MapCfg = eval(open("AG_MapCfg.json", "r").read())
 
 for f in os.listdir("textures"):
     name, ext = os.path.splitext(f)
@@ -285,6 +285,40 @@
     ("*", "The number of Ghost sector exports"): "虚拟扇区导出数量",
     ("Operator", "Compile to bw (Visible Only)"): "编译为bw (仅可见的)",
     ("Operator", "Compile to bw (with Run Script)"): "编译为bw (带运行脚本)",
+    ("*", "Weld Tolerance"): "焊接容差",
+    ("*", "Weld vertices of different sectors within this Euclidean distance (mm) of the first welded vertex when compiling. The default 0 only merges identical vertices and keeps near-duplicates caused by rounding"): "编译时焊接不同扇区中与首个焊接顶点欧氏距离不超过该值（毫米）的顶点。默认值0只合并相同的顶点，不会合并舍入误差产生的近似重复顶点",
+    ("*", "Compile Report"): "编译报告",
+    ("*", "Record stage and sector timings and write a JSON report next to the .bw"): "记录各阶段和扇区的耗时，并在bw文件旁写入JSON报告",
+    ("*", "Slowest Sectors"): "最慢的扇区",
+    ("Operator", "Compile to bw (Background)"): "编译为bw (后台)",
+    ("*", "Compile without blocking the interface, press Esc to cancel"): "编译时不阻塞界面，按 Esc 取消",
+    ("*", "Press Esc to cancel"): "按 Esc 取消",
+    ("*", "Compile Cancelled"): "编译已取消",
+    ("*", "Sector Collecting"): "采集扇区",
+    ("*", "Sector Compiling"): "编译扇区",
+    ("*", "Sector Merging"): "合并扇区",
+    ("*", "Map Parsing"): "解析地图",
+    ("*", "Sector Importing"): "导入扇区",
+    ("*", "Sector Fixing"): "修复扇区",
+    ("*", "Import Cancelled"): "导入已取消",
+    ("*", "Lazy Sector Collection"): "占位扇区集合",
+    ("*", "Lazy Import"): "按区域导入",
+    ("*", "Import sector bounds only and build sector geometry on demand"): "只导入扇区包围盒，按需构建扇区几何",
+    ("Operator", "Build Sectors"): "构建扇区",
+    ("*", "Build the full geometry of lazily imported sectors from the bw file"): "从bw文件构建按区域导入的扇区的完整几何",
+    ("Operator", "Build Selected"): "构建选中",
+    ("Operator", "Build Region"): "构建区域",
+    ("*", "Sectors around the view"): "视图周围的扇区",
+    ("*", "No sector to build"): "没有需要构建的扇区",
+    ("*", "Source bw file not found"): "未找到源bw文件",
+    ("*", "Sectors built"): "已构建扇区",
+    ("*", "Build all lazily imported sectors before exporting"): "导出前请先构建所有按区域导入的扇区",
+    ("Operator", "Compile Preview (Around View)"): "编译预览 (视图周围)",
+    ("*", "Compile only the sectors around the view into a preview bw, loaded the next time the game starts"): "只编译视图周围的扇区到预览bw，下次启动游戏时加载",
+    ("*", "Preview Hops"): "预览跳数",
+    ("*", "Number of portal hops from the view sector included in the preview"): "预览中包含的从视图所在扇区出发的连接跳数",
+    ("*", "Preview Radius"): "预览半径",
+    ("*", "Also include connected sectors within this distance of the view, 0 to disable"): "同时包含距视图该距离内的相连扇区，0 为禁用",
     ("*", "Compile to bw"): "编译为bw",
     ("*", "Compile Success"): "编译成功",
     ("*", "Compile Exception"): "编译异常",
@@ -308,6 +342,8 @@
     ("*", "Wound Groups"): "伤口组",
     ("*", "Mutilation Groups"): "肢解组",
     ("Operator", "Import BOD"): "导入BOD",
+    ("*", "Import BOD, select multiple files or a folder to import in batch"): "导入BOD，选择多个文件或文件夹以批量导入",
+    ("*", "Imported"): "已导入",
     ("*", "From Old Exporter"): "来自旧版导出器",
     ("Operator", "Export BOD"): "导出BOD",
     ("*", "Export BOD as ..."): "导出BOD为...",
@@ -376,4 +412,8 @@
     ("*", "Model Package"): "模型包",
     ("Operator", "Import"): "导入",
     ("Operator", "Open in File Browser"): "在文件浏览器中打开",
+    ("Operator", "Update Model Index"): "更新模型索引",
+    ("*", "Rescan changed models and update the model metadata index"): "重新扫描有变化的模型并更新模型元数据索引",
+    ("*", "Model index updated"): "模型索引已更新",
+    ("*", "Failed"): "失败",
 }
@@ -0,0 +1,542 @@
+# Author: Sryml
+# Email: sryml@hotmail.com
+# Python Version: 3.11
+# License: GPL-3.0
+
+# bw关卡对象模型和读写，不依赖bpy
+# 读取时保留文件中的全部字段 (包括未知用途的保留字节)，写回时与原文件逐字节一致
+# 索引均为文件中的原始值: 顶点和扇区索引从0开始，坐标为Blade坐标
+
+from __future__ import annotations
+
+import struct
+from array import array
+from typing import Any
+
+#
+from . import ag_binio, L3D_bwparse
+from .L3D_bwparse import (
+    BWParseError,
+    Reader,
+    FACE_SKY,
+    FACE_FULL,
+    FACE_PLAIN,
+    FACE_HOLE,
+    FACE_SPLIT,
+    LIGHT_BULB,
+    LIGHT_EXTERNAL,
+)
+
+############################
+# 7004切割树的块标识
+MARK_INNER = 8001
+MARK_OUTER = 8002
+MARK_LEAF = 8003
+#
+TEX_MARK = (3, 0)
+TEX_PAD = bytes(8)
+# 扇区光照和外部光中未知用途的数据 (0,0,0, b"\xCD"*8, 0)
+LIGHT_RESERVED = bytes(24) + b"\xcd" * 8 + bytes(4)
+TRAILER_SIZE = 48
+############################
+
+
+# 记录基类，按__slots__比较和输出
+class Record:
+    __slots__ = ()
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return all(getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={getattr(self, k)!r}" for k in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+class Atmosphere(Record):
+    __slots__ = ("name", "rgb", "alpha")
+
+    def __init__(self, name="", rgb=(0, 0, 0), alpha=0.0):
+        self.name = name  # type: str
+        self.rgb = rgb  # type: tuple[int, int, int]
+        self.alpha = alpha  # type: float
+
+
+# 纹理数据，mark为前置的固定标识，pad为后置的8个字节
+class Texture(Record):
+    __slots__ = ("name", "vx", "vy", "xpos", "ypos", "mark", "pad")
+
+    def __init__(
+        self,
+        name="",
+        vx=(0.0, 0.0, 0.0),
+        vy=(0.0, 0.0, 0.0),
+        xpos=0.0,
+        ypos=0.0,
+        mark=TEX_MARK,
+        pad=TEX_PAD,
+    ):
+        self.name = name  # type: str
+        self.vx = vx  # type: tuple[float, float, float]
+        self.vy = vy  # type: tuple[float, float, float]
+        self.xpos = xpos  # type: float
+        self.ypos = ypos  # type: float
+        self.mark = mark  # type: tuple[int, int]
+        self.pad = pad  # type: bytes
+
+
+# 扇区的环境光或平面光
+class SectorLight(Record):
+    __slots__ = ("rgb", "intensity", "precision", "reserved")
+
+    def __init__(self, rgb=(0, 0, 0), intensity=0.0, precision=0.0, reserved=LIGHT_RESERVED):
+        self.rgb = rgb  # type: tuple[int, int, int]
+        self.intensity = intensity  # type: float
+        self.precision = precision  # type: float
+        self.reserved = reserved  # type: bytes
+
+
+# 洞，tangents为 (法向, 距离) 列表
+class Hole(Record):
+    __slots__ = ("verts", "conn", "tangents")
+
+    def __init__(self, verts=(), conn=0, tangents=None):
+        self.verts = verts  # type: tuple[int, ...]
+        self.conn = conn  # type: int
+        self.tangents = tangents or []  # type: list[tuple[tuple[float, float, float], float]]
+
+
+# 7004切割平面，texture为内侧的纹理
+class CutRecord(Record):
+    __slots__ = ("normal", "distance", "texture")
+
+    def __init__(self, normal=(0.0, 0.0, 0.0), distance=0.0, texture=None):
+        self.normal = normal  # type: tuple[float, float, float]
+        self.distance = distance  # type: float
+        self.texture = texture  # type: Texture | None
+
+
+# 7004切割树的叶子 (8003)，refs为 (洞索引, 切线索引列表) 列表
+class Leaf(Record):
+    __slots__ = ("refs",)
+
+    def __init__(self, refs=None):
+        self.refs = refs or []  # type: list[tuple[int, tuple[int, ...]]]
+
+
+# 面 7001-7005
+# 7002/7005: verts在纹理之前；7002: conn为连接的扇区
+# 7003: hole；7004: holes和tree，tree按文件顺序保存块标识、CutRecord和Leaf
+class Face(Record):
+    __slots__ = (
+        "type",
+        "normal",
+        "distance",
+        "verts",
+        "conn",
+        "texture",
+        "hole",
+        "holes",
+        "tree",
+    )
+
+    def __init__(
+        self,
+        type=FACE_PLAIN,
+        normal=(0.0, 0.0, 0.0),
+        distance=0.0,
+        verts=(),
+        conn=None,
+        texture=None,
+        hole=None,
+        holes=None,
+        tree=None,
+    ):
+        self.type = type  # type: int
+        self.normal = normal  # type: tuple[float, float, float]
+        self.distance = distance  # type: float
+        self.verts = verts  # type: tuple[int, ...]
+        self.conn = conn  # type: int | None
+        self.texture = texture  # type: Texture | None
+        self.hole = hole  # type: Hole | None
+        self.holes = holes  # type: list[Hole] | None
+        self.tree = tree  # type: list[int | CutRecord | Leaf] | None
+
+
+class Sector(Record):
+    __slots__ = ("atmosphere", "ambient", "flat", "flat_vector", "faces")
+
+    def __init__(
+        self,
+        atmosphere="",
+        ambient=None,
+        flat=None,
+        flat_vector=(0.0, 0.0, 0.0),
+        faces=None,
+    ):
+        self.atmosphere = atmosphere  # type: str
+        self.ambient = ambient or SectorLight()  # type: SectorLight
+        self.flat = flat or SectorLight()  # type: SectorLight
+        self.flat_vector = flat_vector  # type: tuple[float, float, float]
+        self.faces = faces or []  # type: list[Face]
+
+
+# 外部光 (15002) 或灯泡 (15001)
+# 外部光: reserved, vector, sectors；灯泡: position, sector
+class Light(Record):
+    __slots__ = (
+        "type",
+        "rgb",
+        "intensity",
+        "precision",
+        "reserved",
+        "vector",
+        "sectors",
+        "position",
+        "sector",
+    )
+
+    def __init__(
+        self,
+        type=LIGHT_BULB,
+        rgb=(0, 0, 0),
+        intensity=0.0,
+        precision=0.0,
+        reserved=LIGHT_RESERVED,
+        vector=(0.0, 0.0, 0.0),
+        sectors=(),
+        position=(0.0, 0.0, 0.0),
+        sector=0,
+    ):
+        self.type = type  # type: int
+        self.rgb = rgb  # type: tuple[int, int, int]
+        self.intensity = intensity  # type: float
+        self.precision = precision  # type: float
+        self.reserved = reserved  # type: bytes
+        self.vector = vector  # type: tuple[float, float, float]
+        self.sectors = sectors  # type: tuple[int, ...]
+        self.position = position  # type: tuple[float, float, float]
+        self.sector = sector  # type: int
+
+
+# 关卡，vertices为展平的坐标数组 (x0,y0,z0,x1,...)，groups为有符号整数数组
+class Level(Record):
+    __slots__ = (
+        "atmospheres",
+        "vertices",
+        "sectors",
+        "lights",
+        "trailer",
+        "groups",
+        "names",
+    )
+
+    def __init__(self):
+        self.atmospheres = []  # type: list[Atmosphere]
+        self.vertices = array("d")
+        self.sectors = []  # type: list[Sector]
+        self.lights = []  # type: list[Light]
+        self.trailer = bytes(TRAILER_SIZE)
+        self.groups = array("i")
+        self.names = []  # type: list[str]
+
+    @property
+    def vertex_count(self):
+        return len(self.vertices) // 3
+
+    def vertex(self, idx: int) -> tuple[float, float, float]:
+        return tuple(self.vertices[idx * 3 : idx * 3 + 3])  # type: ignore
+
+
+############################
+############################ 读取
+############################
+
+
+def read_indices(r: Reader) -> tuple[int, ...]:
+    return r.unpack(f"<{r.u32()}I")
+
+
+def read_texture(r: Reader) -> Texture:
+    mark = r.unpack("<II")
+    name = r.string(r.u32())
+    vx = r.vec3()
+    vy = r.vec3()
+    xpos, ypos = r.unpack("<ff")
+    return Texture(name, vx, vy, xpos, ypos, mark, r.read(8))
+
+
+def read_sector_light(r: Reader) -> SectorLight:
+    rgb = r.unpack("<BBB")
+    intensity, precision = r.unpack("<ff")
+    return SectorLight(rgb, intensity, precision, r.read(36))
+
+
+def read_hole(r: Reader) -> Hole:
+    verts = read_indices(r)
+    conn = r.u32()
+    tangents = [(r.vec3(), r.unpack("<d")[0]) for _ in range(r.u32())]
+    return Hole(verts, conn, tangents)
+
+
+def read_leaf(r: Reader) -> Leaf:
+    refs = []
+    for _ in range(r.u32()):
+        hole_idx = r.u32()
+        refs.append((hole_idx, read_indices(r)))
+    return Leaf(refs)
+
+
+# 切割树与 L3D_bwparse.read_face 的读取规则一致: 每个块标识对应一个切割平面
+def read_tree(r: Reader) -> list:
+    mark = r.u32()
+    if mark == MARK_LEAF:
+        return [read_leaf(r)]
+    if mark not in (MARK_INNER, MARK_OUTER):
+        raise BWParseError(f"Unknown block mark {mark} at {r.offset - 4}")
+    tree = [mark]  # type: list[Any]
+    mark_num = 1
+    cut_num = 0
+    while cut_num < mark_num:
+        mark = r.u32()
+        if mark in (MARK_INNER, MARK_OUTER):
+            tree.append(mark)
+            mark_num += 1
+        elif mark == MARK_LEAF:
+            tree.append(read_leaf(r))
+        else:
+            r.skip(-4)
+            normal = r.vec3()
+            distance = r.unpack("<d")[0]
+            # 检查是否有纹理
+            has_tex = r.unpack("<II") == TEX_MARK
+            r.skip(-8)
+            texture = read_texture(r) if has_tex else None
+            tree.append(CutRecord(normal, distance, texture))
+            cut_num += 1
+    return tree
+
+
+def read_face(r: Reader) -> Face:
+    face_type = r.u32()
+    if face_type not in (FACE_PLAIN, FACE_FULL, FACE_HOLE, FACE_SPLIT, FACE_SKY):
+        raise BWParseError(f"Unknown face type {face_type} at {r.offset - 4}")
+    face = Face(face_type, r.vec3(), r.unpack("<d")[0])
+    if face_type in (FACE_FULL, FACE_SKY):
+        face.verts = read_indices(r)
+        if face_type == FACE_SKY:
+            return face
+        face.conn = r.u32()
+    face.texture = read_texture(r)
+    if face_type == FACE_FULL:
+        return face
+    face.verts = read_indices(r)
+    if face_type == FACE_HOLE:
+        face.hole = read_hole(r)
+    elif face_type == FACE_SPLIT:
+        face.holes = [read_hole(r) for _ in range(r.u32())]
+        face.tree = read_tree(r)
+    return face
+
+
+def read_sector(r: Reader) -> Sector:
+    sector = Sector(r.string(r.u32()))
+    sector.ambient = read_sector_light(r)
+    sector.flat = read_sector_light(r)
+    sector.flat_vector = r.vec3()
+    sector.faces = [read_face(r) for _ in range(r.u32())]
+    return sector
+
+
+def read_light(r: Reader) -> Light:
+    light_type = r.u32()
+    if light_type not in (LIGHT_EXTERNAL, LIGHT_BULB):
+        raise BWParseError(f"Unknown light type {light_type} at {r.offset - 4}")
+    light = Light(light_type, r.unpack("<BBB"), *r.unpack("<ff"))
+    if light_type == LIGHT_EXTERNAL:
+        light.reserved = r.read(36)
+        light.vector = r.vec3()
+        light.sectors = read_indices(r)
+    else:
+        light.position = r.vec3()
+        light.sector = r.u32()
+    return light
+
+
+# progress(阶段, 完成数, 总数)，cancel() 返回True时中止解析并返回None
+def read_level(buffer, progress=None, cancel=None):
+    # type: (Any, Any, Any) -> Level | None
+    r = Reader(buffer)
+    level = Level()
+    try:
+        level.atmospheres = [
+            Atmosphere(r.string(r.u32()), r.unpack("<BBB"), r.unpack("<f")[0])
+            for _ in range(r.u32())
+        ]
+        level.vertices = r.array("d", r.u32() * 3)
+        sec_total = r.u32()
+        sectors = level.sectors
+        for i in range(sec_total):
+            if cancel and cancel():
+                return None
+            sectors.append(read_sector(r))
+            if progress:
+                progress("Map Parsing", i + 1, sec_total)
+        level.lights = [read_light(r) for _ in range(r.u32())]
+        level.trailer = r.read(TRAILER_SIZE)
+        level.groups = r.array("i", sec_total)
+        level.names = [r.string(r.u32()) for _ in range(r.u32())]
+    except (struct.error, IndexError) as e:
+        raise BWParseError(f"Invalid bw file at offset {r.offset}: {e}") from e
+    if r.offset != len(buffer):
+        raise BWParseError(f"Unexpected data at offset {r.offset}")
+    return level
+
+
+def read_bw(filepath, progress=None, cancel=None):
+    # type: (str, Any, Any) -> Level | None
+    with L3D_bwparse.map_file(filepath) as buffer:
+        return read_level(buffer, progress, cancel)
+
+
+############################
+############################ 写入
+############################
+
+
+def write_str(seg: ag_binio.Segment, text: str):
+    buffer = text.encode("Latin1")
+    seg.pack("<I", len(buffer))
+    seg.write(buffer)
+
+
+def write_array(seg: ag_binio.Segment, values: array):
+    if ag_binio.BIG_ENDIAN:
+        values = array(values.typecode, values)
+        values.byteswap()
+    seg.write(values)
+
+
+def write_indices(seg: ag_binio.Segment, indices):
+    seg.pack(f"<I{len(indices)}I", len(indices), *indices)
+
+
+def write_texture(seg: ag_binio.Segment, tex: Texture):
+    seg.pack("<II", *tex.mark)
+    write_str(seg, tex.name)
+    seg.pack("<ddd", *tex.vx)
+    seg.pack("<ddd", *tex.vy)
+    seg.pack("<ff", tex.xpos, tex.ypos)
+    seg.write(tex.pad)
+
+
+def write_sector_light(seg: ag_binio.Segment, light: SectorLight):
+    seg.pack("<BBB", *light.rgb)
+    seg.pack("<ff", light.intensity, light.precision)
+    seg.write(light.reserved)
+
+
+def write_hole(seg: ag_binio.Segment, hole: Hole):
+    write_indices(seg, hole.verts)
+    seg.pack("<II", hole.conn, len(hole.tangents))
+    for normal, distance in hole.tangents:
+        seg.pack("<dddd", *normal, distance)
+
+
+def write_tree(seg: ag_binio.Segment, tree):
+    for item in tree:
+        if isinstance(item, int):
+            seg.pack("<I", item)
+        elif isinstance(item, Leaf):
+            seg.pack("<II", MARK_LEAF, len(item.refs))
+            for hole_idx, tangent_idx in item.refs:
+                seg.pack("<I", hole_idx)
+                write_indices(seg, tangent_idx)
+        else:
+            seg.pack("<dddd", *item.normal, item.distance)
+            if item.texture:
+                write_texture(seg, item.texture)
+
+
+def write_face(seg: ag_binio.Segment, face: Face):
+    face_type = face.type
+    seg.pack("<Idddd", face_type, *face.normal, face.distance)
+    if face_type in (FACE_FULL, FACE_SKY):
+        write_indices(seg, face.verts)
+        if face_type == FACE_SKY:
+            return
+        seg.pack("<I", face.conn)
+    write_texture(seg, face.texture)  # type: ignore
+    if face_type == FACE_FULL:
+        return
+    write_indices(seg, face.verts)
+    if face_type == FACE_HOLE:
+        write_hole(seg, face.hole)  # type: ignore
+    elif face_type == FACE_SPLIT:
+        seg.pack("<I", len(face.holes))  # type: ignore
+        for hole in face.holes:  # type: ignore
+            write_hole(seg, hole)
+        write_tree(seg, face.tree)
+
+
+def write_sector(seg: ag_binio.Segment, sector: Sector):
+    write_str(seg, sector.atmosphere)
+    write_sector_light(seg, sector.ambient)
+    write_sector_light(seg, sector.flat)
+    seg.pack("<ddd", *sector.flat_vector)
+    seg.pack("<I", len(sector.faces))
+    for face in sector.faces:
+        write_face(seg, face)
+
+
+def write_light(seg: ag_binio.Segment, light: Light):
+    seg.pack("<I", light.type)
+    seg.pack("<BBB", *light.rgb)
+    seg.pack("<ff", light.intensity, light.precision)
+    if light.type == LIGHT_EXTERNAL:
+        seg.write(light.reserved)
+        seg.pack("<ddd", *light.vector)
+        write_indices(seg, light.sectors)
+    else:
+        seg.pack("<ddd", *light.position)
+        seg.pack("<I", light.sector)
+
+
+# 按文件顺序写入分段写入器
+def write_level(level: Level) -> ag_binio.SegmentWriter:
+    writer = ag_binio.SegmentWriter()
+    seg = writer.segment()
+    seg.pack("<I", len(level.atmospheres))
+    for atmo in level.atmospheres:
+        write_str(seg, atmo.name)
+        seg.pack("<BBB", *atmo.rgb)
+        seg.pack("<f", atmo.alpha)
+    seg.pack("<I", level.vertex_count)
+    write_array(seg, level.vertices)
+    seg.pack("<I", len(level.sectors))
+    for sector in level.sectors:
+        write_sector(seg, sector)
+    seg.pack("<I", len(level.lights))
+    for light in level.lights:
+        write_light(seg, light)
+    seg.write(level.trailer)
+    write_array(seg, level.groups)
+    seg.pack("<I", len(level.names))
+    for name in level.names:
+        write_str(seg, name)
+    return writer
+
+
+def level_bytes(level: Level) -> bytes:
+    return b"".join(write_level(level).views())
+
+
+def write_bw(level: Level, filepath):
+    writer = write_level(level)
+    writer.write_to(filepath)
+    writer.clear()
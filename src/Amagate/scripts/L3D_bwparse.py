@@ -0,0 +1,647 @@
+# Author: Sryml
+# Email: sryml@hotmail.com
+# Python Version: 3.11
+# License: GPL-3.0
+
+# bw文件解析，不依赖bpy，可在工作线程中运行
+# 解析结果为内存中的关卡模型，坐标和向量保持文件中的Blade坐标与单位，由导入时转换
+# BWFile通过内存映射和偏移索引随机访问扇区、面和光源记录
+
+from __future__ import annotations
+
+import os
+import sys
+import mmap
+import struct
+import contextlib
+from array import array
+
+#
+from . import ag_binio
+
+############################
+# 面类型
+FACE_SKY = 7005
+FACE_FULL = 7002
+FACE_PLAIN = 7001
+FACE_HOLE = 7003
+FACE_SPLIT = 7004
+# 光源类型
+LIGHT_BULB = 15001
+LIGHT_EXTERNAL = 15002
+# 偏移索引
+INDEX_VERSION = 3
+INDEX_SUFFIX = ".agidx"
+INDEX_MAGIC = b"AGIX"
+# 索引文件头: 标识、版本、bw文件大小和修改时间、各偏移、7个数组的长度
+INDEX_HEADER = struct.Struct("<4sIQq5Q7Q")
+############################
+
+
+class BWParseError(Exception):
+    pass
+
+
+# 基于内存的顺序读取器
+Reader = ag_binio.Reader
+
+
+# 纹理数据 (名称, vx, vy, xpos, ypos)
+def read_texture(r: Reader):
+    name = r.string(r.u32())
+    tex_vx = r.vec3()
+    tex_vy = r.vec3()
+    tex_xpos = r.unpack("<f")[0]
+    tex_ypos = r.unpack("<f")[0]
+    return (name, tex_vx, tex_vy, tex_xpos, tex_ypos)
+
+
+# 切线平面 (法向, 距离)
+def read_tangents(r: Reader):
+    return [(r.vec3(), r.unpack("<d")[0]) for _ in range(r.u32())]
+
+
+# 洞的引用 (切线平面列表, 连接扇区ID, 引用的洞数量)
+def read_hole_ref(r: Reader, holes):
+    tangents = conn_sid = None
+    holes_idx_num = r.u32()
+    for _ in range(holes_idx_num):
+        hole_idx = r.u32()
+        tangent_num = r.u32()
+        tangents = [holes[hole_idx][0][r.u32()] for _ in range(tangent_num)]
+        conn_sid = holes[hole_idx][1]
+    return (tangents, conn_sid, holes_idx_num)
+
+
+def read_face(r: Reader):
+    face_type = r.u32()
+    face = {
+        "type": face_type,
+        "normal": r.vec3(),
+        "distance": r.unpack("<d")[0],
+        "verts": None,
+        "conn": 0,
+        "tex": None,
+    }
+    # 完全连接或天空面
+    if face_type in (FACE_FULL, FACE_SKY):
+        face["verts"] = r.unpack(f"<{r.u32()}I")
+        if face_type == FACE_SKY:
+            return face
+        face["conn"] = r.u32() + 1
+
+    # 跳过固定标识 (3,0)
+    r.skip(8)
+    face["tex"] = read_texture(r)
+    # 跳过 b"\x00" * 8
+    r.skip(8)
+    if face_type == FACE_FULL:
+        return face
+
+    face["verts"] = r.unpack(f"<{r.u32()}I")
+    # 单个洞
+    if face_type == FACE_HOLE:
+        r.skip(4 * r.u32())  # 洞的顶点
+        conn_sid = r.u32() + 1
+        face["hole"] = (read_tangents(r), conn_sid)
+    # 多个洞或多纹理
+    elif face_type == FACE_SPLIT:
+        holes = []
+        for _ in range(r.u32()):
+            r.skip(4 * r.u32())  # 洞的顶点
+            conn_sid = r.u32() + 1
+            holes.append((read_tangents(r), conn_sid))
+        face["holes"] = holes
+        cut_data = []
+        cut_num = 0
+        block_mark_num = 0
+        block_mark = r.u32()
+        if block_mark in (8001, 8002):
+            block_mark_num += 1
+        while cut_num < block_mark_num:
+            mark = r.u32()
+            if mark in (8001, 8002):
+                block_mark_num += 1
+            elif mark == 8003:
+                cut_data.append((mark, *read_hole_ref(r, holes)))
+            # 切割数据
+            else:
+                r.skip(-4)
+                plane_no = r.vec3()
+                dist = r.unpack("<d")[0]
+                # 检查是否有纹理
+                if r.unpack("<II") == (3, 0):
+                    tex = read_texture(r)
+                    r.skip(8)
+                else:
+                    tex = None
+                    r.skip(-8)
+                cut_data.append(("cut", plane_no, dist, tex))
+                cut_num += 1
+        face["block_mark"] = block_mark
+        face["cut_data"] = cut_data
+        # 退化为7003
+        if cut_num == 0 and block_mark == 8003:
+            face["hole_ref"] = read_hole_ref(r, holes)
+    return face
+
+
+# 跳过纹理数据 (固定标识、名称、vx、vy、xpos、ypos、填充)
+def skip_texture(r: Reader):
+    r.skip(8)
+    r.skip(r.u32() + 64)
+
+
+# 跳过洞的引用
+def skip_hole_ref(r: Reader):
+    for _ in range(r.u32()):
+        r.skip(4)
+        r.skip(4 * r.u32())
+
+
+# 只读取面的顶点索引和连接的扇区ID，跳过纹理、切线平面和切割数据
+# 读取规则与 read_face 一致，用于构建偏移索引中的扇区摘要
+def scan_face(r: Reader, verts, conns):
+    # type: (Reader, set[int], set[int]) -> None
+    face_type = r.u32()
+    r.skip(32)  # 法向, 距离
+    if face_type in (FACE_FULL, FACE_SKY):
+        verts.update(r.unpack(f"<{r.u32()}I"))
+        if face_type == FACE_SKY:
+            return
+        conns.add(r.u32() + 1)
+    skip_texture(r)
+    if face_type == FACE_FULL:
+        return
+    verts.update(r.unpack(f"<{r.u32()}I"))
+    if face_type == FACE_HOLE:
+        r.skip(4 * r.u32())  # 洞的顶点
+        conns.add(r.u32() + 1)
+        r.skip(32 * r.u32())  # 切线平面
+    elif face_type == FACE_SPLIT:
+        for _ in range(r.u32()):
+            r.skip(4 * r.u32())  # 洞的顶点
+            conns.add(r.u32() + 1)
+            r.skip(32 * r.u32())  # 切线平面
+        cut_num = 0
+        block_mark_num = 0
+        block_mark = r.u32()
+        if block_mark in (8001, 8002):
+            block_mark_num += 1
+        while cut_num < block_mark_num:
+            mark = r.u32()
+            if mark in (8001, 8002):
+                block_mark_num += 1
+            elif mark == 8003:
+                skip_hole_ref(r)
+            else:
+                r.skip(28)  # 法向的其余部分, 距离
+                has_tex = r.unpack("<II") == (3, 0)
+                r.skip(-8)
+                if has_tex:
+                    skip_texture(r)
+                cut_num += 1
+        # 退化为7003
+        if cut_num == 0 and block_mark == 8003:
+            skip_hole_ref(r)
+
+
+def read_sector(r: Reader):
+    sector = read_sector_header(r)
+    sector["faces"] = [read_face(r) for _ in range(r.u32())]
+    return sector
+
+
+# 扇区头部 (大气、环境光、平面光)，不包含面
+def read_sector_header(r: Reader):
+    sector = {"atmo": r.string(r.u32())}
+    # 环境光
+    rgb = r.unpack("<BBB")
+    v, precision = r.unpack("<ff")
+    sector["ambient"] = (rgb, v, precision)
+    # 跳过 (0,0,0) 和 (b"\xCD"*8, 0)
+    r.skip(36)
+    # 平面光
+    rgb = r.unpack("<BBB")
+    v, precision = r.unpack("<ff")
+    r.skip(36)
+    sector["flat"] = (rgb, v, precision, r.vec3())
+    return sector
+
+
+def read_light(r: Reader):
+    light_type = r.u32()
+    if light_type == LIGHT_EXTERNAL:
+        rgb = r.unpack("<BBB")
+        v, precision = r.unpack("<ff")
+        # 跳过 (0,0,0, b"\xCD"*8, 0)
+        r.skip(36)
+        vector = r.vec3()
+        sectors = [sid + 1 for sid in r.unpack(f"<{r.u32()}I")]
+        return {
+            "type": light_type,
+            "rgb": rgb,
+            "v": v,
+            "precision": precision,
+            "vector": vector,
+            "sectors": sectors,
+        }
+    elif light_type == LIGHT_BULB:
+        rgb = r.unpack("<BBB")
+        strength, precision = r.unpack("<ff")
+        pos = r.vec3()
+        return {
+            "type": light_type,
+            "rgb": rgb,
+            "strength": strength,
+            "precision": precision,
+            "pos": pos,
+            "sector": r.u32() + 1,
+        }
+    raise BWParseError(f"Unknown light type {light_type} at {r.offset - 4}")
+
+
+# 只读映射文件，解码时直接从映射中读取，不复制整个文件
+@contextlib.contextmanager
+def map_file(filepath):
+    with open(filepath, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise BWParseError("Empty bw file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+# 解析bw文件，progress(label, i, total)，cancel返回True时中止并返回None
+def parse_bw(filepath, progress=None, cancel=None):
+    with map_file(filepath) as buffer:
+        return parse_buffer(Reader(buffer), progress, cancel)
+
+
+def parse_buffer(r, progress=None, cancel=None):
+    try:
+        level = {}
+        # 大气
+        atmospheres = []
+        for _ in range(r.u32()):
+            name = r.string(r.u32())
+            rgb = r.unpack("<BBB")
+            a = r.unpack("<f")[0]
+            atmospheres.append((name, rgb, a))
+        level["atmospheres"] = atmospheres
+        # 顶点
+        vertex_num = r.u32()
+        level["vertices"] = list(zip(*[iter(r.unpack(f"<{vertex_num * 3}d"))] * 3))
+        # 扇区
+        sec_total = r.u32()
+        sectors = []
+        for i in range(sec_total):
+            if cancel and cancel():
+                return None
+            sectors.append(read_sector(r))
+            if progress:
+                progress("Map Parsing", i + 1, sec_total)
+        level["sectors"] = sectors
+        # 外部光和灯泡
+        level["lights"] = [read_light(r) for _ in range(r.u32())]
+        # 跳过未知数据 (ddd, ddd)
+        r.skip(48)
+        # 组
+        level["groups"] = list(r.unpack(f"<{sec_total}i"))
+        # 扇区名称
+        level["names"] = [r.string(r.u32()) for _ in range(r.u32())]
+    except (struct.error, IndexError, KeyError) as e:
+        raise BWParseError(f"Invalid bw file at offset {r.offset}: {e}") from e
+    # 引用检查，在修改场景之前报告错误
+    vertex_num = len(level["vertices"])
+    for sid, sector in enumerate(sectors, 1):
+        for face in sector["faces"]:
+            verts = face["verts"]
+            if verts and max(verts) >= vertex_num:
+                raise BWParseError(f"Sector {sid}: vertex index out of range")
+            conns = [face["conn"]] + [h[1] for h in face.get("holes", ())]
+            if "hole" in face:
+                conns.append(face["hole"][1])
+            for conn_sid in conns:
+                if conn_sid > sec_total:
+                    raise BWParseError(f"Sector {sid}: connected sector out of range")
+    for light in level["lights"]:
+        for sid in light.get("sectors", [light.get("sector", 1)]):
+            if not 1 <= sid <= sec_total:
+                raise BWParseError("Light sector out of range")
+    return level
+
+
+############################
+############################ 偏移索引
+############################
+
+
+# 各记录的起始偏移，扇区的面偏移为 faces[face_start[i]:face_start[i + 1]]
+# 同时保存按区域导入所需的扇区摘要: 包围盒 bounds[i*6:i*6+6] (最小值, 最大值，Blade坐标)
+# 和连接的扇区ID conns[conn_start[i]:conn_start[i + 1]]
+class BWIndex:
+    def __init__(self):
+        self.atmospheres = 0  # 大气数量的偏移
+        self.vertices = 0  # 顶点数组的偏移
+        self.vertex_num = 0
+        self.sectors = array("Q")
+        self.face_start = array("Q", [0])
+        self.faces = array("Q")
+        self.lights = array("Q")
+        self.groups = 0  # 组数组的偏移
+        self.names = 0  # 名称数量的偏移
+        self.bounds = array("d")
+        self.conn_start = array("Q", [0])
+        self.conns = array("Q")
+
+    def arrays(self):
+        return (
+            self.sectors,
+            self.face_start,
+            self.faces,
+            self.lights,
+            self.bounds,
+            self.conn_start,
+            self.conns,
+        )
+
+    # 偏移都在文件范围内且面偏移表与扇区数量一致
+    def is_valid(self, file_size):
+        # type: (int) -> bool
+        offsets = (self.atmospheres, self.vertices, self.groups, self.names)
+        if any(offset >= file_size for offset in offsets):
+            return False
+        if len(self.face_start) != len(self.sectors) + 1 or self.face_start[0] != 0:
+            return False
+        if self.face_start[-1] != len(self.faces):
+            return False
+        if any(a > b for a, b in zip(self.face_start, self.face_start[1:])):
+            return False
+        if self.vertices + self.vertex_num * 24 > file_size:
+            return False
+        if len(self.bounds) != len(self.sectors) * 6:
+            return False
+        if len(self.conn_start) != len(self.sectors) + 1 or self.conn_start[0] != 0:
+            return False
+        if self.conn_start[-1] != len(self.conns):
+            return False
+        if any(a > b for a, b in zip(self.conn_start, self.conn_start[1:])):
+            return False
+        return all(
+            max(values, default=0) < file_size
+            for values in (self.sectors, self.faces, self.lights)
+        )
+
+
+# 顺序扫描一遍文件，记录扇区、面和光源的偏移
+def build_index(r: Reader):
+    index = BWIndex()
+    try:
+        index.atmospheres = r.offset
+        for _ in range(r.u32()):
+            r.skip(r.u32() + 7)
+        index.vertex_num = r.u32()
+        index.vertices = r.offset
+        vertices = r.unpack(f"<{index.vertex_num * 3}d")
+        sec_total = r.u32()
+        for _ in range(sec_total):
+            index.sectors.append(r.offset)
+            read_sector_header(r)
+            verts = set()  # type: set[int]
+            conns = set()  # type: set[int]
+            for _ in range(r.u32()):
+                index.faces.append(r.offset)
+                scan_face(r, verts, conns)
+            index.face_start.append(len(index.faces))
+            # 扇区摘要，忽略无效的顶点索引
+            verts = [i for i in verts if i < index.vertex_num]
+            if verts:
+                for axis in range(3):
+                    index.bounds.append(min(vertices[i * 3 + axis] for i in verts))
+                for axis in range(3):
+                    index.bounds.append(max(vertices[i * 3 + axis] for i in verts))
+            else:
+                index.bounds.extend((0.0,) * 6)
+            conns.discard(0)
+            index.conns.extend(sorted(conns))
+            index.conn_start.append(len(index.conns))
+        for _ in range(r.u32()):
+            index.lights.append(r.offset)
+            read_light(r)
+        r.skip(48)
+        index.groups = r.offset
+        r.skip(4 * sec_total)
+        index.names = r.offset
+        if index.names + 4 > len(r.buffer):
+            raise struct.error("unpack requires more data")
+    except (struct.error, IndexError, KeyError) as e:
+        raise BWParseError(f"Invalid bw file at offset {r.offset}: {e}") from e
+    return index
+
+
+def index_key(filepath):
+    stat = os.stat(filepath)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+# 索引文件只包含定长文件头和无符号64位偏移数组，不执行文件中的任何代码
+# 与bw文件放在一起的索引可能来自他人，任何校验失败都视为过期
+def load_index(filepath):
+    # type: (str) -> BWIndex | None
+    index_file = f"{filepath}{INDEX_SUFFIX}"
+    if not os.path.exists(index_file):
+        return None
+    try:
+        with open(index_file, "rb") as f:
+            data = f.read()
+        if len(data) < INDEX_HEADER.size:
+            return None
+        header = INDEX_HEADER.unpack_from(data)
+        magic, version, size, mtime = header[:4]
+        if (
+            magic != INDEX_MAGIC
+            or version != INDEX_VERSION
+            or (size, mtime) != index_key(filepath)
+        ):
+            return None
+        index = BWIndex()
+        index.face_start = array("Q")
+        index.conn_start = array("Q")
+        (
+            index.atmospheres,
+            index.vertices,
+            index.vertex_num,
+            index.groups,
+            index.names,
+        ) = header[4:9]
+        lengths = header[9:]
+        # 所有数组元素都是8字节
+        if INDEX_HEADER.size + sum(lengths) * 8 != len(data):
+            return None
+        offset = INDEX_HEADER.size
+        for values, length in zip(index.arrays(), lengths):
+            values.frombytes(data[offset : offset + length * values.itemsize])
+            offset += length * values.itemsize
+        if sys.byteorder != "little":
+            for values in index.arrays():
+                values.byteswap()
+        if not index.is_valid(size):
+            return None
+        return index
+    except (OSError, struct.error) as e:
+        print(f"Failed to load bw index: {e}")
+        return None
+
+
+def save_index(filepath, index):
+    # type: (str, BWIndex) -> None
+    index_file = f"{filepath}{INDEX_SUFFIX}"
+    arrays = index.arrays()
+    temp_file = f"{index_file}.tmp"
+    try:
+        size, mtime = index_key(filepath)
+        with open(temp_file, "wb") as f:
+            f.write(
+                INDEX_HEADER.pack(
+                    INDEX_MAGIC,
+                    INDEX_VERSION,
+                    size,
+                    mtime,
+                    index.atmospheres,
+                    index.vertices,
+                    index.vertex_num,
+                    index.groups,
+                    index.names,
+                    *(len(values) for values in arrays),
+                )
+            )
+            for values in arrays:
+                if sys.byteorder != "little":
+                    values = array(values.typecode, values)
+                    values.byteswap()
+                f.write(values.tobytes())
+        os.replace(temp_file, index_file)
+    except OSError as e:
+        print(f"Failed to save bw index: {e}")
+
+
+# 随机访问bw文件，扇区ID从1开始
+# with BWFile(path) as bw: bw.read_sector(4000)
+class BWFile:
+    def __init__(self, filepath: str, use_sidecar=True):
+        self.filepath = filepath
+        self._stack = contextlib.ExitStack()
+        self.buffer = self._stack.enter_context(map_file(filepath))
+        try:
+            index = load_index(filepath) if use_sidecar else None
+            if index is None:
+                index = build_index(Reader(self.buffer))
+                if use_sidecar:
+                    save_index(filepath, index)
+        except BaseException:
+            self.close()
+            raise
+        self.index = index
+
+    def close(self):
+        self._stack.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def reader(self, offset: int) -> Reader:
+        r = Reader(self.buffer)
+        r.offset = offset
+        return r
+
+    @property
+    def sector_count(self):
+        return len(self.index.sectors)
+
+    @property
+    def light_count(self):
+        return len(self.index.lights)
+
+    def face_count(self, sector_id: int):
+        start = self.index.face_start
+        return start[sector_id] - start[sector_id - 1]
+
+    def read_atmospheres(self):
+        r = self.reader(self.index.atmospheres)
+        return [
+            (r.string(r.u32()), r.unpack("<BBB"), r.unpack("<f")[0])
+            for _ in range(r.u32())
+        ]
+
+    def read_vertex(self, idx: int) -> tuple[float, float, float]:
+        return self.reader(self.index.vertices + idx * 24).vec3()
+
+    def read_vertices(self):
+        r = self.reader(self.index.vertices)
+        values = r.unpack(f"<{self.index.vertex_num * 3}d")
+        return list(zip(*[iter(values)] * 3))
+
+    def read_sector(self, sector_id: int, faces=True):
+        r = self.reader(self.index.sectors[sector_id - 1])
+        if faces:
+            return read_sector(r)
+        return read_sector_header(r)
+
+    def read_face(self, sector_id: int, face_idx: int):
+        if not 0 <= face_idx < self.face_count(sector_id):
+            raise IndexError(f"Sector {sector_id}: face index out of range")
+        start = self.index.face_start[sector_id - 1]
+        return read_face(self.reader(self.index.faces[start + face_idx]))
+
+    def read_light(self, idx: int):
+        return read_light(self.reader(self.index.lights[idx]))
+
+    def read_groups(self):
+        return list(self.reader(self.index.groups).unpack(f"<{self.sector_count}i"))
+
+    def read_names(self):
+        r = self.reader(self.index.names)
+        return [r.string(r.u32()) for _ in range(r.u32())]
+
+
+############################
+############################ 按区域导入
+############################
+
+
+# 只读取构建占位所需的数据，扇区的完整数据按需从BWFile读取
+# 扇区摘要 (包围盒和连接的扇区ID) 来自偏移索引，不解码扇区的面
+def parse_bw_lazy(filepath, progress=None, cancel=None):
+    with BWFile(filepath) as bw:
+        try:
+            index = bw.index
+            bounds = index.bounds
+            conn_start = index.conn_start
+            sec_total = bw.sector_count
+            sectors = []
+            for i in range(sec_total):
+                if cancel and cancel():
+                    return None
+                sectors.append(
+                    {
+                        "min": tuple(bounds[i * 6 : i * 6 + 3]),
+                        "max": tuple(bounds[i * 6 + 3 : i * 6 + 6]),
+                        "conn": list(index.conns[conn_start[i] : conn_start[i + 1]]),
+                    }
+                )
+                if progress:
+                    progress("Map Parsing", i + 1, sec_total)
+            return {
+                "lazy": True,
+                "filepath": filepath,
+                "atmospheres": bw.read_atmospheres(),
+                "sectors": sectors,
+                "lights": [bw.read_light(i) for i in range(bw.light_count)],
+                "groups": bw.read_groups(),
+                "names": bw.read_names(),
+            }
+        except (struct.error, IndexError, KeyError) as e:
+            raise BWParseError(f"Invalid bw file: {e}") from e
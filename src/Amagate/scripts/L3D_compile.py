@@ -0,0 +1,1415 @@
+# Author: Sryml
+# Email: sryml@hotmail.com
+# Python Version: 3.11
+# License: GPL-3.0
+
+# 扇区编译核心，不依赖bpy，可在子进程中运行
+# 主线程负责采集扇区快照 (纯数据)，此模块将快照编译为扇区面数据块，
+# 最后由主线程按 sector_ids 顺序重定位顶点和扇区索引并拼接
+
+from __future__ import annotations
+
+import os
+import sys
+import math
+import time
+import functools
+import struct
+import pickle
+import hashlib
+import json
+import importlib.util
+from io import BytesIO
+from typing import Any
+
+import numpy as np
+
+############################
+epsilon: float = 1e-5
+epsilon2: float = 1 - epsilon
+
+# 并行编译的最少扇区数，少于该数量时在当前进程编译
+PARALLEL_MIN_SECTORS = 64
+
+# 独立模块名，子进程通过该名称导入本模块
+STANDALONE_NAME = "L3D_compile"
+
+# 编译缓存版本，数据块格式或编译规则变化时递增
+CACHE_VERSION = 3
+CACHE_MAGIC = b"AGCC"
+# 缓存文件头: 标识、JSON描述的长度
+CACHE_HEADER = struct.Struct("<4sI")
+
+_F32 = struct.Struct("<f")
+_U32 = struct.Struct("<I")
+
+############################
+# 单精度运算，与mathutils的计算结果保持一致
+
+
+def f32(x: float) -> float:
+    return _F32.unpack(_F32.pack(x))[0]
+
+
+def sub_f32(a, b):
+    return f32(a[0] - b[0]), f32(a[1] - b[1]), f32(a[2] - b[2])
+
+
+def cross_f32(a, b):
+    return (
+        f32(f32(a[1] * b[2]) - f32(a[2] * b[1])),
+        f32(f32(a[2] * b[0]) - f32(a[0] * b[2])),
+        f32(f32(a[0] * b[1]) - f32(a[1] * b[0])),
+    )
+
+
+# Vector.dot: 单精度乘积，双精度逆序累加
+def dot_f32(a, b) -> float:
+    return f32(a[2] * b[2]) + f32(a[1] * b[1]) + f32(a[0] * b[0])
+
+
+def normalize_f32(a):
+    d = dot_f32(a, a)
+    if d > 1.0e-35:
+        d_inv = f32(1.0 / f32(math.sqrt(d)))
+        return f32(a[0] * d_inv), f32(a[1] * d_inv), f32(a[2] * d_inv)
+    return 0.0, 0.0, 0.0
+
+
+############################
+# 双精度几何运算
+
+
+def _sub(a, b):
+    return a[0] - b[0], a[1] - b[1], a[2] - b[2]
+
+
+def _dot(a, b) -> float:
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def _normalized(a):
+    length = math.sqrt(_dot(a, a))
+    if length == 0:
+        return 0.0, 0.0, 0.0
+    return a[0] / length, a[1] / length, a[2] / length
+
+
+############################
+############################ 性能分析
+############################
+
+
+# 阶段计时器
+class _Stage:
+    __slots__ = ("record", "start", "elapsed")
+
+    def __init__(self, record):
+        self.record = record
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.elapsed = time.perf_counter() - self.start
+        self.record[0] += self.elapsed
+        self.record[1] += 1
+
+
+class _NullStage:
+    elapsed = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+# 性能分析器，记录每个阶段的耗时和调用次数
+class Profiler:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {}  # type: dict[str, list]
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        record = self.stages.get(name)
+        if record is None:
+            record = self.stages.setdefault(name, [0.0, 0])
+        return _Stage(record)
+
+    def add(self, name, elapsed, count=1):
+        if not self.enabled:
+            return
+        record = self.stages.setdefault(name, [0.0, 0])
+        record[0] += elapsed
+        record[1] += count
+
+    def merge(self, stages):
+        # type: (dict[str, dict[str, Any]]) -> None
+        for name, item in stages.items():
+            self.add(name, item["time"], item["count"])
+
+    def to_dict(self):
+        return {
+            name: {"time": round(record[0], 6), "count": record[1]}
+            for name, record in self.stages.items()
+        }
+
+
+############################
+############################ 扇区数据块
+############################
+
+
+# 数据块写入器
+# 顶点以扇区内局部索引写入，扇区以ID写入，合并时再修补为全局索引
+class BlobWriter:
+    def __init__(self):
+        self.buffer = BytesIO()
+        self.keys = []  # type: list[tuple[float, float, float]]
+        self.key_map = {}  # type: dict[tuple[float, float, float], int]
+        self.vert_patches = []  # type: list[tuple[int, int]]
+        self.sec_patches = []  # type: list[tuple[int, int]]
+
+    # 分配局部顶点索引，顺序与首次使用顺序一致
+    def alloc_vert(self, key) -> int:
+        idx = self.key_map.get(key)
+        if idx is None:
+            idx = self.key_map.setdefault(key, len(self.keys))
+            self.keys.append(key)
+        return idx
+
+    def write(self, fmt, *args):
+        self.buffer.write(struct.pack(fmt, *args))
+
+    def write_bytes(self, buffer):
+        self.buffer.write(buffer)
+
+    def write_verts(self, verts_idx):
+        buffer = self.buffer
+        buffer.write(_U32.pack(len(verts_idx)))
+        for v_idx in verts_idx:
+            self.vert_patches.append((buffer.tell(), v_idx))
+            buffer.write(_U32.pack(v_idx))
+
+    def write_sector(self, sector_id):
+        self.sec_patches.append((self.buffer.tell(), sector_id))
+        self.buffer.write(_U32.pack(sector_id))
+
+    def finish(self, face_num, steep, errors=()) -> dict[str, Any]:
+        blob = {
+            "data": self.buffer.getvalue(),
+            "keys": self.keys,
+            "vert_patches": self.vert_patches,
+            "sec_patches": self.sec_patches,
+            "face_num": face_num,
+            "steep": steep,
+            "errors": list(errors),  # 编译错误信息
+        }
+        self.buffer.close()
+        return blob
+
+
+# 写入面数据，faces_sorted 中的顶点为局部索引
+def write_faces(writer, faces_sorted, v_dist, tex_id, tex_attrs, tex_names):
+    # type: (BlobWriter, list, list[float], list[int], dict[str, list], dict[int, str]) -> None
+    writer.write("<I", len(faces_sorted))
+    for (
+        face_index,
+        verts_idx,
+        normal,
+        face_type,
+        connect_data,
+    ) in faces_sorted:
+        writer.write("<I", face_type)
+        ## 法向
+        writer.write("<ddd", normal[0], -normal[2], normal[1])
+        writer.write("<d", v_dist[face_index])
+
+        if face_type in (7002, 7005):
+            writer.write_verts(verts_idx)
+            if face_type == 7005:
+                continue
+            writer.write_sector(connect_data[0])
+        ## 固定标识
+        writer.write("<I", 3)
+        writer.write("<I", 0)
+
+        # 写入纹理数据
+        if face_type == 7004:
+            writer.write_bytes(connect_data[2])
+        else:
+            buffer = tex_names[tex_id[face_index]].encode("utf-8")
+            writer.write("<I", len(buffer))
+            writer.write_bytes(buffer)
+            tex_vx = tex_attrs["vx"][face_index]
+            tex_vy = tex_attrs["vy"][face_index]
+            writer.write("<ddd", tex_vx[0], -tex_vx[2], tex_vx[1])
+            writer.write("<ddd", tex_vy[0], -tex_vy[2], tex_vy[1])
+            writer.write(
+                "<ff",
+                tex_attrs["xpos"][face_index]
+                / (0.001 * tex_attrs["xzoom"][face_index]),
+                tex_attrs["ypos"][face_index]
+                / (0.001 * tex_attrs["yzoom"][face_index]),
+            )
+
+        writer.write_bytes(b"\x00" * 8)  # 0
+        #
+        if face_type == 7002:
+            continue
+
+        writer.write_verts(verts_idx)
+        #
+        if face_type == 7003:
+            conn_sid, verts_sub_idx, tangent_data = connect_data
+            writer.write_verts(verts_sub_idx)
+            writer.write_sector(conn_sid)
+
+            writer.write("<I", len(tangent_data))
+            for dist, cross in tangent_data:
+                writer.write("<ddd", cross[0], -cross[2], cross[1])
+                writer.write("<d", dist)
+        #
+        elif face_type == 7004:
+            holes_data, cut_data_buff, _ = connect_data
+            writer.write("<I", len(holes_data))
+
+            for _, tangent_data, verts_sub_idx, conn_sid in holes_data:
+                writer.write_verts(verts_sub_idx)
+                writer.write_sector(conn_sid)
+
+                writer.write("<I", len(tangent_data))
+                for tx, ty, tz, dist in tangent_data:
+                    writer.write("<ddd", tx, ty, tz)
+                    writer.write("<d", dist)
+
+            for buffer in reversed(cut_data_buff):
+                writer.write_bytes(buffer)
+
+
+# 按全局索引重定位数据块
+def relocate(blob, local_map, global_sector_map):
+    # type: (dict[str, Any], Any, dict[int, int]) -> bytearray
+    if isinstance(local_map, np.ndarray):
+        local_map = local_map.tolist()
+    buffer = bytearray(blob["data"])
+    pack_into = _U32.pack_into
+    for offset, v_idx in blob["vert_patches"]:
+        pack_into(buffer, offset, local_map[v_idx])
+    for offset, sid in blob["sec_patches"]:
+        pack_into(buffer, offset, global_sector_map[sid])
+    return buffer
+
+
+############################
+############################ 顶点表
+############################
+
+
+# 批量变换顶点并计算顶点键，与 ((matrix_world @ co) * 1000).to_tuple(0) 的结果一致
+# 返回世界坐标 (float32) 和blade坐标系的顶点键 (x, -z, y)
+def transform_keys(matrix, co):
+    # type: (Any, np.ndarray) -> tuple[np.ndarray, np.ndarray]
+    m = np.asarray(matrix, dtype=np.float32)
+    co = np.asarray(co, dtype=np.float32).reshape(-1, 3)
+    # 单精度乘积，双精度按列顺序累加
+    prod = co[:, None, :] * m[None, :3, :3]
+    co_world = (
+        prod[:, :, 0].astype(np.float64)
+        + prod[:, :, 1]
+        + prod[:, :, 2]
+        + m[:3, 3].astype(np.float64)
+    ).astype(np.float32)
+    keys = np.rint((co_world * np.float32(1000)).astype(np.float64))
+    keys = np.stack((keys[:, 0], -keys[:, 2], keys[:, 1]), axis=1)
+    return co_world, keys
+
+
+# 全局顶点表，按首次出现的顺序分配索引，并焊接容差内的相近顶点
+class VertexTable:
+    def __init__(self, tolerance=0.0):
+        self.tolerance = tolerance  # 焊接容差 (毫米)
+        self.vertices = np.empty((0, 3), dtype=np.float64)
+
+    # 构建顶点表，返回每个扇区的局部索引到全局索引的映射
+    def build(self, keys_list):
+        # type: (list[Any]) -> list[np.ndarray]
+        lengths = [len(keys) for keys in keys_list]
+        if sum(lengths) == 0:
+            return [np.empty(0, dtype=np.int64) for _ in keys_list]
+        all_keys = np.concatenate(
+            [np.asarray(keys, dtype=np.float64).reshape(-1, 3) for keys in keys_list]
+        )
+        # 量化坐标哈希去重
+        quant = np.rint(all_keys).astype(np.int64)
+        _, first_idx, inverse = np.unique(
+            quant, axis=0, return_index=True, return_inverse=True
+        )
+        inverse = inverse.reshape(-1)
+        # 按首次出现的顺序排列
+        order = np.argsort(first_idx, kind="stable")
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        uid = rank[inverse]
+        first_idx = first_idx[order]
+
+        if self.tolerance > 0:
+            segments = np.repeat(np.arange(len(lengths)), lengths)
+            final = self.weld(quant[first_idx], uid, segments)
+            uid = final[uid]
+            kept = np.flatnonzero(final == np.arange(len(final)))
+            first_idx = first_idx[kept]
+            remap = np.empty(len(final), dtype=np.int64)
+            remap[kept] = np.arange(len(kept))
+            uid = remap[uid]
+
+        self.vertices = all_keys[first_idx]
+        return np.split(uid, np.cumsum(lengths)[:-1])
+
+    # 空间哈希焊接，返回每个顶点的代表顶点索引 (代表顶点为最先出现的顶点)
+    # 顶点按出现顺序只与代表顶点比较，簇内顶点与代表顶点的欧氏距离不超过容差，不会链式焊接
+    # 单元格边长不小于容差，容差球总在相邻的27个单元格内
+    # 同一扇区中的顶点不焊接，避免产生退化面
+    def weld(self, verts, uid, segments):
+        # type: (np.ndarray, np.ndarray, np.ndarray) -> np.ndarray
+        tol = self.tolerance
+        tol_sq = tol * tol
+        count = len(verts)
+        root = np.arange(count)
+        cell_size = max(int(math.ceil(tol)), 1)
+        cells = np.floor_divide(verts, cell_size)
+        cells -= cells.min(axis=0) - 1
+        dims = cells.max(axis=0) + 2
+        # 网格过大时放大单元格，保证编码不溢出
+        while int(dims[0]) * int(dims[1]) * int(dims[2]) >= 2**62:
+            cell_size *= 2
+            cells = np.floor_divide(verts, cell_size)
+            cells -= cells.min(axis=0) - 1
+            dims = cells.max(axis=0) + 2
+        stride = np.array([dims[1] * dims[2], dims[2], 1], dtype=np.int64)
+        enc = cells @ stride
+        enc_unique, enc_count = np.unique(enc, return_counts=True)
+
+        # 筛选候选顶点: 所在单元格或相邻单元格中存在其他顶点
+        def occupied(query):
+            pos = np.searchsorted(enc_unique, query)
+            pos[pos == len(enc_unique)] = 0
+            return enc_unique[pos] == query
+
+        # 按编码排序后查询，提高查找的局部性
+        sort_idx = np.argsort(enc, kind="stable")
+        enc_sorted = enc[sort_idx]
+        cand_sorted = enc_count[np.searchsorted(enc_unique, enc_sorted)] > 1
+        offsets = [
+            (x, y, z)
+            for x in (-1, 0, 1)
+            for y in (-1, 0, 1)
+            for z in (-1, 0, 1)
+            if (x, y, z) != (0, 0, 0)
+        ]
+        for offset in offsets:
+            cand_sorted |= occupied(enc_sorted + np.dot(offset, stride))
+        candidate = np.empty(count, dtype=bool)
+        candidate[sort_idx] = cand_sorted
+        cand_idx = np.flatnonzero(candidate)
+        if len(cand_idx) == 0:
+            return root
+
+        # 候选顶点所属的扇区
+        sectors = {int(i): set() for i in cand_idx}
+        mask = candidate[uid]
+        for i, sec in zip(uid[mask].tolist(), segments[mask].tolist()):
+            sectors[i].add(sec)
+
+        grid = {}  # type: dict[int, list[int]]
+        cand_enc = enc[cand_idx].tolist()
+        cand_co = dict(zip(cand_idx.tolist(), verts[cand_idx].tolist()))
+        for i, e in zip(cand_co, cand_enc):
+            grid.setdefault(e, []).append(i)
+        neighbors = [int(np.dot(offset, stride)) for offset in offsets] + [0]
+        # 按出现顺序处理，当前顶点之前的代表顶点已确定
+        for i, e in zip(cand_co, cand_enc):
+            co = cand_co[i]
+            best = -1
+            for offset in neighbors:
+                for j in grid.get(e + offset, ()):
+                    if j >= i or root[j] != j or (best != -1 and j > best):
+                        continue
+                    co2 = cand_co[j]
+                    dx, dy, dz = co2[0] - co[0], co2[1] - co[1], co2[2] - co[2]
+                    if dx * dx + dy * dy + dz * dz > tol_sq:
+                        continue
+                    if sectors[i] & sectors[j]:
+                        continue
+                    best = j
+            # 焊接到最先出现的代表顶点
+            if best != -1:
+                root[i] = best
+                sectors[best] |= sectors[i]
+        return root
+
+    def tobytes(self) -> bytes:
+        return np.ascontiguousarray(self.vertices, dtype="<f8").tobytes()
+
+
+############################
+############################ 网格拓扑
+############################
+
+
+# 与bmesh一致的拓扑: 面的边按环顺序，边的相连面按径向顺序
+class Topology:
+    def __init__(self, polys, edges):
+        # type: (list[tuple[int, ...]], list[tuple[int, int]]) -> None
+        self.polys = polys
+        self.edge_index = {
+            (a, b) if a < b else (b, a): i for i, (a, b) in enumerate(edges)
+        }
+        edge_faces = {}  # type: dict[tuple[int, int], list[int]]
+        face_edges = []  # type: list[list[tuple[int, int]]]
+        for fi, verts in enumerate(polys):
+            num = len(verts)
+            lst = []
+            for i in range(num):
+                a, b = verts[i], verts[(i + 1) % num]
+                key = (a, b) if a < b else (b, a)
+                edge_faces.setdefault(key, []).append(fi)
+                lst.append(key)
+            face_edges.append(lst)
+        # 径向循环从最后添加的面开始
+        for key, faces in edge_faces.items():
+            if len(faces) > 1:
+                edge_faces[key] = [faces[-1]] + faces[:-1]
+        self.edge_faces = edge_faces
+        self.face_edges = face_edges
+
+    # 获取相连的平展面
+    def get_linked_flat(self, face, normals):
+        # type: (int, list[tuple[float, float, float]]) -> list[int]
+        visited = []  # type: list[int]
+        visited_set = set()
+        stack = [face]
+        normal = normals[face]
+        edge_faces = self.edge_faces
+        while stack:
+            f = stack.pop()
+            if f in visited_set:
+                continue
+            visited.append(f)
+            visited_set.add(f)
+            for e in self.face_edges[f]:
+                for f2 in edge_faces[e]:
+                    if f2 not in visited_set and _dot(normals[f2], normal) > epsilon2:
+                        stack.append(f2)
+        return visited
+
+    # 岛屿遍历顺序 (广度优先)，与融并面时的面顺序一致
+    def island_order(self, faces):
+        # type: (list[int]) -> list[int]
+        group_set = set(faces)
+        start = min(faces)
+        order = [start]
+        visited = {start}
+        idx = 0
+        while idx < len(order):
+            f = order[idx]
+            idx += 1
+            for e in self.face_edges[f]:
+                for f2 in self.edge_faces[e]:
+                    if f2 in group_set and f2 != f and f2 not in visited:
+                        visited.add(f2)
+                        order.append(f2)
+                        break
+        return order
+
+    # 获取平展面组的外轮廓
+    # 等同于删除组外的面、融并组面、反细分边之后剩余面的顶点，返回None表示无法提取
+    def flat_outline(self, faces, co):
+        # type: (list[int], list[tuple[float, float, float]]) -> list[int] | None
+        polys = self.polys
+        edge_faces = self.edge_faces
+        if len(faces) == 1:
+            loop = list(polys[faces[0]])
+            boundary = [
+                (loop[i], loop[(i + 1) % len(loop)]) for i in range(len(loop))
+            ]
+        else:
+            group_set = set(faces)
+            next_vert = {}  # type: dict[int, int]
+            boundary = []
+            v1 = -1
+            for f in self.island_order(faces):
+                verts = polys[f]
+                num = len(verts)
+                for i, e in enumerate(self.face_edges[f]):
+                    if sum(1 for f2 in edge_faces[e] if f2 in group_set) != 1:
+                        continue
+                    a, b = verts[i], verts[(i + 1) % num]
+                    # 外轮廓不是简单环
+                    if a in next_vert:
+                        return None
+                    next_vert[a] = b
+                    boundary.append((a, b))
+                    if v1 == -1:
+                        v1 = a
+            if v1 == -1:
+                return None
+            loop = [v1]
+            v = next_vert.get(v1)
+            while v is not None and v != v1:
+                loop.append(v)
+                v = next_vert.get(v)
+            if v is None or len(loop) != len(next_vert):
+                return None
+
+        return self.unsubdivide(loop, boundary, co)
+
+    # 反细分边，合并共线的子顶点
+    def unsubdivide(self, loop, boundary, co):
+        # type: (list[int], list[tuple[int, int]], list[tuple[float, float, float]]) -> list[int] | None
+        edge_index = self.edge_index
+        link = {}  # type: dict[int, list[tuple[int, int]]]
+        for a, b in boundary:
+            idx = edge_index[(a, b) if a < b else (b, a)]
+            link.setdefault(a, []).append((idx, b))
+            link.setdefault(b, []).append((idx, a))
+        # 顶点的相连边按边索引排序
+        adj = {v: [n for _, n in sorted(lst)] for v, lst in link.items()}
+
+        chains = []  # type: list[tuple[list[int], int]]
+        visited = set()
+        for v in sorted(adj):
+            if v in visited:
+                continue
+            nb = adj[v]
+            if len(nb) != 2:
+                continue
+            dir1 = _normalized(_sub(co[nb[0]], co[v]))
+            dir2 = _normalized(_sub(co[nb[1]], co[v]))
+            # 如果该顶点只连接两条边且共线，则为子顶点
+            if _dot(dir1, dir2) < -0.999999:
+                verts, endpoint = self.get_sub_verts_along_line(v, dir1, adj, co)
+                if endpoint is None:
+                    return None
+                chains.append((verts, endpoint))
+                visited.update(verts)
+
+        # 合并到端点，使用并查集记录合并关系
+        parent = {}  # type: dict[int, int]
+
+        def find(v):
+            while v in parent:
+                v = parent[v]
+            return v
+
+        for verts, endpoint in chains:
+            nb = adj[endpoint]
+            endpoint2 = nb[0]
+            if endpoint2 in verts:
+                endpoint2 = nb[1]
+            target = find(endpoint2)
+            for v in verts:
+                root = find(v)
+                if root != target:
+                    parent[root] = target
+
+        mapped = [find(v) for v in loop]
+        num = len(mapped)
+        # 焊接后保留每段重复顶点中的最后一个
+        result = [mapped[i] for i in range(num) if mapped[i] != mapped[(i + 1) % num]]
+        if len(result) < 3:
+            return None
+        return result
+
+    # 获取共线的子顶点
+    @staticmethod
+    def get_sub_verts_along_line(vert, dir, adj, co):
+        visited = []  # type: list[int]
+        endpoint = None
+        stack = [vert]
+        while stack:
+            v = stack.pop()
+            if v in visited:
+                continue
+            visited.append(v)
+            for v2 in adj[v]:
+                if v2 in visited:
+                    continue
+                nb = adj[v2]
+                link_num = len(nb)
+                if link_num > 2:
+                    endpoint = v
+                    continue
+                elif link_num == 2:
+                    v3 = nb[1] if nb[0] == v else nb[0]
+                    dir2 = _normalized(_sub(co[v2], co[v3]))
+                    # 如果连接边等于2且另一条边不共线，说明是端点
+                    if abs(_dot(dir2, dir)) < 0.999999:
+                        endpoint = v
+                        continue
+                stack.append(v2)
+        return visited, endpoint
+
+
+############################
+############################ 平面切割
+############################
+
+
+# 与Blender的 double_round 一致: 四舍五入，恰好为0.5时取偶
+def double_round(x: float, ndigits: int) -> float:
+    pow1 = 10.0**ndigits
+    y = x * pow1
+    z = math.floor(abs(y) + 0.5)
+    z = z if y >= 0 else -z
+    if abs(y - z) == 0.5:
+        y2 = y / 2.0
+        z = math.floor(abs(y2) + 0.5)
+        z = 2.0 * (z if y2 >= 0 else -z)
+    return z / pow1
+
+
+# 平展面的纹理属性键，与 is_tex_uniform 的比较顺序一致
+TEX_KEYS = ("tex_id", "xpos", "ypos", "xzoom", "yzoom", "angle")
+
+
+# 平展面切割器
+# 平展面的所有顶点一次性投影到平面的二维坐标中，切割在二维数组上进行，
+# 输出与 flat_split 相同的切割记录 (8001/8002/8003) 和切线数据
+class FlatSplitter:
+    dist = 1e-4  # 切割时判断顶点在平面上的距离
+
+    def __init__(self, snapshot, group_faces, normal):
+        # type: (dict[str, Any], list[int], tuple[float, float, float]) -> None
+        self.snapshot = snapshot
+        polys = snapshot["polys"]
+        co_world = snapshot["co_world"]
+        conn = snapshot["conn"]
+        tex_id = snapshot["tex_id"]
+        tex_attrs = snapshot["tex_attrs"]
+        self.errors = []  # type: list[str]
+        # 平面坐标系
+        axis_n = np.array(_normalized(normal), dtype=np.float64)
+        helper = (0.0, 0.0, 1.0) if abs(axis_n[2]) < 0.9 else (1.0, 0.0, 0.0)
+        axis_u = np.cross(helper, axis_n)
+        axis_u /= np.linalg.norm(axis_u)
+        axis_v = np.cross(axis_n, axis_u)
+        self.basis = np.stack((axis_u, axis_v), axis=1)  # type: np.ndarray
+
+        verts_map = {}  # type: dict[int, int]
+        pool3 = []  # type: list[tuple[float, float, float]]
+        block = []
+        for f in group_faces:
+            verts = []
+            for v in polys[f]:
+                idx = verts_map.get(v)
+                if idx is None:
+                    idx = verts_map.setdefault(v, len(pool3))
+                    pool3.append(tuple(co_world[v]))
+                verts.append(idx)
+            attrs = tuple(tex_id[f] if k == "tex_id" else tex_attrs[k][f] for k in TEX_KEYS)
+            block.append((verts, conn[f], attrs, f))
+        self.pool3 = pool3
+        # 投影到二维坐标
+        self.pool2 = np.asarray(pool3, dtype=np.float64) @ self.basis
+        self.block = block
+
+    ############################
+    def add_vert(self, co3, co2):
+        self.pool3.append(co3)
+        self.pool2 = np.vstack((self.pool2, co2))
+        return len(self.pool3) - 1
+
+    # 二分平面，返回 (内部面, 外部面)，切割失败时外部面为None
+    def bisect(self, block, plane_no, plane_co):
+        no2 = np.asarray(plane_no, dtype=np.float64) @ self.basis
+        co2 = np.asarray(plane_co, dtype=np.float64) @ self.basis
+        side_val = ((self.pool2 - co2) @ no2).tolist()
+        side = [1 if s > self.dist else -1 if s < -self.dist else 0 for s in side_val]
+        inner = []
+        outer = []
+        new_verts = {}  # type: dict[tuple[int, int], int]
+        for face in block:
+            verts = face[0]
+            sides = [side[v] for v in verts]
+            if min(sides) >= 0 and max(sides) > 0:
+                outer.append(face)
+                continue
+            if max(sides) <= 0:
+                inner.append(face)
+                continue
+            # 切割面
+            inner_verts = []
+            outer_verts = []
+            num = len(verts)
+            for i in range(num):
+                a, b = verts[i], verts[(i + 1) % num]
+                sa, sb = side[a], side[b]
+                if sa <= 0:
+                    inner_verts.append(a)
+                if sa >= 0:
+                    outer_verts.append(a)
+                if sa * sb < 0:
+                    key = (a, b) if a < b else (b, a)
+                    m = new_verts.get(key)
+                    if m is None:
+                        t = side_val[a] / (side_val[a] - side_val[b])
+                        pa, pb = self.pool3[a], self.pool3[b]
+                        co3 = tuple(f32(pa[k] + (pb[k] - pa[k]) * t) for k in range(3))
+                        co2_new = self.pool2[a] + (self.pool2[b] - self.pool2[a]) * t
+                        m = new_verts.setdefault(key, self.add_vert(co3, co2_new))
+                        side.append(0)
+                        side_val.append(0.0)
+                    inner_verts.append(m)
+                    outer_verts.append(m)
+            inner.append((inner_verts,) + face[1:])
+            outer.append((outer_verts,) + face[1:])
+        if not inner or not outer:
+            return block, None
+        return inner, outer
+
+    ############################
+    # 面的法向 (Newell)
+    def face_normal(self, verts):
+        pool3 = self.pool3
+        nx = ny = nz = 0.0
+        num = len(verts)
+        for i in range(num):
+            x1, y1, z1 = pool3[verts[i - 1]]
+            x2, y2, z2 = pool3[verts[i]]
+            nx += (y1 - y2) * (z1 + z2)
+            ny += (z1 - z2) * (x1 + x2)
+            nz += (x1 - x2) * (y1 + y2)
+        n = _normalized((nx, ny, nz))
+        return f32(n[0]), f32(n[1]), f32(n[2])
+
+    # 面的内部边切线，按顶点顺序返回 (v1, 切线, 距离)
+    def face_tangents(self, block, face):
+        edge_count = {}  # type: dict[tuple[int, int], int]
+        for f in block:
+            verts = f[0]
+            num = len(verts)
+            for i in range(num):
+                a, b = verts[i], verts[(i + 1) % num]
+                key = (a, b) if a < b else (b, a)
+                edge_count[key] = edge_count.get(key, 0) + 1
+
+        verts = face[0]
+        normal = self.face_normal(verts)
+        result = []
+        num = len(verts)
+        for i in range(num):
+            a, b = verts[i], verts[(i + 1) % num]
+            # 跳过边界
+            if edge_count[(a, b) if a < b else (b, a)] < 2:
+                continue
+            v1, v2 = self.pool3[a], self.pool3[b]
+            cross = normalize_f32(cross_f32(sub_f32(v2, v1), normal))
+            tangent = tuple(f32(double_round(c, 5)) for c in cross)
+            dist = round(dot_f32((-v1[0], -v1[1], -v1[2]), tangent) * 1000, 1)
+            result.append((v1, tangent, dist))
+        return result
+
+    # 顶点相对于切线的方向
+    def side_dots(self, verts, v1, tangent):
+        result = []
+        for v in verts:
+            d = _normalized(_sub(self.pool3[v], v1))
+            result.append(_dot(d, tangent))
+        return result
+
+    # 判断纹理一致性，返回不一致的属性索引，一致时返回-1
+    @staticmethod
+    def tex_break(block):
+        face = block[0]
+        for i, key in enumerate(TEX_KEYS):
+            if key == "angle":
+                val_1 = round(face[2][i], 3)
+                if next((0 for f in block if round(f[2][i], 3) != val_1), 1) == 0:
+                    return i
+            else:
+                val_1 = face[2][i]
+                if next((0 for f in block if f[2][i] != val_1), 1) == 0:
+                    return i
+        return -1
+
+    def tex_buffer(self, face):
+        # type: (tuple) -> bytes
+        f = face[3]
+        tex_attrs = self.snapshot["tex_attrs"]
+        tex_vx = tex_attrs["vx"][f]
+        tex_vy = tex_attrs["vy"][f]
+        name = self.snapshot["tex_names"][face[2][0]].encode("utf-8")
+        return b"".join(
+            (
+                struct.pack("<I", len(name)),
+                name,
+                struct.pack(
+                    "<ddddddff",
+                    tex_vx[0],
+                    -tex_vx[2],
+                    tex_vx[1],
+                    tex_vy[0],
+                    -tex_vy[2],
+                    tex_vy[1],
+                    face[2][1] / (0.001 * face[2][3]),
+                    face[2][2] / (0.001 * face[2][4]),
+                ),
+            )
+        )
+
+    ############################
+    # 平展面分割，与 flat_split 的流程一致
+    def split(self, hole_dict):
+        # type: (dict[int, dict[str, Any]]) -> tuple[list, list[bytes], bytes]
+        cut_data_buffer = []  # type: list[bytes]
+        tex_buffer = b""
+        stack = [(self.block, [], -1)]
+        while stack:
+            block, block_mark, cut_data_idx = stack.pop()
+            hole = next((f for f in block if f[1] != 0), None)
+            if hole:
+                other_holes = [f for f in block if f is not hole and f[1] != 0]
+            else:
+                other_holes = []
+            #
+            if other_holes:
+                tangent_data = []
+                for v1, tangent, dist in self.face_tangents(block, hole):
+                    clean_hole = set()  # 可清理的洞
+                    polluted_hole = set()  # 污染的洞
+                    for hole_2 in other_holes:
+                        dot_lst = self.side_dots(hole_2[0], v1, tangent)
+                        # 所有点在切线空间内或与切线平行，则为可清理的洞
+                        if all([i > -epsilon for i in dot_lst]):
+                            clean_hole.add(hole_2[1])
+                        # 只有部分点在切线空间内（不包括与切线平行），则为不可清理的污染的洞
+                        elif next((i > epsilon for i in dot_lst), None):
+                            polluted_hole.add(hole_2[1])
+                    if clean_hole or polluted_hole:
+                        tangent_data.append(
+                            [v1, tangent, dist, clean_hole, polluted_hole]
+                        )
+                ####
+                # 切割平面
+                clear_mark = True
+                inner_cut = False
+                while tangent_data:
+                    is_tex_uniform = self.tex_break(block) == -1
+                    # 污染数量最少的排前面
+                    tangent_data.sort(key=lambda x: len(x[4]))
+                    # 清理数量最多的排前面
+                    tangent_data.sort(key=lambda x: -len(x[3]))
+                    #
+                    plane_co, tangent, dist, clean_hole, polluted_hole = tangent_data[0]
+                    block, outer_block = self.bisect(block, tangent, plane_co)
+                    if outer_block is None:
+                        self.errors.append(f"bisect_plane failed: {self.snapshot['name']}")
+                        if not inner_cut:
+                            clear_mark = False
+                        break
+                    cut_data_buffer.append(
+                        struct.pack("<dddd", tangent[0], -tangent[2], tangent[1], dist)
+                    )
+                    if inner_cut:
+                        stack.append(
+                            (outer_block, [8001 if is_tex_uniform else 8002], cut_data_idx)
+                        )
+                    else:
+                        block_mark.append(8001 if is_tex_uniform else 8002)
+                        stack.append((outer_block, block_mark, cut_data_idx))
+                    if not is_tex_uniform:
+                        cut_data_idx = len(cut_data_buffer) - 1
+                    else:
+                        cut_data_idx = -1
+                    #
+                    for i in range(len(tangent_data) - 1, 0, -1):
+                        tangent_data[i][3].difference_update(clean_hole)
+                        tangent_data[i][4].difference_update(clean_hole)
+                        if not (tangent_data[i][3] or tangent_data[i][4]):
+                            tangent_data.pop(i)
+                    tangent_data.pop(0)
+                    inner_cut = True
+                #
+                if clear_mark:
+                    block_mark = []
+            ####
+            key_idx = self.tex_break(block)
+            if key_idx != -1:
+                is_angle = TEX_KEYS[key_idx] == "angle"
+
+                def tex_val(f):
+                    return round(f[2][key_idx], 3) if is_angle else f[2][key_idx]
+
+                faces_dict = {}
+                for f in block:
+                    faces_dict.setdefault(tex_val(f), []).append(f)
+                faces_list = [(k, v) for k, v in faces_dict.items()]
+                #
+                faces_list.sort(key=lambda x: len(x[1]))
+                val_1 = faces_list[0][0]
+                face = faces_list[0][1][0]
+                for v1, tangent, dist in self.face_tangents(block, face):
+                    for face2 in block:
+                        if tex_val(face2) == val_1:
+                            continue
+                        is_polluted = next(
+                            (1 for i in self.side_dots(face2[0], v1, tangent) if i > epsilon),
+                            0,
+                        )
+                        if is_polluted:
+                            inner_block, outer_block = self.bisect(block, tangent, v1)
+                            if outer_block is None:
+                                self.errors.append(
+                                    f"tex bisect_plane failed: {self.snapshot['name']}"
+                                )
+                                break
+                            cut_data_buffer.append(
+                                struct.pack(
+                                    "<dddd", tangent[0], -tangent[2], tangent[1], dist
+                                )
+                            )
+                            block_mark.append(8002)
+                            stack.append((outer_block, block_mark, cut_data_idx))
+                            stack.append((inner_block, [], len(cut_data_buffer) - 1))
+                            break
+                    # 如果没有发生break
+                    else:
+                        continue
+                    break
+            else:
+                # 最终的块只剩下一个洞或1个纹理
+                if cut_data_idx != -1 or (not stack):
+                    tex_buffer = self.tex_buffer(block[0])
+                    # 如果不是最后一个块
+                    if cut_data_idx != -1:
+                        cut_data_buffer[cut_data_idx] = b"".join(
+                            (
+                                cut_data_buffer[cut_data_idx],
+                                struct.pack("<II", 3, 0),
+                                tex_buffer,
+                                b"\x00" * 8,
+                            )
+                        )
+                hole = next((f for f in block if f[1] != 0), None)
+                hole_fmt = ""
+                hole_v = ()
+                if hole:
+                    hole_data = hole_dict[hole[1]]
+                    tangent_idx = []
+                    if len(block) != 1:
+                        for v1, tangent, dist in self.face_tangents(block, hole):
+                            t = tangent[0], -tangent[2], tangent[1], dist
+                            if t not in hole_data["tangent"]:
+                                hole_data["tangent"].append(t)
+                                tangent_idx.append(len(hole_data["tangent"]) - 1)
+                            else:
+                                index = hole_data["tangent"].index(t)
+                                if index not in tangent_idx:
+                                    tangent_idx.append(index)
+                    hole_fmt = f"II{'I'*len(tangent_idx)}"
+                    hole_v = (hole_data["index"], len(tangent_idx), *tangent_idx)
+                cut_data_buffer.append(
+                    struct.pack(
+                        f"<{'I'*len(block_mark)}II{hole_fmt}",
+                        *block_mark,
+                        8003,
+                        1 if hole else 0,
+                        *hole_v,
+                    )
+                )
+        #
+        holes_data = [
+            (v["index"], v["tangent"], v["verts_idx"], k) for k, v in hole_dict.items()
+        ]
+        holes_data.sort(key=lambda x: x[0])
+        return holes_data, cut_data_buffer, tex_buffer
+
+
+############################
+############################ 扇区编译
+############################
+
+
+# 判断纹理一致性
+def is_tex_uniform(faces, tex_id, tex_attrs):
+    # type: (list[int], list[int], dict[str, list]) -> bool
+    face = faces[0]
+    val_1 = tex_id[face]
+    if next((0 for f in faces if tex_id[f] != val_1), 1) == 0:
+        return False
+    for key in ("xpos", "ypos", "xzoom", "yzoom", "angle"):
+        values = tex_attrs[key]
+        if key == "angle":
+            val_1 = round(values[face], 3)
+            uniform = next((0 for f in faces if round(values[f], 3) != val_1), 1)
+        else:
+            val_1 = values[face]
+            uniform = next((0 for f in faces if values[f] != val_1), 1)
+        if not uniform:
+            return False
+    return True
+
+
+# 编译扇区面数据，返回None表示外轮廓无法提取，需要由主线程使用bmesh编译
+def compile_sector(snapshot, profile=False):
+    # type: (dict[str, Any], bool) -> dict[str, Any] | None
+    start_time = time.perf_counter()
+    profiler = Profiler(profile)
+    polys = snapshot["polys"]
+    co = snapshot["co"]
+    co_world = snapshot["co_world"]
+    keys = snapshot["keys"]
+    normals = snapshot["normals"]
+    w_normals = snapshot["w_normals"]
+    conn = snapshot["conn"]
+    tex_id = snapshot["tex_id"]
+    tex_attrs = snapshot["tex_attrs"]
+    topo = Topology(polys, snapshot["edges"])
+    writer = BlobWriter()
+    errors = []  # type: list[str]
+
+    # 面数据
+    faces_sorted = []
+    conn_face_visited = set()
+    for face_index in range(len(polys)):
+        if face_index in conn_face_visited:
+            continue
+
+        connect_data = ()
+        normal = w_normals[face_index]
+        with profiler.stage("linked_flat"):
+            group_faces = topo.get_linked_flat(face_index, normals)
+        conn_face_visited.update(group_faces)
+        # 如果该平面只有一个面
+        if len(group_faces) == 1:
+            conne_sid = conn[face_index]
+            # 如果没有连接或者连接的扇区不在导出列表中
+            if conne_sid == 0:
+                if tex_id[face_index] == -1:
+                    face_type = 7005  # 天空面
+                else:
+                    face_type = 7001  # 普通面
+            else:
+                face_type = 7002  # 整个面是连接的
+                connect_data = (conne_sid,)
+        # 如果该平面有多个面
+        else:
+            conn_face_num = 0
+            hole_dict = {}  # type: dict[int, dict[str, Any]]
+            face_conn = -1
+            verts_sub_idx = []
+            for face in group_faces:
+                conn_sid = conn[face]
+                if conn_sid == 0 or conn_sid in hole_dict:
+                    continue
+                face_conn = face
+                verts_sub_idx = [writer.alloc_vert(keys[v]) for v in polys[face]]
+                hole_dict[conn_sid] = {
+                    "index": conn_face_num,
+                    "tangent": [],
+                    "verts_idx": verts_sub_idx,
+                }
+                conn_face_num += 1
+            # 多连接或多纹理需要平面切割
+            if conn_face_num > 1 or not is_tex_uniform(group_faces, tex_id, tex_attrs):
+                face_type = 7004  # 平面中的多连接或多纹理
+                with profiler.stage("flat_split"):
+                    splitter = FlatSplitter(snapshot, group_faces, normal)
+                    connect_data = splitter.split(hole_dict)
+                errors.extend(splitter.errors)
+            # 如果连接数量是1, 7003类型
+            elif conn_face_num == 1:
+                face_type = 7003  # 平面中的单连接
+                # 按照顶点顺序计算切线
+                tangent_data = []  # 切线数据
+                conn_verts = polys[face_conn]
+                verts_sub_idx_num = len(verts_sub_idx)
+                for i in range(verts_sub_idx_num):
+                    j = (i + 1) % verts_sub_idx_num
+                    co1 = co_world[conn_verts[i]]
+                    co2 = co_world[conn_verts[j]]
+                    cross = normalize_f32(cross_f32(sub_f32(co2, co1), normal))
+                    dist = dot_f32((-co1[0], -co1[1], -co1[2]), cross) * 1000
+                    tangent_data.append((dist, cross))
+
+                connect_data = (conn[face_conn], verts_sub_idx, tangent_data)
+            # 如果连接数量是0
+            elif tex_id[group_faces[0]] == -1:
+                face_type = 7005  # 天空面
+            else:
+                face_type = 7001  # 普通面
+        # 获取凸壳顶点
+        with profiler.stage("outline"):
+            outline = topo.flat_outline(group_faces, co)
+        if outline is None:
+            if len(group_faces) > 1:
+                return None
+            continue
+        verts_idx = [writer.alloc_vert(keys[v]) for v in outline]
+        faces_sorted.append((face_index, verts_idx, normal, face_type, connect_data))
+
+    # 地板面排前面，避免滑坡问题
+    faces_sorted.sort(key=lambda x: round(-x[2][2], 3))
+    with profiler.stage("write"):
+        write_faces(
+            writer,
+            faces_sorted,
+            snapshot["v_dist"],
+            tex_id,
+            tex_attrs,
+            snapshot["tex_names"],
+        )
+    blob = writer.finish(len(faces_sorted), has_steep_face(faces_sorted), errors)
+    if profile:
+        blob["profile"] = {
+            "time": round(time.perf_counter() - start_time, 6),
+            "stages": profiler.to_dict(),
+        }
+    return blob
+
+
+# 是否存在会被引擎判定为滑坡的面
+def has_steep_face(faces_sorted) -> bool:
+    for item in faces_sorted:
+        cos = item[2][2]
+        # 与z轴点乘为0或负，跳过
+        if cos < epsilon:
+            continue
+        if cos < 0.7665:
+            return True
+    return False
+
+
+############################
+############################ 编译缓存
+############################
+
+
+# 扇区快照的内容哈希，作为缓存键
+def snapshot_key(snapshot) -> str:
+    # type: (dict[str, Any]) -> str
+    return hashlib.sha1(pickle.dumps(snapshot, protocol=4)).hexdigest()
+
+
+# 编译缓存文件: 文件头 + JSON描述 + 各扇区的原始数据
+# JSON中每个扇区为 [扇区ID, 缓存键, 面数, 滑坡, 数据长度, 顶点数, 顶点修补数, 扇区修补数]
+# 原始数据依次为面数据、顶点坐标 (<f8 x3)、顶点修补和扇区修补 (<u4 x2)
+# 缓存文件可能随.blend一起分享，读取时不执行文件中的任何代码，校验失败时整体视为无效
+
+
+# 校验并还原单个扇区的数据块，失败时返回None
+def unpack_cache_blob(item, body, offset):
+    # type: (Any, memoryview, int) -> tuple[int, str, dict[str, Any], int] | None
+    if not isinstance(item, list) or len(item) != 8:
+        return None
+    sid, key, face_num, steep, data_len, keys_num, vert_num, sec_num = item
+    if not isinstance(key, str) or not isinstance(steep, bool):
+        return None
+    counts = (sid, face_num, data_len, keys_num, vert_num, sec_num)
+    if not all(type(n) is int and n >= 0 for n in counts):
+        return None
+    end = offset + data_len + keys_num * 24 + (vert_num + sec_num) * 8
+    if end > len(body):
+        return None
+    data = bytes(body[offset : offset + data_len])
+    offset += data_len
+    keys = np.frombuffer(body, dtype="<f8", count=keys_num * 3, offset=offset)
+    offset += keys_num * 24
+    vert_patches = np.frombuffer(body, dtype="<u4", count=vert_num * 2, offset=offset)
+    offset += vert_num * 8
+    sec_patches = np.frombuffer(body, dtype="<u4", count=sec_num * 2, offset=offset)
+    vert_patches = vert_patches.reshape(-1, 2)
+    sec_patches = sec_patches.reshape(-1, 2)
+    # 修补位置必须在面数据内，顶点修补必须引用已有顶点
+    for patches in (vert_patches, sec_patches):
+        if len(patches) and int(patches[:, 0].max()) + 4 > data_len:
+            return None
+    if len(vert_patches) and int(vert_patches[:, 1].max()) >= keys_num:
+        return None
+    blob = {
+        "data": data,
+        "keys": keys.astype(np.float64).reshape(-1, 3),
+        "vert_patches": [tuple(p) for p in vert_patches.tolist()],
+        "sec_patches": [tuple(p) for p in sec_patches.tolist()],
+        "face_num": face_num,
+        "steep": steep,
+        "errors": [],
+    }
+    return sid, key, blob, end
+
+
+# 读取编译缓存 {sector_id: (key, blob)}，缓存无效时返回空字典
+def load_cache(filepath, version):
+    # type: (str, str) -> dict[int, tuple[str, dict[str, Any]]]
+    if not os.path.exists(filepath):
+        return {}
+    try:
+        with open(filepath, "rb") as f:
+            buffer = f.read()
+        magic, header_len = CACHE_HEADER.unpack_from(buffer)
+        if magic != CACHE_MAGIC:
+            return {}
+        header_end = CACHE_HEADER.size + header_len
+        header = json.loads(buffer[CACHE_HEADER.size : header_end])
+    except (OSError, struct.error, ValueError) as e:
+        print(f"Failed to load compile cache: {e}")
+        return {}
+    if (
+        not isinstance(header, dict)
+        or header.get("cache_version") != CACHE_VERSION
+        or header.get("version") != version
+        or not isinstance(header.get("sectors"), list)
+    ):
+        return {}
+    sectors = {}
+    body = memoryview(buffer)[header_end:]
+    offset = 0
+    for item in header["sectors"]:
+        result = unpack_cache_blob(item, body, offset)
+        if result is None:
+            print("Failed to load compile cache: invalid sector data")
+            return {}
+        sid, key, blob, offset = result
+        sectors[sid] = (key, blob)
+    if offset != len(body):
+        print("Failed to load compile cache: unexpected data")
+        return {}
+    return sectors
+
+
+def save_cache(filepath, version, sectors):
+    # type: (str, str, dict[int, tuple[str, dict[str, Any]]]) -> None
+    items = []
+    parts = []
+    for sid, (key, blob) in sectors.items():
+        keys = np.asarray(blob["keys"], dtype="<f8").reshape(-1, 3)
+        vert_patches = np.asarray(blob["vert_patches"], dtype="<u4").reshape(-1, 2)
+        sec_patches = np.asarray(blob["sec_patches"], dtype="<u4").reshape(-1, 2)
+        items.append(
+            [
+                sid,
+                key,
+                blob["face_num"],
+                bool(blob["steep"]),
+                len(blob["data"]),
+                len(keys),
+                len(vert_patches),
+                len(sec_patches),
+            ]
+        )
+        parts.extend((blob["data"], keys, vert_patches, sec_patches))
+    header = json.dumps(
+        {"cache_version": CACHE_VERSION, "version": version, "sectors": items},
+        separators=(",", ":"),
+    ).encode()
+    temp_file = f"{filepath}.tmp"
+    try:
+        with open(temp_file, "wb") as f:
+            f.write(CACHE_HEADER.pack(CACHE_MAGIC, len(header)))
+            f.write(header)
+            for part in parts:
+                f.write(part)
+        os.replace(temp_file, filepath)
+    except OSError as e:
+        print(f"Failed to save compile cache: {e}")
+
+
+############################
+############################ 并行编译
+############################
+
+
+# 以独立模块名加载本模块，使子进程可以反序列化任务
+def get_standalone():
+    module = sys.modules.get(STANDALONE_NAME)
+    if module is not None and getattr(module, "__file__", None) == __file__:
+        return module
+    spec = importlib.util.spec_from_file_location(STANDALONE_NAME, __file__)
+    module = importlib.util.module_from_spec(spec)  # type: ignore
+    sys.modules[STANDALONE_NAME] = module
+    spec.loader.exec_module(module)  # type: ignore
+    return module
+
+
+# 子进程的初始化代码，按文件路径加载本模块
+def _bootstrap_code() -> str:
+    return (
+        "import sys, importlib.util\n"
+        f"spec = importlib.util.spec_from_file_location({STANDALONE_NAME!r}, {__file__!r})\n"
+        "module = importlib.util.module_from_spec(spec)\n"
+        f"sys.modules[{STANDALONE_NAME!r}] = module\n"
+        "spec.loader.exec_module(module)\n"
+    )
+
+
+def get_workers() -> int:
+    return max(1, min((os.cpu_count() or 1) - 1, 8))
+
+
+# 编译多个扇区，结果顺序与输入一致，progress(完成数, 总数)
+def compile_sectors(snapshots, workers=0, progress=None, profile=False):
+    # type: (list[dict[str, Any]], int, Any, bool) -> list[dict[str, Any] | None]
+    total = len(snapshots)
+    results = []
+    for blob in iter_compile_sectors(snapshots, workers, profile):
+        results.append(blob)
+        if progress:
+            progress(len(results), total)
+    return results
+
+
+# 逐个产出编译结果，可在任意位置关闭生成器以中止编译
+def iter_compile_sectors(snapshots, workers=0, profile=False):
+    if workers <= 0:
+        workers = get_workers()
+    done = 0
+    if workers > 1 and len(snapshots) >= PARALLEL_MIN_SECTORS:
+        for blob in _iter_parallel(snapshots, workers, profile):
+            yield blob
+            done += 1
+        if done == len(snapshots):
+            return
+    # 串行编译，或并行不可用时编译剩余部分
+    for snapshot in snapshots[done:]:
+        yield compile_sector(snapshot, profile)
+
+
+def _iter_parallel(snapshots, workers, profile):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+
+    total = len(snapshots)
+    module = get_standalone()
+    chunksize = max(1, min(32, total // (workers * 4)))
+    executor = None
+    finished = False
+    try:
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=exec,
+            initargs=(_bootstrap_code(), {}),
+        )
+        yield from executor.map(
+            functools.partial(module.compile_sector, profile=profile),
+            snapshots,
+            chunksize=chunksize,
+        )
+        finished = True
+    except (BrokenProcessPool, OSError) as e:
+        print(f"\nParallel compile unavailable, fallback to serial: {e}")
+    finally:
+        # 中止时取消剩余任务，不等待子进程
+        if executor is not None:
+            executor.shutdown(wait=finished, cancel_futures=not finished)
@@ -82,6 +82,7 @@ GS_COLL = "Ghost Sector Collection"
 E_COLL = "Entity Collection"
 C_COLL = "Camera Collection"
 M_COLL = "Marked Collection"
+LZ_COLL = "Lazy Sector Collection"
 
 # CONNECT_SECTORS = set()
 
@@ -270,6 +271,13 @@ def ensure_collection(name, hide_select=False) -> Collection:
     return item.obj  # type: ignore
 
 
+# 按区域导入时尚未构建的扇区占位
+def get_lazy_sectors(scene=None) -> list[Object]:
+    if scene is None:
+        scene = bpy.context.scene
+    return [obj for obj in scene.objects if obj.get("AG.lazy_sector")]
+
+
 # 确保材质
 def ensure_material(tex: Image) -> bpy.types.Material:
     tex_data = tex.amagate_data
@@ -372,10 +380,14 @@ class AsyncThread(threading.Thread):
         self.loop = asyncio.new_event_loop()
         self.frustum_culling_event: asyncio.Event  # 视锥裁剪事件
         self.frustum_culling_args = ()  # type: tuple[Scene, Vector, Vector, int, int] # type: ignore
+        self.paused = False  # 批量操作期间暂停视锥裁剪
 
     def set_hide_viewport(self, queue):
         # type: (list[tuple[Object, bool]]) -> Callable[[], None]
         def func():
+            if self.paused:
+                queue.clear()
+                return
             for sec, hide_viewport in queue:
                 if sec.hide_viewport != hide_viewport:
                     sec.hide_viewport = hide_viewport
@@ -387,6 +399,9 @@ class AsyncThread(threading.Thread):
         try:
             while True:
                 await self.frustum_culling_event.wait()
+                if self.paused:
+                    self.frustum_culling_event.clear()
+                    continue
                 #
                 scene, origin, direction, front_id, back_id = self.frustum_culling_args
                 SectorManage = scene.amagate_data["SectorManage"]
@@ -475,6 +490,119 @@ class AsyncThread(threading.Thread):
         logger.debug("AsyncThread closed")
 
 
+############################
+############################ 批量操作事务
+############################
+
+
+# 批量操作期间挂起本插件的更新回调、绘制回调和异步线程，不修改用户偏好设置
+class BulkTransaction:
+    def __init__(self):
+        self.link_queue = []  # type: list[tuple[Object, Collection]]
+        self.depsgraph_attached = False
+        self.draw_attached = False
+        self.active = False
+
+    # 延迟到事务结束时链接
+    def link(self, obj, coll):
+        # type: (Object, Collection) -> None
+        self.link_queue.append((obj, coll))
+
+    # 批量链接对象
+    def flush(self):
+        for obj, coll in self.link_queue:
+            data.link2coll(obj, coll)
+        self.link_queue.clear()
+
+    def suspend(self):
+        global draw_handler
+        self.active = True
+        handlers = bpy.app.handlers.depsgraph_update_post
+        self.depsgraph_attached = depsgraph_update_post in handlers
+        if self.depsgraph_attached:
+            handlers.remove(depsgraph_update_post)  # type: ignore
+        self.draw_attached = draw_handler is not None
+        if self.draw_attached:
+            bpy.types.SpaceView3D.draw_handler_remove(draw_handler, "WINDOW")
+            draw_handler = None
+        if ASYNC_THREAD:
+            ASYNC_THREAD.paused = True
+
+    def resume(self):
+        global draw_handler
+        if not self.active:
+            return
+        self.active = False
+        self.flush()
+        #
+        if ASYNC_THREAD:
+            ASYNC_THREAD.paused = False
+        # 事务期间加载了其它文件时，回调可能已由load_post重新注册
+        handlers = bpy.app.handlers.depsgraph_update_post
+        if self.depsgraph_attached and depsgraph_update_post not in handlers:
+            handlers.append(depsgraph_update_post)  # type: ignore
+        if self.draw_attached and draw_handler is None:
+            draw_handler = bpy.types.SpaceView3D.draw_handler_add(
+                draw_callback_3d, (), "WINDOW", "POST_PIXEL"
+            )
+
+    # 加载其它文件中断了事务，丢弃已失效的对象
+    def abort(self):
+        self.link_queue.clear()
+        self.resume()
+
+
+TRANSACTION = None  # type: BulkTransaction | None
+
+
+# 开始批量操作事务，已在事务中时返回None (并入外层事务)
+# 跨计时器回调的操作 (如分时导入地图) 可直接使用，由 end_transaction 结束
+def begin_transaction():
+    global TRANSACTION
+    if TRANSACTION is not None:
+        return None
+    transaction = TRANSACTION = BulkTransaction()
+    transaction.suspend()
+    return transaction
+
+
+# 结束事务并恢复回调，事务已被文件加载中止时忽略
+def end_transaction(transaction):
+    # type: (BulkTransaction | None) -> None
+    global TRANSACTION
+    if transaction is None or transaction is not TRANSACTION:
+        return
+    TRANSACTION = None
+    transaction.resume()
+
+
+# 推送撤销，事务期间不推送，由事务结束时统一推送一次
+def undo_push(message):
+    if TRANSACTION is None:
+        bpy.ops.ed.undo_push(message=message)
+
+
+# 批量操作上下文，退出时恢复回调并推送一次撤销 (undo_message为空时不推送)
+# 嵌套使用时并入外层事务，退出时链接已创建的对象
+@contextlib.contextmanager
+def bulk_transaction(undo_message=""):
+    transaction = begin_transaction()
+    if transaction is None:
+        outer = TRANSACTION  # type: BulkTransaction # type: ignore
+        yield outer
+        outer.flush()
+        return
+
+    success = False
+    try:
+        yield transaction
+        success = True
+    finally:
+        end_transaction(transaction)
+    if success and undo_message:
+        undo_push(undo_message)
+
+
 ############################
 ############################ 回调函数
 ############################
@@ -496,7 +624,7 @@ def check_sector_coll():
         obj = SectorManage["sectors"][deleted_ids[0]]["obj"]
         if obj and bpy.context.scene in obj.users_scene:
             bpy.ops.ed.undo()
-            bpy.ops.ed.undo_push(message="Sector Collection Check")
+            undo_push("Sector Collection Check")
             return
 
 
@@ -512,7 +640,7 @@ def check_delete():
     ] + [item.obj for item in scene_data.ensure_coll]:
         if not i:
             bpy.ops.ed.undo()
-            bpy.ops.ed.undo_push(message="Special Object Check")
+            undo_push("Special Object Check")
             return
 
     # 检查已删除的扇区
@@ -571,7 +699,7 @@ def check_delete():
         for k in deleted_entities:
             ag_utils.delete_entity(k)
         #
-        bpy.ops.ed.undo_push(message=f"L3D {pgettext('Delete')}")
+        undo_push(f"L3D {pgettext('Delete')}")
 
 
 # 扇区合并检查
@@ -598,7 +726,7 @@ def check_sector_join():
 
     for id in remove_ids:
         ag_utils.sector_mgr_remove(str(id))
-    bpy.ops.ed.undo_push(message="Join Sector")
+    undo_push("Join Sector")
 
 
 # 分离扇区检查
@@ -658,7 +786,7 @@ def check_sector_separate():
     # for obj in selected_objects:
     #     obj.select_set(True)
 
-    bpy.ops.ed.undo_push(message="Sector Check")
+    undo_push("Sector Check")
 
 
 # 复制检查
@@ -764,7 +892,7 @@ def check_duplicate():
 
     def timer():
         bpy.ops.object.mode_set(mode="OBJECT")
-        bpy.ops.ed.undo_push(message=f"L3D {pgettext('Duplicate')}")
+        undo_push(f"L3D {pgettext('Duplicate')}")
 
     bpy.app.timers.register(timer, first_interval=0.05)
 
@@ -780,7 +908,7 @@ def check_paste():
     ]
     if paste_sectors or paste_entities:
         bpy.ops.ed.undo()
-        bpy.ops.ed.undo_push(message="L3D Paste Check")
+        undo_push("L3D Paste Check")
 
 
 # 变换检查
@@ -818,7 +946,7 @@ def check_transform(bl_idname):
                     entity["AG.ambient_color"] = color  # type: ignore
                     entity.update_tag()
 
-    bpy.ops.ed.undo_push(message=f"L3D {pgettext('Transform')}")
+    undo_push(f"L3D {pgettext('Transform')}")
 
 
 # 扇区选择检查
@@ -867,7 +995,7 @@ def geometry_modify_post(
 
         # 扇区编辑检查
         if undo:
-            bpy.ops.ed.undo_push(message="Sector Check")
+            undo_push("Sector Check")
 
 
 # def check_connect_timer():
@@ -1254,7 +1382,11 @@ def load_post(filepath=""):
     from . import entity_data, L3D_data
     from . import L3D_operator as OP_L3D
 
-    global OPERATOR_POINTER, draw_handler, LOAD_POST_CALLBACK, ASYNC_THREAD
+    global OPERATOR_POINTER, draw_handler, LOAD_POST_CALLBACK, ASYNC_THREAD, TRANSACTION
+    # 分时的批量操作被文件加载中断
+    if TRANSACTION is not None:
+        TRANSACTION.abort()
+        TRANSACTION = None
     context = bpy.context
     scene_data = context.scene.amagate_data
     wm_data = context.window_manager.amagate_data
@@ -1658,7 +1790,7 @@ class Atmo_Select(bpy.types.PropertyGroup):
         # region_redraw("UI")
         data.area_redraw("VIEW_3D")
 
-        bpy.ops.ed.undo_push(message="Select Atmosphere")
+        undo_push("Select Atmosphere")
 
 
 # 选择外部光
@@ -1685,7 +1817,7 @@ class External_Select(bpy.types.PropertyGroup):
             scene_data.defaults.external_id = scene_data.externals[value].id
         data.region_redraw("UI")
 
-        bpy.ops.ed.undo_push(message="Select External Light")
+        undo_push("Select External Light")
 
 
 # 选择纹理
@@ -1717,7 +1849,7 @@ class Texture_Select(bpy.types.PropertyGroup):
         # data.region_redraw("UI")
         data.area_redraw("VIEW_3D")
 
-        bpy.ops.ed.undo_push(message="Select Texture")
+        undo_push("Select Texture")
 
 
 ############################
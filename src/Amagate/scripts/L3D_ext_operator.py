@@ -17,9 +17,11 @@ import time
 import json
 from pathlib import Path
 from pprint import pprint
-from io import StringIO, BytesIO
+from io import StringIO
 from typing import Any, TYPE_CHECKING
 
+import numpy as np
+
 import bpy
 import bmesh
 from bpy.app.translations import pgettext
@@ -38,7 +40,7 @@ from bpy.props import (
 from mathutils import *  # type: ignore
 
 from . import data, L3D_data
-from . import ag_utils
+from . import ag_utils, ag_binio, L3D_compile
 
 
 if TYPE_CHECKING:
@@ -58,6 +60,8 @@ epsilon: float = ag_utils.epsilon
 epsilon2: float = ag_utils.epsilon2
 
 COMPILE_STATUS = False
+REPORT_TOP_N = 10  # 编译报告中列出的最慢扇区数量
+EXPORT_TIME_SLICE = 0.05  # 后台编译每次计时器事件的处理时间(秒)
 
 SKY_TEX_REFPATH = {
     "Casa": "../Casa/casa_d.mmp",
@@ -567,22 +571,429 @@ def copy_flat(matrix_world, global_sector_map, group_faces, layer_list, conn_lay
     return bm_flat
 
 
+# 采集扇区快照，供编译核心使用
+def snapshot_sector(sec, mesh, global_sector_map, tex_names):
+    # type: (Object, bpy.types.Mesh, dict[int, int], dict[int, str]) -> dict[str, Any]
+    matrix_world = sec.matrix_world
+    quat = matrix_world.to_quaternion()
+    attributes = mesh.attributes
+    # 批量读取顶点并变换
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3)
+    co_world, keys = L3D_compile.transform_keys([tuple(r) for r in matrix_world], co)
+    # 面的顶点
+    loop_start = np.empty(len(mesh.polygons), dtype=np.int32)
+    loop_total = np.empty(len(mesh.polygons), dtype=np.int32)
+    loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_start)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+    mesh.loops.foreach_get("vertex_index", loop_verts)
+    loop_verts = loop_verts.tolist()
+    polys = [
+        tuple(loop_verts[i : i + n])
+        for i, n in zip(loop_start.tolist(), loop_total.tolist())
+    ]
+    edges = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edges)
+    # 面法线取自网格而不是bmesh: Blender对网格面和BMFace使用相同的单精度算法
+    # (三角形normal_tri_v3，四边形normal_quad_v3，多边形Newell法)，bmesh.from_mesh时重新计算，
+    # 两者逐位相同且免去构建bmesh的开销。由 compile_check.py 在实际地图上比对
+    normals = np.empty(len(mesh.polygons) * 3, dtype=np.float32)
+    mesh.polygons.foreach_get("normal", normals)
+    normals = normals.reshape(-1, 3)
+    w_normals = [(quat @ Vector(n)).to_tuple() for n in normals]
+    conn = [
+        d.value if d.value in global_sector_map else 0
+        for d in attributes["amagate_connected"].data  # type: ignore
+    ]
+    tex_id = [d.value for d in attributes["amagate_tex_id"].data]  # type: ignore
+    tex_attrs = {
+        key: [d.value for d in attributes[f"amagate_tex_{key}"].data]  # type: ignore
+        for key in ("xpos", "ypos", "xzoom", "yzoom", "angle")
+    }
+    for key in ("vx", "vy"):
+        tex_attrs[key] = [d.vector.to_tuple() for d in attributes[f"amagate_tex_{key}"].data]  # type: ignore
+    return {
+        "name": sec.name,
+        "co": co.tolist(),
+        "co_world": co_world.tolist(),
+        "keys": list(map(tuple, keys.tolist())),
+        "polys": polys,
+        "edges": list(map(tuple, edges.reshape(-1, 2).tolist())),
+        "normals": normals.tolist(),
+        "w_normals": w_normals,
+        "conn": conn,
+        "tex_id": tex_id,
+        "tex_attrs": tex_attrs,
+        "v_dist": [d.value for d in attributes["amagate_v_dist"].data],  # type: ignore
+        "tex_names": {i: tex_names[i] for i in sorted(set(tex_id)) if i in tex_names},
+    }
+
+
+# 通过复制网格获取平展面组的外轮廓，用于外轮廓提取失败时以及调试时对照
+def flat_outline_bmesh(sec_bm, group_faces_idx):
+    # type: (bmesh.types.BMesh, list[int]) -> list[int]
+    bm_convex = sec_bm.copy()
+    bmesh.ops.delete(
+        bm_convex,
+        geom=[f for f in bm_convex.faces if f.index not in group_faces_idx],
+        context="FACES",
+    )  # 删除非组面
+    if len(group_faces_idx) > 1:
+        bmesh.ops.dissolve_faces(
+            bm_convex, faces=list(bm_convex.faces), use_verts=False
+        )  # 合并组面
+    ag_utils.unsubdivide(bm_convex)  # 反细分
+    if len(bm_convex.faces) == 0:
+        bm_convex.free()
+        return []
+    bm_convex.faces.ensure_lookup_table()
+    # 复制的网格顶点索引与原网格一致
+    verts_co = {v.co.to_tuple(): v.index for v in sec_bm.verts}
+    outline = [verts_co[v.co.to_tuple()] for v in bm_convex.faces[0].verts]
+    # 清理
+    bm_convex.free()
+    return outline
+
+
+# 使用bmesh编译扇区面数据，用于外轮廓无法直接提取的扇区，以及调试时对照
+def compile_sector_bmesh(sec, mesh, global_sector_map):
+    # type: (Object, bpy.types.Mesh, dict[int, int]) -> dict[str, Any]
+    matrix_world = sec.matrix_world
+    writer = L3D_compile.BlobWriter()
+    sec_bm = bmesh.new()
+    sec_bm.from_mesh(mesh)
+    sec_bm.faces.ensure_lookup_table()
+    sec_bm.verts.ensure_lookup_table()
+    conn_layer = sec_bm.faces.layers.int.get("amagate_connected")
+    tex_id_layer = sec_bm.faces.layers.int.get("amagate_tex_id")
+    layer_list = [
+        tex_id_layer,
+        sec_bm.faces.layers.float.get("amagate_tex_xpos"),
+        sec_bm.faces.layers.float.get("amagate_tex_ypos"),
+        sec_bm.faces.layers.float.get("amagate_tex_xzoom"),
+        sec_bm.faces.layers.float.get("amagate_tex_yzoom"),
+        sec_bm.faces.layers.float.get("amagate_tex_angle"),
+        sec_bm.faces.layers.float_vector.get("amagate_tex_vx"),
+        sec_bm.faces.layers.float_vector.get("amagate_tex_vy"),
+    ]
+
+    def alloc_vert(v):
+        v_key = ((matrix_world @ v.co) * 1000).to_tuple(0)
+        return writer.alloc_vert((v_key[0], -v_key[2], v_key[1]))
+
+    # 外轮廓提取使用的拓扑
+    topo = L3D_compile.Topology(
+        [tuple(v.index for v in f.verts) for f in sec_bm.faces],
+        [(e.verts[0].index, e.verts[1].index) for e in sec_bm.edges],
+    )
+    co = [v.co.to_tuple() for v in sec_bm.verts]
+
+    # 面数据
+    faces_sorted = []
+    conn_face_visited = set()
+    for face_index, face in enumerate(sec_bm.faces):
+        if face in conn_face_visited:
+            continue
+
+        connect_data = ()
+        normal = matrix_world.to_quaternion() @ face.normal
+        group_faces = ag_utils.get_linked_flat(face)
+        conn_face_visited.update(group_faces)
+        # 如果该平面只有一个面
+        if len(group_faces) == 1:
+            conne_sid = face[conn_layer]  # type: ignore
+            # 如果没有连接或者连接的扇区不在导出列表中
+            if conne_sid == 0 or global_sector_map.get(conne_sid) is None:
+                if face[tex_id_layer] == -1:  # type: ignore
+                    face_type = 7005  # 天空面
+                else:
+                    face_type = 7001  # 普通面
+            else:
+                face_type = 7002  # 整个面是连接的
+                connect_data = (conne_sid,)
+        # 如果该平面有多个面
+        else:
+            conn_face_num = 0
+            hole_dict = {}  # type: Any
+            for face in group_faces:
+                conn_sid = face[conn_layer]  # type: ignore
+                if conn_sid == 0 or global_sector_map.get(conn_sid) is None:
+                    continue
+                if conn_sid in hole_dict:
+                    continue
+
+                face_conn = face
+                verts_sub_idx = [alloc_vert(v) for v in face_conn.verts]
+                hole_dict[conn_sid] = {
+                    "index": conn_face_num,
+                    "tangent": [],
+                    "verts_idx": verts_sub_idx,
+                }
+                #
+                conn_face_num += 1
+            # 连接数量是0或1，判断纹理一致性
+            if conn_face_num < 2:
+                face = group_faces[0]
+                for layer in layer_list[:-2]:
+                    if layer.name[12:] == "angle":
+                        val_1 = round(face[layer], 3)  # type: ignore
+                        is_tex_uniform = next((0 for f in group_faces if round(f[layer], 3) != val_1), 1)  # type: ignore
+                    else:
+                        val_1 = face[layer]  # type: ignore
+                        is_tex_uniform = next((0 for f in group_faces if f[layer] != val_1), 1)  # type: ignore
+                    if not is_tex_uniform:
+                        face_type = 7004  # 平面中的多纹理
+                        # 复制平面
+                        bm_flat = copy_flat(
+                            matrix_world,
+                            global_sector_map,
+                            group_faces,
+                            layer_list,
+                            conn_layer,
+                        )
+                        connect_data = flat_split(sec, bm_flat, hole_dict)
+                        break
+                # 没有发生break，纹理是一致的
+                else:
+                    # 如果连接数量是1, 7003类型
+                    if conn_face_num == 1:
+                        face_type = 7003  # 平面中的单连接
+                        # 按照顶点顺序计算切线
+                        tangent_data = []  # 切线数据
+                        verts_sub_idx_num = len(verts_sub_idx)
+                        for i in range(verts_sub_idx_num):
+                            j = (i + 1) % verts_sub_idx_num
+
+                            co1 = matrix_world @ face_conn.verts[i].co
+                            co2 = matrix_world @ face_conn.verts[j].co
+                            cross = (co2 - co1).cross(normal)  # type: Vector
+                            cross.normalize()
+                            dist = (-co1).dot(cross) * 1000
+
+                            tangent_data.append((dist, cross))
+
+                        connect_data = (face_conn[conn_layer], verts_sub_idx, tangent_data)  # type: ignore
+                    # 如果连接数量是0
+                    elif face[tex_id_layer] == -1:  # type: ignore
+                        face_type = 7005  # 天空面
+                    else:
+                        face_type = 7001  # 普通面
+            # 连接数量大于1，直接为7004类型
+            else:
+                face_type = 7004  # 平面中的多连接
+                # 复制平面
+                bm_flat = copy_flat(
+                    matrix_world,
+                    global_sector_map,
+                    group_faces,
+                    layer_list,
+                    conn_layer,
+                )
+                connect_data = flat_split(sec, bm_flat, hole_dict)
+        # 获取凸壳顶点
+        group_faces_idx = [f.index for f in group_faces]
+        outline = topo.flat_outline(group_faces_idx, co)
+        if outline is None and len(group_faces) > 1:
+            outline = flat_outline_bmesh(sec_bm, group_faces_idx)
+        elif data.DEBUG:
+            outline_2 = flat_outline_bmesh(sec_bm, group_faces_idx)
+            if [co[i] for i in outline or ()] != [co[i] for i in outline_2]:
+                logger.debug(f"Outline mismatch: {sec.name}, face {face_index}")
+        if not outline:
+            continue
+        verts_idx = [alloc_vert(sec_bm.verts[i]) for i in outline]
+
+        faces_sorted.append((face_index, verts_idx, normal, face_type, connect_data))
+
+    sec_bm.free()
+    # 地板面排前面，避免滑坡问题
+    z_axis = Vector((0, 0, 1))
+    faces_sorted.sort(key=lambda x: round(x[2].dot(-z_axis), 3))
+
+    tex_names = {}
+    tex_id = [d.value for d in mesh.attributes["amagate_tex_id"].data]  # type: ignore
+    for i in set(tex_id):
+        img = L3D_data.get_texture_by_id(i)[1]
+        if img:
+            tex_names[i] = img.name
+    tex_attrs = {
+        key: [d.value for d in mesh.attributes[f"amagate_tex_{key}"].data]  # type: ignore
+        for key in ("xpos", "ypos", "xzoom", "yzoom")
+    }
+    for key in ("vx", "vy"):
+        tex_attrs[key] = [d.vector for d in mesh.attributes[f"amagate_tex_{key}"].data]  # type: ignore
+    L3D_compile.write_faces(
+        writer,
+        faces_sorted,
+        [d.value for d in mesh.attributes["amagate_v_dist"].data],  # type: ignore
+        tex_id,
+        tex_attrs,
+        tex_names,
+    )
+    return writer.finish(
+        len(faces_sorted), L3D_compile.has_steep_face(faces_sorted)
+    )
+
+
+# 返回两个编译结果首个不同的字段，相同时返回空字符串
+def blob_diff(blob, blob_2):
+    # type: (dict[str, Any], dict[str, Any]) -> str
+    for key in ("data", "keys", "vert_patches", "sec_patches", "face_num", "steep"):
+        if not np.array_equal(blob[key], blob_2[key]):
+            return key
+    return ""
+
+
+# 比较快照编译与bmesh编译的结果
+def verify_blob(sec, mesh, global_sector_map, blob):
+    # type: (Object, bpy.types.Mesh, dict[int, int], dict[str, Any]) -> bool
+    key = blob_diff(blob, compile_sector_bmesh(sec, mesh, global_sector_map))
+    if key:
+        logger.debug(f"Sector compile mismatch: {sec.name}, {key}")
+        return False
+    return True
+
+
+# 获取3D视图的观察位置，没有3D视图时使用场景摄像机
+def get_view_location(context: Context):
+    region_data = getattr(context, "region_data", None)
+    if region_data is not None:
+        return region_data.view_matrix.inverted().translation.copy()
+    if context.scene.camera:
+        return context.scene.camera.matrix_world.translation.copy()
+    return None
+
+
+# 点到物体世界包围盒的距离
+def bbox_distance(obj: Object, point: Vector) -> float:
+    corners = [obj.matrix_world @ Vector(c) for c in obj.bound_box]
+    d = Vector(
+        max(min(c[i] for c in corners) - point[i], 0, point[i] - max(c[i] for c in corners))
+        for i in range(3)
+    )
+    return d.length
+
+
+# 查找包含该点的凸扇区，点不在任何扇区内时返回最近的扇区
+def find_sector_at(sectors_dict, point):
+    # type: (Any, Vector) -> int | None
+    nearest = None
+    nearest_dist = math.inf
+    for k in sectors_dict:
+        sec = sectors_dict[k]["obj"]  # type: Object
+        if not sec.amagate_data.get_sector_data().is_convex:
+            continue
+        dist = bbox_distance(sec, point)
+        if dist < nearest_dist:
+            nearest, nearest_dist = int(k), dist
+        if dist > 0:
+            continue
+        # 凸多面体内的点与几何中心位于每个面的同一侧
+        mesh = sec.data  # type: bpy.types.Mesh # type: ignore
+        local = sec.matrix_world.inverted() @ point
+        center = sum((v.co for v in mesh.vertices), Vector()) / len(mesh.vertices)
+        if all(
+            (local - f.center).dot(f.normal) * (center - f.center).dot(f.normal)
+            >= -epsilon
+            for f in mesh.polygons
+        ):
+            return int(k)
+    return nearest
+
+
+# 从起始扇区沿连接面向外扩展，收集跳数不超过hops或包围盒距离在radius内的扇区
+def collect_region_sectors(sectors_dict, start_sid, point, hops, radius):
+    # type: (Any, int, Vector, int, float) -> set[int]
+    region = {start_sid}
+    queue = [(start_sid, 0)]
+    while queue:
+        sid, depth = queue.pop(0)
+        mesh = sectors_dict[str(sid)]["obj"].data  # type: bpy.types.Mesh # type: ignore
+        attr = mesh.attributes["amagate_connected"]
+        conn = np.empty(len(attr.data), dtype=np.int32)  # type: ignore
+        attr.data.foreach_get("value", conn)  # type: ignore
+        for conn_sid in set(conn.tolist()):
+            if conn_sid == 0 or conn_sid in region or str(conn_sid) not in sectors_dict:
+                continue
+            if depth + 1 <= hops or (
+                radius > 0
+                and bbox_distance(sectors_dict[str(conn_sid)]["obj"], point) <= radius
+            ):
+                region.add(conn_sid)
+                queue.append((conn_sid, depth + 1))
+    return region
+
+
 #
 def export_map(
-    this: bpy.types.Operator,
+    this: bpy.types.Operator | None,
+    context: Context,
+    visible_only=False,
+    with_run_script=False,
+    ui=True,
+    workers=0,
+    sector_filter=None,
+    preview_pos=None,
+):
+    # this为None时报告输出到控制台，ui为False时不更新进度条 (用于后台批量编译)
+    steps = export_map_steps(
+        this,
+        context,
+        visible_only,
+        with_run_script,
+        ui,
+        workers,
+        sector_filter,
+        preview_pos,
+    )
+    while True:
+        try:
+            next(steps)
+        except StopIteration as e:
+            return e.value
+
+
+# 分步导出地图，每处理一个扇区产出一次进度 (label, i, total)，结束时返回操作结果
+# 关闭生成器即中止导出，不会写入bw文件
+# sector_filter: 只导出其中的扇区ID，连接到其它扇区的面作为墙壁处理
+# preview_pos: 预览导出时的玩家位置，写入 <地图>_preview.bw 和一次性的 AG_PreviewCfg.json，下次启动游戏时加载预览
+def export_map_steps(
+    this: bpy.types.Operator | None,
     context: Context,
     visible_only=False,
     with_run_script=False,
+    ui=True,
+    workers=0,
+    sector_filter=None,
+    preview_pos=None,
 ):
     global COMPILE_STATUS
     scene_data = context.scene.amagate_data
+    # 分步导出时界面保持响应，产出进度后不保留Blender数据的引用，按名称重新获取
+    scene_name = context.scene.name
+
+    def get_scene_data():
+        return bpy.data.scenes[scene_name].amagate_data
+
+    def get_sector(idx):
+        # type: (int) -> Object
+        return bpy.data.objects[sec_names[idx]]  # type: ignore
+
+    def report(level, message):
+        if this:
+            this.report(level, message)
+        else:
+            print(f"{next(iter(level))}: {message}")
+
     # 检查是否为无标题文件
     if not bpy.data.filepath:
-        this.report({"WARNING"}, "Please save the file first")
+        report({"WARNING"}, "Please save the file first")
         return {"CANCELLED"}
 
     # 如果在编辑模式下，切换到物体模式并调用`几何修改回调`函数更新数据
-    if "EDIT" in context.mode:
+    if "EDIT" in context.mode and bpy.ops.object.mode_set.poll():
         objects_in_mode = context.objects_in_mode
         bpy.ops.object.mode_set(mode="OBJECT")
         sectors_in_mode = [obj for obj in objects_in_mode if obj.amagate_data.is_sector]
@@ -590,17 +1001,23 @@ def export_map(
             L3D_data.geometry_modify_post(sectors_in_mode)
         L3D_data.update_scene_edit_mode()
 
+    # 按区域导入的地图，未构建的扇区不会被导出
+    if sector_filter is None and L3D_data.get_lazy_sectors(context.scene):
+        report({"ERROR"}, "Build all lazily imported sectors before exporting")
+        return {"CANCELLED"}
+
     # 收集可见的凸扇区
     sectors_dict = scene_data["SectorManage"]["sectors"]
     sector_ids = [
         int(k)
         for k in sectors_dict
-        if (not visible_only or sectors_dict[k]["obj"].visible_get())
+        if (sector_filter is None or int(k) in sector_filter)
+        and (not visible_only or sectors_dict[k]["obj"].visible_get())
         and sectors_dict[k]["obj"].amagate_data.get_sector_data().is_convex
     ]
 
     if not sector_ids:
-        this.report({"WARNING"}, "No visible sector found")
+        report({"WARNING"}, "No visible sector found")
         return {"CANCELLED"}
     sector_ids.sort()
 
@@ -611,569 +1028,355 @@ def export_map(
     sec_total = len(sector_ids)
     bar_length = 20  # 进度条长度
     wm = bpy.context.window_manager
-    wm.progress_begin(0, 1)  # 初始化进度条
+    if ui:
+        wm.progress_begin(0, 1)  # 初始化进度条
+
+    # 进度条
+    def progress_update(label, i, total):
+        percent = i / total
+        if ui:
+            wm.progress_update(percent)
+        filled = int(bar_length * percent)
+        bar = ("█" * filled).ljust(bar_length, "-")
+        print(
+            f"\r{label}: |{bar}| {percent*100:.1f}% | {i} of {total}",
+            end="",
+            flush=True,
+        )
 
     bw_file = f"{os.path.splitext(bpy.data.filepath)[0]}.bw"
+    if preview_pos is not None:
+        bw_file = f"{os.path.splitext(bpy.data.filepath)[0]}_preview.bw"
+    # 性能分析
+    profiler = L3D_compile.Profiler(wm.amagate_data.compile_report)
+    sector_profiles = [
+        {"id": sid, "time": 0.0, "cached": False, "stages": {}} for sid in sector_ids
+    ]
     global_face_count = 0
     global_vertex_count = 0
-    global_vertex_map = {}  # {tuple(co): global_index}
-    sector_vertex_indices = {}  # 每个扇区的全局顶点索引映射
     global_sector_map = {sid: i for i, sid in enumerate(sector_ids)}  # 全局扇区映射
+    tex_names = {}  # type: dict[int, str]
+    for img in bpy.data.images:
+        tex_id = img.amagate_data.id  # type: ignore
+        if tex_id != 0:
+            tex_names.setdefault(tex_id, img.name)
     #
-    verts_buffer = BytesIO()  # 缓存顶点数据
-    sec_buffer = BytesIO()  # 缓存扇区数据
-    with open(bw_file, "wb") as f:
-        # 写入大气数据
-        f.write(struct.pack("<I", len(scene_data.atmospheres) + 1))
-        for atm in scene_data.atmospheres:
-            buffer = atm.item_name.encode("utf-8")
-            f.write(struct.pack("<I", len(buffer)))
-            f.write(buffer)
-            f.write(
-                struct.pack("<BBB", *(math.ceil(atm.color[i] * 255) for i in range(3)))
-            )
-            f.write(struct.pack("<f", atm.color[-1]))
-        ## 写入Amagate元数据
-        buffer = f"Metadata:\nAmagate-{data.VERSION} {data.Copyright}\nhttps://github.com/Sryml/Amagate".encode(
-            "utf-8"
-        )
-        f.write(struct.pack("<I", len(buffer)))
-        f.write(buffer)
-        f.write(b"\x00" * 7)
-
-        # 写入顶点数据
-        # number_pos = f.tell()
-        # f.write(struct.pack("<I", 0))  # 占位
-        # for i in sector_ids:
-        #     sec = sectors_dict[str(i)]["obj"]  # type: Object
-        #     sec_vertex_indices = []
-        #     sec_data = sec.amagate_data.get_sector_data()
-        #     mesh = sec.data  # type: bpy.types.Mesh # type: ignore
-        #     matrix_world = sec.matrix_world
-        #     for v in mesh.vertices:
-        #         # 变换顶点坐标并转换为毫米单位
-        #         v_key = ((matrix_world @ v.co) * 1000).to_tuple(1)
-        #         if v_key not in global_vertex_map:
-        #             global_vertex_map[v_key] = global_vertex_count
-        #             global_vertex_count += 1
-        #             f.write(struct.pack("<ddd", v_key[0], -v_key[2], v_key[1]))
-        #         sec_vertex_indices.append(global_vertex_map[v_key])
-        #     sector_vertex_indices[sec_data.id] = sec_vertex_indices
-        # # 暂存当前流位置并更正顶点数量
-        # stream_pos = f.tell()
-        # f.seek(number_pos)
-        # f.write(struct.pack("<I", global_vertex_count))
-        # f.seek(stream_pos)
-
-        # 写入扇区数据
-        # XXX 该明度系数只是近似效果，具体算法未知
-        v_factor = 0.86264  # 明度系数
-        ambient_light_p = bytes.fromhex("0000803C")  # 0.015625 环境光精度
-        ext_light_p = bytes.fromhex("0000003D")  # 0.03125 外部灯光精度
-        bulb_buffer = BytesIO()  # 缓存灯泡数据
-        bulb_num = 0
-        group_buffer = BytesIO()  # 缓存组数据
-        sec_name_buffer = BytesIO()  # 缓存扇区名称数据
-        steep_auto = []  # 自动陡峭
-        steep_yes = []
-        steep_no = []
-        sec_buffer.write(struct.pack("<I", sec_total))
-        depsgraph = bpy.context.evaluated_depsgraph_get()
-        for progress, sector_id in enumerate(sector_ids):
-            # 进度条
-            i = progress + 1
-            percent = i / sec_total
-            wm.progress_update(percent)
-            #
-            filled = int(bar_length * percent)
-            bar = ("█" * filled).ljust(bar_length, "-")
-            print(
-                f"\rSector Compiling: |{bar}| {percent*100:.1f}% | {i} of {sec_total}",
-                end="",
-                flush=True,
+    writer = ag_binio.SegmentWriter()  # 分段写入器
+    head_seg = ag_binio.Segment(1024)  # 大气数据
+    # 写入大气数据
+    head_seg.pack("<I", len(scene_data.atmospheres) + 1)
+    for atm in scene_data.atmospheres:
+        head_seg.write_str(atm.item_name)
+        head_seg.pack("<BBB", *(math.ceil(atm.color[i] * 255) for i in range(3)))
+        head_seg.pack("<f", atm.color[-1])
+    ## 写入Amagate元数据
+    head_seg.write_str(
+        f"Metadata:\nAmagate-{data.VERSION} {data.Copyright}\nhttps://github.com/Sryml/Amagate"
+    )
+    head_seg.write(b"\x00" * 7)
+
+    # 写入扇区数据
+    # XXX 该明度系数只是近似效果，具体算法未知
+    v_factor = 0.86264  # 明度系数
+    ambient_light_p = bytes.fromhex("0000803C")  # 0.015625 环境光精度
+    ext_light_p = bytes.fromhex("0000003D")  # 0.03125 外部灯光精度
+    bulb_seg = ag_binio.Segment()  # 灯泡数据
+    bulb_num = 0
+    group_seg = ag_binio.Segment()  # 组数据
+    sec_name_seg = ag_binio.Segment()  # 扇区名称数据
+    steep_auto = []  # 自动陡峭
+    steep_yes = []
+    steep_no = []
+    sec_headers = []  # type: list[ag_binio.Segment]
+    sec_names = []  # type: list[str]
+    sec_steep = []  # type: list[tuple[bool, str]]
+    snapshots = []  # type: list[dict[str, Any]]
+    # 采集扇区数据
+    for progress, sector_id in enumerate(sector_ids):
+        progress_update("Sector Collecting", progress + 1, sec_total)
+        yield "Sector Collecting", progress + 1, sec_total
+
+        scene_data = get_scene_data()
+        sectors_dict = scene_data["SectorManage"]["sectors"]
+        sec = sectors_dict[str(sector_id)]["obj"]  # type: Object
+        sec_data = sec.amagate_data.get_sector_data()
+        matrix_world = sec.matrix_world
+        evaluated_obj = sec.evaluated_get(bpy.context.evaluated_depsgraph_get())
+        mesh = evaluated_obj.data  # type: bpy.types.Mesh # type: ignore
+        sec_names.append(sec.name)
+        sec_steep.append((sec_data.steep_check, sec_data.steep))
+        with profiler.stage("snapshot") as stage:
+            snapshots.append(
+                snapshot_sector(sec, mesh, global_sector_map, tex_names)
             )
-            #
-
-            sec = sectors_dict[str(sector_id)]["obj"]  # type: Object
-            sec_data = sec.amagate_data.get_sector_data()
-            matrix_world = sec.matrix_world
-            sec_mesh = sec.data  # type: bpy.types.Mesh # type: ignore
-            # 调试
-            # if i == 471:
-            #     print(sec.name)
-            #
-            # sec_vertex_indices = sector_vertex_indices[sec_data.id]
-            evaluated_obj = sec.evaluated_get(depsgraph)
-            mesh = evaluated_obj.data  # type: bpy.types.Mesh # type: ignore
-            sec_bm = bmesh.new()
-            sec_bm.from_mesh(mesh)
-            sec_bm.faces.ensure_lookup_table()
-            sec_bm.verts.ensure_lookup_table()
-            flat_light_layer = sec_bm.faces.layers.int.get("amagate_flat_light")
-            conn_layer = sec_bm.faces.layers.int.get("amagate_connected")
-            tex_id_layer = sec_bm.faces.layers.int.get("amagate_tex_id")
-            tex_vx_layer = sec_bm.faces.layers.float_vector.get("amagate_tex_vx")
-            tex_vy_layer = sec_bm.faces.layers.float_vector.get("amagate_tex_vy")
-            xpos_layer = sec_bm.faces.layers.float.get("amagate_tex_xpos")
-            ypos_layer = sec_bm.faces.layers.float.get("amagate_tex_ypos")
-            layer_list = [
-                tex_id_layer,
-                xpos_layer,
-                ypos_layer,
-                sec_bm.faces.layers.float.get("amagate_tex_xzoom"),
-                sec_bm.faces.layers.float.get("amagate_tex_yzoom"),
-                sec_bm.faces.layers.float.get("amagate_tex_angle"),
-                tex_vx_layer,
-                tex_vy_layer,
-            ]
-
-            # 灯泡
-            if sec_data.bulb_light:
-                bulb_num += len(sec_data.bulb_light)
-                # bulb = None
-                for bulb in sec_data.bulb_light:
-                    light = bulb.light_obj  # type: Object
-                    if light:
-                        light_data = light.data  # type: bpy.types.Light # type: ignore
-                        bulb_buffer.write(struct.pack("<I", 15001))
-                        bulb_buffer.write(
-                            struct.pack(
-                                "<BBB", *(math.ceil(c * 255) for c in light_data.color)
-                            )
-                        )
-                        bulb_buffer.write(struct.pack("<f", bulb.strength))
-                        bulb_buffer.write(struct.pack("<f", bulb.precision))
-                        pos = (light.matrix_world.translation * 1000).to_tuple(1)
-                        bulb_buffer.write(struct.pack("<ddd", pos[0], -pos[2], pos[1]))
-                        bulb_buffer.write(
-                            struct.pack("<I", global_sector_map[sector_id])
-                        )
-
-            # 组
-            group_buffer.write(struct.pack("<i", sec_data.group))  # 有符号整数
-
-            # 扇区名称
-            buffer = sec.name.encode("utf-8")
-            sec_name_buffer.write(struct.pack("<I", len(buffer)))
-            sec_name_buffer.write(buffer)
-
-            # 大气名称
-            atm_name = L3D_data.get_atmo_by_id(scene_data, sec_data.atmo_id)[
-                1
-            ].item_name
-            buffer = atm_name.encode("utf-8")
-            sec_buffer.write(struct.pack("<I", len(buffer)))
-            sec_buffer.write(buffer)
-
-            # 环境光
-            color = sec_data.ambient_color
-            sec_buffer.write(struct.pack("<BBB", *(math.ceil(c * 255) for c in color)))
-            sec_buffer.write(struct.pack("<f", color.v * v_factor))
-            sec_buffer.write(ambient_light_p)
-            sec_buffer.write(struct.pack("<ddd", 0, 0, 0))  # 未知用途 默认0
-            sec_buffer.write(bytes.fromhex("CD" * 8))
-            sec_buffer.write(struct.pack("<I", 0))
-
-            # 平面光
-            face = next((f for f in sec_bm.faces if f[flat_light_layer] == 1), None)  # type: ignore
-            if face:
-                vector = matrix_world.to_quaternion() @ -face.normal
-                vector = vector[0], -vector[2], vector[1]
-            else:
-                vector = (0, 0, 0)
-            color = sec_data.flat_light.color
-            sec_buffer.write(struct.pack("<BBB", *(math.ceil(c * 255) for c in color)))
-            sec_buffer.write(struct.pack("<f", color.v * v_factor))
-            sec_buffer.write(ambient_light_p)
-            sec_buffer.write(struct.pack("<ddd", 0, 0, 0))  # # 未知用途 默认0
-            sec_buffer.write(bytes.fromhex("CD" * 8))
-            sec_buffer.write(struct.pack("<I", 0))
-            ## 平面光向量
-            sec_buffer.write(struct.pack("<ddd", *vector))
-
-            # 面数据
-            faces_sorted = []
-            z_axis = Vector((0, 0, 1))
-
-            conn_face_visited = set()
-            # connect_num = 0
-            for face_index, face in enumerate(sec_bm.faces):
-                # if connect_num == sec_data.connect_num:
-                #     break
-                if face in conn_face_visited:
-                    continue
-
-                # connected_sid = mesh.attributes["amagate_connected"].data[face_index].value  # type: ignore
-                # if connected_sid == 0 or global_sector_map.get(connected_sid) is None:
-                #     continue
-
-                connect_data = ()
-                normal = matrix_world.to_quaternion() @ face.normal
-                group_faces = ag_utils.get_linked_flat(face)
-                conn_face_visited.update(group_faces)
-                # 如果该平面只有一个面
-                if len(group_faces) == 1:
-                    conne_sid = face[conn_layer]  # type: ignore
-                    # 如果没有连接或者连接的扇区不在导出列表中
-                    if conne_sid == 0 or global_sector_map.get(conne_sid) is None:
-                        if face[tex_id_layer] == -1:  # type: ignore
-                            face_type = 7005  # 天空面
-                        else:
-                            face_type = 7001  # 普通面
-                    else:
-                        face_type = 7002  # 整个面是连接的
-                        connect_data = (conne_sid,)
-                    # verts_idx = [sec_vertex_indices[v.index] for v in face.verts]
-                    # connect_num += 1
-                # 如果该平面有多个面
-                else:
-                    conn_face_num = 0
-                    hole_dict = {}  # type: Any
-                    for face in group_faces:
-                        conn_sid = face[conn_layer]  # type: ignore
-                        if conn_sid == 0 or global_sector_map.get(conn_sid) is None:
-                            continue
-                        if conn_sid in hole_dict:
-                            continue
-
-                        face_conn = face
-                        verts_sub_idx = []
-                        for v in face_conn.verts:
-                            v_key = ((matrix_world @ v.co) * 1000).to_tuple(0)
-                            v_key = v_key[0], -v_key[2], v_key[1]
-                            vert_idx = global_vertex_map.get(v_key)
-                            if vert_idx is None:
-                                vert_idx = global_vertex_map.setdefault(
-                                    v_key, global_vertex_count
-                                )
-                                global_vertex_count += 1
-                                verts_buffer.write(struct.pack("<ddd", *v_key))
-                            verts_sub_idx.append(vert_idx)
-                        hole_dict[conn_sid] = {
-                            "index": conn_face_num,
-                            "tangent": [],
-                            "verts_idx": verts_sub_idx,
-                        }
-                        #
-                        conn_face_num += 1
-                    # 连接数量是0或1，判断纹理一致性
-                    if conn_face_num < 2:
-                        face = group_faces[0]
-                        for layer in layer_list[:-2]:
-                            if layer.name[12:] == "angle":
-                                val_1 = round(face[layer], 3)  # type: ignore
-                                is_tex_uniform = next((0 for f in group_faces if round(f[layer], 3) != val_1), 1)  # type: ignore
-                            else:
-                                val_1 = face[layer]  # type: ignore
-                                is_tex_uniform = next((0 for f in group_faces if f[layer] != val_1), 1)  # type: ignore
-                            if not is_tex_uniform:
-                                face_type = 7004  # 平面中的多纹理
-                                # 复制平面
-                                bm_flat = copy_flat(
-                                    matrix_world,
-                                    global_sector_map,
-                                    group_faces,
-                                    layer_list,
-                                    conn_layer,
-                                )
-                                connect_data = flat_split(sec, bm_flat, hole_dict)
-                                break
-                        # 没有发生break，纹理是一致的
-                        else:
-                            # 如果连接数量是1, 7003类型
-                            if conn_face_num == 1:
-                                face_type = 7003  # 平面中的单连接
-                                #
-                                # 按照顶点顺序计算切线
-                                tangent_data = []  # 切线数据
-                                # for idx, edge in enumerate(face_conn.edges):
-                                #     # 跳过边界
-                                #     if (
-                                #         edge.link_faces[0].normal.dot(
-                                #             edge.link_faces[1].normal
-                                #         )
-                                #         < epsilon2
-                                #     ):
-                                #         continue
-
-                                #     co1 = matrix_world @ face_conn.verts[idx].co
-                                #     co2 = (
-                                #         matrix_world
-                                #         @ face_conn.verts[
-                                #             (idx + 1) % len(face_conn.verts)
-                                #         ].co
-                                #     )
-
-                                verts_sub_idx_num = len(verts_sub_idx)
-                                for i in range(verts_sub_idx_num):
-                                    j = (i + 1) % verts_sub_idx_num
-
-                                    co1 = matrix_world @ face_conn.verts[i].co
-                                    co2 = matrix_world @ face_conn.verts[j].co
-                                    cross = (co2 - co1).cross(normal)  # type: Vector
-                                    cross.normalize()
-                                    dist = (-co1).dot(cross) * 1000
-
-                                    tangent_data.append((dist, cross))
-
-                                connect_data = (face_conn[conn_layer], verts_sub_idx, tangent_data)  # type: ignore
-                            # 如果连接数量是0
-                            elif face[tex_id_layer] == -1:  # type: ignore
-                                face_type = 7005  # 天空面
-                            else:
-                                face_type = 7001  # 普通面
-                    # 连接数量大于1，直接为7004类型
-                    else:
-                        face_type = 7004  # 平面中的多连接
-                        # 复制平面
-                        bm_flat = copy_flat(
-                            matrix_world,
-                            global_sector_map,
-                            group_faces,
-                            layer_list,
-                            conn_layer,
-                        )
-                        connect_data = flat_split(sec, bm_flat, hole_dict)
-                # 获取凸壳顶点
-                bm_convex = sec_bm.copy()
-                group_faces_idx = [f.index for f in group_faces]
-                bmesh.ops.delete(
-                    bm_convex,
-                    geom=[f for f in bm_convex.faces if f.index not in group_faces_idx],
-                    context="FACES",
-                )  # 删除非组面
-                if len(group_faces) > 1:
-                    bmesh.ops.dissolve_faces(
-                        bm_convex, faces=list(bm_convex.faces), use_verts=False
-                    )  # 合并组面
-                ag_utils.unsubdivide(bm_convex)  # 反细分
-                if len(bm_convex.faces) == 0:
-                    bm_convex.free()
-                    continue
-                bm_convex.faces.ensure_lookup_table()
-                # verts_idx = [
-                #     global_vertex_map[((matrix_world @ v.co) * 1000).to_tuple(1)]
-                #     for v in bm_convex.faces[0].verts
-                # ]
-                verts_idx = []
-                for v in bm_convex.faces[0].verts:
-                    v_key = ((matrix_world @ v.co) * 1000).to_tuple(0)
-                    v_key = v_key[0], -v_key[2], v_key[1]
-                    vert_idx = global_vertex_map.get(v_key)
-                    if vert_idx is None:
-                        vert_idx = global_vertex_map.setdefault(
-                            v_key, global_vertex_count
-                        )
-                        global_vertex_count += 1
-                        verts_buffer.write(struct.pack("<ddd", *v_key))
-                    verts_idx.append(vert_idx)
-                # 清理
-                bm_convex.free()
-
-                faces_sorted.append(
-                    (face_index, verts_idx, normal, face_type, connect_data)
-                )
-
-            sec_bm.free()
-            # ag_utils.debugprint(f"{sec.name}: {[i[0] for i in faces_sorted]}")
-            # faces_sorted.sort(key=lambda x: -x[3]) # 连接面排前面
-            # faces_sorted.sort(key=lambda x: x[2].to_tuple(3)) # 按法向排列
-            faces_sorted.sort(
-                key=lambda x: round(x[2].dot(-z_axis), 3)
-            )  # 地板面排前面，避免滑坡问题
-
-            # 如果不会被引擎设为滑坡且为自动模式
-            if not sec_data.steep_check and sec_data.steep == "0":
-                for item in faces_sorted:
-                    cos = item[2].dot(z_axis)
-                    # 与z轴点乘为0或负，跳过
-                    if cos < epsilon:
-                        continue
-                    if cos < 0.7665:
-                        steep_auto.append(sec)
-                        break
-            elif sec_data.steep == "1":
-                steep_yes.append(sec)
-            elif sec_data.steep == "2":
-                steep_no.append(sec)
-
-            global_face_count += len(faces_sorted)
-            sec_buffer.write(struct.pack("<I", len(faces_sorted)))
-            for (
-                face_index,
-                verts_idx,
-                normal,
-                face_type,
-                connect_data,
-            ) in faces_sorted:
-                sec_buffer.write(struct.pack("<I", face_type))
-                ## 法向
-                # normal = matrix_world.to_quaternion() @ face.normal
-                sec_buffer.write(struct.pack("<ddd", normal[0], -normal[2], normal[1]))
-                sec_buffer.write(struct.pack("<d", mesh.attributes["amagate_v_dist"].data[face_index].value))  # type: ignore
-
-                if face_type in (7002, 7005):
-                    sec_buffer.write(struct.pack("<I", len(verts_idx)))
-                    for v_idx in verts_idx:
-                        sec_buffer.write(struct.pack("<I", v_idx))
-                    if face_type == 7005:
-                        continue
-                    conn_sid = connect_data[0]
-                    sec_buffer.write(struct.pack("<I", global_sector_map[conn_sid]))
-                ## 固定标识
-                sec_buffer.write(struct.pack("<I", 3))
-                sec_buffer.write(struct.pack("<I", 0))
-
-                # 写入纹理数据
-                if face_type == 7004:
-                    tex_buffer = connect_data[2]
-                    sec_buffer.write(tex_buffer)
-                else:
-                    buffer = L3D_data.get_texture_by_id(mesh.attributes["amagate_tex_id"].data[face_index].value)[1].name.encode("utf-8")  # type: ignore
-                    sec_buffer.write(struct.pack("<I", len(buffer)))
-                    sec_buffer.write(buffer)
-                    # if face_index == 1:
-                    #     tex_vx = Vector((1, 0, 0)).normalized()/10
-                    #     tex_vy = Vector((0, 0, 1)).normalized()/10
-                    # else:
-                    tex_vx = mesh.attributes["amagate_tex_vx"].data[face_index].vector  # type: ignore
-                    tex_vy = mesh.attributes["amagate_tex_vy"].data[face_index].vector  # type: ignore
-                    sec_buffer.write(
-                        struct.pack("<ddd", tex_vx[0], -tex_vx[2], tex_vx[1])
-                    )
-                    sec_buffer.write(
-                        struct.pack("<ddd", tex_vy[0], -tex_vy[2], tex_vy[1])
-                    )
-                    tex_xpos = mesh.attributes["amagate_tex_xpos"].data[face_index].value  # type: ignore
-                    tex_ypos = mesh.attributes["amagate_tex_ypos"].data[face_index].value  # type: ignore
-                    tex_xzoom = mesh.attributes["amagate_tex_xzoom"].data[face_index].value  # type: ignore
-                    tex_yzoom = mesh.attributes["amagate_tex_yzoom"].data[face_index].value  # type: ignore
-                    sec_buffer.write(
-                        struct.pack(
-                            "<ff",
-                            tex_xpos / (0.001 * tex_xzoom),
-                            tex_ypos / (0.001 * tex_yzoom),
-                        )
+        sector_profiles[progress]["name"] = sec.name
+        sector_profiles[progress]["time"] += stage.elapsed
+        sector_profiles[progress]["stages"]["snapshot"] = {
+            "time": round(stage.elapsed, 6),
+            "count": 1,
+        }
+
+        # 灯泡
+        if sec_data.bulb_light:
+            bulb_num += len(sec_data.bulb_light)
+            # bulb = None
+            for bulb in sec_data.bulb_light:
+                light = bulb.light_obj  # type: Object
+                if light:
+                    light_data = light.data  # type: bpy.types.Light # type: ignore
+                    bulb_seg.pack("<I", 15001)
+                    bulb_seg.pack(
+                        "<BBB", *(math.ceil(c * 255) for c in light_data.color)
                     )
+                    bulb_seg.pack("<f", bulb.strength)
+                    bulb_seg.pack("<f", bulb.precision)
+                    pos = (light.matrix_world.translation * 1000).to_tuple(1)
+                    bulb_seg.pack("<ddd", pos[0], -pos[2], pos[1])
+                    bulb_seg.pack("<I", global_sector_map[sector_id])
 
-                sec_buffer.write(b"\x00" * 8)  # 0
-                #
-                if face_type == 7002:
-                    continue
+        # 组
+        group_seg.pack("<i", sec_data.group)  # 有符号整数
 
-                sec_buffer.write(struct.pack("<I", len(verts_idx)))
-                for v_idx in verts_idx:
-                    sec_buffer.write(struct.pack("<I", v_idx))
-                #
-                if face_type == 7003:
-                    conn_sid, verts_sub_idx, tangent_data = connect_data
-                    sec_buffer.write(struct.pack("<I", len(verts_sub_idx)))
-                    for v_idx in verts_sub_idx:
-                        sec_buffer.write(struct.pack("<I", v_idx))
-                    sec_buffer.write(struct.pack("<I", global_sector_map[conn_sid]))
-
-                    sec_buffer.write(struct.pack("<I", len(tangent_data)))
-                    for dist, cross in tangent_data:
-                        sec_buffer.write(
-                            struct.pack("<ddd", cross[0], -cross[2], cross[1])
-                        )
-                        sec_buffer.write(struct.pack("<d", dist))
-                #
-                elif face_type == 7004:
-                    holes_data, cut_data_buff, _ = connect_data
-                    sec_buffer.write(struct.pack("<I", len(holes_data)))
-
-                    for _, tangent_data, verts_sub_idx, conn_sid in holes_data:
-                        sec_buffer.write(struct.pack("<I", len(verts_sub_idx)))
-                        for v_idx in verts_sub_idx:
-                            sec_buffer.write(struct.pack("<I", v_idx))
-                        sec_buffer.write(struct.pack("<I", global_sector_map[conn_sid]))
-
-                        sec_buffer.write(struct.pack("<I", len(tangent_data)))
-                        for tx, ty, tz, dist in tangent_data:
-                            sec_buffer.write(struct.pack("<ddd", tx, ty, tz))
-                            sec_buffer.write(struct.pack("<d", dist))
-
-                    while cut_data_buff:
-                        sec_buffer.write(cut_data_buff.pop())
-
-        # 写入外部光和灯泡数据
-        external_num = 0
-        number_pos = sec_buffer.tell()
-        sec_buffer.write(struct.pack("<I", 0))  # 占位
-        ## 外部光
-        for ext in scene_data.externals:
-            if not ext.users_obj:
-                continue
+        # 扇区名称
+        sec_name_seg.write_str(sec.name)
 
-            color = ext.color
-            vector = ext.vector.normalized()
-            precision = ext.data.shadow_maximum_resolution
-            sec_buffer.write(struct.pack("<I", 15002))
-            sec_buffer.write(struct.pack("<BBB", *(math.ceil(c * 255) for c in color)))
-            sec_buffer.write(struct.pack("<f", color.v * v_factor))
-            sec_buffer.write(struct.pack("<f", precision))
-            sec_buffer.write(struct.pack("<ddd", 0, 0, 0))
-            sec_buffer.write(bytes.fromhex("CD" * 8))
-            sec_buffer.write(struct.pack("<I", 0))
-            sec_buffer.write(struct.pack("<ddd", vector[0], -vector[2], vector[1]))
-            ## 使用该外部光的扇区
-            users_num = 0
-            number_pos_2 = sec_buffer.tell()
-            sec_buffer.write(struct.pack("<I", 0))  # 占位
-            for i in ext.users_obj:
-                sid = i.obj.amagate_data.get_sector_data().id
-                # 如果扇区在导出列表中
-                if global_sector_map.get(sid) is not None:
-                    users_num += 1
-                    sec_buffer.write(struct.pack("<I", global_sector_map[sid]))
-            stream_pos = sec_buffer.tell()
-            sec_buffer.seek(number_pos_2)
-            sec_buffer.write(struct.pack("<I", users_num))
-            sec_buffer.seek(stream_pos)
-            external_num += 1
-        ## 灯泡
-        stream_pos = sec_buffer.tell()
-        sec_buffer.seek(number_pos)
-        sec_buffer.write(struct.pack("<I", bulb_num + external_num))
-        sec_buffer.seek(stream_pos)
-        sec_buffer.write(bulb_buffer.getvalue())
-        bulb_buffer.close()
-
-        ## 未知数据 地图边界？
-        sec_buffer.write(struct.pack("<ddd", 0, 0, 0))
-        sec_buffer.write(struct.pack("<ddd", 0, 0, 0))
-
-        # 写入组数据
-        sec_buffer.write(group_buffer.getvalue())
-        group_buffer.close()
-
-        # 写入扇区名称数据
-        sec_buffer.write(struct.pack("<I", sec_total))
-        sec_buffer.write(sec_name_buffer.getvalue())
-        sec_name_buffer.close()
+        header_seg = ag_binio.Segment(256)
+        # 大气名称
+        atm_name = L3D_data.get_atmo_by_id(scene_data, sec_data.atmo_id)[
+            1
+        ].item_name
+        header_seg.write_str(atm_name)
+
+        # 环境光
+        color = sec_data.ambient_color
+        header_seg.pack("<BBB", *(math.ceil(c * 255) for c in color))
+        header_seg.pack("<f", color.v * v_factor)
+        header_seg.write(ambient_light_p)
+        header_seg.pack("<ddd", 0, 0, 0)  # 未知用途 默认0
+        header_seg.write(bytes.fromhex("CD" * 8))
+        header_seg.pack("<I", 0)
+
+        # 平面光
+        flat_light = mesh.attributes.get("amagate_flat_light")
+        face = next(
+            (
+                mesh.polygons[i]
+                for i, d in enumerate(flat_light.data)  # type: ignore
+                if d.value == 1
+            ),
+            None,
+        )
+        if face:
+            vector = matrix_world.to_quaternion() @ -face.normal
+            vector = vector[0], -vector[2], vector[1]
+        else:
+            vector = (0, 0, 0)
+        color = sec_data.flat_light.color
+        header_seg.pack("<BBB", *(math.ceil(c * 255) for c in color))
+        header_seg.pack("<f", color.v * v_factor)
+        header_seg.write(ambient_light_p)
+        header_seg.pack("<ddd", 0, 0, 0)  # # 未知用途 默认0
+        header_seg.write(bytes.fromhex("CD" * 8))
+        header_seg.pack("<I", 0)
+        ## 平面光向量
+        header_seg.pack("<ddd", *vector)
+        sec_headers.append(header_seg)
+
+    # 读取编译缓存，只编译内容发生变化的扇区
+    # 预览导出使用单独的缓存，边界扇区的连接被过滤，不能与完整导出共用
+    print()
+    cache_file = f"{os.path.splitext(bw_file)[0]}.agcache"
+    blob_cache = L3D_compile.load_cache(cache_file, data.VERSION)
+    blobs = [None] * sec_total  # type: list[Any]
+    cache_keys = []
+    pending = []
+    with profiler.stage("cache"):
+        for idx, snapshot in enumerate(snapshots):
+            key = L3D_compile.snapshot_key(snapshot)
+            cache_keys.append(key)
+            cached = blob_cache.get(sector_ids[idx])
+            if cached and cached[0] == key:
+                blobs[idx] = cached[1]
+                sector_profiles[idx]["cached"] = True
+            else:
+                pending.append(idx)
+
+    # 处理单个扇区的编译结果
+    def merge_blob(idx, blob):
+        global COMPILE_STATUS
+        status = COMPILE_STATUS
+        # 需要平面切割的扇区在主线程中编译
+        if blob is None:
+            COMPILE_STATUS = True
+            sec = get_sector(idx)
+            mesh = sec.evaluated_get(bpy.context.evaluated_depsgraph_get()).data
+            with profiler.stage("bmesh") as stage:
+                blob = compile_sector_bmesh(sec, mesh, global_sector_map)  # type: ignore
+            sector_profiles[idx]["time"] += stage.elapsed
+            sector_profiles[idx]["stages"]["bmesh"] = {
+                "time": round(stage.elapsed, 6),
+                "count": 1,
+            }
+            # 切割失败的扇区不缓存，下次导出时重新编译
+            if COMPILE_STATUS:
+                blob_cache[sector_ids[idx]] = (cache_keys[idx], blob)
+            else:
+                blob_cache.pop(sector_ids[idx], None)
+            COMPILE_STATUS = status and COMPILE_STATUS
+        else:
+            # 子进程中的分析数据不缓存
+            profile = blob.pop("profile", None)
+            if profile:
+                sector_profiles[idx]["time"] += profile["time"]
+                sector_profiles[idx]["stages"].update(profile["stages"])
+                profiler.merge(profile["stages"])
+            if data.DEBUG:
+                sec = get_sector(idx)
+                mesh = sec.evaluated_get(bpy.context.evaluated_depsgraph_get()).data
+                verify_blob(sec, mesh, global_sector_map, blob)  # type: ignore
+            # 切割失败的扇区不缓存
+            if blob["errors"]:
+                COMPILE_STATUS = False
+                print("\n" + "\n".join(blob["errors"]))
+                blob_cache.pop(sector_ids[idx], None)
+            else:
+                blob_cache[sector_ids[idx]] = (cache_keys[idx], blob)
+        blobs[idx] = blob
 
-        #
-        f.write(struct.pack("<I", global_vertex_count))
-        f.write(verts_buffer.getvalue())
-        f.write(sec_buffer.getvalue())
-        verts_buffer.close()
-        sec_buffer.close()
+    # 编译扇区面数据，可并行
+    compile_iter = L3D_compile.iter_compile_sectors(
+        [snapshots[idx] for idx in pending], workers, profiler.enabled
+    )
+    compile_time = 0.0
+    last_time = time.perf_counter()
+    try:
+        for progress, (idx, blob) in enumerate(zip(pending, compile_iter)):
+            compile_time += time.perf_counter() - last_time
+            progress_update("Sector Compiling", progress + 1, len(pending))
+            merge_blob(idx, blob)
+            yield "Sector Compiling", progress + 1, len(pending)
+            last_time = time.perf_counter()
+    finally:
+        compile_iter.close()
+    profiler.add("compile", compile_time)
+    snapshots.clear()
+    scene_data = get_scene_data()
+    sectors_dict = scene_data["SectorManage"]["sectors"]
+    # 保存编译缓存，移除已删除的扇区
+    for sid in list(blob_cache):
+        if str(sid) not in sectors_dict:
+            blob_cache.pop(sid)
+    L3D_compile.save_cache(cache_file, data.VERSION, blob_cache)
+    print(f"\nSector Cache: {sec_total - len(pending)} of {sec_total}", end="")
+
+    # 构建全局顶点表
+    with profiler.stage("vertex_table"):
+        vertex_table = L3D_compile.VertexTable(
+            bpy.context.window_manager.amagate_data.weld_tolerance
+        )
+        local_maps = vertex_table.build([blob["keys"] for blob in blobs])
+    global_vertex_count = len(vertex_table.vertices)
+    writer.append(head_seg)
+    writer.segment(4).pack("<I", global_vertex_count)
+    writer.append(np.ascontiguousarray(vertex_table.vertices, dtype="<f8"))
+
+    # 合并扇区数据
+    writer.segment(4).pack("<I", sec_total)
+    for idx, sector_id in enumerate(sector_ids):
+        blob = blobs[idx]  # type: dict[str, Any]
+        steep_check, steep = sec_steep[idx]
+        # 如果不会被引擎设为滑坡且为自动模式
+        if not steep_check and steep == "0":
+            if blob["steep"]:
+                steep_auto.append(idx)
+        elif steep == "1":
+            steep_yes.append(idx)
+        elif steep == "2":
+            steep_no.append(idx)
+
+        global_face_count += blob["face_num"]
+        writer.append(sec_headers[idx])
+        with profiler.stage("relocate"):
+            writer.append(
+                L3D_compile.relocate(blob, local_maps[idx], global_sector_map)
+            )
+        yield "Sector Merging", idx + 1, sec_total
+    blobs.clear()
+    scene_data = get_scene_data()
+
+    # 写入外部光和灯泡数据
+    light_seg = writer.segment()
+    external_num = 0
+    number_pos = light_seg.pack("<I", 0)  # 占位
+    ## 外部光
+    for ext in scene_data.externals:
+        if not ext.users_obj:
+            continue
+
+        color = ext.color
+        vector = ext.vector.normalized()
+        precision = ext.data.shadow_maximum_resolution
+        light_seg.pack("<I", 15002)
+        light_seg.pack("<BBB", *(math.ceil(c * 255) for c in color))
+        light_seg.pack("<f", color.v * v_factor)
+        light_seg.pack("<f", precision)
+        light_seg.pack("<ddd", 0, 0, 0)
+        light_seg.write(bytes.fromhex("CD" * 8))
+        light_seg.pack("<I", 0)
+        light_seg.pack("<ddd", vector[0], -vector[2], vector[1])
+        ## 使用该外部光的扇区
+        users_num = 0
+        number_pos_2 = light_seg.pack("<I", 0)  # 占位
+        for i in ext.users_obj:
+            sid = i.obj.amagate_data.get_sector_data().id
+            # 如果扇区在导出列表中
+            if global_sector_map.get(sid) is not None:
+                users_num += 1
+                light_seg.pack("<I", global_sector_map[sid])
+        light_seg.patch(number_pos_2, "<I", users_num)
+        external_num += 1
+    ## 灯泡
+    light_seg.patch(number_pos, "<I", bulb_num + external_num)
+    writer.append(bulb_seg)
+
+    ## 未知数据 地图边界？
+    trailer_seg = writer.segment(48)
+    trailer_seg.pack("<ddd", 0, 0, 0)
+    trailer_seg.pack("<ddd", 0, 0, 0)
+
+    # 写入组数据
+    writer.append(group_seg)
+
+    # 写入扇区名称数据
+    writer.segment(4).pack("<I", sec_total)
+    writer.append(sec_name_seg)
+
+    # 一次性写入文件
+    with profiler.stage("write_file"):
+        writer.write_to(bw_file)
+    writer.clear()
 
     #
-    wm.progress_end()
+    if ui:
+        wm.progress_end()
+    scripts_time = time.perf_counter()
     # 地图数据脚本
     map_dir = Path(bpy.data.filepath).parent
     # 玩家
     coll = L3D_data.ensure_collection(L3D_data.E_COLL)
     player = scene_data["EntityManage"].get("Player1")  # type: Object
-    if player and player.name in coll.all_objects:
+    if preview_pos is not None:
+        player_pos = (Vector(preview_pos) * 1000).to_tuple(1)
+        player_kind = "Knight_N"
+        if player and player.name in coll.all_objects:
+            player_kind = player.amagate_data.get_entity_data().Kind
+    elif player and player.name in coll.all_objects:
         player_pos = (player.matrix_world.translation * 1000).to_tuple(
             1
         )  # 转换为毫米单位
         player_kind = player.amagate_data.get_entity_data().Kind
     else:
-        sec = sectors_dict[str(sector_ids[0])]["obj"]  # type: Object
+        sec = get_sector(0)
         bbox_corners = [sec.matrix_world @ Vector(corner) for corner in sec.bound_box]
         center = sum(bbox_corners, Vector()) / 8
         player_pos = (center * 1000).to_tuple(0)  # 转换为毫米单位
@@ -1186,61 +1389,69 @@ def export_map(
         "player_pos": player_pos,
         "player_kind": player_kind,
     }
-    json.dump(
-        mapcfg,
-        open(map_dir / "AG_MapCfg.json", "w", encoding="utf-8"),
-        indent=4,
-        ensure_ascii=False,
-        sort_keys=True,
-    )
-    # with open(os.path.join(map_dir, "AG_MapCfg.py"), "w", encoding="utf-8") as file:
-    #     file.write("# Automatically generated by Amagate\n\n")
-    #     file.write("AG_MapCfg = ")
-    #     pprint(mapcfg, stream=file, indent=0, sort_dicts=False)
-    #
-    with open(os.path.join(map_dir, "AG_dome.lvl"), "w", encoding="utf-8") as file:
-        file.write("# Automatically generated by Amagate\n\n")
-        if scene_data.sky_tex_enum != "-1":
-            enum_items = scene_data.bl_rna.properties["sky_tex_enum"].enum_items  # type: ignore
-            name = enum_items[int(scene_data.sky_tex_enum) - 1].description
-            name = name.replace(" - Reforged", "")
-            file.write(f"WorldDome -> {SKY_TEX_REFPATH[name]}")
-    #
-    with open(os.path.join(map_dir, "AG_Script.py"), "w", encoding="utf-8") as file:
-        file.write("# Automatically generated by Amagate\n\n")
-        file.write("import Bladex\n")
-        file.write("import Raster\n\n")
-        file.write("####\n")
-        color = tuple(math.ceil(c * 255) for c in scene_data.sky_color)
-        file.write(f"Raster.SetDomeColor{color}\n\n")
+    # 预览导出写入一次性的预览配置，游戏启动时 (Cfg.py) 优先加载并删除，不覆盖完整地图的配置
+    preview_cfg = map_dir / "AG_PreviewCfg.json"
+    if preview_pos is not None:
+        cfg_file = preview_cfg
+    else:
+        cfg_file = map_dir / "AG_MapCfg.json"
+        if preview_cfg.exists():
+            preview_cfg.unlink()
+    with open(cfg_file, "w", encoding="utf-8") as file:
+        json.dump(mapcfg, file, indent=4, ensure_ascii=False, sort_keys=True)
+    # 完整导出或地图脚本尚不存在时写入地图脚本
+    if preview_pos is None or not (map_dir / "AG_Script.py").exists():
+        # with open(os.path.join(map_dir, "AG_MapCfg.py"), "w", encoding="utf-8") as file:
+        #     file.write("# Automatically generated by Amagate\n\n")
+        #     file.write("AG_MapCfg = ")
+        #     pprint(mapcfg, stream=file, indent=0, sort_dicts=False)
         #
-        file.write("####\n")
-        coll = (
-            ("steep_auto", steep_auto_code),
-            ("steep_yes", steep_yes_code),
-            ("steep_no", steep_no_code),
-        )
-        for key, code in coll:
-            pos_list = []
-            for sec in locals()[key]:
-                mesh = sec.data  # type: bpy.types.Mesh # type: ignore
-                matrix_world = sec.matrix_world
-                # 计算几何中心
-                faces_center = [matrix_world @ f.center for f in mesh.polygons]
-                center = sum(faces_center, Vector()) / len(faces_center)
-                center = (center * 1000).to_tuple(0)
-                pos_list.append((center[0], -center[2], center[1]))
-            file.write(f"{key} = {pos_list}\n")
-            file.write(code)
-    #
-    filepath = map_dir / "AG_Objs.py"
-    if not filepath.exists():
-        with open(filepath, "w", encoding="utf-8") as file:
+        with open(os.path.join(map_dir, "AG_dome.lvl"), "w", encoding="utf-8") as file:
             file.write("# Automatically generated by Amagate\n\n")
-    # 地图运行脚本
-    if with_run_script:
+            if scene_data.sky_tex_enum != "-1":
+                enum_items = scene_data.bl_rna.properties["sky_tex_enum"].enum_items  # type: ignore
+                name = enum_items[int(scene_data.sky_tex_enum) - 1].description
+                name = name.replace(" - Reforged", "")
+                file.write(f"WorldDome -> {SKY_TEX_REFPATH[name]}")
+        #
+        with open(os.path.join(map_dir, "AG_Script.py"), "w", encoding="utf-8") as file:
+            file.write("# Automatically generated by Amagate\n\n")
+            file.write("import Bladex\n")
+            file.write("import Raster\n\n")
+            file.write("####\n")
+            color = tuple(math.ceil(c * 255) for c in scene_data.sky_color)
+            file.write(f"Raster.SetDomeColor{color}\n\n")
+            #
+            file.write("####\n")
+            coll = (
+                ("steep_auto", steep_auto_code),
+                ("steep_yes", steep_yes_code),
+                ("steep_no", steep_no_code),
+            )
+            for key, code in coll:
+                pos_list = []
+                for idx in locals()[key]:
+                    sec = get_sector(idx)
+                    mesh = sec.data  # type: bpy.types.Mesh # type: ignore
+                    matrix_world = sec.matrix_world
+                    # 计算几何中心
+                    faces_center = [matrix_world @ f.center for f in mesh.polygons]
+                    center = sum(faces_center, Vector()) / len(faces_center)
+                    center = (center * 1000).to_tuple(0)
+                    pos_list.append((center[0], -center[2], center[1]))
+                file.write(f"{key} = {pos_list}\n")
+                file.write(code)
+        #
+        filepath = map_dir / "AG_Objs.py"
+        if not filepath.exists():
+            with open(filepath, "w", encoding="utf-8") as file:
+                file.write("# Automatically generated by Amagate\n\n")
+    # 地图运行脚本，预览需要能读取预览配置的Cfg.py
+    if with_run_script or preview_pos is not None:
         scripts_dir = os.path.join(data.ADDON_PATH, "blade_scripts")
         for f in os.listdir(scripts_dir):
+            if not os.path.isfile(os.path.join(scripts_dir, f)):
+                continue
             shutil.copy(
                 os.path.join(scripts_dir, f),
                 os.path.join(os.path.dirname(bw_file), f),
@@ -1249,14 +1460,40 @@ def export_map(
 
     # self.report({'WARNING'}, "Compile to bw Failed")
 
-    print(f", Done in {time.time() - start_time:.2f}s")
+    profiler.add("scripts", time.perf_counter() - scripts_time)
+    total_time = time.time() - start_time
+    print(f", Done in {total_time:.2f}s")
+    # 编译报告
+    slowest_info = ""
+    if profiler.enabled:
+        slowest = sorted(sector_profiles, key=lambda x: -x["time"])[:REPORT_TOP_N]
+        report_data = {
+            "version": data.VERSION,
+            "bw_file": os.path.basename(bw_file),
+            "time": round(total_time, 6),
+            "status": COMPILE_STATUS,
+            "workers": workers or L3D_compile.get_workers(),
+            "sectors": sec_total,
+            "compiled": len(pending),
+            "vertices": global_vertex_count,
+            "faces": global_face_count,
+            "stages": profiler.to_dict(),
+            "slowest": [{"id": i["id"], "name": i["name"], "time": round(i["time"], 6)} for i in slowest],
+            "sector_profiles": sector_profiles,
+        }
+        report_file = f"{os.path.splitext(bw_file)[0]}.report.json"
+        with open(report_file, "w", encoding="utf-8") as file:
+            json.dump(report_data, file, indent=4, ensure_ascii=False)
+        slowest_info = f"\n{pgettext('Slowest Sectors')}: " + ", ".join(
+            f"{i['name']} ({i['time'] * 1000:.1f} ms)" for i in slowest[:5]
+        )
     if COMPILE_STATUS:
-        this.report(
+        report(
             {"INFO"},
-            f"{pgettext('Compile Success')}:\n{global_vertex_count} {pgettext('Vertices')}, {global_face_count} {pgettext('Faces')}, {sec_total} {pgettext('Sectors')}",
+            f"{pgettext('Compile Success')}:\n{global_vertex_count} {pgettext('Vertices')}, {global_face_count} {pgettext('Faces')}, {sec_total} {pgettext('Sectors')}{slowest_info}",
         )
     else:
-        this.report({"WARNING"}, f"{pgettext('Compile Exception')}")
+        report({"WARNING"}, f"{pgettext('Compile Exception')}")
     return {"FINISHED"}
 
 
@@ -1283,6 +1520,162 @@ class OT_ExportMapWithRunScript(bpy.types.Operator):
         return export_map(self, context, with_run_script=True)
 
 
+class OT_ExportMapPreview(bpy.types.Operator):
+    bl_idname = "amagate.exportmap_preview"
+    bl_label = "Compile Preview (Around View)"
+    bl_description = "Compile only the sectors around the view into a preview bw, loaded the next time the game starts"
+    bl_options = {"INTERNAL"}
+
+    def execute(self, context: Context):
+        wm_data = context.window_manager.amagate_data
+        sectors_dict = context.scene.amagate_data["SectorManage"]["sectors"]
+        point = get_view_location(context)
+        start_sid = None if point is None else find_sector_at(sectors_dict, point)
+        if start_sid is None:
+            self.report({"WARNING"}, "No visible sector found")
+            return {"CANCELLED"}
+        region = collect_region_sectors(
+            sectors_dict,
+            start_sid,
+            point,
+            wm_data.preview_hops,
+            wm_data.preview_radius,
+        )
+        return export_map(self, context, sector_filter=region, preview_pos=point)
+
+
+# 后台编译期间扇区的几何、变换或集合发生变化时，已采集的数据失效
+def export_depsgraph_update_post(scene, depsgraph):
+    for update in depsgraph.updates:
+        id_data = update.id
+        if isinstance(id_data, bpy.types.Collection) or (
+            isinstance(id_data, bpy.types.Object)
+            and id_data.amagate_data.is_sector
+            and (update.is_updated_geometry or update.is_updated_transform)
+        ):
+            OT_ExportMapModal.invalidated = True
+            return
+
+
+# 撤销或重做会重建所有数据块
+def export_undo_post(scene, *args):
+    OT_ExportMapModal.invalidated = True
+
+
+class OT_ExportMapModal(bpy.types.Operator):
+    bl_idname = "amagate.exportmap_modal"
+    bl_label = "Compile to bw (Background)"
+    bl_description = "Compile without blocking the interface, press Esc to cancel"
+    bl_options = {"INTERNAL"}
+
+    visible_only: BoolProperty(default=False)  # type: ignore
+    with_run_script: BoolProperty(default=False)  # type: ignore
+    running = False
+    invalidated = False
+
+    @classmethod
+    def poll(cls, context: Context):
+        return not OT_ExportMapModal.running
+
+    @staticmethod
+    def add_handlers():
+        OT_ExportMapModal.invalidated = False
+        handlers = bpy.app.handlers
+        handlers.depsgraph_update_post.append(export_depsgraph_update_post)
+        handlers.undo_post.append(export_undo_post)
+        handlers.redo_post.append(export_undo_post)
+
+    @staticmethod
+    def remove_handlers():
+        handlers = bpy.app.handlers
+        if export_depsgraph_update_post in handlers.depsgraph_update_post:
+            handlers.depsgraph_update_post.remove(export_depsgraph_update_post)
+        for handler_list in (handlers.undo_post, handlers.redo_post):
+            if export_undo_post in handler_list:
+                handler_list.remove(export_undo_post)
+
+    def advance(self):
+        # 处理一个时间片，导出结束时返回操作结果
+        deadline = time.perf_counter() + EXPORT_TIME_SLICE
+        try:
+            while True:
+                self.progress = next(self.steps)
+                if time.perf_counter() >= deadline:
+                    return None
+        except StopIteration as e:
+            return e.value
+
+    def update_status(self, context: Context):
+        label, i, total = self.progress
+        context.window_manager.progress_update(i / total)
+        context.workspace.status_text_set(
+            f"{pgettext(label)}: {i} / {total}    {pgettext('Press Esc to cancel')}"
+        )
+
+    def finish(self, context: Context):
+        wm = context.window_manager
+        if self.timer:
+            wm.event_timer_remove(self.timer)
+            self.timer = None
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+        self.remove_handlers()
+        OT_ExportMapModal.running = False
+
+    def cancel(self, context: Context):
+        self.steps.close()
+        self.finish(context)
+
+    def invoke(self, context: Context, event):
+        self.timer = None
+        self.progress = ("", 0, 1)
+        self.steps = export_map_steps(
+            self, context, self.visible_only, self.with_run_script, ui=False
+        )
+        # 第一个时间片在当前上下文中执行 (编辑模式切换等)
+        result = self.advance()
+        if result is not None:
+            return result
+
+        wm = context.window_manager
+        OT_ExportMapModal.running = True
+        # 第一个时间片中的更新已经求值，之后的修改使已采集的数据失效
+        context.evaluated_depsgraph_get()
+        self.add_handlers()
+        wm.progress_begin(0, 1)
+        self.update_status(context)
+        self.timer = wm.event_timer_add(0.01, window=context.window)
+        wm.modal_handler_add(self)
+        return {"RUNNING_MODAL"}
+
+    def modal(self, context: Context, event):
+        # 中止时关闭生成器，bw文件不会被写入
+        if event.type == "ESC" and event.value == "PRESS":
+            self.cancel(context)
+            self.report({"WARNING"}, "Compile Cancelled")
+            return {"CANCELLED"}
+        # 编译期间进入编辑模式、修改扇区或撤销会使已采集的数据失效
+        if "EDIT" in context.mode or OT_ExportMapModal.invalidated:
+            self.cancel(context)
+            self.report({"WARNING"}, "Compile Cancelled")
+            return {"CANCELLED"}
+        if event.type != "TIMER" or event.timer != self.timer:
+            return {"PASS_THROUGH"}
+
+        try:
+            result = self.advance()
+        except Exception as e:
+            logger.exception(e)
+            self.finish(context)
+            self.report({"ERROR"}, f"{pgettext('Compile Exception')}: {e}")
+            return {"CANCELLED"}
+        if result is not None:
+            self.finish(context)
+            return result
+        self.update_status(context)
+        return {"PASS_THROUGH"}
+
+
 class OT_ExportMap(bpy.types.Operator):
     bl_idname = "amagate.exportmap"
     bl_label = "Compile to bw"
@@ -1301,6 +1694,12 @@ class OT_ExportMap(bpy.types.Operator):
         column = layout.column()
         column.operator(OT_ExportMapOnlyVisible.bl_idname)
         column.operator(OT_ExportMapWithRunScript.bl_idname)
+        column.operator(OT_ExportMapModal.bl_idname)
+        column.operator(OT_ExportMapPreview.bl_idname)
+        column.prop(context.window_manager.amagate_data, "preview_hops")
+        column.prop(context.window_manager.amagate_data, "preview_radius")
+        column.prop(context.window_manager.amagate_data, "weld_tolerance")
+        column.prop(context.window_manager.amagate_data, "compile_report")
 
     def execute(self, context: Context):
         return export_map(self, context)
@@ -10,12 +10,15 @@ import struct
 import math
 import os
 import time
+import threading
 import contextlib
 from pathlib import Path
 
 from io import StringIO, BytesIO
 from typing import Any, TYPE_CHECKING
 
+import numpy as np
+
 #
 import bpy
 import bmesh
@@ -35,8 +38,9 @@ from bpy.props import (
 from mathutils import *  # type: ignore
 
 #
-from . import data, L3D_data, ag_utils
+from . import data, L3D_data, ag_utils, L3D_bwparse
 from . import L3D_operator as OP_L3D
+from . import L3D_ext_operator as OP_L3D_EXT
 from . import sector_operator as OP_SECTOR
 
 #
@@ -54,7 +58,9 @@ logger = data.logger
 
 epsilon: float = ag_utils.epsilon
 epsilon2: float = ag_utils.epsilon2
-unpack = ag_utils.unpack
+############################
+IMPORT_JOB = None  # type: ImportJob | None
+IMPORT_TIME_SLICE = 0.05  # 每次计时器回调构建场景的时间(秒)
 ############################
 
 
@@ -63,115 +69,163 @@ def verify_bw(bw_file):
     pass
 
 
-# 分割洞
-def hole_split(sec_bm, inner_face, tangent_data, sector_id):
-    geom = list(inner_face.verts) + list(inner_face.edges) + [inner_face]
-    while tangent_data:
-        plane_no, plane_co = tangent_data.pop()
-        result = bmesh.ops.bisect_plane(
-            sec_bm,
-            geom=geom,  # type: ignore
-            dist=1e-4,
-            plane_no=plane_no,
-            plane_co=plane_co,
-            clear_inner=False,
-            clear_outer=False,
+# 面在其平面上的二维划分
+# 切割在平面坐标中计算，内外侧由切线两侧的顶点直接确定，之后按记录的事件拆分bmesh面
+class FacePartition:
+    def __init__(self, face: bmesh.types.BMFace, dist=1e-4):
+        self.face = face
+        self.dist = dist
+        normal = face.normal
+        self.origin = face.verts[0].co.copy()
+        self.axis_u = normal.orthogonal().normalized()
+        self.axis_v = normal.cross(self.axis_u)
+        self.co = [v.co.copy() for v in face.verts]  # type: list[Vector]
+        self.pts = [self.to_2d(co) for co in self.co]  # 平面坐标
+        self.pieces = [list(range(len(self.co)))]  # 每个片段的点环，片段0为原始面
+        self.values = [{}]  # type: list[dict[str, Any]] # 片段的属性覆盖
+        self.events = []  # type: list[tuple]
+
+    def to_2d(self, co: Vector) -> tuple[float, float]:
+        vec = co - self.origin
+        return (vec.dot(self.axis_u), vec.dot(self.axis_v))
+
+    # 在点a和b之间插入新点，共享该线段的片段同时插入
+    def split_segment(self, a, b, t):
+        p = len(self.co)
+        self.co.append(self.co[a].lerp(self.co[b], t))
+        (x1, y1), (x2, y2) = self.pts[a], self.pts[b]
+        self.pts.append((x1 + (x2 - x1) * t, y1 + (y2 - y1) * t))
+        for loop in self.pieces:
+            n = len(loop)
+            for k in range(n):
+                if {loop[k], loop[(k + 1) % n]} == {a, b}:
+                    loop.insert(k + 1, p)
+                    break
+        self.events.append(("edge", a, b, p))
+        return p
+
+    # 用平面切割片段，法向的反方向为内侧，返回 (内侧, 外侧)，平面未穿过片段时返回None
+    def clip(self, piece, plane_no, plane_co):
+        # type: (int, Vector, Vector) -> tuple[int, int] | None
+        loop = self.pieces[piece][:]  # 插入新点会修改原点环
+        n = len(loop)
+        # 平面与面的交线 a*x + b*y + c = 0
+        line = np.array(
+            (plane_no.dot(self.axis_u), plane_no.dot(self.axis_v)), dtype=np.float64
         )
-        # 获取内部面
-        cut_verts = [g for g in result["geom_cut"] if isinstance(g, bmesh.types.BMVert)]
-        cut_edges = [g for g in result["geom_cut"] if isinstance(g, bmesh.types.BMEdge)]
-        if not cut_edges:
-            continue
-        edge = cut_edges[0]
-        if len(edge.link_faces) == 1:
-            #
-            # bm_mesh = bpy.data.meshes.new(f"AG.split")
-            # sec_bm.to_mesh(bm_mesh)
-            # bm_obj = bpy.data.objects.new(f"AG.split", bm_mesh)
-            # data.link2coll(bm_obj, bpy.context.scene.collection)
-            # logger.debug(f"bisect_plane: {plane_no}, {plane_co}")
-            #
+        c = (self.origin - plane_co).dot(plane_no)
+        dist = np.array([self.pts[i] for i in loop], dtype=np.float64) @ line + c
+        side = np.zeros(n, dtype=np.int8)
+        side[dist > self.dist] = 1
+        side[dist < -self.dist] = -1
+        if side.min() >= 0 or side.max() <= 0:
+            return None
+        crossing = [k for k in range(n) if side[k] * side[(k + 1) % n] < 0]
+        if len(crossing) + np.count_nonzero(side == 0) != 2:
             return None
-        if edge.link_faces[0].normal.dot(edge.link_faces[1].normal) < epsilon2:
-            continue
 
-        face1, face2 = edge.link_faces
-        line_p1 = edge.verts[0].co.copy()
-        line_p2 = edge.verts[1].co.copy()
-        co = next(
-            v.co.copy()
-            for v in face1.verts
-            if v not in cut_verts
-            and (geometry.intersect_point_line(v.co, line_p1, line_p2)[0] - v.co).length
-            > 1e-4
-        )
-        pt, pct = geometry.intersect_point_line(co, line_p1, line_p2)
-        dir = (co - pt).normalized()
-        if plane_no.dot(dir) < 0:
-            inner_face = face1
-        else:
-            inner_face = face2
-        geom = list(inner_face.verts) + list(inner_face.edges) + [inner_face]
-    return inner_face
+        new_pts = {}
+        for k in crossing:
+            k2 = (k + 1) % n
+            t = dist[k] / (dist[k] - dist[k2])
+            new_pts[k] = self.split_segment(loop[k], loop[k2], float(t))
+        inner = []
+        outer = []
+        cut = []
+        for k in range(n):
+            i = loop[k]
+            if side[k] <= 0:
+                inner.append(i)
+            if side[k] >= 0:
+                outer.append(i)
+            if side[k] == 0:
+                cut.append(i)
+            p = new_pts.get(k)
+            if p is not None:
+                inner.append(p)
+                outer.append(p)
+                cut.append(p)
+        outer_piece = len(self.pieces)
+        self.pieces[piece] = inner
+        self.pieces.append(outer)
+        self.values.append(dict(self.values[piece]))
+        # 外侧独有的顶点，用于区分拆分后的两个面
+        marker = loop[int(np.argmax(side))]
+        self.events.append(("face", piece, outer_piece, cut[0], cut[1], marker))
+        return piece, outer_piece
+
+    # 拆分bmesh面，新面追加在末尾，原始面的索引保持不变，返回每个片段的面
+    def apply(self, layers):
+        # type: (dict[str, Any]) -> list[bmesh.types.BMFace]
+        bm_verts = list(self.face.verts)  # type: list[bmesh.types.BMVert]
+        faces = [self.face]
+        for event in self.events:
+            if event[0] == "edge":
+                _, a, b, p = event
+                v_a, v_b = bm_verts[a], bm_verts[b]
+                edge = next(e for e in v_a.link_edges if e.other_vert(v_a) == v_b)
+                new_edge, new_vert = bmesh.utils.edge_split(edge, v_a, 0.5)
+                new_vert.co = self.co[p]
+                bm_verts.append(new_vert)
+            else:
+                _, piece, outer_piece, p, q, marker = event
+                face = faces[piece]
+                new_face, _ = bmesh.utils.face_split(face, bm_verts[p], bm_verts[q])
+                if bm_verts[marker] in new_face.verts:
+                    faces.append(new_face)
+                else:
+                    faces[piece] = new_face
+                    faces.append(face)
+        for face, values in zip(faces, self.values):
+            for key, value in values.items():
+                if key == "material_index":
+                    face.material_index = value
+                else:
+                    face[layers[key]] = value
+        return faces
+
+
+# 分割7003面的洞并设置连接的扇区
+def split_hole_face(face, tangent_data, conn_sid, layers):
+    part = FacePartition(face)
+    piece = hole_split(part, 0, tangent_data)
+    part.values[piece]["connected"] = conn_sid
+    return part.apply(layers)[piece]
 
 
-# 平展面分割
-def flat_split(sec_bm, face, cut_data, layers, sector_id):
-    stack = [face]
+# 按切割数据分割7004面
+def split_flat_face(face, cut_data, layers):
+    part = FacePartition(face)
+    flat_split(part, cut_data)
+    return part.apply(layers)
+
+
+# 分割洞，返回洞所在的片段
+def hole_split(part, piece, tangent_data):
+    # type: (FacePartition, int, list[tuple[Vector, Vector]]) -> int
+    while tangent_data:
+        plane_no, plane_co = tangent_data.pop()
+        result = part.clip(piece, plane_no, plane_co)
+        if result is not None:
+            piece = result[0]
+    return piece
+
+
+# 平展面分割，cut_data为先序排列的切割树: 内侧子树紧随切割，外侧片段入栈
+def flat_split(part, cut_data):
+    # type: (FacePartition, list[tuple]) -> None
+    stack = [0]
     while stack:
-        inner_face = stack.pop()
+        piece = stack.pop()
         while cut_data:
             tuple_data = cut_data.pop()
             if tuple_data[0] == "cut":
                 _, plane_no, plane_co, tex_data = tuple_data
-                geom = list(inner_face.verts) + list(inner_face.edges) + [inner_face]
-                result = bmesh.ops.bisect_plane(
-                    sec_bm,
-                    geom=geom,  # type: ignore
-                    dist=1e-4,
-                    plane_no=plane_no,
-                    plane_co=plane_co,
-                    clear_inner=False,
-                    clear_outer=False,
-                )
-                # 获取内部面
-                cut_verts = [
-                    g for g in result["geom_cut"] if isinstance(g, bmesh.types.BMVert)
-                ]
-                cut_edges = [
-                    g for g in result["geom_cut"] if isinstance(g, bmesh.types.BMEdge)
-                ]
-                #
-                if not cut_edges:
+                result = part.clip(piece, plane_no, plane_co)
+                if result is None:
                     continue
-                #     bm_mesh = bpy.data.meshes.new(f"AG.split")
-                #     sec_bm.to_mesh(bm_mesh)
-                #     bm_obj = bpy.data.objects.new(f"AG.split", bm_mesh)
-                #     data.link2coll(bm_obj, bpy.context.scene.collection)
-                #     logger.debug(f"bisect_plane: {plane_no}, {plane_co}")
-                #
-                edge = cut_edges[0]
-                face1, face2 = edge.link_faces
-                line_p1 = edge.verts[0].co.copy()
-                line_p2 = edge.verts[1].co.copy()
-                co = next(
-                    v.co.copy()
-                    for v in face1.verts
-                    if v not in cut_verts
-                    and (
-                        geometry.intersect_point_line(v.co, line_p1, line_p2)[0] - v.co
-                    ).length
-                    > 1e-4
-                )
-                pt, pct = geometry.intersect_point_line(co, line_p1, line_p2)
-                dir = (co - pt).normalized()
-                if plane_no.dot(dir) < 0:
-                    inner_face = face1
-                    outer_face = face2
-                else:
-                    inner_face = face2
-                    outer_face = face1
-                stack.append(outer_face)
+                piece, outer_piece = result
+                stack.append(outer_piece)
                 # 如果有纹理数据
                 if tex_data:
                     (
@@ -184,24 +238,25 @@ def flat_split(sec_bm, face, cut_data, layers, sector_id):
                         tex_xzoom,
                         tex_yzoom,
                     ) = tex_data
-                    inner_face.material_index = slot_index
-                    inner_face[layers["flag"]] = L3D_data.FACE_FLAG[tex_type]
-                    inner_face[layers["tex_id"]] = tex_id
-                    inner_face[layers["tex_xpos"]] = tex_xpos
-                    inner_face[layers["tex_ypos"]] = tex_ypos
-                    inner_face[layers["tex_angle"]] = tex_angle
-                    inner_face[layers["tex_xzoom"]] = tex_xzoom
-                    inner_face[layers["tex_yzoom"]] = tex_yzoom
+                    part.values[piece].update(
+                        material_index=slot_index,
+                        flag=L3D_data.FACE_FLAG[tex_type],
+                        tex_id=tex_id,
+                        tex_xpos=tex_xpos,
+                        tex_ypos=tex_ypos,
+                        tex_angle=tex_angle,
+                        tex_xzoom=tex_xzoom,
+                        tex_yzoom=tex_yzoom,
+                    )
             elif tuple_data[0] == 8003:
                 _, tangent_data, conn_sid = tuple_data
                 # 有洞，需要分割
                 if tangent_data:
-                    inner_face = hole_split(sec_bm, inner_face, tangent_data, sector_id)
-                    if inner_face is not None:
-                        inner_face[layers["connected"]] = conn_sid
+                    piece = hole_split(part, piece, tangent_data)
+                    part.values[piece]["connected"] = conn_sid
                 # 有洞，无需分割
                 elif conn_sid:
-                    inner_face[layers["connected"]] = conn_sid
+                    part.values[piece]["connected"] = conn_sid
                 # 无洞
                 else:
                     pass
@@ -209,20 +264,17 @@ def flat_split(sec_bm, face, cut_data, layers, sector_id):
                 break
 
 
-# 解包纹理数据
-def unpack_texture(sec_mesh, sec_data, normal, f, global_texture_map):
+# 解包纹理数据，tex为解析得到的 (名称, vx, vy, xpos, ypos)
+def unpack_texture(sec_mesh, sec_data, normal, tex, global_texture_map):
     x_axis = Vector((1, 0, 0))
     y_axis = Vector((0, 1, 0))
     z_axis = Vector((0, 0, 1))
     #
-    name_len = unpack("<I", f)[0]
-    texture_name = unpack(f"{name_len}s", f)
-    tex_vx = Vector(unpack("<ddd", f))
+    texture_name, tex_vx, tex_vy, tex_xpos, tex_ypos = tex
+    tex_vx = Vector(tex_vx)
     tex_vx.yz = tex_vx.z, -tex_vx.y
-    tex_vy = Vector(unpack("<ddd", f))
+    tex_vy = Vector(tex_vy)
     tex_vy.yz = tex_vy.z, -tex_vy.y
-    tex_xpos = unpack("<f", f)[0]
-    tex_ypos = unpack("<f", f)[0]
     #
     tex_vx_len = tex_vx.length
     tex_vy_len = tex_vy.length
@@ -460,714 +512,1008 @@ def connect_vm(sec_bm, link_face, sid, layers, conn_sec):
     return True
 
 
+# 扇区面属性 {名称: 类型}
+FACE_LAYERS = {
+    "connected": "INT",
+    "flag": "INT",
+    "flat_light": "INT",
+    "tex_id": "INT",
+    "tex_xpos": "FLOAT",
+    "tex_ypos": "FLOAT",
+    "tex_angle": "FLOAT",
+    "tex_xzoom": "FLOAT",
+    "tex_yzoom": "FLOAT",
+}
+
+
+# 新建面记录，verts为扇区内的顶点索引
+def new_face_record(faces, verts):
+    # type: (list[dict[str, Any]], list[int]) -> dict[str, Any]
+    face = dict.fromkeys(FACE_LAYERS, 0)
+    face["index"] = len(faces)
+    face["verts"] = verts
+    face["material_index"] = 0
+    faces.append(face)
+    return face
+
+
+# 每条边恰好被两个面使用、没有孤立顶点和重复面
+def is_closed_mesh(faces, vert_num):
+    # type: (list[dict[str, Any]], int) -> bool
+    edge_count = {}
+    face_keys = set()
+    used = set()
+    for face in faces:
+        verts = face["verts"]
+        key = frozenset(verts)
+        if len(key) != len(verts) or key in face_keys:
+            return False
+        face_keys.add(key)
+        used.update(verts)
+        for i in range(len(verts)):
+            v1, v2 = verts[i - 1], verts[i]
+            edge = (v1, v2) if v1 < v2 else (v2, v1)
+            edge_count[edge] = edge_count.get(edge, 0) + 1
+    return len(used) == vert_num and all(n == 2 for n in edge_count.values())
+
+
+# 是否存在距离小于dist的顶点
+def has_near_doubles(verts, dist):
+    # type: (list[Vector], float) -> bool
+    grid = {}
+    for co in verts:
+        cell = (int(co.x // dist), int(co.y // dist), int(co.z // dist))
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    for co2 in grid.get((cell[0] + dx, cell[1] + dy, cell[2] + dz), ()):
+                        if (co - co2).length <= dist:
+                            return True
+        grid.setdefault(cell, []).append(co)
+    return False
+
+
+# 批量写入扇区网格和面属性
+def build_sector_mesh(sec_mesh, verts, faces):
+    # type: (bpy.types.Mesh, list[Vector], list[dict[str, Any]]) -> None
+    sec_mesh.from_pydata(verts, [], [face["verts"] for face in faces])
+    for key, attr_type in FACE_LAYERS.items():
+        attr = sec_mesh.attributes.new(f"amagate_{key}", attr_type, "FACE")
+        attr.data.foreach_set("value", [face[key] for face in faces])  # type: ignore
+    sec_mesh.polygons.foreach_set(
+        "material_index", [face["material_index"] for face in faces]
+    )
+    sec_mesh.update()
+
+
+# 用面记录创建bmesh，用于需要切割或修复的扇区
+def build_sector_bmesh(verts, faces):
+    # type: (list[Vector], list[dict[str, Any]]) -> tuple[bmesh.types.BMesh, dict[str, Any], list[bmesh.types.BMFace]]
+    sec_bm = bmesh.new()
+    layers = {
+        key: (
+            sec_bm.faces.layers.int if attr_type == "INT" else sec_bm.faces.layers.float
+        ).new(f"amagate_{key}")
+        for key, attr_type in FACE_LAYERS.items()
+    }
+    bm_verts = [sec_bm.verts.new(co) for co in verts]
+    bm_faces = []
+    for face in faces:
+        bm_face = sec_bm.faces.new([bm_verts[i] for i in face["verts"]])
+        bm_face.material_index = face["material_index"]
+        for key, layer in layers.items():
+            bm_face[layer] = face[key]  # type: ignore
+        bm_faces.append(bm_face)
+    return sec_bm, layers, bm_faces
+
+
+# 转换Blade坐标 (毫米, x,-z,y) 到Blender坐标
+def to_blender(co, scale=1.0):
+    vec = Vector(co) / scale if scale != 1.0 else Vector(co)
+    vec.yz = vec.z, -vec.y
+    return vec
+
+
+# 切线平面转换为 (plane_no, plane_co)
+def to_tangent_data(tangents):
+    tangent_data = []
+    for no, dist in tangents:
+        plane_no = to_blender(no)
+        plane_co = plane_no * -(dist / 1000)
+        tangent_data.append((plane_no, plane_co))
+    return tangent_data
+
+
 # 导入地图
 def import_map(bw_file):
-    scene = bpy.context.scene
-    scene_data = scene.amagate_data
-    # 全局数据索引
-    global_vertex_count = 0
-    global_vertex_map = {}  # {global_index: tuple(co)}
-    global_atmo_map = {}
-    global_texture_map = {}
-    atmos_name_len = []
-    #
-    abnormal_sec = []
-    fix_sec = []
-    #
-    v_factor = 0.86264  # 明度系数
-    #
-    x_axis = Vector((1, 0, 0))
-    y_axis = Vector((0, 1, 0))
-    z_axis = Vector((0, 0, 1))
-    #
-    context = bpy.context
-    #
-    wm = context.window_manager
+    level = L3D_bwparse.parse_bw(bw_file)
+    wm = bpy.context.window_manager
     wm.progress_begin(0, 1)  # 初始化进度条
-    with open(bw_file, "rb") as f:
-        # 创建大气
-        atmo_num = unpack("<I", f)[0]
-        for i in range(atmo_num):
-            name_len = unpack("<I", f)[0]
-            name = unpack(f"{name_len}s", f)
-            rgb = unpack("<BBB", f)
-            a = unpack("<f", f)[0]
-            if name.startswith("Metadata:"):
-                continue
+    for label, i, total in import_map_steps(level):
+        wm.progress_update(i / total)
+    wm.progress_end()
+    return True
 
-            item = OP_L3D.OT_Scene_Atmo_Add.add(context)
-            item["_item_name"] = name
-            item["_color"] = (*[i / 255 for i in rgb], a)
-            global_atmo_map[name] = item.id
-            atmos_name_len.append(name_len)
-
-        # 全局顶点映射
-        vertex_num = unpack("<I", f)[0]
-        for i in range(vertex_num):
-            vert = Vector(unpack("<ddd", f)) / 1000
-            vert.yz = vert.z, -vert.y
-            global_vertex_map[global_vertex_count] = vert
-            global_vertex_count += 1
-
-        # 扇区
-        sec_total = unpack("<I", f)[0]
-        scene_data["SectorManage"]["max_id"] = sec_total
-        #
-        start_time = time.time()
-        bar_length = 20  # 进度条长度
-        for sector_id in range(1, sec_total + 1):
-            # 进度条
-            i = sector_id
-            percent = i / sec_total
-            wm.progress_update(percent)
-            filled = int(bar_length * percent)
-            bar = ("█" * filled).ljust(bar_length, "-")
-            print(
-                f"\rSector Importing: |{bar}| {percent*100:.1f}% | {i} of {sec_total}",
-                end="",
-                flush=True,
-            )
-            #
-            sec_mesh = bpy.data.meshes.new(f"Sector{sector_id}")
-            sec = bpy.data.objects.new(
-                f"Sector{sector_id}", sec_mesh
-            )  # type: Object # type: ignore
-            sec.amagate_data.set_sector_data()
-            sec_data = sec.amagate_data.get_sector_data()
-            sec_data.id = sector_id
-            sec_vertex_map = {}
 
-            #
-            hole_split_list = []
-            flat_split_list = []
-            need_fix = False
-            #
-            sec_bm = bmesh.new()
-            layers = {
-                "connected": sec_bm.faces.layers.int.new("amagate_connected"),
-                "flag": sec_bm.faces.layers.int.new("amagate_flag"),
-                "flat_light": sec_bm.faces.layers.int.new("amagate_flat_light"),
-                "tex_id": sec_bm.faces.layers.int.new("amagate_tex_id"),
-                "tex_xpos": sec_bm.faces.layers.float.new("amagate_tex_xpos"),
-                "tex_ypos": sec_bm.faces.layers.float.new("amagate_tex_ypos"),
-                "tex_angle": sec_bm.faces.layers.float.new("amagate_tex_angle"),
-                "tex_xzoom": sec_bm.faces.layers.float.new("amagate_tex_xzoom"),
-                "tex_yzoom": sec_bm.faces.layers.float.new("amagate_tex_yzoom"),
-            }
-            # 大气
-            name_len = unpack("<I", f)[0]
-            atmo_name = unpack(f"{name_len}s", f)
-
-            # 环境光
-            rgb = unpack("<BBB", f)
-            v = unpack("<f", f)[0]
-            precision = unpack("<f", f)[0]
-            ambient_color = Color(i / 255 for i in rgb)
-            ambient_color.v = v / v_factor
-            # 跳过 (0,0,0) unknown1 = unpack("<ddd", f)
-            f.seek(24, 1)
-            # 跳过12个字节 (b"\xCD"*8, 0)
-            f.seek(12, 1)
-
-            # 平面光
-            rgb = unpack("<BBB", f)
-            v = unpack("<f", f)[0]
-            precision = unpack("<f", f)[0]
-            # 跳过 (0,0,0) unknown1 = unpack("<ddd", f)
-            f.seek(24, 1)
-            # 跳过12个字节 (b"\xCD"*8, 0)
-            f.seek(12, 1)
-            flat_vector = Vector(unpack("<ddd", f))
-            flat_vector.yz = flat_vector.z, -flat_vector.y
-            flat_color = Color(i / 255 for i in rgb)
-            flat_color.v = v / v_factor
-
-            # 读取面
-            face_num = unpack("<I", f)[0]
-            for i in range(face_num):
-                face = None  # type: bmesh.types.BMFace # type: ignore
-                # 面类型
-                face_type = unpack("<I", f)[0]
-                # 法向
-                normal = Vector(unpack("<ddd", f))
-                normal.yz = normal.z, -normal.y
-                # 距离
-                distance = unpack("<d", f)[0]
-                # if sector_id == 2048:
-                #     logger.debug(f"normal: {normal}, face_type: {face_type}")
-                # edges_dict = {}
-
-                # 完全连接或天空面的情况
-                if face_type in (7002, 7005):
-                    vertex_num = unpack("<I", f)[0]
-                    verts_list = []
-                    for i in range(vertex_num):
-                        verts_idx = unpack("<I", f)[0]
-                        vert = sec_vertex_map.get(verts_idx)
-                        if vert is None:
-                            co1 = global_vertex_map[verts_idx]
-                            # 是否在现有边内部
-                            # for dir2, len2, vert, edge in edges_dict.values():
-                            #     dir1 = (co1 - vert.co)
-                            #     len1 = dir1.length
-                            #     dir1.normalize()
-                            #     dot = dir1.dot(dir2)
-                            #     # 共线
-                            #     if abs(dot) > epsilon2:
-                            #         # 在边内
-                            #         if len1 < len2 and dot > epsilon2:
-                            #             new_edge, new_vert = bmesh.utils.edge_split(edge, vert, 0.5)
-                            #             new_vert.co = co1
-                            #             vert = new_vert
-                            #             # bmesh.ops.subdivide_edges
-                            #         # 在边外
-                            #         else:
-                            #             vert = sec_bm.verts.new(co1)
-                            #         break
-                            # 如果没有发生break，则创建新的顶点
-                            vert = sec_bm.verts.new(co1)
-                            sec_vertex_map[verts_idx] = vert
-                        #
-                        verts_list.append(vert)
-                    face = sec_bm.faces.new(verts_list)
-                    # for edge in face.edges:
-                    #     edges_dict.setdefault(edge, ((edge.verts[1].co - edge.verts[0].co).normalized(), edge.calc_length(), edge.verts[0], edge))
-                    # sec_bm.to_mesh(sec_mesh)
-                    # 跳过天空面
-                    if face_type == 7005:
-                        tex_id = -1
-                        dot = normal.dot(z_axis)
-                        # 判断纹理类型
-                        if dot > epsilon:
-                            tex_type = "Floor"
-                        elif dot < -epsilon:
-                            tex_type = "Ceiling"
-                        else:
-                            tex_type = "Wall"
-
-                        # 设置扇区预设纹理
-                        tex_prop = sec_data.textures.get(tex_type)
-                        if not tex_prop:
-                            tex_prop = sec_data.textures.add()
-                            tex_prop.target = "Sector"
-                            tex_prop.name = tex_type
-                            tex_prop["id"] = tex_id
-                            tex_prop["xpos"] = 0
-                            tex_prop["ypos"] = 0
-                            tex_prop["angle"] = 0
-                            tex_prop["xzoom"] = 20
-                            tex_prop["yzoom"] = 20
-                        else:
-                            tex_type = "Custom"
-
-                        img = scene_data.ensure_null_tex  # type: Image
-                        img_data = img.amagate_data
-                        slot_index = sec_mesh.materials.find(img_data.mat_obj.name)
-                        if slot_index == -1:
-                            sec_mesh.materials.append(img_data.mat_obj)
-                            slot_index = sec_mesh.materials.find(img_data.mat_obj.name)
-                        face[layers["flag"]] = L3D_data.FACE_FLAG[tex_type]
-                        face.material_index = slot_index
-                        face[layers["tex_id"]] = tex_id
-                        face[layers["tex_xpos"]] = 0
-                        face[layers["tex_ypos"]] = 0
-                        face[layers["tex_angle"]] = 0
-                        face[layers["tex_xzoom"]] = 20
-                        face[layers["tex_yzoom"]] = 20
-                        continue
-                    # 设置连接面
-                    sec_data.connect_num += 1
-                    conn_sid = unpack("<I", f)[0] + 1
-                    face[layers["connected"]] = conn_sid
-
-                ## 跳过固定标识 (3,0)
-                f.seek(8, 1)
-
-                # 解包纹理数据
-                (
-                    tex_type,
-                    slot_index,
-                    tex_id,
-                    tex_xpos,
-                    tex_ypos,
-                    tex_angle,
-                    tex_xzoom,
-                    tex_yzoom,
-                ) = unpack_texture(sec_mesh, sec_data, normal, f, global_texture_map)
+# 创建大气，返回 {大气名称: 大气ID}
+def create_atmospheres(context, atmospheres):
+    # type: (Context, list[tuple[str, tuple, float]]) -> dict[str, int]
+    atmo_map = {}
+    for name, rgb, a in atmospheres:
+        if name.startswith("Metadata:"):
+            continue
 
-                #
-                if face_type == 7002:
-                    face[layers["flag"]] = L3D_data.FACE_FLAG[tex_type]
-                    face.material_index = slot_index
-                    face[layers["tex_id"]] = tex_id
-                    face[layers["tex_xpos"]] = tex_xpos
-                    face[layers["tex_ypos"]] = tex_ypos
-                    face[layers["tex_angle"]] = tex_angle
-                    face[layers["tex_xzoom"]] = tex_xzoom
-                    face[layers["tex_yzoom"]] = tex_yzoom
-
-                # 跳过 b"\x00" * 8
-                f.seek(8, 1)
+        item = OP_L3D.OT_Scene_Atmo_Add.add(context)
+        item["_item_name"] = name
+        item["_color"] = (*[i / 255 for i in rgb], a)
+        atmo_map[name] = item.id
+    return atmo_map
 
-                #
-                if face_type == 7002:
-                    continue
 
-                # 非7002/7005的情况
-                vertex_num = unpack("<I", f)[0]
-                verts_list = []
-                for i in range(vertex_num):
-                    verts_idx = unpack("<I", f)[0]
-                    vert = sec_vertex_map.get(verts_idx)
-                    if vert is None:
-                        vert = sec_bm.verts.new(global_vertex_map[verts_idx])
-                        sec_vertex_map[verts_idx] = vert
-                    verts_list.append(vert)
-                # XXX 错误的面，顶点数量小于3
-                if len(verts_list) > 2:
-                    face = sec_bm.faces.new(verts_list)
-                    # sec_bm.to_mesh(sec_mesh)
-                    #
-                    face[layers["flag"]] = L3D_data.FACE_FLAG[tex_type]
-                    face.material_index = slot_index
-                    face[layers["tex_id"]] = tex_id
-                    face[layers["tex_xpos"]] = tex_xpos
-                    face[layers["tex_ypos"]] = tex_ypos
-                    face[layers["tex_angle"]] = tex_angle
-                    face[layers["tex_xzoom"]] = tex_xzoom
-                    face[layers["tex_yzoom"]] = tex_yzoom
-                else:
-                    logger.error(
-                        f"Invalid face: type {face_type}, vertex_num {[v.co for v in verts_list]}"
-                    )
-                # 切割面
-                if face_type == 7003:
-                    vertex_sub_num = unpack("<I", f)[0]
-                    f.seek(4 * vertex_sub_num, 1)
-                    conn_sid = unpack("<I", f)[0] + 1
-
-                    tangent_data = []
-                    tangent_num = unpack("<I", f)[0]
-                    for i in range(tangent_num):
-                        plane_no = Vector(unpack("<ddd", f))
-                        plane_no.yz = plane_no.z, -plane_no.y
-                        dist = unpack("<d", f)[0] / 1000
-                        plane_co = plane_no * -dist
-                        tangent_data.append((plane_no, plane_co))
-
-                    # inner_face = hole_split(sec_bm, face, tangent_data)
-                    # inner_face[layers["connected"]] = conn_sid
-                    if face:
-                        hole_split_list.append((face, tangent_data, conn_sid))
-                        #
-                        sec_data.connect_num += 1
-                #
-                elif face_type == 7004:
-                    holes_data = []
-                    cut_data = []
-                    cut_num = 0
-                    block_mark_num = 0
-                    hole_num = unpack("<I", f)[0]
-                    for i in range(hole_num):
-                        hole_vx_num = unpack("<I", f)[0]
-                        f.seek(4 * hole_vx_num, 1)
-                        conn_sid = unpack("<I", f)[0] + 1
-
-                        tangent_data = []
-                        tangent_num = unpack("<I", f)[0]
-                        for i in range(tangent_num):
-                            plane_no = Vector(unpack("<ddd", f))
-                            plane_no.yz = plane_no.z, -plane_no.y
-                            dist = unpack("<d", f)[0] / 1000
-                            plane_co = plane_no * -dist
-                            tangent_data.append((plane_no, plane_co))
-                        holes_data.append((tangent_data, conn_sid))
-                    #
-                    if face:
-                        sec_data.connect_num += hole_num
-                    #
-                    block_mark = unpack("<I", f)[0]
-                    if block_mark in (8001, 8002):
-                        block_mark_num += 1
-                    # while True:
-                    while cut_num < block_mark_num:
-                        mark = unpack("<I", f)[0]
-                        if mark in (8001, 8002):
-                            block_mark_num += 1
-                        elif mark == 8003:
-                            tangent_data = conn_sid = None
-                            # holes_idx_data = []
-                            holes_idx_num = unpack("<I", f)[0]
-                            for i in range(holes_idx_num):
-                                hole_idx = unpack("<I", f)[0]
-                                tangent_num = unpack("<I", f)[0]
-                                tangent_data = [
-                                    holes_data[hole_idx][0][unpack("<I", f)[0]]
-                                    for i in range(tangent_num)
-                                ]
-                                conn_sid = holes_data[hole_idx][1]
-                                # holes_idx_data.append((tangent_data, conn_sid))
-                            cut_data.append((mark, tangent_data, conn_sid))
-                            if holes_idx_num > 1:
-                                # 添加到异常扇区
-                                abnormal_sec.append(sec)
-                        # elif mark in (7001, 7002, 7003, 7004, 7005):
-                        #     f.seek(-4, 1)  # back 4
-                        #     break
-                        # 切割数据
-                        else:
-                            # mark2 = unpack("I", f)[0]
-                            # f.seek(-4, 1)
-                            # if mark2 in (15001, 15002):
-                            #     f.seek(-4, 1)  # back 8
-                            #     break
-                            # if mark in atmos_name_len:
-                            #     name = unpack(f"{mark}s", f)
-                            #     f.seek(-mark, 1)
-                            #     if name in global_atmo_map:
-                            #         f.seek(-4, 1)
-                            #         break
-
-                            f.seek(-4, 1)
-                            plane_no = Vector(unpack("<ddd", f))
-                            plane_no.yz = plane_no.z, -plane_no.y
-                            dist = unpack("<d", f)[0] / 1000
-                            plane_co = plane_no * -dist
-                            # 检查是否有纹理
-                            flag = unpack("<II", f)
-                            if tuple(flag) == (3, 0):
-                                tex_data = unpack_texture(
-                                    sec_mesh, sec_data, normal, f, global_texture_map
-                                )
-                                # 跳过 b"\x00" * 8
-                                f.seek(8, 1)
-                            else:
-                                tex_data = None
-                                f.seek(-8, 1)
-                            cut_data.append(("cut", plane_no, plane_co, tex_data))
-                            #
-                            cut_num += 1
-                    # 退化为7003
-                    if cut_num == 0 and block_mark == 8003:
-                        holes_idx_num = unpack("<I", f)[0]
-                        for i in range(holes_idx_num):
-                            hole_idx = unpack("<I", f)[0]
-                            tangent_num = unpack("<I", f)[0]
-                            tangent_data = [
-                                holes_data[hole_idx][0][unpack("<I", f)[0]]
-                                for i in range(tangent_num)
-                            ]
-                            conn_sid = holes_data[hole_idx][1]
-                            # inner_face = hole_split(sec_bm, face, tangent_data)
-                            # inner_face[layers["connected"]] = holes_data[hole_idx][1]
-                        if holes_idx_num != 0 and face:
-                            hole_split_list.append((face, tangent_data, conn_sid))
-                            sec_data.connect_num += 1
-                    # 切割
-                    elif face:
-                        flat_split_list.append((face, cut_data))
-                        # flat_split(sec_bm, face, cut_data, layers)
-
-            # if sector_id == 1447:
-            #     logger.debug(flat_split_list)
-
-            # 处理非连续边
-            edges_list = []  # type: list[tuple[Vector, float, bmesh.types.BMEdge]]
-            for e in sec_bm.edges:
-                if len(e.link_faces) == 1:
-                    vector = e.verts[1].co - e.verts[0].co
-                    edges_list.append((vector.normalized(), vector.length, e))
-            need_fix = len(edges_list) > 0
-            # logger.debug(f"edges_list: {len(edges_list)}")
-            #
-            while edges_list:
-                dir1, len1, e1 = edges_list.pop()
-                # logger.debug(f"dir: {dir1.to_tuple()}, len: {len1}")
-                for idx, (dir2, len2, e2) in enumerate(edges_list):
-                    if abs(dir1.dot(dir2)) < epsilon2:
-                        continue
-
-                    vert = e2.verts[1] if e2.verts[0] in e1.verts else e2.verts[0]
-                    vector = vert.co - e1.verts[0].co
-                    # logger.debug(f"intersection: {set(e2.verts).intersection(set(e1.verts))}")
-                    direction = vector.normalized()
-                    dot = dir1.dot(direction)
-                    # 不共线，跳过
-                    if abs(dot) < epsilon2:
-                        continue
-
-                    edges_list.pop(idx)
-                    edges = ((dir1, len1, e1), (dir2, len2, e2))
-                    for i in (0, 1):
-                        dir1, len1, e1 = edges[i]
-                        dir2, len2, e2 = edges[1 - i]
-                        for vert in e2.verts:
-                            if vert in e1.verts:
-                                continue
-
-                            vector = vert.co - e1.verts[0].co
-                            direction = vector.normalized()
-                            dot = dir1.dot(direction)
-                            # 点不在e1上，跳过
-                            if dir1.dot(direction) < epsilon2 or vector.length > len1:
-                                continue
-                            #
-                            new_edge, new_vert = bmesh.utils.edge_split(
-                                e1, e1.verts[0], 0.5
-                            )
-                            new_vert.co = vert.co
-                    # 存在边内顶点
-                    break
+def create_external_light(context, light):
+    # type: (Context, dict[str, Any]) -> Any
+    v_factor = 0.86264  # 明度系数
+    ext_color = Color(i / 255 for i in light["rgb"])
+    ext_color.v = light["v"] / v_factor
+    item = OP_L3D.OT_Scene_External_Add.add(context)
+    item.color = ext_color
+    item.vector = to_blender(light["vector"])
+    item.data.shadow_maximum_resolution = light["precision"]
+    return item
+
+
+def create_bulb(context, sec, light):
+    # type: (Context, Object, dict[str, Any]) -> Any
+    item = OP_SECTOR.OT_Bulb_Add.add(context, sec)
+    item.light_obj.data.color = [i / 255 for i in light["rgb"]]
+    item.light_obj.matrix_world.translation = to_blender(light["pos"], 1000)
+    item.strength = light["strength"]
+    item.precision = light["precision"]
+    item.update_location(context)
+    return item
+
+
+# 导入扇区时共享的全局数据
+class SectorBuilder:
+    def __init__(self, transaction, atmo_map, texture_map, vertex_map):
+        # type: (L3D_data.BulkTransaction, dict[str, int], dict[str, Any], Any) -> None
+        self.scene_data = bpy.context.scene.amagate_data
+        self.transaction = transaction
+        self.atmo_map = atmo_map  # {大气名称: 大气ID}
+        self.texture_map = texture_map  # {纹理名称: 图像数据}
+        self.vertex_map = vertex_map  # 全局顶点索引 -> Blender坐标
+        self.abnormal_sec = []  # type: list[Object]
+        self.fix_sec = []  # type: list[tuple[Object, list, list]]
+        self.sec_coll = L3D_data.ensure_collection(L3D_data.S_COLL)
+
+
+# 构建单个扇区，需要修复的扇区加入builder.fix_sec
+def build_sector(builder, sector_id, sector):
+    # type: (SectorBuilder, int, dict[str, Any]) -> Object
+    scene_data = builder.scene_data
+    transaction = builder.transaction
+    global_atmo_map = builder.atmo_map
+    global_texture_map = builder.texture_map
+    global_vertex_map = builder.vertex_map
+    abnormal_sec = builder.abnormal_sec
+    fix_sec = builder.fix_sec
+    sec_coll = builder.sec_coll
+    #
+    v_factor = 0.86264  # 明度系数
+    #
+    z_axis = Vector((0, 0, 1))
+    #
+    sec_mesh = bpy.data.meshes.new(f"Sector{sector_id}")
+    sec = bpy.data.objects.new(
+        f"Sector{sector_id}", sec_mesh
+    )  # type: Object # type: ignore
+    sec.amagate_data.set_sector_data()
+    sec_data = sec.amagate_data.get_sector_data()
+    sec_data.id = sector_id
+    sec_vertex_map = {}  # {global_index: local_index}
+    sec_verts = []  # type: list[Vector]
+    sec_faces = []  # type: list[dict[str, Any]]
 
-            # 按距离合并顶点
-            bmesh.ops.remove_doubles(sec_bm, verts=sec_bm.verts, dist=0.0001)  # type: ignore
-            mesh_tmp = bpy.data.meshes.new("")
-            sec_bm.to_mesh(mesh_tmp)
-            bpy.data.meshes.remove(mesh_tmp)
-            # 切割
-            if not need_fix:
-                # if sector_id == 6:
-                #     bm_mesh = bpy.data.meshes.new(f"AG.split")
-                #     sec_bm.to_mesh(bm_mesh)
-                #     bm_obj = bpy.data.objects.new(f"AG.split", bm_mesh)
-                #     data.link2coll(bm_obj, bpy.context.scene.collection)
-                for face, tangent_data, conn_sid in hole_split_list:
-                    # if sector_id == 6:
-                    #     logger.debug(f"face: {face.index}, tangent_data: {tangent_data}")
-                    inner_face = hole_split(sec_bm, face, tangent_data, sector_id)
-                    if inner_face is not None:
-                        inner_face[layers["connected"]] = conn_sid
-                for face, cut_data in flat_split_list:
-                    flat_split(sec_bm, face, cut_data, layers, sector_id)
-                #
-                sec_bm.to_mesh(sec_mesh)
-                sec_bm.free()
-                # 有限融并
-                ag_utils.dissolve_limit_sectors([sec], check_convex=False)
-                sec_data.is_2d_sphere = ag_utils.is_2d_sphere(sec)
-                sec_data.is_convex = ag_utils.is_convex(sec)
-            else:
-                sec_bm.to_mesh(sec_mesh)
-                for idx, (face, tangent_data, conn_sid) in enumerate(hole_split_list):
-                    hole_split_list[idx] = (face.index, tangent_data, conn_sid)
-                for idx, (face, cut_data) in enumerate(flat_split_list):
-                    flat_split_list[idx] = (face.index, cut_data)
+    #
+    hole_split_list = []
+    flat_split_list = []
+    need_fix = False
+    #
+    # 大气
+    atmo_name = sector["atmo"]
+    # 环境光
+    rgb, v, precision = sector["ambient"]
+    ambient_color = Color(i / 255 for i in rgb)
+    ambient_color.v = v / v_factor
+    # 平面光
+    rgb, v, precision, flat_vector = sector["flat"]
+    flat_vector = to_blender(flat_vector)
+    flat_color = Color(i / 255 for i in rgb)
+    flat_color.v = v / v_factor
+
+    # 读取面
+    for face_rec in sector["faces"]:
+        face = None  # type: bmesh.types.BMFace # type: ignore
+        # 面类型
+        face_type = face_rec["type"]
+        # 法向
+        normal = to_blender(face_rec["normal"])
+
+        # 完全连接或天空面的情况
+        if face_type in (7002, 7005):
+            verts_list = []
+            for verts_idx in face_rec["verts"]:
+                vert = sec_vertex_map.get(verts_idx)
+                if vert is None:
+                    vert = sec_vertex_map[verts_idx] = len(sec_verts)
+                    sec_verts.append(global_vertex_map[verts_idx])
                 #
-                fix_sec.append((sec, hole_split_list, flat_split_list))
-                sec_bm.free()
+                verts_list.append(vert)
+            face = new_face_record(sec_faces, verts_list)
+            # 跳过天空面
+            if face_type == 7005:
+                tex_id = -1
+                dot = normal.dot(z_axis)
+                # 判断纹理类型
+                if dot > epsilon:
+                    tex_type = "Floor"
+                elif dot < -epsilon:
+                    tex_type = "Ceiling"
+                else:
+                    tex_type = "Wall"
 
-            #
-            for tex_type in ("Floor", "Ceiling", "Wall"):
+                # 设置扇区预设纹理
                 tex_prop = sec_data.textures.get(tex_type)
                 if not tex_prop:
                     tex_prop = sec_data.textures.add()
                     tex_prop.target = "Sector"
                     tex_prop.name = tex_type
-                    tex_prop["id"] = -1
+                    tex_prop["id"] = tex_id
                     tex_prop["xpos"] = 0
                     tex_prop["ypos"] = 0
                     tex_prop["angle"] = 0
                     tex_prop["xzoom"] = 20
                     tex_prop["yzoom"] = 20
-            ############################
-            # sec_mesh.clear_geometry()
-            # vertices = [v.co for v in sec_bm.verts]
-            # center = sum(vertices, Vector()) / len(vertices)
-            # sec.location = center
-
-            # 添加修改器
-            modifier = sec.modifiers.new("", type="NODES")
-            modifier.node_group = scene_data.sec_node  # type: ignore
-            # 添加到扇区管理字典
-            scene_data["SectorManage"]["sectors"][str(sector_id)] = {
-                "obj": sec,
-                "atmo_id": 0,
-                "external_id": 0,
-            }
-            #
-            sec_data.atmo_id = global_atmo_map[atmo_name]
-            sec_data.ambient_color = ambient_color
-            sec_data.flat_light.color = flat_color
-            sec.amagate_data.is_sector = True
+                else:
+                    tex_type = "Custom"
+
+                img = scene_data.ensure_null_tex  # type: Image
+                img_data = img.amagate_data
+                slot_index = sec_mesh.materials.find(img_data.mat_obj.name)
+                if slot_index == -1:
+                    sec_mesh.materials.append(img_data.mat_obj)
+                    slot_index = sec_mesh.materials.find(img_data.mat_obj.name)
+                face["flag"] = L3D_data.FACE_FLAG[tex_type]
+                face["material_index"] = slot_index
+                face["tex_id"] = tex_id
+                face["tex_xpos"] = 0
+                face["tex_ypos"] = 0
+                face["tex_angle"] = 0
+                face["tex_xzoom"] = 20
+                face["tex_yzoom"] = 20
+                continue
+            # 设置连接面
+            sec_data.connect_num += 1
+            face["connected"] = face_rec["conn"]
+
+        # 解包纹理数据
+        (
+            tex_type,
+            slot_index,
+            tex_id,
+            tex_xpos,
+            tex_ypos,
+            tex_angle,
+            tex_xzoom,
+            tex_yzoom,
+        ) = unpack_texture(
+            sec_mesh, sec_data, normal, face_rec["tex"], global_texture_map
+        )
+
+        #
+        if face_type == 7002:
+            face["flag"] = L3D_data.FACE_FLAG[tex_type]
+            face["material_index"] = slot_index
+            face["tex_id"] = tex_id
+            face["tex_xpos"] = tex_xpos
+            face["tex_ypos"] = tex_ypos
+            face["tex_angle"] = tex_angle
+            face["tex_xzoom"] = tex_xzoom
+            face["tex_yzoom"] = tex_yzoom
+            continue
+
+        # 非7002/7005的情况
+        verts_list = []
+        for verts_idx in face_rec["verts"]:
+            vert = sec_vertex_map.get(verts_idx)
+            if vert is None:
+                vert = sec_vertex_map[verts_idx] = len(sec_verts)
+                sec_verts.append(global_vertex_map[verts_idx])
+            verts_list.append(vert)
+        # XXX 错误的面，顶点数量小于3
+        if len(verts_list) > 2:
+            face = new_face_record(sec_faces, verts_list)
             #
-            sec_coll = L3D_data.ensure_collection(L3D_data.S_COLL)
-            if need_fix:
-                pass
-            elif sec in abnormal_sec:
-                coll_name = "Abnormal"
-                coll = bpy.data.collections.get(coll_name)
-                if not coll:
-                    coll = bpy.data.collections.new(coll_name)
-                    sec_coll.children.link(coll)
-                data.link2coll(sec, coll)
-            else:
-                data.link2coll(sec, sec_coll)
-            # 平面光设置
-            if flat_vector.length != 0:
-                dot_list = [
-                    (f.index, f.normal.dot(flat_vector)) for f in sec_mesh.polygons
-                ]
-                dot_list.sort(key=lambda x: x[1])
-                sec_mesh.attributes["amagate_flat_light"].data[dot_list[0][0]].value = 1  # type: ignore
-
-            # 耗时操作
-            # sec.select_set(True)
-            # bpy.ops.object.origin_set(type='ORIGIN_GEOMETRY', center='MEDIAN')
-            # sec.select_set(False)
-
-        # 修复扇区
-        for sec, hole_split_list, flat_split_list in fix_sec:
-            # sec_data = sec.amagate_data.get_sector_data()
-            sec_mesh = sec.data  # type: bpy.types.Mesh  # type: ignore
-            sec_bm = bmesh.new()
-            sec_bm.from_mesh(sec_mesh)
-            layers = {
-                "connected": sec_bm.faces.layers.int.get("amagate_connected"),
-                "flag": sec_bm.faces.layers.int.get("amagate_flag"),
-                "flat_light": sec_bm.faces.layers.int.get("amagate_flat_light"),
-                "tex_id": sec_bm.faces.layers.int.get("amagate_tex_id"),
-                "tex_xpos": sec_bm.faces.layers.float.get("amagate_tex_xpos"),
-                "tex_ypos": sec_bm.faces.layers.float.get("amagate_tex_ypos"),
-                "tex_angle": sec_bm.faces.layers.float.get("amagate_tex_angle"),
-                "tex_xzoom": sec_bm.faces.layers.float.get("amagate_tex_xzoom"),
-                "tex_yzoom": sec_bm.faces.layers.float.get("amagate_tex_yzoom"),
-            }
+            face["flag"] = L3D_data.FACE_FLAG[tex_type]
+            face["material_index"] = slot_index
+            face["tex_id"] = tex_id
+            face["tex_xpos"] = tex_xpos
+            face["tex_ypos"] = tex_ypos
+            face["tex_angle"] = tex_angle
+            face["tex_xzoom"] = tex_xzoom
+            face["tex_yzoom"] = tex_yzoom
+        else:
+            logger.error(
+                f"Invalid face: type {face_type}, vertex_num {[sec_verts[v] for v in verts_list]}"
+            )
+        # 切割面
+        if face_type == 7003:
+            tangents, conn_sid = face_rec["hole"]
+            if face:
+                hole_split_list.append((face, to_tangent_data(tangents), conn_sid))
+                #
+                sec_data.connect_num += 1
+        #
+        elif face_type == 7004:
+            holes_data = face_rec["holes"]
+            if face:
+                sec_data.connect_num += len(holes_data)
+            # 同一个洞的切线平面共享转换结果
+            tangent_map = {}
+
+            def convert(tangents):
+                if tangents is None:
+                    return None
+                ret = []
+                for t in tangents:
+                    key = id(t)
+                    if key not in tangent_map:
+                        tangent_map[key] = to_tangent_data([t])[0]
+                    ret.append(tangent_map[key])
+                return ret
+
+            cut_data = []
+            for item in face_rec["cut_data"]:
+                if item[0] == 8003:
+                    _, tangents, conn_sid, holes_idx_num = item
+                    cut_data.append((8003, convert(tangents), conn_sid))
+                    if holes_idx_num > 1:
+                        # 添加到异常扇区
+                        abnormal_sec.append(sec)
+                else:
+                    _, no, dist, tex = item
+                    plane_no = to_blender(no)
+                    plane_co = plane_no * -(dist / 1000)
+                    tex_data = None
+                    if tex is not None:
+                        tex_data = unpack_texture(
+                            sec_mesh, sec_data, normal, tex, global_texture_map
+                        )
+                    cut_data.append(("cut", plane_no, plane_co, tex_data))
+            # 退化为7003
+            hole_ref = face_rec.get("hole_ref")
+            if hole_ref is not None:
+                tangents, conn_sid, holes_idx_num = hole_ref
+                if holes_idx_num != 0 and face:
+                    hole_split_list.append((face, convert(tangents), conn_sid))
+                    sec_data.connect_num += 1
             # 切割
-            for idx in range(len(hole_split_list) - 1, -1, -1):
-                face_idx, tangent_data, conn_sid = hole_split_list[idx]
-                if len(tangent_data) == 1:
+            elif face:
+                flat_split_list.append((face, cut_data))
+
+    # 无需切割和修复的扇区直接批量写入网格，否则使用bmesh
+    if (
+        hole_split_list
+        or flat_split_list
+        or not is_closed_mesh(sec_faces, len(sec_verts))
+        or has_near_doubles(sec_verts, 0.0001)
+    ):
+        sec_bm, layers, bm_faces = build_sector_bmesh(sec_verts, sec_faces)
+        hole_split_list = [
+            (bm_faces[face["index"]], tangent_data, conn_sid)
+            for face, tangent_data, conn_sid in hole_split_list
+        ]
+        flat_split_list = [
+            (bm_faces[face["index"]], cut_data) for face, cut_data in flat_split_list
+        ]
+    else:
+        sec_bm = None
+        build_sector_mesh(sec_mesh, sec_verts, sec_faces)
+        # 有限融并
+        ag_utils.dissolve_limit_sectors([sec], check_convex=False)
+        sec_data.is_2d_sphere = ag_utils.is_2d_sphere(sec)
+        sec_data.is_convex = ag_utils.is_convex(sec)
+
+    if sec_bm is not None:
+        # if sector_id == 1447:
+        #     logger.debug(flat_split_list)
+
+        # 处理非连续边
+        edges_list = []  # type: list[tuple[Vector, float, bmesh.types.BMEdge]]
+        for e in sec_bm.edges:
+            if len(e.link_faces) == 1:
+                vector = e.verts[1].co - e.verts[0].co
+                edges_list.append((vector.normalized(), vector.length, e))
+        need_fix = len(edges_list) > 0
+        # logger.debug(f"edges_list: {len(edges_list)}")
+        #
+        while edges_list:
+            dir1, len1, e1 = edges_list.pop()
+            # logger.debug(f"dir: {dir1.to_tuple()}, len: {len1}")
+            for idx, (dir2, len2, e2) in enumerate(edges_list):
+                if abs(dir1.dot(dir2)) < epsilon2:
                     continue
 
-                hole_split_list.pop(idx)
-                sec_bm.faces.ensure_lookup_table()
-                face = sec_bm.faces[face_idx]
-                inner_face = hole_split(sec_bm, face, tangent_data, sector_id)
-                if inner_face is not None:
-                    inner_face[layers["connected"]] = conn_sid
-            for face_idx, cut_data in flat_split_list:
-                sec_bm.faces.ensure_lookup_table()
-                face = sec_bm.faces[face_idx]
-                flat_split(sec_bm, face, cut_data, layers, sector_id)
+                vert = e2.verts[1] if e2.verts[0] in e1.verts else e2.verts[0]
+                vector = vert.co - e1.verts[0].co
+                # logger.debug(f"intersection: {set(e2.verts).intersection(set(e1.verts))}")
+                direction = vector.normalized()
+                dot = dir1.dot(direction)
+                # 不共线，跳过
+                if abs(dot) < epsilon2:
+                    continue
+
+                edges_list.pop(idx)
+                edges = ((dir1, len1, e1), (dir2, len2, e2))
+                for i in (0, 1):
+                    dir1, len1, e1 = edges[i]
+                    dir2, len2, e2 = edges[1 - i]
+                    for vert in e2.verts:
+                        if vert in e1.verts:
+                            continue
+
+                        vector = vert.co - e1.verts[0].co
+                        direction = vector.normalized()
+                        dot = dir1.dot(direction)
+                        # 点不在e1上，跳过
+                        if dir1.dot(direction) < epsilon2 or vector.length > len1:
+                            continue
+                        #
+                        new_edge, new_vert = bmesh.utils.edge_split(
+                            e1, e1.verts[0], 0.5
+                        )
+                        new_vert.co = vert.co
+                # 存在边内顶点
+                break
+
+        # 按距离合并顶点
+        bmesh.ops.remove_doubles(sec_bm, verts=sec_bm.verts, dist=0.0001)  # type: ignore
+        mesh_tmp = bpy.data.meshes.new("")
+        sec_bm.to_mesh(mesh_tmp)
+        bpy.data.meshes.remove(mesh_tmp)
+        # 切割
+        if not need_fix:
+            # if sector_id == 6:
+            #     bm_mesh = bpy.data.meshes.new(f"AG.split")
+            #     sec_bm.to_mesh(bm_mesh)
+            #     bm_obj = bpy.data.objects.new(f"AG.split", bm_mesh)
+            #     data.link2coll(bm_obj, bpy.context.scene.collection)
+            for face, tangent_data, conn_sid in hole_split_list:
+                # if sector_id == 6:
+                #     logger.debug(f"face: {face.index}, tangent_data: {tangent_data}")
+                split_hole_face(face, tangent_data, conn_sid, layers)
+            for face, cut_data in flat_split_list:
+                split_flat_face(face, cut_data, layers)
             #
             sec_bm.to_mesh(sec_mesh)
             sec_bm.free()
             # 有限融并
             ag_utils.dissolve_limit_sectors([sec], check_convex=False)
-        # 顶点匹配连接
-        for sec, hole_split_list, flat_split_list in fix_sec:
-            sec_data = sec.amagate_data.get_sector_data()
-            sec_mesh = sec.data  # type: bpy.types.Mesh  # type: ignore
-            sec_bm = bmesh.new()
-            sec_bm.from_mesh(sec_mesh)
-            layers = {
-                "connected": sec_bm.faces.layers.int.get("amagate_connected"),
-                "flag": sec_bm.faces.layers.int.get("amagate_flag"),
-                "flat_light": sec_bm.faces.layers.int.get("amagate_flat_light"),
-                "tex_id": sec_bm.faces.layers.int.get("amagate_tex_id"),
-                "tex_xpos": sec_bm.faces.layers.float.get("amagate_tex_xpos"),
-                "tex_ypos": sec_bm.faces.layers.float.get("amagate_tex_ypos"),
-                "tex_angle": sec_bm.faces.layers.float.get("amagate_tex_angle"),
-                "tex_xzoom": sec_bm.faces.layers.float.get("amagate_tex_xzoom"),
-                "tex_yzoom": sec_bm.faces.layers.float.get("amagate_tex_yzoom"),
-            }
-            for idx in range(len(hole_split_list) - 1, -1, -1):
-                face_idx, tangent_data, conn_sid = hole_split_list[idx]
-                if len(tangent_data) == 1:
-                    conn_sec = scene_data["SectorManage"]["sectors"][str(conn_sid)][
-                        "obj"
-                    ]
-                    sec_bm.faces.ensure_lookup_table()
-                    face = sec_bm.faces[face_idx]
-                    result = connect_vm(sec_bm, face, sec_data.id, layers, conn_sec)
-                    # logger.debug(f"connect_vm: {result}")
-                    # if result:
-                    #     hole_split_list.pop(idx)
-            #
-            sec_bm.to_mesh(sec_mesh)
-            sec_bm.free()
-            # 有限融并
-            # ag_utils.dissolve_limit_sectors([sec], check_convex=False)
             sec_data.is_2d_sphere = ag_utils.is_2d_sphere(sec)
             sec_data.is_convex = ag_utils.is_convex(sec)
+        else:
+            sec_bm.to_mesh(sec_mesh)
+            for idx, (face, tangent_data, conn_sid) in enumerate(hole_split_list):
+                hole_split_list[idx] = (face.index, tangent_data, conn_sid)
+            for idx, (face, cut_data) in enumerate(flat_split_list):
+                flat_split_list[idx] = (face.index, cut_data)
             #
-            if not sec_data.is_2d_sphere:
-                coll_name = "Need Fix"
-                coll = bpy.data.collections.get(coll_name)
-                if not coll:
-                    coll = bpy.data.collections.new(coll_name)
-                    sec_coll.children.link(coll)
-                data.link2coll(sec, coll)
-            else:
-                data.link2coll(sec, sec_coll)
-
-        # 外部光和灯泡数据
-        light_num = unpack("<I", f)[0]
-        for i in range(light_num):
-            light_type = unpack("<I", f)[0]
-            # 外部光
-            if light_type == 15002:
-                rgb = unpack("<BBB", f)
-                v = unpack("<f", f)[0]
-                precision = unpack("<f", f)[0]
-                # 跳过 (0,0,0, b"\xCD"*8, 0)
-                f.seek(36, 1)
-                ext_vector = Vector(unpack("<ddd", f))
-                ext_vector.yz = ext_vector.z, -ext_vector.y
-                ext_color = Color(i / 255 for i in rgb)
-                ext_color.v = v / v_factor
-                # 创建外部光
-                item = OP_L3D.OT_Scene_External_Add.add(context)
-                item.color = ext_color
-                item.vector = ext_vector
-                item.data.shadow_maximum_resolution = precision
-                # 使用该外部光的扇区
-                sec_num = unpack("<I", f)[0]
-                # logger.debug(f"External light: {sec_num}")
-                for i in range(sec_num):
-                    sid = unpack("<I", f)[0] + 1
-                    sec = scene_data["SectorManage"]["sectors"][str(sid)]["obj"]
-                    sec_data = sec.amagate_data.get_sector_data()
-                    sec_data.external_id = item.id
-            # 灯泡光
-            elif light_type == 15001:
-                rgb = unpack("<BBB", f)
-                rgb = [i / 255 for i in rgb]
-                strength = unpack("<f", f)[0]
-                precision = unpack("<f", f)[0]
-                pos = Vector(unpack("<ddd", f)) / 1000
-                pos.yz = pos.z, -pos.y
-                sid = unpack("<I", f)[0] + 1
-                #
-                sec = scene_data["SectorManage"]["sectors"][str(sid)]["obj"]
+            fix_sec.append((sec, hole_split_list, flat_split_list))
+            sec_bm.free()
+
+    #
+    for tex_type in ("Floor", "Ceiling", "Wall"):
+        tex_prop = sec_data.textures.get(tex_type)
+        if not tex_prop:
+            tex_prop = sec_data.textures.add()
+            tex_prop.target = "Sector"
+            tex_prop.name = tex_type
+            tex_prop["id"] = -1
+            tex_prop["xpos"] = 0
+            tex_prop["ypos"] = 0
+            tex_prop["angle"] = 0
+            tex_prop["xzoom"] = 20
+            tex_prop["yzoom"] = 20
+    ############################
+    # sec_mesh.clear_geometry()
+    # vertices = [v.co for v in sec_bm.verts]
+    # center = sum(vertices, Vector()) / len(vertices)
+    # sec.location = center
+
+    # 添加修改器
+    modifier = sec.modifiers.new("", type="NODES")
+    modifier.node_group = scene_data.sec_node  # type: ignore
+    # 添加到扇区管理字典
+    scene_data["SectorManage"]["sectors"][str(sector_id)] = {
+        "obj": sec,
+        "atmo_id": 0,
+        "external_id": 0,
+    }
+    #
+    sec_data.atmo_id = global_atmo_map[atmo_name]
+    sec_data.ambient_color = ambient_color
+    sec_data.flat_light.color = flat_color
+    sec.amagate_data.is_sector = True
+    #
+    if need_fix:
+        pass
+    elif sec in abnormal_sec:
+        coll_name = "Abnormal"
+        coll = bpy.data.collections.get(coll_name)
+        if not coll:
+            coll = bpy.data.collections.new(coll_name)
+            sec_coll.children.link(coll)
+        transaction.link(sec, coll)
+    else:
+        transaction.link(sec, sec_coll)
+    # 平面光设置
+    if flat_vector.length != 0:
+        dot_list = [
+            (f.index, f.normal.dot(flat_vector)) for f in sec_mesh.polygons
+        ]
+        dot_list.sort(key=lambda x: x[1])
+        sec_mesh.attributes["amagate_flat_light"].data[dot_list[0][0]].value = 1  # type: ignore
+    return sec
+
+
+# 修复扇区，每修复一个扇区产出一次进度
+def fix_sectors_steps(builder):
+    # type: (SectorBuilder) -> Any
+    scene_data = builder.scene_data
+    transaction = builder.transaction
+    sec_coll = builder.sec_coll
+    sectors_dict = scene_data["SectorManage"]["sectors"]
+    fix_sec = builder.fix_sec
+    for i, (sec, hole_split_list, flat_split_list) in enumerate(fix_sec):
+        yield "Sector Fixing", i + 1, len(fix_sec)
+        sec_mesh = sec.data  # type: bpy.types.Mesh  # type: ignore
+        sec_bm = bmesh.new()
+        sec_bm.from_mesh(sec_mesh)
+        layers = {
+            "connected": sec_bm.faces.layers.int.get("amagate_connected"),
+            "flag": sec_bm.faces.layers.int.get("amagate_flag"),
+            "flat_light": sec_bm.faces.layers.int.get("amagate_flat_light"),
+            "tex_id": sec_bm.faces.layers.int.get("amagate_tex_id"),
+            "tex_xpos": sec_bm.faces.layers.float.get("amagate_tex_xpos"),
+            "tex_ypos": sec_bm.faces.layers.float.get("amagate_tex_ypos"),
+            "tex_angle": sec_bm.faces.layers.float.get("amagate_tex_angle"),
+            "tex_xzoom": sec_bm.faces.layers.float.get("amagate_tex_xzoom"),
+            "tex_yzoom": sec_bm.faces.layers.float.get("amagate_tex_yzoom"),
+        }
+        # 切割
+        for idx in range(len(hole_split_list) - 1, -1, -1):
+            face_idx, tangent_data, conn_sid = hole_split_list[idx]
+            if len(tangent_data) == 1:
+                continue
+
+            hole_split_list.pop(idx)
+            sec_bm.faces.ensure_lookup_table()
+            face = sec_bm.faces[face_idx]
+            split_hole_face(face, tangent_data, conn_sid, layers)
+        for face_idx, cut_data in flat_split_list:
+            sec_bm.faces.ensure_lookup_table()
+            face = sec_bm.faces[face_idx]
+            split_flat_face(face, cut_data, layers)
+        #
+        sec_bm.to_mesh(sec_mesh)
+        sec_bm.free()
+        # 有限融并
+        ag_utils.dissolve_limit_sectors([sec], check_convex=False)
+    # 顶点匹配连接
+    for sec, hole_split_list, flat_split_list in fix_sec:
+        sec_data = sec.amagate_data.get_sector_data()
+        sec_mesh = sec.data  # type: bpy.types.Mesh  # type: ignore
+        sec_bm = bmesh.new()
+        sec_bm.from_mesh(sec_mesh)
+        layers = {
+            "connected": sec_bm.faces.layers.int.get("amagate_connected"),
+            "flag": sec_bm.faces.layers.int.get("amagate_flag"),
+            "flat_light": sec_bm.faces.layers.int.get("amagate_flat_light"),
+            "tex_id": sec_bm.faces.layers.int.get("amagate_tex_id"),
+            "tex_xpos": sec_bm.faces.layers.float.get("amagate_tex_xpos"),
+            "tex_ypos": sec_bm.faces.layers.float.get("amagate_tex_ypos"),
+            "tex_angle": sec_bm.faces.layers.float.get("amagate_tex_angle"),
+            "tex_xzoom": sec_bm.faces.layers.float.get("amagate_tex_xzoom"),
+            "tex_yzoom": sec_bm.faces.layers.float.get("amagate_tex_yzoom"),
+        }
+        for idx in range(len(hole_split_list) - 1, -1, -1):
+            face_idx, tangent_data, conn_sid = hole_split_list[idx]
+            if len(tangent_data) == 1:
+                # 按区域导入时，连接的扇区可能尚未构建
+                conn_item = sectors_dict.get(str(conn_sid))
+                if conn_item is None:
+                    continue
+                conn_sec = conn_item["obj"]
+                sec_bm.faces.ensure_lookup_table()
+                face = sec_bm.faces[face_idx]
+                result = connect_vm(sec_bm, face, sec_data.id, layers, conn_sec)
+                # logger.debug(f"connect_vm: {result}")
+                # if result:
+                #     hole_split_list.pop(idx)
+        #
+        sec_bm.to_mesh(sec_mesh)
+        sec_bm.free()
+        # 有限融并
+        # ag_utils.dissolve_limit_sectors([sec], check_convex=False)
+        sec_data.is_2d_sphere = ag_utils.is_2d_sphere(sec)
+        sec_data.is_convex = ag_utils.is_convex(sec)
+        #
+        if not sec_data.is_2d_sphere:
+            coll_name = "Need Fix"
+            coll = bpy.data.collections.get(coll_name)
+            if not coll:
+                coll = bpy.data.collections.new(coll_name)
+                sec_coll.children.link(coll)
+            transaction.link(sec, coll)
+        else:
+            transaction.link(sec, sec_coll)
+
+
+# 分步构建场景，每导入一个扇区产出一次进度 (label, i, total)
+# 构建期间挂起插件回调，扇区在结束时批量链接到集合
+def import_map_steps(level):
+    # type: (dict[str, Any]) -> Any
+    with L3D_data.bulk_transaction("Import Map") as transaction:
+        yield from build_map_steps(level, transaction)
+
+
+def build_map_steps(level, transaction):
+    # type: (dict[str, Any], L3D_data.BulkTransaction) -> Any
+    scene = bpy.context.scene
+    scene_data = scene.amagate_data
+    #
+    context = bpy.context
+    # 创建大气
+    global_atmo_map = create_atmospheres(context, level["atmospheres"])
+    # 全局顶点映射
+    global_vertex_map = [to_blender(co, 1000) for co in level["vertices"]]
+    builder = SectorBuilder(transaction, global_atmo_map, {}, global_vertex_map)
+
+    # 扇区
+    sec_total = len(level["sectors"])
+    scene_data["SectorManage"]["max_id"] = sec_total
+    #
+    start_time = time.time()
+    bar_length = 20  # 进度条长度
+    for sector_id, sector in enumerate(level["sectors"], 1):
+        # 进度条
+        i = sector_id
+        percent = i / sec_total
+        filled = int(bar_length * percent)
+        bar = ("█" * filled).ljust(bar_length, "-")
+        print(
+            f"\rSector Importing: |{bar}| {percent*100:.1f}% | {i} of {sec_total}",
+            end="",
+            flush=True,
+        )
+        build_sector(builder, sector_id, sector)
+        yield "Sector Importing", sector_id, sec_total
+
+    yield from fix_sectors_steps(builder)
+
+    # 灯泡需要对扇区进行射线检测，先链接扇区
+    transaction.flush()
+    # 外部光和灯泡数据
+    sectors_dict = scene_data["SectorManage"]["sectors"]
+    for light in level["lights"]:
+        # 外部光
+        if light["type"] == L3D_bwparse.LIGHT_EXTERNAL:
+            item = create_external_light(context, light)
+            # 使用该外部光的扇区
+            for sid in light["sectors"]:
+                sec = sectors_dict[str(sid)]["obj"]
                 sec_data = sec.amagate_data.get_sector_data()
-                item = OP_SECTOR.OT_Bulb_Add.add(context, sec)
-                item.light_obj.data.color = rgb
-                item.light_obj.matrix_world.translation = pos
-                item.strength = strength
-                item.precision = precision
-                item.update_location(context)
-        # 跳过未知数据 (ddd, ddd)
-        f.seek(48, 1)
-        # 组数据
-        for sid in range(1, sec_total + 1):
-            sec = scene_data["SectorManage"]["sectors"][str(sid)]["obj"]
-            sec_data = sec.amagate_data.get_sector_data()
-            group = unpack("<i", f)[0]  # 有符号整数
-            sec_data.group = group
-        # 扇区名称数据
-        sec_total = unpack("<I", f)[0]
-        for sid in range(1, sec_total + 1):
-            sec = scene_data["SectorManage"]["sectors"][str(sid)]["obj"]
-            name_len = unpack("<I", f)[0]
-            name = unpack(f"{name_len}s", f)
-            sec.rename(name, mode="ALWAYS")
-            sec.data.rename(name, mode="ALWAYS")
+                sec_data.external_id = item.id
+        # 灯泡光
+        else:
+            sec = sectors_dict[str(light["sector"])]["obj"]
+            create_bulb(context, sec, light)
+    # 组数据
+    for sid, group in enumerate(level["groups"], 1):
+        sec = sectors_dict[str(sid)]["obj"]
+        sec_data = sec.amagate_data.get_sector_data()
+        sec_data.group = group  # 有符号整数
+    # 扇区名称数据
+    for sid, name in enumerate(level["names"], 1):
+        sec = sectors_dict[str(sid)]["obj"]
+        sec.rename(name, mode="ALWAYS")
+        sec.data.rename(name, mode="ALWAYS")
     #
-    wm.progress_end()
     print(f", Done in {time.time() - start_time:.2f}s")
 
-    ############################
-    return True
+
+############################
+############################ 按区域导入
+############################
+
+
+# 分步创建扇区占位，扇区的完整网格在选择或处于区域内时再构建
+def import_lazy_steps(level):
+    # type: (dict[str, Any]) -> Any
+    with L3D_data.bulk_transaction("Import Map") as transaction:
+        yield from build_lazy_steps(level, transaction)
+
+
+def build_lazy_steps(level, transaction):
+    # type: (dict[str, Any], L3D_data.BulkTransaction) -> Any
+    context = bpy.context
+    scene_data = context.scene.amagate_data
+    create_atmospheres(context, level["atmospheres"])
+    # 外部光全部创建，灯泡在扇区构建时创建
+    sector_external = {}
+    sector_bulbs = {}
+    for idx, light in enumerate(level["lights"]):
+        if light["type"] == L3D_bwparse.LIGHT_EXTERNAL:
+            item = create_external_light(context, light)
+            for sid in light["sectors"]:
+                sector_external[sid] = item.id
+        else:
+            sector_bulbs.setdefault(light["sector"], []).append(idx)
+
+    sec_total = len(level["sectors"])
+    scene_data["SectorManage"]["max_id"] = sec_total
+    scene_data["LazyImport"] = {"filepath": level["filepath"]}
+    names = level["names"]
+    lazy_coll = L3D_data.ensure_collection(L3D_data.LZ_COLL)
+    for sector_id, summary in enumerate(level["sectors"], 1):
+        co_1 = to_blender(summary["min"], 1000)
+        co_2 = to_blender(summary["max"], 1000)
+        co_min = Vector(map(min, co_1, co_2))
+        co_max = Vector(map(max, co_1, co_2))
+        name = names[sector_id - 1] if sector_id <= len(names) else ""
+        # 立方体空物体显示扇区包围盒
+        obj = bpy.data.objects.new(
+            name or f"Sector{sector_id}", None
+        )  # type: Object # type: ignore
+        obj.empty_display_type = "CUBE"
+        obj.location = (co_min + co_max) / 2
+        obj.scale = [max(v / 2, 0.001) for v in co_max - co_min]
+        obj["AG.lazy_sector"] = sector_id
+        obj["AG.lazy_conn"] = [sid for sid in summary["conn"] if sid != sector_id]
+        obj["AG.lazy_external"] = sector_external.get(sector_id, 0)
+        obj["AG.lazy_bulbs"] = sector_bulbs.get(sector_id, [])
+        obj["AG.lazy_group"] = level["groups"][sector_id - 1]
+        obj["AG.lazy_name"] = name
+        transaction.link(obj, lazy_coll)
+        yield "Sector Importing", sector_id, sec_total
+
+
+# 按需读取并转换顶点
+class LazyVertexMap:
+    def __init__(self, bw: L3D_bwparse.BWFile):
+        self.bw = bw
+        self.cache = {}  # type: dict[int, Vector]
+
+    def __getitem__(self, idx: int) -> Vector:
+        co = self.cache.get(idx)
+        if co is None:
+            co = self.cache[idx] = to_blender(self.bw.read_vertex(idx), 1000)
+        return co
+
+
+# 点到占位包围盒的距离
+def placeholder_distance(obj: Object, point: Vector) -> float:
+    return Vector(
+        max(abs(point[i] - obj.location[i]) - abs(obj.scale[i]), 0) for i in range(3)
+    ).length
+
+
+# 从离该点最近的占位沿连接向外扩展，收集跳数不超过hops或距离在radius内的占位
+def collect_lazy_region(placeholders, point, hops, radius):
+    # type: (list[Object], Vector, int, float) -> list[Object]
+    by_id = {obj["AG.lazy_sector"]: obj for obj in placeholders}
+    start = min(placeholders, key=lambda obj: placeholder_distance(obj, point))
+    region = {start["AG.lazy_sector"]}
+    queue = [(start, 0)]
+    while queue:
+        obj, depth = queue.pop(0)
+        for conn_sid in obj["AG.lazy_conn"]:
+            conn_obj = by_id.get(conn_sid)
+            if conn_obj is None or conn_sid in region:
+                continue
+            if depth + 1 <= hops or (
+                radius > 0 and placeholder_distance(conn_obj, point) <= radius
+            ):
+                region.add(conn_sid)
+                queue.append((conn_obj, depth + 1))
+    return [by_id[sid] for sid in sorted(region)]
+
+
+# 从原bw文件构建占位对应的扇区，返回构建的扇区
+def build_lazy_sectors(context, placeholders):
+    # type: (Context, list[Object]) -> list[Object]
+    scene_data = context.scene.amagate_data
+    sectors_dict = scene_data["SectorManage"]["sectors"]
+    filepath = scene_data["LazyImport"]["filepath"]
+    built = []
+    with L3D_bwparse.BWFile(filepath) as bw, L3D_data.bulk_transaction(
+        "Build Sectors"
+    ) as transaction:
+        atmo_map = {item.item_name: item.id for item in scene_data.atmospheres}
+        texture_map = {
+            img.name: img.amagate_data
+            for img in bpy.data.images
+            if img.amagate_data.id > 0  # type: ignore
+        }
+        builder = SectorBuilder(transaction, atmo_map, texture_map, LazyVertexMap(bw))
+        for obj in placeholders:
+            sector_id = obj["AG.lazy_sector"]
+            props = (
+                obj["AG.lazy_external"],
+                list(obj["AG.lazy_bulbs"]),
+                obj["AG.lazy_group"],
+                obj["AG.lazy_name"],
+            )
+            # 已构建的扇区只移除占位
+            if str(sector_id) not in sectors_dict:
+                sec = build_sector(builder, sector_id, bw.read_sector(sector_id))
+                built.append((sec, props))
+            bpy.data.objects.remove(obj)
+        for _ in fix_sectors_steps(builder):
+            pass
+        # 灯泡需要对扇区进行射线检测，先链接扇区
+        transaction.flush()
+        for sec, (external_id, bulbs, group, name) in built:
+            sec_data = sec.amagate_data.get_sector_data()
+            if external_id:
+                sec_data.external_id = external_id
+            for idx in bulbs:
+                create_bulb(context, sec, bw.read_light(idx))
+            sec_data.group = group
+            if name:
+                sec.rename(name, mode="ALWAYS")
+                sec.data.rename(name, mode="ALWAYS")
+    if not L3D_data.get_lazy_sectors(context.scene):
+        del scene_data["LazyImport"]
+    return [sec for sec, _ in built]
+
+
+class OT_LazyBuildSectors(bpy.types.Operator):
+    bl_idname = "amagate.lazy_build_sectors"
+    bl_label = "Build Sectors"
+    bl_description = "Build the full geometry of lazily imported sectors from the bw file"
+    bl_options = {"INTERNAL"}
+
+    target: EnumProperty(
+        items=[
+            ("SELECTED", "Selected", ""),
+            ("REGION", "Region", "Sectors around the view"),
+            ("ALL", "All", ""),
+        ],
+        default="SELECTED",
+    )  # type: ignore
+
+    @classmethod
+    def poll(cls, context: Context):
+        return (
+            context.mode == "OBJECT"
+            and context.scene.amagate_data.get("LazyImport") is not None
+        )
+
+    def execute(self, context: Context):
+        scene_data = context.scene.amagate_data
+        wm_data = context.window_manager.amagate_data
+        placeholders = L3D_data.get_lazy_sectors(context.scene)
+        if self.target == "SELECTED":
+            placeholders = [obj for obj in placeholders if obj.select_get()]
+        elif self.target == "REGION" and placeholders:
+            point = OP_L3D_EXT.get_view_location(context)
+            if point is None:
+                self.report({"WARNING"}, "No view found")
+                return {"CANCELLED"}
+            placeholders = collect_lazy_region(
+                placeholders, point, wm_data.preview_hops, wm_data.preview_radius
+            )
+        if not placeholders:
+            self.report({"WARNING"}, "No sector to build")
+            return {"CANCELLED"}
+        if not os.path.exists(scene_data["LazyImport"]["filepath"]):
+            self.report({"ERROR"}, "Source bw file not found")
+            return {"CANCELLED"}
+
+        try:
+            sectors = build_lazy_sectors(context, placeholders)
+        except (L3D_bwparse.BWParseError, OSError) as e:
+            self.report({"ERROR"}, f"{pgettext('Invalid file')}: {e}")
+            return {"CANCELLED"}
+        for sec in sectors:
+            sec.select_set(True)
+        self.report({"INFO"}, f"{pgettext('Sectors built')}: {len(sectors)}")
+        return {"FINISHED"}
+
+
+############################
+############################ 导入任务
+############################
+
+
+# 两阶段导入: 工作线程中解析bw文件，然后由计时器分时构建场景
+# 按区域导入时只解析扇区摘要并创建占位
+class ImportJob:
+    def __init__(self, filepath: str, lazy=False):
+        self.filepath = filepath
+        self.lazy = lazy
+        self.level = None  # type: dict[str, Any] | None
+        self.error = ""
+        self.state = "parse"  # parse, build, done, cancelled, error
+        self.progress = ("Map Parsing", 0, 1)
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self.parse, daemon=True)
+        self.steps = None
+        self.on_finish = None
+
+    def set_progress(self, label, i, total):
+        self.progress = (label, i, total)
+
+    def parse(self):
+        try:
+            parse = L3D_bwparse.parse_bw_lazy if self.lazy else L3D_bwparse.parse_bw
+            self.level = parse(
+                self.filepath, self.set_progress, self.cancel_event.is_set
+            )
+        except (L3D_bwparse.BWParseError, OSError) as e:
+            self.error = str(e)
+
+    def parse_finished(self):
+        return not self.thread.is_alive()
+
+    # 加载其它文件会移除计时器，此时任务不再运行
+    def is_running(self):
+        if self.state == "parse":
+            return not self.parse_finished()
+        if self.state == "build":
+            return bpy.app.timers.is_registered(self.build_tick)
+        return False
+
+    def end(self, state):
+        global IMPORT_JOB
+        self.state = state
+        self.level = None
+        if IMPORT_JOB is self:
+            IMPORT_JOB = None
+
+    def start_build(self, on_finish):
+        self.state = "build"
+        self.on_finish = on_finish
+        if self.lazy:
+            self.steps = import_lazy_steps(self.level)
+        else:
+            self.steps = import_map_steps(self.level)
+        bpy.app.timers.register(self.build_tick, first_interval=0.01)
+
+    def build_tick(self):
+        if self.cancel_event.is_set():
+            self.steps.close()  # type: ignore
+            self.end("cancelled")
+            logger.info("Import Cancelled")
+            self.on_finish(False)  # type: ignore
+            return None
+        deadline = time.perf_counter() + IMPORT_TIME_SLICE
+        try:
+            while time.perf_counter() < deadline:
+                self.progress = next(self.steps)  # type: ignore
+        except StopIteration:
+            self.end("done")
+            self.on_finish(True)  # type: ignore
+            return None
+        except Exception as e:
+            logger.exception(e)
+            self.error = str(e)
+            self.end("error")
+            # 构建失败，结束初始化地图的事务以恢复被挂起的回调
+            L3D_data.end_transaction(L3D_data.TRANSACTION)
+            return None
+        return 0.001
 
 
 ############################
@@ -1175,6 +1521,77 @@ def import_map(bw_file):
 ############################
 
 
+# 显示导入进度，按Esc取消
+class OT_ImportMapProgress(bpy.types.Operator):
+    bl_idname = "amagate.importmap_progress"
+    bl_label = "Import Map Progress"
+    bl_options = {"INTERNAL"}
+
+    def invoke(self, context: Context, event):
+        self.job = IMPORT_JOB
+        if self.job is None:
+            return {"CANCELLED"}
+        wm = context.window_manager
+        wm.progress_begin(0, 1)
+        self.timer = wm.event_timer_add(0.05, window=context.window)
+        wm.modal_handler_add(self)
+        return {"RUNNING_MODAL"}
+
+    def finish(self, context: Context):
+        wm = context.window_manager
+        wm.event_timer_remove(self.timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+
+    def modal(self, context: Context, event):
+        job = self.job  # type: ImportJob
+        if event.type == "ESC" and event.value == "PRESS":
+            job.cancel_event.set()
+        if event.type != "TIMER" or event.timer != self.timer:
+            return {"PASS_THROUGH"}
+
+        # 解析完成，错误在修改场景之前报告
+        if job.state == "parse" and job.parse_finished():
+            self.finish(context)
+            if job.error:
+                job.end("error")
+                self.report({"ERROR"}, f"{pgettext('Invalid file')}: {job.error}")
+                return {"CANCELLED"}
+            if job.level is None or job.cancel_event.is_set():
+                job.end("cancelled")
+                self.report({"WARNING"}, "Import Cancelled")
+                return {"CANCELLED"}
+            # 重新加载文件会释放窗口的处理器和本操作实例，结束模态后再由计时器加载
+            bpy.app.timers.register(
+                reload_homefile(context.window, job.filepath), first_interval=0.01
+            )
+            return {"FINISHED"}
+        if job.state in ("done", "cancelled", "error"):
+            self.finish(context)
+            if job.state == "error":
+                self.report({"ERROR"}, job.error)
+            elif job.state == "cancelled":
+                self.report({"WARNING"}, "Import Cancelled")
+            return {"FINISHED"}
+
+        label, i, total = job.progress
+        context.window_manager.progress_update(i / max(total, 1))
+        context.workspace.status_text_set(
+            f"{pgettext(label)}: {i} / {total}    {pgettext('Press Esc to cancel')}"
+        )
+        return {"PASS_THROUGH"}
+
+
+# 一次性计时器: 重置为默认场景，加载完成后初始化地图并开始构建
+def reload_homefile(window, filepath):
+    def warp():
+        L3D_data.LOAD_POST_CALLBACK = (OP_L3D.InitMap, (filepath,))
+        with bpy.context.temp_override(window=window):
+            bpy.ops.wm.read_homefile(app_template="")
+
+    return warp
+
+
 class OT_ImportMap(bpy.types.Operator):
     bl_idname = "amagate.importmap"
     bl_label = "Import Map"
@@ -1193,6 +1610,12 @@ class OT_ImportMap(bpy.types.Operator):
     directory: StringProperty(subtype="DIR_PATH")  # type: ignore
     files: CollectionProperty(type=bpy.types.OperatorFileListElement)  # type: ignore
 
+    lazy: BoolProperty(
+        name="Lazy Import",
+        description="Import sector bounds only and build sector geometry on demand",
+        default=False,
+    )  # type: ignore
+
     execute_type: IntProperty(default=0, options={"HIDDEN"})  # type: ignore
 
     # @classmethod
@@ -1211,8 +1634,13 @@ class OT_ImportMap(bpy.types.Operator):
         #     self.report({"ERROR"}, "No bw file selected")
         #     return {"CANCELLED"}
 
-        L3D_data.LOAD_POST_CALLBACK = (OP_L3D.InitMap, (str(filepath),))
-        bpy.ops.wm.read_homefile(app_template="")
+        global IMPORT_JOB
+        if IMPORT_JOB is not None and IMPORT_JOB.is_running():
+            return {"CANCELLED"}
+        # 在后台线程中解析，完成后再重置场景并构建
+        IMPORT_JOB = ImportJob(str(filepath), self.lazy)
+        IMPORT_JOB.thread.start()
+        bpy.ops.amagate.importmap_progress("INVOKE_DEFAULT")  # type: ignore
 
         return {"FINISHED"}
 
@@ -1240,6 +1668,7 @@ class OT_ImportMap(bpy.types.Operator):
 
     def draw(self, context: Context):
         if self.execute_type != 0:
+            self.layout.prop(self, "lazy")
             return
 
         layout = self.layout  # type: bpy.types.UILayout
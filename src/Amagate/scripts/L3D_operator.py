@@ -156,7 +156,7 @@ class OT_Scene_Atmo_Add(bpy.types.Operator):
 
         scene_data.active_atmosphere = len(scene_data.atmospheres) - 1
         if undo:
-            bpy.ops.ed.undo_push(message="Add Atmosphere")
+            L3D_data.undo_push("Add Atmosphere")
 
         return item
 
@@ -202,7 +202,7 @@ class OT_Scene_Atmo_Remove(bpy.types.Operator):
         if active_atmo >= len(scene_data.atmospheres):
             scene_data.active_atmosphere = len(scene_data.atmospheres) - 1
         if self.undo:
-            bpy.ops.ed.undo_push(message="Remove Atmosphere")
+            L3D_data.undo_push("Remove Atmosphere")
         return {"FINISHED"}
 
     def invoke(self, context: Context, event):
@@ -227,7 +227,7 @@ class OT_Scene_Atmo_Default(bpy.types.Operator):
 
         scene_data.defaults.atmo_id = scene_data.atmospheres[active_atmo].id
         if self.undo:
-            bpy.ops.ed.undo_push(message="Set as default atmosphere")
+            L3D_data.undo_push("Set as default atmosphere")
         return {"FINISHED"}
 
 
@@ -321,7 +321,7 @@ class OT_Scene_External_Add(bpy.types.Operator):
 
         scene_data.active_external = len(scene_data.externals) - 1
         if undo:
-            bpy.ops.ed.undo_push(message="Add External Light")
+            L3D_data.undo_push("Add External Light")
         return item
 
 
@@ -365,7 +365,7 @@ class OT_Scene_External_Remove(bpy.types.Operator):
         if active_idx >= len(externals):
             scene_data.active_external = len(externals) - 1
         if self.undo:
-            bpy.ops.ed.undo_push(message="Remove External Light")
+            L3D_data.undo_push("Remove External Light")
 
         return {"FINISHED"}
 
@@ -391,7 +391,7 @@ class OT_Scene_External_Default(bpy.types.Operator):
 
         scene_data.defaults.external_id = scene_data.externals[active_idx].id
         if self.undo:
-            bpy.ops.ed.undo_push(message="Set as default external light")
+            L3D_data.undo_push("Set as default external light")
 
         return {"FINISHED"}
 
@@ -653,7 +653,7 @@ class Texture_Default_Prop(bpy.types.PropertyGroup):
         if value:
             scene_data.defaults.textures[name].id = self.img_id
             data.region_redraw("UI")
-            bpy.ops.ed.undo_push(message="Set as default texture")
+            L3D_data.undo_push("Set as default texture")
         self[name] = True
 
     def init(self, context: Context):
@@ -753,7 +753,7 @@ class Texture_Package_Prop(bpy.types.PropertyGroup):
                     if img.packed_file:
                         img.unpack(method=m)
         message = "Pack All" if selected == "Pack All" else "Unpack All"
-        bpy.ops.ed.undo_push(message=message)
+        L3D_data.undo_push(message)
         # XXX 也许不起作用
         ag_utils.simulate_keypress(27)
 
@@ -787,10 +787,10 @@ class OT_Texture_Package(bpy.types.Operator):
         if img and img.amagate_data.id and img != scene_data.ensure_null_tex:
             if img.packed_file:
                 img.unpack(method=m)
-                bpy.ops.ed.undo_push(message="Unpack Texture")
+                L3D_data.undo_push("Unpack Texture")
             else:
                 img.pack()
-                bpy.ops.ed.undo_push(message="Pack Texture")
+                L3D_data.undo_push("Pack Texture")
         return {"FINISHED"}
 
     def invoke(self, context: Context, event):
@@ -1107,7 +1107,7 @@ class OT_SelectByGroup(bpy.types.Operator):
                 sec.select_set(True)
 
         if self.undo:
-            bpy.ops.ed.undo_push(message=self.bl_label)
+            L3D_data.undo_push(self.bl_label)
 
         return {"FINISHED"}
 
@@ -1141,7 +1141,7 @@ class OT_DeselectByGroup(bpy.types.Operator):
                 sec.select_set(False)
 
         if self.undo:
-            bpy.ops.ed.undo_push(message=self.bl_label)
+            L3D_data.undo_push(self.bl_label)
 
         return {"FINISHED"}
 
@@ -1319,7 +1319,7 @@ class OT_EntityCreate(bpy.types.Operator):
         )
         ret = self.add(self, context, inter_name)[0]
 
-        bpy.ops.ed.undo_push(message="Create Entity")
+        L3D_data.undo_push("Create Entity")
         return ret
 
     # 添加锚点
@@ -1624,7 +1624,7 @@ class OT_OpenPrefab(bpy.types.Operator):
                             data_to.collections = [coll_name]
                         coll = data_to.collections[0]
                         context.scene.collection.children.link(coll)  # type: ignore
-                        bpy.ops.ed.undo_push(message="Append")
+                        L3D_data.undo_push("Append")
                     else:
                         L3D_data.LOAD_POST_CALLBACK = (
                             self.set_ent_enum,
@@ -2135,7 +2135,18 @@ class OT_New(bpy.types.Operator):
 #     bl_options = {"INTERNAL"}
 
 
+# 整个初始化 (包括分时导入) 在一个事务中进行，由 InitMap_finish 结束并推送一次撤销
 def InitMap(imp_filepath=""):
+    transaction = L3D_data.begin_transaction()
+    try:
+        init_map(imp_filepath, transaction)
+    except:
+        L3D_data.end_transaction(transaction)
+        raise
+
+
+def init_map(imp_filepath, transaction):
+    # type: (str, L3D_data.BulkTransaction | None) -> None
     context = bpy.context
     is_import = imp_filepath != ""
     imp_filepath = Path(imp_filepath)
@@ -2263,12 +2274,43 @@ def InitMap(imp_filepath=""):
         # bpy.ops.wm.save_mainfile(filepath=str(save_filepath))
 
         # logger.info("Start import map...")
+        job = OP_L3D_IMP.IMPORT_JOB
+        if job is not None and job.filepath == str(imp_filepath):
+            # 已在后台解析，分时构建场景
+            def on_finish(success):
+                if success:
+                    InitMap_finish(is_import, save_filepath, main_area, transaction)
+                else:
+                    # 中止导入，丢弃未完成的场景 (加载文件时中止事务)
+                    bpy.ops.wm.read_homefile(app_template="")
+
+            job.start_build(on_finish)
+            bpy.ops.amagate.importmap_progress("INVOKE_DEFAULT")  # type: ignore
+            return
         OP_L3D_IMP.import_map(str(imp_filepath))
-        sec = scene_data["SectorManage"]["sectors"]["1"]["obj"]
-        sec.select_set(True)
-        bpy.ops.object.origin_set(type="ORIGIN_GEOMETRY", center="MEDIAN")
-        sec.select_set(False)
-        scene.camera.matrix_world.translation = sec.location
+        InitMap_finish(is_import, save_filepath, main_area, transaction)
+    else:
+        InitMap_finish(is_import, transaction=transaction)
+
+
+# 初始化地图的收尾工作，导入地图时在场景构建完成后调用
+def InitMap_finish(is_import, save_filepath=None, main_area=None, transaction=None):
+    context = bpy.context
+    scene = context.scene
+    scene_data = scene.amagate_data
+    if is_import:
+        item = scene_data["SectorManage"]["sectors"].get("1")
+        if item is not None:
+            sec = item["obj"]
+            sec.select_set(True)
+            bpy.ops.object.origin_set(type="ORIGIN_GEOMETRY", center="MEDIAN")
+            sec.select_set(False)
+            scene.camera.matrix_world.translation = sec.location
+        # 按区域导入，扇区尚未构建
+        else:
+            placeholders = L3D_data.get_lazy_sectors(scene)
+            if placeholders:
+                scene.camera.matrix_world.translation = placeholders[0].location
         with context.temp_override(
             area=main_area,
             region=next(r for r in main_area.regions if r.type == "WINDOW"),
@@ -2277,14 +2319,16 @@ def InitMap(imp_filepath=""):
         # logger.info("Import Map Done")
         #
     scene_data.atmo_id_key = "1"
+    # load_post会中止进行中的事务，先结束事务再恢复回调
+    L3D_data.end_transaction(transaction)
     L3D_data.load_post()
 
     if is_import:
-        bpy.ops.ed.undo_push(message="Import Map")
+        L3D_data.undo_push("Import Map")
         L3D_data.SAVE_POST_CALLBACK = (OT_Texture_Reload.reload_all, ())
         bpy.ops.wm.save_mainfile("INVOKE_DEFAULT", filepath=str(save_filepath))  # type: ignore
     else:
-        bpy.ops.ed.undo_push(message="Initialize Scene")
+        L3D_data.undo_push("Initialize Scene")
     # 启动异步线程
     if not L3D_data.ASYNC_THREAD:
         L3D_data.ASYNC_THREAD = L3D_data.AsyncThread()
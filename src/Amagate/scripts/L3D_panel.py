@@ -1985,6 +1985,21 @@ class AMAGATE_PT_L3D_Tools(L3D_Panel, bpy.types.Panel):
             icon="IMPORT",
         )
         op.execute_type = 0  # type: ignore
+        # 按区域导入的扇区
+        if scene_data.get("LazyImport") is not None:
+            row = column.row(align=True)
+            op = row.operator(
+                OP_L3D_IMP.OT_LazyBuildSectors.bl_idname, text="Build Selected"
+            )
+            op.target = "SELECTED"  # type: ignore
+            op = row.operator(
+                OP_L3D_IMP.OT_LazyBuildSectors.bl_idname, text="Build Region"
+            )
+            op.target = "REGION"  # type: ignore
+            op = row.operator(
+                OP_L3D_IMP.OT_LazyBuildSectors.bl_idname, text="", icon="MESH_CUBE"
+            )
+            op.target = "ALL"  # type: ignore
 
         column.separator(type="LINE")
 
@@ -0,0 +1,235 @@
+# Author: Sryml
+# Email: sryml@hotmail.com
+# Python Version: 3.11
+# License: GPL-3.0
+
+# 二进制读写工具，不依赖bpy
+# 所有编解码器共用预编译的Struct缓存，读取器和写入器直接操作内存缓冲区
+
+from __future__ import annotations
+
+import os
+import sys
+import mmap
+import struct
+import contextlib
+from array import array
+
+############################
+STRUCT_CACHE = {}  # type: dict[str, struct.Struct]
+BIG_ENDIAN = sys.byteorder == "big"
+
+
+# 获取预编译的Struct对象，未指定字节序时按小端序且不对齐
+def get_struct(fmt: str) -> struct.Struct:
+    st = STRUCT_CACHE.get(fmt)
+    if st is None:
+        full_fmt = fmt if fmt[:1] in "<>!=@" else f"<{fmt}"
+        st = STRUCT_CACHE.setdefault(fmt, struct.Struct(full_fmt))
+    return st
+
+
+############################
+############################ 读取
+############################
+
+
+# 基于内存的顺序读取器，buffer可以是bytes、mmap或memoryview
+# seek/tell/read与文件对象的用法一致，读取越界时抛出struct.error
+class Reader:
+    def __init__(self, buffer, offset=0):
+        self.buffer = buffer
+        self.offset = offset
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def unpack(self, fmt: str) -> tuple:
+        st = get_struct(fmt)
+        values = st.unpack_from(self.buffer, self.offset)
+        self.offset += st.size
+        return values
+
+    def u8(self) -> int:
+        return self.unpack("<B")[0]
+
+    def u32(self) -> int:
+        return self.unpack("<I")[0]
+
+    def i32(self) -> int:
+        return self.unpack("<i")[0]
+
+    def f32(self) -> float:
+        return self.unpack("<f")[0]
+
+    def f64(self) -> float:
+        return self.unpack("<d")[0]
+
+    def vec3(self) -> tuple[float, float, float]:
+        return self.unpack("<ddd")  # type: ignore
+
+    def view(self, size: int) -> memoryview:
+        """不复制的切片"""
+        end = self.offset + size
+        if end > len(self.buffer):
+            raise struct.error("unpack requires more data")
+        data = memoryview(self.buffer)[self.offset : end]
+        self.offset = end
+        return data
+
+    def read(self, size: int) -> bytes:
+        end = self.offset + size
+        if end > len(self.buffer):
+            raise struct.error("unpack requires more data")
+        data = bytes(self.buffer[self.offset : end])
+        self.offset = end
+        return data
+
+    def string(self, length: int) -> str:
+        """Latin-1字符串"""
+        end = self.offset + length
+        if end > len(self.buffer):
+            raise struct.error("unpack requires more data")
+        text = str(self.buffer[self.offset : end], "Latin1")
+        self.offset = end
+        return text
+
+    def lstring(self) -> str:
+        """带长度前缀的Latin-1字符串"""
+        return self.string(self.u32())
+
+    def array(self, typecode: str, count: int) -> array:
+        """读取count个小端序数值到array"""
+        values = array(typecode)
+        values.frombytes(self.read(count * values.itemsize))
+        if BIG_ENDIAN:
+            values.byteswap()
+        return values
+
+    def ndarray(self, dtype, count: int, shape=None):
+        """读取count个小端序数值到numpy数组 (复制)"""
+        import numpy as np
+
+        dtype = np.dtype(dtype).newbyteorder("<")
+        values = np.frombuffer(
+            self.view(count * dtype.itemsize), dtype=dtype, count=count
+        ).astype(dtype.newbyteorder("="))
+        if shape is not None:
+            values = values.reshape(shape)
+        return values
+
+    def skip(self, size: int):
+        self.offset += size
+
+    def seek(self, offset: int, whence=0):
+        if whence == 1:
+            offset += self.offset
+        elif whence == 2:
+            offset += len(self.buffer)
+        self.offset = offset
+        return offset
+
+    def tell(self) -> int:
+        return self.offset
+
+
+# 只读映射文件并返回读取器，不复制整个文件
+@contextlib.contextmanager
+def open_reader(filepath):
+    with open(filepath, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield Reader(b"")
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield Reader(buffer)
+
+
+############################
+############################ 写入
+############################
+
+
+# 可增长的字节段，预分配容量，数据直接打包到缓冲区中
+class Segment:
+    def __init__(self, capacity=4096):
+        self.buffer = bytearray(capacity)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def reserve(self, size: int) -> int:
+        """预留空间，返回偏移"""
+        offset = self.size
+        end = offset + size
+        capacity = len(self.buffer)
+        if end > capacity:
+            self.buffer.extend(bytes(max(end, capacity * 2) - capacity))
+        self.size = end
+        return offset
+
+    def pack(self, fmt: str, *args) -> int:
+        st = get_struct(fmt)
+        offset = self.reserve(st.size)
+        st.pack_into(self.buffer, offset, *args)
+        return offset
+
+    def write(self, data) -> int:
+        data = memoryview(data).cast("B")
+        offset = self.reserve(len(data))
+        self.buffer[offset : self.size] = data
+        return offset
+
+    def write_str(self, text: str) -> int:
+        """写入带长度前缀的utf-8字符串"""
+        buffer = text.encode("utf-8")
+        offset = self.pack("<I", len(buffer))
+        self.write(buffer)
+        return offset
+
+    def patch(self, offset: int, fmt: str, *args):
+        """在偏移处原地修补数据"""
+        get_struct(fmt).pack_into(self.buffer, offset, *args)
+
+    def view(self) -> memoryview:
+        return memoryview(self.buffer)[: self.size]
+
+
+# 分段写入器，按顺序拼接字节段和外部缓冲区，最后一次性写入文件
+class SegmentWriter:
+    def __init__(self):
+        self.parts = []  # 字节段或支持缓冲区协议的对象
+
+    def segment(self, capacity=4096) -> Segment:
+        seg = Segment(capacity)
+        self.parts.append(seg)
+        return seg
+
+    def append(self, buffer):
+        """追加外部缓冲区，不复制"""
+        self.parts.append(buffer)
+
+    def views(self):
+        for part in self.parts:
+            if isinstance(part, Segment):
+                yield part.view()
+            else:
+                yield memoryview(part).cast("B")
+
+    def nbytes(self) -> int:
+        return sum(len(view) for view in self.views())
+
+    def write_to(self, filepath):
+        """先写入临时文件再替换，失败时不会留下不完整的文件"""
+        temp_file = f"{filepath}.tmp"
+        try:
+            with open(temp_file, "wb") as f:
+                f.writelines(self.views())
+            os.replace(temp_file, filepath)
+        except BaseException:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+
+    def clear(self):
+        self.parts.clear()
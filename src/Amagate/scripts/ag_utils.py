@@ -18,7 +18,6 @@ import requests
 import zipfile
 import tempfile
 import typing
-import struct
 import re
 
 from typing import Any, TYPE_CHECKING
@@ -35,7 +34,7 @@ from mathutils import *  # type: ignore
 from bpy_extras import anim_utils
 
 #
-from . import data, L3D_data
+from . import data, L3D_data, ag_binio
 
 if TYPE_CHECKING:
     import bpy_stub as bpy
@@ -645,22 +644,13 @@ def set_dict(this, key, value):
     this[key] = value
 
 
+# 兼容文件对象的读取，编解码器应使用 ag_binio.Reader
 def unpack(fmat: str, f) -> Any:
-    fmat_ = fmat.lower()
-    if fmat_[-1] == "s":
-        chunk = int(fmat_[:-1])
-    else:
-        chunk = (
-            fmat_.count("h") * 2
-            + fmat_.count("i") * 4
-            + fmat_.count("f") * 4
-            + fmat_.count("d") * 8
-            + fmat_.count("b")
-        )
-
-    if fmat_[-1] == "s":
-        return struct.unpack(fmat, f.read(chunk))[0].decode("Latin1")
-    return struct.unpack(fmat, f.read(chunk))
+    st = ag_binio.get_struct(fmat)
+    values = st.unpack(f.read(st.size))
+    if fmat[-1] == "s":
+        return values[0].decode("Latin1")
+    return values
 
 
 # 射线法，判断点是否在多边形内
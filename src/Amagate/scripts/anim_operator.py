@@ -9,7 +9,6 @@ import sys
 import os
 import math
 import pickle
-import struct
 import contextlib
 import shutil
 import threading
@@ -19,7 +18,7 @@ import re
 from datetime import datetime
 from pathlib import Path
 from pprint import pprint
-from io import StringIO, BytesIO
+from io import StringIO
 from typing import Any, TYPE_CHECKING
 
 import bpy
@@ -42,7 +41,7 @@ from bpy_extras.io_utils import ExportHelper
 from bpy_extras import anim_utils
 
 from . import data, entity_data
-from . import ag_utils
+from . import ag_utils, ag_binio
 from .ag_utils import epsilon, epsilon2
 
 
@@ -58,7 +57,6 @@ if TYPE_CHECKING:
 
 ############################
 logger = data.logger
-unpack = ag_utils.unpack
 
 
 ############################
@@ -394,16 +392,16 @@ class OT_ExportAnim(bpy.types.Operator, ExportHelper):
 
         # 目标坐标系
         target_space_inv = Quaternion((1, 0, 0), -math.pi / 2).inverted()  # type: ignore
-        buffer = BytesIO()
+        buffer = ag_binio.Segment()
         # 静态骨骼逆矩阵
         static_bones_matrix_inv = {}
         # 内部名称
         inter_name = action_name.encode("utf-8")
-        buffer.write(struct.pack("I", len(inter_name)))
+        buffer.pack("I", len(inter_name))
         buffer.write(inter_name)
         # 骨骼数量
         count = len(bones_name)
-        buffer.write(struct.pack("I", count))
+        buffer.pack("I", count)
         # 所有骨骼的旋转姿态
         for bone_idx, bone_name in enumerate(bones_name):
             bone = armature.bones[bone_name]
@@ -425,7 +423,7 @@ class OT_ExportAnim(bpy.types.Operator, ExportHelper):
             ]
 
             #
-            buffer.write(struct.pack("I", frame_len))
+            buffer.pack("I", frame_len)
             fcurves_len = len(fcurves)
             for frame in range(1, frame_len + 1):
                 if fcurves_len != 4:
@@ -440,7 +438,7 @@ class OT_ExportAnim(bpy.types.Operator, ExportHelper):
 
                 # 相对于父旋转
                 quat_rel = (parent_quat @ quat_local).normalized()
-                buffer.write(struct.pack("ffff", *quat_rel))
+                buffer.pack("ffff", *quat_rel)
 
         # 根骨骼位置姿态
         bone = armature.bones[bones_name[0]]
@@ -455,7 +453,7 @@ class OT_ExportAnim(bpy.types.Operator, ExportHelper):
         ]  # type: list[bpy.types.FCurve]
 
         #
-        buffer.write(struct.pack("I", frame_len))
+        buffer.pack("I", frame_len)
         fcurves_len = len(fcurves)
         for frame in range(1, frame_len + 1):
             if fcurves_len != 3:
@@ -466,11 +464,10 @@ class OT_ExportAnim(bpy.types.Operator, ExportHelper):
             # co_local = target_space_inv @ (co_glob - location)
             co_local = target_space_inv @ quat @ co
             co_local *= 1000
-            buffer.write(struct.pack("ddd", *co_local))
+            buffer.pack("ddd", *co_local)
         #
         with open(self.filepath, "wb") as f:
-            f.write(buffer.getvalue())
-        buffer.close()
+            f.write(buffer.view())
         # 清理
         bpy.data.actions.remove(baked_action)
 
@@ -626,12 +623,12 @@ class OT_ImportAnim(bpy.types.Operator):
             filename = filepath.name
             logger.debug(filename)
             action_name = filename[:-4]
-            with open(filepath, "rb") as f:
+            with ag_binio.open_reader(filepath) as f:
                 # 内部名称
-                length = unpack("I", f)[0]
-                inter_name = unpack(f"{length}s", f)
+                length = f.unpack("I")[0]
+                inter_name = f.string(length)
                 # 骨骼数量
-                count = unpack("I", f)[0]
+                count = f.unpack("I")[0]
                 max_skip = count - bone_count
                 skip_num = 0
                 if count != bone_count:
@@ -697,11 +694,11 @@ class OT_ImportAnim(bpy.types.Operator):
                     #         loc_data_path, index=i, action_group=bone_name
                     #     )
                     #
-                    frame_len = unpack("I", f)[0]
+                    frame_len = f.unpack("I")[0]
                     if scene.frame_end < frame_len:
                         scene.frame_end = frame_len
                     for frame in range(1, frame_len + 1):
-                        quat = Quaternion(unpack("ffff", f))
+                        quat = Quaternion(f.unpack("ffff"))
                         # if frame == 1:
                         #     print(quat.to_euler())
                         # 子骨骼的旋转数据是相对于父骨骼的
@@ -723,7 +720,7 @@ class OT_ImportAnim(bpy.types.Operator):
                         #     diff = math.acos(bone.matrix.to_quaternion().dot(matrix.to_quaternion())) * 2
                         #     if math.degrees(diff) > 120:
                         #         skip_num += 1
-                        #         f.seek((frame_len - 1) * 16, 1)
+                        #         f.skip((frame_len - 1) * 16)
                         #         break
 
                         bone.matrix = matrix
@@ -734,9 +731,9 @@ class OT_ImportAnim(bpy.types.Operator):
                 bone = bone_first
                 matrix = bone.matrix_local.inverted()  # type: Matrix
                 location = bone.matrix_local.translation
-                frame_len = unpack("I", f)[0]
+                frame_len = f.unpack("I")[0]
                 for frame in range(1, frame_len + 1):
-                    co = Vector(unpack("ddd", f)) / 1000
+                    co = Vector(f.unpack("ddd")) / 1000
                     # 添加骨骼偏移
                     co_glob = (target_space_q @ co) + location
                     co_local = matrix @ co_glob
@@ -1195,7 +1192,7 @@ class OT_ExportCamera(bpy.types.Operator, ExportHelper):
         #
         channelbag = self.channelbag
         channelbag_data = self.channelbag_data
-        buffer = BytesIO()
+        buffer = ag_binio.Segment()
         # 曲线
         fcurves_loc = [
             channelbag.fcurves.find("location", index=i) for i in range(3)
@@ -1228,7 +1225,7 @@ class OT_ExportCamera(bpy.types.Operator, ExportHelper):
                     continue
                 kp.co[0] = (kp.co[0] - 1) * 3 + 1
 
-        buffer.write(struct.pack("I", frame_len))
+        buffer.pack("I", frame_len)
         buffer.write(bytes((0, 0, 64, 64)))
         for frame in range(frame_start, frame_len + frame_start + 1):
             rot = Euler(
@@ -1245,14 +1242,13 @@ class OT_ExportCamera(bpy.types.Operator, ExportHelper):
             # fov = 2 * math.atan(sensor_width / (lens * 2))
             # fov /= fov_factor
             #
-            buffer.write(struct.pack("fff", *axis))
-            buffer.write(struct.pack("f", angle))
-            buffer.write(struct.pack("fff", *loc))
-            buffer.write(struct.pack("f", lens))
+            buffer.pack("fff", *axis)
+            buffer.pack("f", angle)
+            buffer.pack("fff", *loc)
+            buffer.pack("f", lens)
         #
         with open(self.filepath, "wb") as f:
-            f.write(buffer.getvalue())
-        buffer.close()
+            f.write(buffer.view())
         # 清理
         action = camera_obj.animation_data.action
         has_slot = hasattr(camera_obj.animation_data, "action_slot")
@@ -1430,26 +1426,26 @@ class OT_ImportCamera(bpy.types.Operator):
         camera_obj.rotation_mode = "XYZ"
         frame_start = 1
 
-        with open(filepath, "rb") as f:
-            file_size = os.fstat(f.fileno()).st_size
-            frame_len = int(unpack("I", f)[0] / 3 + frame_start)
+        with ag_binio.open_reader(filepath) as f:
+            file_size = len(f)
+            frame_len = int(f.unpack("I")[0] / 3 + frame_start)
             if scene.frame_end < frame_len:
                 scene.frame_end = frame_len
             # 固定4字节 0 0 64 64
-            mark = unpack("bbbb", f)
+            mark = f.unpack("bbbb")
             # print(mark)
             for frame in range(frame_start, frame_len + 1):
                 if f.tell() >= file_size:
                     logger.warning("End of file")
                     break
                 # 轴角
-                axis = unpack("fff", f)
+                axis = f.unpack("fff")
                 axis = -axis[0], -axis[2], axis[1]
-                angle = unpack("f", f)[0]
+                angle = f.unpack("f")[0]
                 # 位置与fov
-                location = Vector(unpack("fff", f)) / 1000
+                location = Vector(f.unpack("fff")) / 1000
                 location.yz = location.z, -location.y
-                lens = unpack("f", f)[0] / 0.037 * sensor_factor
+                lens = f.unpack("f")[0] / 0.037 * sensor_factor
                 #
                 rot = (Quaternion(axis, angle)).to_euler()  # type: ignore
                 for i in range(3):
@@ -1458,7 +1454,7 @@ class OT_ImportCamera(bpy.types.Operator):
                 # lens = sensor_width / (2 * math.tan(fov / 2))
                 fcurve_fov.keyframe_points.insert(frame, lens)
                 # 跳过缩放的2帧
-                f.seek(64, 1)
+                f.skip(64)
 
         return {"FINISHED"}
 
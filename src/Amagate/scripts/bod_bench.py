@@ -0,0 +1,208 @@
+# Author: Sryml
+# Email: sryml@hotmail.com
+# Python Version: 3.11
+# License: GPL-3.0
+
+# BOD导出中顶点组查询的基准测试: 骨骼归属检查和手动分块的范围查找
+# 在启用了插件的Blender中运行:
+#   blender -b --python bod_bench.py -- --verts 5000 50000 [--bones 20] [--chunks 2] [--output bench.json]
+# 对比逐个顶点组重新遍历网格的旧算法和 GroupMembers 的一次遍历，并检查两者的结果一致
+
+from __future__ import annotations
+
+import sys
+
+# 本目录中的operator.py会遮蔽标准库模块，作为脚本运行时将其移出sys.path
+_script_dir = __file__.replace("\\", "/").rpartition("/")[0]
+sys.path[:] = [p for p in sys.path if p.replace("\\", "/") != _script_dir]
+
+import json
+import time
+import random
+import argparse
+
+############################
+CHUNK_SIZE = 64  # 自动分块大小
+REPEAT = 3  # 每项取最短时间
+############################
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="bod_bench", description="Benchmark BOD vertex group lookups"
+    )
+    parser.add_argument("--verts", type=int, nargs="+", default=[5000, 50000])
+    parser.add_argument("--bones", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=2, help="manual chunks per bone")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="", help="write results json")
+    return parser.parse_args(argv)
+
+
+def find_module(suffix):
+    for name, module in list(sys.modules.items()):
+        if name.endswith(suffix):
+            return module
+    return None
+
+
+# 创建网格物体: 每个骨骼顶点组包含一段连续的顶点，
+# 每个骨骼开头的几个手动分块顶点组以前两个成员标记范围
+def build_object(verts_num, bones_num, chunks_num, seed):
+    import bpy
+
+    rng = random.Random(seed)
+    mesh = bpy.data.meshes.new("AG_BodBench")
+    mesh.from_pydata(
+        [(rng.random(), rng.random(), rng.random()) for _ in range(verts_num)], [], []
+    )
+    obj = bpy.data.objects.new("AG_BodBench", mesh)
+    bone_size = verts_num // bones_num
+    bones_name = []
+    for bone_idx in range(bones_num):
+        name = f"bone{bone_idx}"
+        bones_name.append(name)
+        start = bone_idx * bone_size
+        end = verts_num if bone_idx == bones_num - 1 else start + bone_size
+        obj.vertex_groups.new(name=name).add(list(range(start, end)), 1.0, "REPLACE")
+        chunk_start = start
+        for chunk_idx in range(chunks_num):
+            chunk_end = min(chunk_start + rng.randint(8, 32), end) - 1
+            if chunk_end <= chunk_start:
+                break
+            group = obj.vertex_groups.new(name=f"chunk_{name}_{chunk_idx}")
+            group.add([chunk_start, chunk_end], 1.0, "REPLACE")
+            chunk_start = chunk_end + 1
+    return obj, bones_name, bone_size
+
+
+# 旧算法: 逐个顶点查找所属骨骼
+def baseline_vert_bone(mesh, groups_idx):
+    import numpy as np
+
+    group_bone = {group: bone for bone, group in enumerate(groups_idx)}
+    vert_bone = np.empty(len(mesh.vertices), dtype=np.int32)
+    for v in mesh.vertices:
+        bones = [group_bone[g.group] for g in v.groups if g.group in group_bone]
+        vert_bone[v.index] = bones[0] if len(bones) == 1 else -1
+    return vert_bone
+
+
+# 旧算法: 每个分块顶点组都重新遍历网格
+def baseline_chunks(ag_utils, obj, prefix, start, num, chunk_size):
+    chunks = []
+    chunk_start = start
+    end = start + num
+    for name in obj.vertex_groups.keys():
+        if not name.lower().startswith(prefix):
+            continue
+        vertex_indices = ag_utils.get_vertex_in_group(obj, name)
+        if vertex_indices[0] == chunk_start:
+            chunk_num = min(vertex_indices[1] - chunk_start + 1, end - chunk_start)
+            chunks.append([chunk_start, chunk_num])
+            chunk_start += chunk_num
+            if chunk_start >= end:
+                break
+    while chunk_start < end:
+        chunk_num = min(chunk_size, end - chunk_start)
+        chunks.append([chunk_start, chunk_num])
+        chunk_start += chunk_num
+    return chunks
+
+
+def best_time(func):
+    result = None
+    best = float("inf")
+    for _ in range(REPEAT):
+        start_time = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start_time)
+    return best, result
+
+
+def bench(entity_operator, ag_utils, verts_num, args):
+    import bpy
+
+    obj, bones_name, bone_size = build_object(
+        verts_num, args.bones, args.chunks, args.seed
+    )
+    mesh = obj.data
+    vertex_groups = obj.vertex_groups
+    groups_idx = [vertex_groups[name].index for name in bones_name]
+
+    def ranges(bone_idx):
+        start = bone_idx * bone_size
+        num = (verts_num - start) if bone_idx == len(bones_name) - 1 else bone_size
+        return start, num
+
+    def old_path():
+        vert_bone = baseline_vert_bone(mesh, groups_idx)
+        chunks = [
+            baseline_chunks(
+                ag_utils, obj, f"chunk_{name}_", *ranges(i), CHUNK_SIZE
+            )
+            for i, name in enumerate(bones_name)
+        ]
+        return vert_bone, chunks
+
+    def new_path():
+        members = entity_operator.GroupMembers(mesh, len(vertex_groups))
+        vert_bone = members.vert_bone(groups_idx)
+        chunks = []
+        for i, name in enumerate(bones_name):
+            prefix = f"chunk_{name}_"
+            chunk_groups = [
+                members.get(vertex_groups[group].index, 2)
+                for group in vertex_groups.keys()
+                if group.lower().startswith(prefix)
+            ]
+            chunks.append(
+                entity_operator.get_bod_chunks(
+                    *ranges(i), chunk_groups, CHUNK_SIZE
+                ).tolist()
+            )
+        return vert_bone, chunks
+
+    old_time, (old_bone, old_chunks) = best_time(old_path)
+    new_time, (new_bone, new_chunks) = best_time(new_path)
+    same = old_bone.tolist() == new_bone.tolist() and old_chunks == new_chunks
+    groups_num = len(vertex_groups)
+    bpy.data.objects.remove(obj)
+    bpy.data.meshes.remove(mesh)
+    return {
+        "verts": verts_num,
+        "bones": args.bones,
+        "groups": groups_num,
+        "old": round(old_time, 6),
+        "new": round(new_time, 6),
+        "same": same,
+    }
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    args = parse_args(argv)
+    entity_operator = find_module(".scripts.entity_operator")
+    ag_utils = find_module(".scripts.ag_utils")
+    if entity_operator is None or ag_utils is None:
+        print("Amagate add-on is not enabled")
+        return 2
+
+    results = []
+    for verts_num in args.verts:
+        result = bench(entity_operator, ag_utils, verts_num, args)
+        results.append(result)
+        speedup = result["old"] / max(result["new"], 1e-9)
+        print(
+            f"{result['verts']:>8} verts: {result['old']:.3f}s -> {result['new']:.3f}s"
+            f" ({speedup:.1f}x){'' if result['same'] else '  MISMATCH'}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=4)
+    return 0 if all(r["same"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
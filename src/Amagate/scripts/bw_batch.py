@@ -0,0 +1,228 @@
+# Author: Sryml
+# Email: sryml@hotmail.com
+# Python Version: 3.11
+# License: GPL-3.0
+
+# 后台批量编译地图
+# 驱动: python bw_batch.py a.blend b.blend ... --jobs 4 --blender "C:/Blender/blender.exe"
+# 每个.blend文件在单独的 `blender -b` 进程中运行本脚本 (工作模式)，编译bw并生成AG_Script/AG_MapCfg
+# 工作进程退出码: 0 成功, 1 编译异常, 2 未找到插件, 3 已取消或不是Blade地图
+
+from __future__ import annotations
+
+import sys
+
+# 本目录中的operator.py会遮蔽标准库模块，作为脚本运行时将其移出sys.path
+_script_dir = __file__.replace("\\", "/").rpartition("/")[0]
+sys.path[:] = [p for p in sys.path if p.replace("\\", "/") != _script_dir]
+
+import os
+import json
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+############################
+EXIT_OK = 0
+EXIT_EXCEPTION = 1
+EXIT_NO_ADDON = 2
+EXIT_CANCELLED = 3
+
+EXIT_NAMES = {
+    EXIT_OK: "ok",
+    EXIT_EXCEPTION: "exception",
+    EXIT_NO_ADDON: "no addon",
+    EXIT_CANCELLED: "cancelled",
+}
+
+LOG_TAIL = 20  # 失败时保留的输出行数
+############################
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="bw_batch", description="Compile Amagate maps in background Blender"
+    )
+    parser.add_argument("files", nargs="*", help=".blend files or directories")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "blender"))
+    parser.add_argument("-j", "--jobs", type=int, default=0)
+    parser.add_argument(
+        "--workers", type=int, default=0, help="sector compile processes per map"
+    )
+    parser.add_argument("--visible-only", action="store_true")
+    parser.add_argument("--with-run-script", action="store_true")
+    parser.add_argument("--timeout", type=float, default=0)
+    parser.add_argument("--summary", default="", help="write summary json")
+    return parser.parse_args(argv)
+
+
+############################
+############################ 工作模式 (在Blender中运行)
+############################
+
+
+def find_export_module():
+    for name, module in list(sys.modules.items()):
+        if name.endswith(".scripts.L3D_ext_operator"):
+            return module
+    return None
+
+
+def run_worker(args):
+    import bpy
+
+    module = find_export_module()
+    if module is None:
+        print("Amagate add-on is not enabled")
+        return EXIT_NO_ADDON
+
+    context = bpy.context
+    if not context.scene.amagate_data.is_blade:
+        print(f"Not a Blade map: {bpy.data.filepath}")
+        return EXIT_CANCELLED
+
+    try:
+        result = module.export_map(
+            None,
+            context,
+            visible_only=args.visible_only,
+            with_run_script=args.with_run_script,
+            ui=False,
+            workers=args.workers,
+        )
+    except Exception:
+        import traceback
+
+        traceback.print_exc()
+        return EXIT_EXCEPTION
+
+    if "FINISHED" not in result:
+        return EXIT_CANCELLED
+    return EXIT_OK if module.COMPILE_STATUS else EXIT_EXCEPTION
+
+
+############################
+############################ 驱动模式
+############################
+
+
+def collect_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(
+                    os.path.join(root, n) for n in sorted(names) if n.endswith(".blend")
+                )
+        else:
+            files.append(path)
+    return [os.path.abspath(f) for f in files]
+
+
+def compile_file(filepath, args, workers):
+    # type: (str, argparse.Namespace, int) -> dict
+    cmd = [
+        args.blender,
+        "-b",
+        filepath,
+        "--python",
+        os.path.abspath(__file__),
+        "--",
+        "--worker",
+        "--workers",
+        str(workers),
+    ]
+    if args.visible_only:
+        cmd.append("--visible-only")
+    if args.with_run_script:
+        cmd.append("--with-run-script")
+
+    start_time = time.perf_counter()
+    try:
+        proc = subprocess.run(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            timeout=args.timeout or None,
+        )
+        code = proc.returncode
+        output = proc.stdout
+    except subprocess.TimeoutExpired as e:
+        code = -1
+        output = f"Timeout after {e.timeout}s"
+    except OSError as e:
+        code = -2
+        output = str(e)
+    elapsed = time.perf_counter() - start_time
+
+    result = {"file": filepath, "code": code, "time": round(elapsed, 3)}
+    if code != EXIT_OK:
+        result["log"] = output.splitlines()[-LOG_TAIL:]
+    return result
+
+
+def run_driver(args):
+    files = collect_files(args.files)
+    if not files:
+        print("No .blend file found")
+        return 1
+
+    cpu_count = os.cpu_count() or 1
+    jobs = min(args.jobs or max(1, cpu_count // 2), len(files))
+    # 每个Blender进程的扇区编译进程数，避免超额占用CPU
+    workers = args.workers or max(1, cpu_count // jobs - 1)
+
+    print(f"Compiling {len(files)} maps, {jobs} jobs x {workers} workers")
+    start_time = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for result in executor.map(lambda f: compile_file(f, args, workers), files):
+            status = EXIT_NAMES.get(result["code"], f"error {result['code']}")
+            print(f"[{status:>9}] {result['time']:8.2f}s  {result['file']}")
+            for line in result.get("log", ()):
+                print(f"    {line}")
+            results.append(result)
+    total_time = time.perf_counter() - start_time
+
+    failed = [r for r in results if r["code"] != EXIT_OK]
+    print(
+        f"Done in {total_time:.2f}s, {len(results) - len(failed)} succeeded, {len(failed)} failed"
+    )
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "time": round(total_time, 3),
+                    "jobs": jobs,
+                    "workers": workers,
+                    "results": results,
+                },
+                file,
+                indent=4,
+                ensure_ascii=False,
+            )
+    return 1 if failed else 0
+
+
+############################
+def main():
+    argv = sys.argv[1:]
+    # Blender传递给脚本的参数在 `--` 之后
+    if "--" in argv:
+        argv = argv[argv.index("--") + 1 :]
+    args = parse_args(argv)
+    if args.worker:
+        code = run_worker(args)
+        sys.stdout.flush()
+        # 后台模式下sys.exit会被Blender捕获，使用os._exit确保退出码
+        os._exit(code)
+    sys.exit(run_driver(args))
+
+
+if __name__ == "__main__":
+    main()
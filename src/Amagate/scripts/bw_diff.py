@@ -0,0 +1,483 @@
+# Author: Sryml
+# Email: sryml@hotmail.com
+# Python Version: 3.11
+# License: GPL-3.0
+
+# bw文件结构比较工具
+# 用法: python bw_diff.py a.bw b.bw [--match name|index] [--tol 1e-6] [--tex-tol 1e-4]
+# 先按偏移索引计算每个扇区数据块的哈希 (顶点索引替换为坐标)，只解码哈希不同的扇区
+# 顶点索引解析为坐标，连接的扇区解析为扇区名称 (或索引) 后再比较，不受顶点表和扇区顺序变化的影响
+# 退出码: 0 相同, 1 有差异, 2 错误
+
+from __future__ import annotations
+
+import sys
+
+# 本目录中的operator.py会遮蔽标准库模块，作为脚本运行时将其移出sys.path
+_script_dir = __file__.replace("\\", "/").rpartition("/")[0]
+sys.path[:] = [p for p in sys.path if p.replace("\\", "/") != _script_dir]
+
+import os
+import math
+import time
+import types
+import struct
+import hashlib
+import argparse
+import importlib
+from typing import Any, Iterator
+
+############################
+PACKAGE_NAME = "amagate_scripts"  # 作为脚本运行时的包名
+
+EXIT_SAME = 0
+EXIT_DIFF = 1
+EXIT_ERROR = 2
+############################
+
+
+# 作为脚本运行时以包的方式加载本目录，使模块间的相对导入可用
+def load_modules():
+    if __package__:
+        from . import L3D_bwmodel, L3D_bwparse
+
+        return L3D_bwmodel, L3D_bwparse
+    if PACKAGE_NAME not in sys.modules:
+        package = types.ModuleType(PACKAGE_NAME)
+        package.__path__ = [os.path.dirname(os.path.abspath(__file__))]
+        sys.modules[PACKAGE_NAME] = package
+    return (
+        importlib.import_module(f"{PACKAGE_NAME}.L3D_bwmodel"),
+        importlib.import_module(f"{PACKAGE_NAME}.L3D_bwparse"),
+    )
+
+
+L3D_bwmodel, L3D_bwparse = load_modules()
+FACE_SKY = L3D_bwparse.FACE_SKY
+FACE_FULL = L3D_bwparse.FACE_FULL
+FACE_PLAIN = L3D_bwparse.FACE_PLAIN
+FACE_HOLE = L3D_bwparse.FACE_HOLE
+FACE_SPLIT = L3D_bwparse.FACE_SPLIT
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="bw_diff", description="Compare two Blade .bw map files"
+    )
+    parser.add_argument("file_a")
+    parser.add_argument("file_b")
+    parser.add_argument(
+        "--match",
+        choices=("name", "index"),
+        default="name",
+        help="match sectors by name (default, falls back to index on duplicates) or index",
+    )
+    parser.add_argument(
+        "--tol", type=float, default=1e-6, help="tolerance for coordinates and normals"
+    )
+    parser.add_argument(
+        "--tex-tol", type=float, default=1e-4, help="tolerance for texture mapping"
+    )
+    parser.add_argument(
+        "--max-diffs", type=int, default=20, help="differences shown per sector, 0 = all"
+    )
+    parser.add_argument(
+        "--no-index", action="store_true", help="do not read or write the .agidx index"
+    )
+    return parser.parse_args(argv)
+
+
+############################
+############################ 比较
+############################
+
+
+def is_close(a, b, tol) -> bool:
+    if a == b:
+        return True
+    if math.isnan(a) or math.isnan(b):
+        return math.isnan(a) and math.isnan(b)
+    return abs(a - b) <= tol
+
+
+# 递归比较记录，产出 (路径, a, b)，纹理数据使用纹理容差
+def diff_values(path, a, b, tols) -> Iterator[tuple[str, Any, Any]]:
+    if isinstance(a, float) and isinstance(b, (int, float)):
+        if not is_close(a, b, tols[0]):
+            yield path, a, b
+    elif isinstance(a, L3D_bwmodel.Record) and type(a) is type(b):
+        if isinstance(a, L3D_bwmodel.Texture):
+            tols = (tols[1], tols[1])
+        for key in a.__slots__:
+            yield from diff_values(f"{path}.{key}", getattr(a, key), getattr(b, key), tols)
+    elif isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        if len(a) != len(b):
+            yield f"{path}.len", len(a), len(b)
+            return
+        for i, (item_a, item_b) in enumerate(zip(a, b)):
+            yield from diff_values(f"{path}[{i}]", item_a, item_b, tols)
+    elif a != b:
+        yield path, a, b
+
+
+# 扇区数据块的哈希，只遍历结构不解码记录
+# 原始字节直接计入，顶点索引替换为坐标，连接的扇区替换为匹配键
+# 因此顶点表增删顶点或重排后，未改动的扇区哈希仍然相同
+class SectorHasher:
+    def __init__(self, side, buffer, vertices):
+        # type: (DiffSide, memoryview, memoryview) -> None
+        self.buffer = buffer
+        self.vertices = vertices
+        self.r = L3D_bwparse.Reader(buffer)
+        # 带长度前缀的匹配键
+        self.keys = []  # type: list[bytes]
+        for key in side.keys:
+            key = repr(key).encode()
+            self.keys.append(len(key).to_bytes(4, "little") + key)
+        self.span = 0
+        self.h = hashlib.blake2b(digest_size=16)
+
+    def digest(self, offset: int) -> bytes:
+        r = self.r
+        r.offset = self.span = offset
+        self.h = hashlib.blake2b(digest_size=16)
+        try:
+            r.skip(r.u32())  # 大气
+            r.skip(47 * 2 + 24)  # 环境光、平面光
+            for _ in range(r.u32()):
+                self.face()
+            self.raw()
+        except (struct.error, IndexError) as e:
+            raise L3D_bwparse.BWParseError(
+                f"Invalid bw file at offset {r.offset}: {e}"
+            ) from e
+        return self.h.digest()
+
+    # 计入上次位置到当前位置的原始字节
+    def raw(self):
+        end = self.r.offset
+        if end > len(self.buffer):
+            raise IndexError("sector data out of range")
+        self.h.update(self.buffer[self.span : end])
+        self.span = end
+
+    def verts(self):
+        r = self.r
+        num = r.u32()
+        self.raw()
+        vertices = self.vertices
+        size = len(vertices)
+        self.h.update(
+            b"".join(
+                vertices[i * 24 : i * 24 + 24]
+                if i * 24 < size
+                else f"<invalid {i}>".encode()
+                for i in r.unpack(f"<{num}I")
+            )
+        )
+        self.span = r.offset
+
+    def conn(self):
+        self.raw()
+        idx = self.r.u32()
+        if 0 <= idx < len(self.keys):
+            self.h.update(self.keys[idx])
+        else:
+            self.h.update(f"<invalid {idx}>".encode())
+        self.span = self.r.offset
+
+    def texture(self):
+        r = self.r
+        r.skip(8)  # 固定标识 (3,0)
+        r.skip(r.u32())
+        r.skip(48 + 8 + 8)  # vx, vy, xpos, ypos, 填充
+
+    def hole(self):
+        self.verts()
+        self.conn()
+        self.r.skip(32 * self.r.u32())  # 切线平面
+
+    def leaf(self):
+        r = self.r
+        for _ in range(r.u32()):
+            r.skip(4)
+            r.skip(4 * r.u32())
+
+    # 与 L3D_bwmodel.read_tree 的读取规则一致
+    def tree(self):
+        r = self.r
+        mark = r.u32()
+        if mark == L3D_bwmodel.MARK_LEAF:
+            self.leaf()
+            return
+        if mark not in (L3D_bwmodel.MARK_INNER, L3D_bwmodel.MARK_OUTER):
+            raise L3D_bwparse.BWParseError(
+                f"Unknown block mark {mark} at {r.offset - 4}"
+            )
+        mark_num = 1
+        cut_num = 0
+        while cut_num < mark_num:
+            mark = r.u32()
+            if mark in (L3D_bwmodel.MARK_INNER, L3D_bwmodel.MARK_OUTER):
+                mark_num += 1
+            elif mark == L3D_bwmodel.MARK_LEAF:
+                self.leaf()
+            else:
+                r.skip(-4)
+                r.skip(32)  # 法向, 距离
+                has_tex = r.unpack("<II") == L3D_bwmodel.TEX_MARK
+                r.skip(-8)
+                if has_tex:
+                    self.texture()
+                cut_num += 1
+
+    def face(self):
+        r = self.r
+        face_type = r.u32()
+        if face_type not in (FACE_PLAIN, FACE_FULL, FACE_HOLE, FACE_SPLIT, FACE_SKY):
+            raise L3D_bwparse.BWParseError(
+                f"Unknown face type {face_type} at {r.offset - 4}"
+            )
+        r.skip(32)  # 法向, 距离
+        if face_type in (FACE_FULL, FACE_SKY):
+            self.verts()
+            if face_type == FACE_SKY:
+                return
+            self.conn()
+        self.texture()
+        if face_type == FACE_FULL:
+            return
+        self.verts()
+        if face_type == FACE_HOLE:
+            self.hole()
+        elif face_type == FACE_SPLIT:
+            for _ in range(r.u32()):
+                self.hole()
+            self.tree()
+
+
+# 打开的bw文件，扇区数据块和顶点表直接在映射上访问
+class DiffSide:
+    def __init__(self, filepath, use_sidecar=True):
+        self.filepath = filepath
+        self.bw = L3D_bwparse.BWFile(filepath, use_sidecar)
+        index = self.bw.index
+        self.vertices = self.bw.reader(index.vertices).array(
+            "d", index.vertex_num * 3
+        )
+        self.names = self.bw.read_names()
+        self.groups = self.bw.read_groups()
+        self.keys = self.names  # type: list[Any]
+
+    def close(self):
+        self.bw.close()
+
+    # 需要先设置好匹配键
+    def sector_hashes(self) -> list[bytes]:
+        index = self.bw.index
+        buffer = memoryview(self.bw.buffer)
+        vertices = buffer[index.vertices : index.vertices + index.vertex_num * 24]
+        try:
+            hasher = SectorHasher(self, buffer, vertices)
+            return [hasher.digest(start) for start in index.sectors]
+        finally:
+            vertices.release()
+            buffer.release()
+
+    # 组数据之前的48个字节
+    def trailer(self) -> bytes:
+        offset = self.bw.index.groups - L3D_bwmodel.TRAILER_SIZE
+        return self.bw.buffer[offset : self.bw.index.groups]
+
+    def read_sector(self, idx: int):
+        return L3D_bwmodel.read_sector(self.bw.reader(self.bw.index.sectors[idx]))
+
+    def read_lights(self):
+        return [
+            L3D_bwmodel.read_light(self.bw.reader(offset))
+            for offset in self.bw.index.lights
+        ]
+
+    def coords(self, indices):
+        v = self.vertices
+        return [tuple(v[i * 3 : i * 3 + 3]) for i in indices]
+
+    def sector_key(self, idx):
+        if 0 <= idx < len(self.keys):
+            return self.keys[idx]
+        return f"<invalid {idx}>"
+
+    # 顶点解析为坐标，连接的扇区解析为匹配键
+    def resolve_hole(self, hole):
+        hole = L3D_bwmodel.Hole(**hole.to_dict())
+        hole.verts = self.coords(hole.verts)
+        hole.conn = self.sector_key(hole.conn)
+        return hole
+
+    def resolve_face(self, face):
+        face = L3D_bwmodel.Face(**face.to_dict())
+        face.verts = self.coords(face.verts)
+        if face.conn is not None:
+            face.conn = self.sector_key(face.conn)
+        if face.hole is not None:
+            face.hole = self.resolve_hole(face.hole)
+        if face.holes is not None:
+            face.holes = [self.resolve_hole(h) for h in face.holes]
+        return face
+
+    def resolve_light(self, light):
+        light = L3D_bwmodel.Light(**light.to_dict())
+        light.sectors = [self.sector_key(sid) for sid in light.sectors]
+        if light.type == L3D_bwmodel.LIGHT_BULB:
+            light.sector = self.sector_key(light.sector)
+        return light
+
+
+def diff_sector(side_a, side_b, idx_a, idx_b, tols):
+    sec_a = side_a.read_sector(idx_a)
+    sec_b = side_b.read_sector(idx_b)
+    for key in ("atmosphere", "ambient", "flat", "flat_vector"):
+        yield from diff_values(key, getattr(sec_a, key), getattr(sec_b, key), tols)
+    if side_a.groups[idx_a] != side_b.groups[idx_b]:
+        yield "group", side_a.groups[idx_a], side_b.groups[idx_b]
+    faces_a, faces_b = sec_a.faces, sec_b.faces
+    if len(faces_a) != len(faces_b):
+        yield "faces.len", len(faces_a), len(faces_b)
+    for i, (face_a, face_b) in enumerate(zip(faces_a, faces_b)):
+        yield from diff_values(
+            f"faces[{i}]", side_a.resolve_face(face_a), side_b.resolve_face(face_b), tols
+        )
+
+
+def fmt_value(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.9g}"
+    if isinstance(value, bytes):
+        return value.hex()
+    text = repr(value)
+    return text if len(text) <= 80 else f"{text[:77]}..."
+
+
+############################
+def run(args):
+    start_time = time.perf_counter()
+    use_sidecar = not args.no_index
+    tols = (args.tol, args.tex_tol)
+    side_a = DiffSide(args.file_a, use_sidecar)
+    try:
+        side_b = DiffSide(args.file_b, use_sidecar)
+    except BaseException:
+        side_a.close()
+        raise
+    diff_count = 0
+    try:
+        # 扇区匹配
+        match_by = args.match
+        if match_by == "name" and (
+            len(set(side_a.names)) != len(side_a.names)
+            or len(set(side_b.names)) != len(side_b.names)
+        ):
+            print("Duplicate sector names, matching by index")
+            match_by = "index"
+        if match_by == "index":
+            side_a.keys = list(range(len(side_a.names)))
+            side_b.keys = list(range(len(side_b.names)))
+        map_b = {key: idx for idx, key in enumerate(side_b.keys)}
+        pairs = [(idx, map_b.get(key)) for idx, key in enumerate(side_a.keys)]
+        matched_b = {idx_b for _, idx_b in pairs}
+        only_b = [idx for idx in range(len(side_b.keys)) if idx not in matched_b]
+
+        # 哈希相同的扇区无需解码
+        hashes_a = side_a.sector_hashes()
+        hashes_b = side_b.sector_hashes()
+        decoded = 0
+
+        # 大气
+        atmos_a = {
+            a.name: a
+            for a in map(lambda t: L3D_bwmodel.Atmosphere(*t), side_a.bw.read_atmospheres())
+        }
+        atmos_b = {
+            a.name: a
+            for a in map(lambda t: L3D_bwmodel.Atmosphere(*t), side_b.bw.read_atmospheres())
+        }
+        for name in sorted(atmos_a.keys() | atmos_b.keys()):
+            if name not in atmos_b:
+                print(f"Atmosphere {name!r} only in A")
+            elif name not in atmos_a:
+                print(f"Atmosphere {name!r} only in B")
+            else:
+                for path, a, b in diff_values("", atmos_a[name], atmos_b[name], tols):
+                    print(f"Atmosphere {name!r}{path}: {fmt_value(a)} -> {fmt_value(b)}")
+                    diff_count += 1
+                continue
+            diff_count += 1
+
+        # 扇区
+        for idx_a, idx_b in pairs:
+            label = f"Sector {side_a.names[idx_a]!r} ({idx_a + 1}"
+            if idx_b is None:
+                print(f"{label}) only in A")
+                diff_count += 1
+                continue
+            label = f"{label} -> {idx_b + 1})"
+            if side_a.names[idx_a] != side_b.names[idx_b]:
+                print(f"{label}: name: {side_a.names[idx_a]!r} -> {side_b.names[idx_b]!r}")
+                diff_count += 1
+            if (
+                hashes_a[idx_a] == hashes_b[idx_b]
+                and side_a.groups[idx_a] == side_b.groups[idx_b]
+            ):
+                continue
+            decoded += 1
+            shown = 0
+            for path, a, b in diff_sector(side_a, side_b, idx_a, idx_b, tols):
+                diff_count += 1
+                shown += 1
+                if args.max_diffs and shown > args.max_diffs:
+                    continue
+                print(f"{label}: {path}: {fmt_value(a)} -> {fmt_value(b)}")
+            if args.max_diffs and shown > args.max_diffs:
+                print(f"{label}: ... {shown - args.max_diffs} more")
+        for idx_b in only_b:
+            print(f"Sector {side_b.names[idx_b]!r} ({idx_b + 1}) only in B")
+            diff_count += 1
+
+        # 光源
+        lights_a = side_a.read_lights()
+        lights_b = side_b.read_lights()
+        if len(lights_a) != len(lights_b):
+            print(f"Lights: count {len(lights_a)} -> {len(lights_b)}")
+            diff_count += 1
+        for i, (light_a, light_b) in enumerate(zip(lights_a, lights_b)):
+            for path, a, b in diff_values(
+                "", side_a.resolve_light(light_a), side_b.resolve_light(light_b), tols
+            ):
+                print(f"Light {i}{path}: {fmt_value(a)} -> {fmt_value(b)}")
+                diff_count += 1
+        if side_a.trailer() != side_b.trailer():
+            print(f"Trailer: {side_a.trailer().hex()} -> {side_b.trailer().hex()}")
+            diff_count += 1
+    finally:
+        side_a.close()
+        side_b.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(
+        f"{diff_count} differences, {decoded} of {len(pairs)} sectors decoded"
+        f" ({elapsed:.2f}s)"
+    )
+    return EXIT_DIFF if diff_count else EXIT_SAME
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    try:
+        return run(args)
+    except (OSError, L3D_bwparse.BWParseError) as e:
+        print(f"Error: {e}")
+        return EXIT_ERROR
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+# Author: Sryml
+# Email: sryml@hotmail.com
+# Python Version: 3.11
+# License: GPL-3.0
+
+# bw文件检查工具，替代parsebw
+# 用法: python bw_inspect.py map.bw [--json | --dump] [--sector N] [--no-index]
+# 摘要和JSON读取完整关卡；--dump和--sector通过偏移索引直接定位扇区，扇区ID从1开始
+# 文本按需生成，只在输出时格式化
+
+from __future__ import annotations
+
+import sys
+
+# 本目录中的operator.py会遮蔽标准库模块，作为脚本运行时将其移出sys.path
+_script_dir = __file__.replace("\\", "/").rpartition("/")[0]
+sys.path[:] = [p for p in sys.path if p.replace("\\", "/") != _script_dir]
+
+import os
+import json
+import time
+import types
+import argparse
+import importlib
+from array import array
+from collections import Counter
+from typing import Any, Iterator
+
+############################
+PACKAGE_NAME = "amagate_scripts"  # 作为脚本运行时的包名
+############################
+
+
+# 作为脚本运行时以包的方式加载本目录，使模块间的相对导入可用
+def load_modules():
+    if __package__:
+        from . import L3D_bwmodel, L3D_bwparse
+
+        return L3D_bwmodel, L3D_bwparse
+    if PACKAGE_NAME not in sys.modules:
+        package = types.ModuleType(PACKAGE_NAME)
+        package.__path__ = [os.path.dirname(os.path.abspath(__file__))]
+        sys.modules[PACKAGE_NAME] = package
+    return (
+        importlib.import_module(f"{PACKAGE_NAME}.L3D_bwmodel"),
+        importlib.import_module(f"{PACKAGE_NAME}.L3D_bwparse"),
+    )
+
+
+L3D_bwmodel, L3D_bwparse = load_modules()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="bw_inspect", description="Inspect Blade .bw map files"
+    )
+    parser.add_argument("file", help=".bw file")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--json", action="store_true", help="dump records as json")
+    mode.add_argument("--dump", action="store_true", help="dump sectors as text")
+    parser.add_argument(
+        "-s", "--sector", type=int, default=0, help="only this sector (1-based)"
+    )
+    parser.add_argument(
+        "--no-index", action="store_true", help="do not read or write the .agidx index"
+    )
+    parser.add_argument("-o", "--output", default="", help="write to file")
+    return parser.parse_args(argv)
+
+
+############################
+############################ 格式化
+############################
+
+
+def fmt_vec(v) -> str:
+    return f"({v[0]:.6g}, {v[1]:.6g}, {v[2]:.6g})"
+
+
+def fmt_tex(tex) -> str:
+    if tex is None:
+        return "None"
+    return (
+        f"{tex.name}, vx: {fmt_vec(tex.vx)}, vy: {fmt_vec(tex.vy)}, "
+        f"pos: ({tex.xpos:.6g}, {tex.ypos:.6g})"
+    )
+
+
+def fmt_light(light) -> str:
+    return f"RGB: {light.rgb}, Intensity: {light.intensity:.6g}, Precision: {light.precision:.6g}"
+
+
+def dump_face(idx, face, offset=None) -> Iterator[str]:
+    address = f" - {offset:X}" if offset is not None else ""
+    line = f"    {idx}: {face.type}, Normal: {fmt_vec(face.normal)}, {face.distance:.6g}, Verts: {list(face.verts)}"
+    if face.conn is not None:
+        line += f", Sector: {face.conn + 1}"
+    yield f"{line}{address}\n"
+    if face.texture is not None:
+        yield f"        Texture: {fmt_tex(face.texture)}\n"
+    holes = [face.hole] if face.hole else face.holes or ()
+    for i, hole in enumerate(holes):
+        yield f"        Hole {i}: Sector: {hole.conn + 1}, Verts: {list(hole.verts)}, Tangents: {len(hole.tangents)}\n"
+        for normal, distance in hole.tangents:
+            yield f"            {fmt_vec(normal)}, {distance:.6g}\n"
+    for item in face.tree or ():
+        if isinstance(item, int):
+            yield f"        {item}\n"
+        elif isinstance(item, L3D_bwmodel.Leaf):
+            yield f"        8003 {item.refs}\n"
+        else:
+            yield f"        Cut: {fmt_vec(item.normal)}, {item.distance:.6g}\n"
+            if item.texture is not None:
+                yield f"            Texture: {fmt_tex(item.texture)}\n"
+
+
+def dump_sector(sector_id, sector, offsets=None) -> Iterator[str]:
+    yield f"Sector {sector_id}: {sector.atmosphere}, Faces: {len(sector.faces)}\n"
+    yield f"    Ambient {fmt_light(sector.ambient)}\n"
+    yield f"    Flat {fmt_light(sector.flat)}, Vector: {fmt_vec(sector.flat_vector)}\n"
+    for idx, face in enumerate(sector.faces):
+        yield from dump_face(idx, face, offsets[idx] if offsets else None)
+    yield "\n"
+
+
+def dump_file(bw, sector_id=0) -> Iterator[str]:
+    index = bw.index
+    if sector_id:
+        sector_ids = [sector_id]
+    else:
+        sector_ids = range(1, bw.sector_count + 1)
+    for sid in sector_ids:
+        start, end = index.face_start[sid - 1], index.face_start[sid]
+        sector = L3D_bwmodel.read_sector(bw.reader(index.sectors[sid - 1]))
+        yield from dump_sector(sid, sector, index.faces[start:end])
+    if sector_id:
+        return
+    for i in range(bw.light_count):
+        light = L3D_bwmodel.read_light(bw.reader(index.lights[i]))
+        if light.type == L3D_bwmodel.LIGHT_EXTERNAL:
+            sectors = [sid + 1 for sid in light.sectors]
+            yield f"Light {i}: External, {fmt_light(light)}, Vector: {fmt_vec(light.vector)}, Sectors: {sectors}\n"
+        else:
+            yield f"Light {i}: Bulb, {fmt_light(light)}, Position: {fmt_vec(light.position)}, Sector: {light.sector + 1}\n"
+
+
+def to_json(value) -> Any:
+    if isinstance(value, L3D_bwmodel.Record):
+        return {k: to_json(v) for k, v in value.to_dict().items()}
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, (list, tuple, array)):
+        return [to_json(v) for v in value]
+    return value
+
+
+def level_json(level) -> dict[str, Any]:
+    data = to_json(level)
+    vertices = data["vertices"]
+    data["vertices"] = [vertices[i : i + 3] for i in range(0, len(vertices), 3)]
+    return data
+
+
+def summary(filepath, level, elapsed) -> Iterator[str]:
+    faces = Counter(f.type for s in level.sectors for f in s.faces)
+    holes = sum(
+        (1 if f.hole else 0) + len(f.holes or ()) for s in level.sectors for f in s.faces
+    )
+    lights = Counter(light.type for light in level.lights)
+    yield f"File: {os.path.basename(filepath)} ({os.path.getsize(filepath)} bytes)\n"
+    yield f"Atmospheres: {len(level.atmospheres)}\n"
+    yield f"Vertices: {level.vertex_count}\n"
+    yield f"Sectors: {len(level.sectors)}\n"
+    face_types = ", ".join(f"{k}: {v}" for k, v in sorted(faces.items()))
+    yield f"Faces: {sum(faces.values())} ({face_types})\n"
+    yield f"Holes: {holes}\n"
+    yield (
+        f"Lights: {len(level.lights)} (External: {lights[L3D_bwmodel.LIGHT_EXTERNAL]},"
+        f" Bulb: {lights[L3D_bwmodel.LIGHT_BULB]})\n"
+    )
+    yield f"Groups: {len(set(level.groups))}\n"
+    yield f"Parse time: {elapsed * 1000:.1f} ms\n"
+
+
+############################
+def run(args, out):
+    filepath = args.file
+    if args.dump or args.sector:
+        with L3D_bwparse.BWFile(filepath, use_sidecar=not args.no_index) as bw:
+            if not 0 <= args.sector <= bw.sector_count:
+                print(f"Sector {args.sector} out of range (1-{bw.sector_count})")
+                return 1
+            if args.json:
+                r = bw.reader(bw.index.sectors[args.sector - 1])
+                json.dump(to_json(L3D_bwmodel.read_sector(r)), out, indent=2)
+                out.write("\n")
+            else:
+                out.writelines(dump_file(bw, args.sector))
+        return 0
+
+    start_time = time.perf_counter()
+    level = L3D_bwmodel.read_bw(filepath)
+    elapsed = time.perf_counter() - start_time
+    if args.json:
+        json.dump(level_json(level), out, indent=2)
+        out.write("\n")
+    else:
+        out.writelines(summary(filepath, level, elapsed))
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    try:
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as out:
+                return run(args, out)
+        return run(args, sys.stdout)
+    except (OSError, L3D_bwparse.BWParseError) as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+# Author: Sryml
+# Email: sryml@hotmail.com
+# Python Version: 3.11
+# License: GPL-3.0
+
+# 扇区编译的回归检查: 比对快照编译 (串行和并行) 与bmesh编译的结果，以及快照中的面法线
+# 在启用了插件的Blender中运行:
+#   blender -b map.blend --python compile_check.py -- [--workers 4] [--output check.json]
+# 存在差异时退出码为1
+
+from __future__ import annotations
+
+import sys
+
+# 本目录中的operator.py会遮蔽标准库模块，作为脚本运行时将其移出sys.path
+_script_dir = __file__.replace("\\", "/").rpartition("/")[0]
+sys.path[:] = [p for p in sys.path if p.replace("\\", "/") != _script_dir]
+
+import json
+import argparse
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="compile_check", description="Compare Amagate sector compile paths"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=0, help="parallel compile processes"
+    )
+    parser.add_argument("--output", default="", help="write results json")
+    return parser.parse_args(argv)
+
+
+def find_module(suffix):
+    for name, module in list(sys.modules.items()):
+        if name.endswith(suffix):
+            return module
+    return None
+
+
+# 快照中的面法线与bmesh面法线逐位比较，返回不同的面数
+def normal_mismatch(mesh, snapshot):
+    import bmesh
+
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    count = sum(
+        1
+        for face, normal in zip(bm.faces, snapshot["normals"])
+        if face.normal.to_tuple() != tuple(normal)
+    )
+    bm.free()
+    return count
+
+
+def check(ext_operator, L3D_compile, workers):
+    import bpy
+
+    scene_data = bpy.context.scene.amagate_data
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    sectors_dict = scene_data["SectorManage"]["sectors"]
+    sector_ids = sorted(
+        int(k)
+        for k in sectors_dict
+        if sectors_dict[k]["obj"].amagate_data.get_sector_data().is_convex
+    )
+    global_sector_map = {sid: i for i, sid in enumerate(sector_ids)}
+    tex_names = {}  # type: dict[int, str]
+    for img in bpy.data.images:
+        tex_id = img.amagate_data.id  # type: ignore
+        if tex_id != 0:
+            tex_names.setdefault(tex_id, img.name)
+
+    sectors = [sectors_dict[str(sid)]["obj"] for sid in sector_ids]
+    meshes = [sec.evaluated_get(depsgraph).data for sec in sectors]
+    snapshots = [
+        ext_operator.snapshot_sector(sec, mesh, global_sector_map, tex_names)
+        for sec, mesh in zip(sectors, meshes)
+    ]
+    serial = list(L3D_compile.iter_compile_sectors(snapshots, 1))
+    # 扇区数不足时强制使用并行路径
+    min_sectors = L3D_compile.PARALLEL_MIN_SECTORS
+    L3D_compile.PARALLEL_MIN_SECTORS = 1
+    try:
+        parallel = list(
+            L3D_compile.iter_compile_sectors(
+                snapshots, max(workers or L3D_compile.get_workers(), 2)
+            )
+        )
+    finally:
+        L3D_compile.PARALLEL_MIN_SECTORS = min_sectors
+
+    results = []
+    for sec, mesh, snapshot, blob, blob_2 in zip(
+        sectors, meshes, snapshots, serial, parallel
+    ):
+        result = {"name": sec.name, "normals": normal_mismatch(mesh, snapshot)}
+        # 需要平面切割的扇区只由bmesh编译
+        if blob is None or blob_2 is None:
+            result["parallel"] = "" if blob is None and blob_2 is None else "blob"
+            result["bmesh"] = ""
+        else:
+            blob_2.pop("profile", None)
+            result["parallel"] = ext_operator.blob_diff(blob, blob_2)
+            result["bmesh"] = ext_operator.blob_diff(
+                blob,
+                ext_operator.compile_sector_bmesh(sec, mesh, global_sector_map),
+            )
+        result["same"] = not (
+            result["normals"] or result["parallel"] or result["bmesh"]
+        )
+        results.append(result)
+    return results
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    args = parse_args(argv)
+    ext_operator = find_module(".scripts.L3D_ext_operator")
+    L3D_compile = find_module(".scripts.L3D_compile")
+    if ext_operator is None or L3D_compile is None:
+        print("Amagate add-on is not enabled")
+        return 2
+
+    results = check(ext_operator, L3D_compile, args.workers)
+    failed = [r for r in results if not r["same"]]
+    for r in failed:
+        print(
+            f"MISMATCH {r['name']}: normals {r['normals']},"
+            f" parallel '{r['parallel']}', bmesh '{r['bmesh']}'"
+        )
+    print(f"{len(results)} sectors, {len(failed)} mismatched")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=4, ensure_ascii=False)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -795,6 +795,33 @@ class WindowManagerProperty(bpy.types.PropertyGroup):
         default=True,
     )  # type: ignore
     ent_chunk_size: IntProperty(name="Chunk Size", default=256, min=1, max=512, step=16)  # type: ignore
+    weld_tolerance: FloatProperty(
+        name="Weld Tolerance",
+        description="Weld vertices of different sectors within this Euclidean distance (mm) of the first welded vertex when compiling. The default 0 only merges identical vertices and keeps near-duplicates caused by rounding",
+        default=0.0,
+        min=0.0,
+        max=10.0,
+    )  # type: ignore
+    compile_report: BoolProperty(
+        name="Compile Report",
+        description="Record stage and sector timings and write a JSON report next to the .bw",
+        default=False,
+    )  # type: ignore
+    preview_hops: IntProperty(
+        name="Preview Hops",
+        description="Number of portal hops from the view sector included in the preview",
+        default=2,
+        min=0,
+        max=64,
+    )  # type: ignore
+    preview_radius: FloatProperty(
+        name="Preview Radius",
+        description="Also include connected sectors within this distance of the view, 0 to disable",
+        default=0.0,
+        min=0.0,
+        subtype="DISTANCE",
+        unit="LENGTH",
+    )  # type: ignore
     #
     ent_inter_name: StringProperty(default="", get=lambda self: self.get_ent_inter_name(), set=lambda self, value: None)  # type: ignore
     ent_enum: EnumProperty(
@@ -0,0 +1,404 @@
+# Author: Sryml
+# Email: sryml@hotmail.com
+# Python Version: 3.11
+# License: GPL-3.0
+
+# BOD模型读取，不依赖bpy，可在子进程中运行
+# scan_bod只解析结构和元数据，用于模型索引，不解码顶点和面
+# read_bod解码完整的模型数据，由导入操作在主线程中创建对象
+
+from __future__ import annotations
+
+import os
+import sys
+import struct
+import hashlib
+import functools
+import importlib.util
+from array import array
+from typing import Any
+
+import numpy as np
+
+if __package__:
+    from . import ag_binio
+else:
+    # 独立加载时按路径加载同目录的ag_binio，本目录中的operator.py会遮蔽标准库，不能加入sys.path
+    _binio_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ag_binio.py")
+    _spec = importlib.util.spec_from_file_location("ag_binio", _binio_file)
+    ag_binio = importlib.util.module_from_spec(_spec)  # type: ignore
+    _spec.loader.exec_module(ag_binio)  # type: ignore
+
+############################
+# 独立模块名，子进程通过该名称导入本模块
+STANDALONE_NAME = "entity_bod"
+
+# 并行处理的最少文件数，少于该数量时在当前进程处理
+PARALLEL_MIN_FILES = 8
+
+HASH_CHUNK_SIZE = 1 << 20
+
+# BOD定长记录的大小
+VERT_SIZE = 48  # 坐标和法线
+FACE_FIXED_SIZE = 12 + 24 + 4  # 顶点索引、UV、固定0
+BONE_FIXED_SIZE = 4 + 128 + 8  # 父骨骼索引、矩阵、顶点数量和起始位置
+CHUNK_SIZE = 40
+FIRE_VERT_SIZE = 28
+LIGHT_SIZE = 36
+ANCHOR_FIXED_SIZE = 132
+EDGE_SIZE = 80
+SPIKE_SIZE = 56
+TRAIL_SIZE = 56
+
+############################
+
+
+# 文件内容的哈希
+def file_hash(filepath) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filepath, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Blade坐标 (毫米, x,-z,y) 转换到Blender坐标 (米)
+def to_blender(co):
+    x, y, z = co
+    return (x / 1000, z / 1000, -y / 1000)
+
+
+# 扫描BOD文件的结构，返回元数据
+def scan_bod(filepath) -> dict[str, Any]:
+    with ag_binio.open_reader(filepath) as f:
+        name = f.lstring()
+        # 顶点
+        verts_num = f.u32()
+        f.skip(VERT_SIZE * verts_num)
+        # 面
+        faces_num = f.u32()
+        textures = set()
+        for i in range(faces_num):
+            f.skip(12)
+            textures.add(f.lstring())
+            f.skip(FACE_FIXED_SIZE - 12)
+        # 骨架，只有一个骨骼时没有骨架
+        bones_num = f.u32()
+        for i in range(bones_num):
+            if bones_num != 1:
+                f.skip(f.u32())
+            f.skip(BONE_FIXED_SIZE)
+            f.skip(CHUNK_SIZE * f.u32())
+        # 几何中心和半径
+        center = f.vec3()
+        radius = f.f64()
+        # 火焰
+        fires_num = f.u32()
+        for i in range(fires_num):
+            f.skip(FIRE_VERT_SIZE * f.u32())
+            f.skip(8)
+        # 灯光
+        lights_num = f.u32()
+        f.skip(LIGHT_SIZE * lights_num)
+        # 锚点
+        anchors = []
+        for i in range(f.u32()):
+            anchors.append(f.lstring())
+            f.skip(ANCHOR_FIXED_SIZE)
+        # 剩余数据: 边缘，尖刺，组，轨迹
+        counts = {"edges": 0, "spikes": 0, "trails": 0}
+        data_num = f.u32()
+        for kind, size in (("edges", EDGE_SIZE), ("spikes", SPIKE_SIZE)):
+            if data_num == 0:
+                break
+            counts[kind] = f.u32()
+            f.skip(size * counts[kind])
+            data_num -= 1
+        if data_num:
+            # 组和肢解组
+            f.skip(f.u32())
+            f.skip(4 * f.u32())
+            data_num -= 1
+        if data_num:
+            counts["trails"] = f.u32()
+            f.skip(TRAIL_SIZE * counts["trails"])
+        # 跳过的数据超出文件范围
+        if f.tell() > len(f):
+            raise struct.error("unpack requires more data")
+
+    return {
+        "type": "BOD",
+        "name": name,
+        "vertices": verts_num,
+        "faces": faces_num,
+        "bones": bones_num if bones_num != 1 else 0,
+        "anchors": len(anchors),
+        "anchor_names": anchors,
+        "lights": lights_num,
+        "fires": fires_num,
+        **counts,
+        "textures": sorted(textures),
+        "center": to_blender(center),
+        "radius": radius / 1000,
+    }
+
+
+# 扫描单个模型文件，.blend文件的元数据需要在Blender主线程中读取，这里只计算哈希
+def scan_file(filepath) -> dict[str, Any]:
+    record = {"hash": file_hash(filepath)}
+    if filepath.lower().endswith(".bod"):
+        record.update(scan_bod(filepath))
+    return record
+
+
+# BOD顶点记录: 坐标和法线
+BOD_VERT_DTYPE = np.dtype([("co", "<f8", 3), ("normal", "<f8", 3)])
+
+
+# 读取BOD面表，面记录包含纹理名称，长度不固定
+def read_bod_faces(f: ag_binio.Reader, faces_num):
+    vert_idx = array("I")
+    uvs = array("f")
+    img_names = []  # type: list[str]
+    for i in range(faces_num):
+        vert_idx.extend(f.unpack("III"))
+        img_names.append(f.lstring())
+        uvs.extend(f.unpack("ffffff"))
+        # 跳过0
+        f.skip(4)
+    vert_idx = np.frombuffer(vert_idx, dtype=np.uint32).reshape(-1, 3)
+    # (u0, u1, u2, v0, v1, v2) -> 每个循环的 (u, v)
+    uvs = np.frombuffer(uvs, dtype=np.float32).reshape(-1, 2, 3).transpose(0, 2, 1)
+    return vert_idx, uvs, img_names
+
+
+# 分配面的顶点索引，规则与bmesh创建面一致:
+# 面的顶点集合已存在时为折叠面，改用复制的顶点，复制顶点的索引从verts_num开始
+def build_bod_faces(vert_idx, verts_num):
+    # type: (np.ndarray, int) -> tuple[list[int], list[int], list[int], dict[int, list[int]], int, int, int]
+    face_keys = set()
+    kept = []  # 保留的面在文件中的索引
+    loops = []
+    dup_src = []  # 复制顶点对应的原顶点
+    verts_dup = {}  # type: dict[int, list[int]]
+    folded_faces = 0
+    multiple_folded_face = 0
+    zero_width_faces = 0
+    for face_idx, verts in enumerate(vert_idx.tolist()):
+        key = frozenset(verts)
+        if len(key) != 3:
+            zero_width_faces += 1
+            continue
+        if key in face_keys:
+            level = 0
+            while True:
+                dup_verts = [
+                    verts_dup[i][level]
+                    for i in verts
+                    if i in verts_dup and level < len(verts_dup[i])
+                ]
+                if len(dup_verts) == 3:
+                    key = frozenset(dup_verts)
+                    if key in face_keys:
+                        level += 1
+                        continue
+                else:
+                    dup_verts = []
+                    for i in verts:
+                        if i in verts_dup and level < len(verts_dup[i]):
+                            dup_verts.append(verts_dup[i][level])
+                        else:
+                            index = verts_num + len(dup_src)
+                            verts_dup.setdefault(i, []).append(index)
+                            dup_src.append(i)
+                            dup_verts.append(index)
+                            if level != 0:
+                                multiple_folded_face += 1
+                    key = frozenset(dup_verts)
+                break
+            #
+            if level == 0:
+                folded_faces += 1
+            verts = dup_verts
+        face_keys.add(key)
+        kept.append(face_idx)
+        loops.extend(verts)
+    return (
+        kept,
+        loops,
+        dup_src,
+        verts_dup,
+        folded_faces,
+        multiple_folded_face,
+        zero_width_faces,
+    )
+
+
+# 火焰顶点: 坐标和标记
+FIRE_VERT_DTYPE = np.dtype([("co", "<f8", 3), ("mark", "<u4")])
+# 灯光: 强度、精度、坐标、父骨骼索引
+LIGHT_DTYPE = np.dtype(
+    [("strength", "<f4"), ("precision", "<f4"), ("co", "<f8", 3), ("parent", "<i4")]
+)
+# 边缘: 标记、父骨骼索引、三个点
+EDGE_DTYPE = np.dtype([("mark", "<u4"), ("parent", "<i4"), ("points", "<f8", (3, 3))])
+# 尖刺和轨迹: 标记、父骨骼索引、起点和方向
+SPIKE_DTYPE = np.dtype([("mark", "<u4"), ("parent", "<i4"), ("points", "<f8", (2, 3))])
+
+
+# 解码BOD文件，返回只包含基本类型和数组的数据，可跨进程传递
+# 网格顶点坐标转换为米，其它数据保持文件中的单位 (毫米)
+def read_bod(filepath) -> dict[str, Any]:
+    bod = {}  # type: dict[str, Any]
+    with ag_binio.open_reader(filepath) as f:
+        bod["name"] = f.lstring()
+        # 顶点，跳过法线
+        verts_num = f.u32()
+        coords = f.ndarray(BOD_VERT_DTYPE, verts_num)["co"] / 1000
+        # 面
+        vert_idx, uvs, img_names = read_bod_faces(f, f.u32())
+        (
+            kept,
+            loops,
+            dup_src,
+            verts_dup,
+            bod["folded_faces"],
+            bod["multiple_folded_face"],
+            bod["zero_width_faces"],
+        ) = build_bod_faces(vert_idx, verts_num)
+        # 复制的顶点使用原顶点的坐标
+        dup_src = np.array(dup_src, dtype=np.int64)
+        bod["verts_num"] = verts_num
+        bod["coords"] = np.concatenate((coords, coords[dup_src]))
+        bod["loops"] = np.array(loops, dtype=np.int32)
+        bod["dup_src"] = dup_src
+        bod["verts_dup"] = verts_dup
+        bod["uvs"] = uvs[kept]
+        bod["face_images"] = [img_names[i] for i in kept]
+        # 骨骼: (名称, 父骨骼索引, 矩阵, 顶点数量, 顶点起始位置)
+        bones = []
+        bones_num = f.u32()
+        for i in range(bones_num):
+            name = f.lstring() if bones_num != 1 else ""
+            parent_idx = f.i32()
+            matrix = f.unpack("dddd" * 4)
+            numverts, vert_start = f.unpack("II")
+            bones.append((name, parent_idx, matrix, numverts, vert_start))
+            f.skip(CHUNK_SIZE * f.u32())
+        bod["bones"] = bones
+        # 几何中心和半径
+        bod["center"] = f.vec3()
+        bod["radius"] = f.f64()
+        # 火焰: (顶点, 父骨骼索引, 序号)
+        fires = []
+        for i in range(f.u32()):
+            verts = f.ndarray(FIRE_VERT_DTYPE, f.u32())
+            fires.append((verts, *f.unpack("iI")))
+        bod["fires"] = fires
+        bod["lights"] = f.ndarray(LIGHT_DTYPE, f.u32())
+        # 锚点: (名称, 矩阵, 父骨骼索引)
+        anchors = []
+        for i in range(f.u32()):
+            name = f.lstring()
+            anchors.append((name, f.unpack("dddd" * 4), f.i32()))
+        bod["anchors"] = anchors
+        # 剩余数据: 边缘，尖刺，组，轨迹，数据种类数决定读取到哪一项
+        data_num = bod["data_num"] = f.u32()
+        bod["edges"] = np.zeros(0, dtype=EDGE_DTYPE)
+        bod["spikes"] = np.zeros(0, dtype=SPIKE_DTYPE)
+        bod["trails"] = np.zeros(0, dtype=SPIKE_DTYPE)
+        if data_num > 0:
+            bod["edges"] = f.ndarray(EDGE_DTYPE, f.u32())
+        if data_num > 1:
+            bod["spikes"] = f.ndarray(SPIKE_DTYPE, f.u32())
+        if data_num > 2:
+            bod["groups"] = f.ndarray(np.uint8, f.u32())
+            bod["mutilation_groups"] = f.ndarray(np.int32, f.u32())
+        if data_num > 3:
+            bod["trails"] = f.ndarray(SPIKE_DTYPE, f.u32())
+    return bod
+
+
+############################
+############################ 并行处理
+############################
+
+
+# 以独立模块名加载本模块，使子进程可以反序列化任务
+def get_standalone():
+    module = sys.modules.get(STANDALONE_NAME)
+    if module is not None and getattr(module, "__file__", None) == __file__:
+        return module
+    spec = importlib.util.spec_from_file_location(STANDALONE_NAME, __file__)
+    module = importlib.util.module_from_spec(spec)  # type: ignore
+    sys.modules[STANDALONE_NAME] = module
+    spec.loader.exec_module(module)  # type: ignore
+    return module
+
+
+# 子进程的初始化代码，按文件路径加载本模块
+def _bootstrap_code() -> str:
+    return (
+        "import sys, importlib.util\n"
+        f"spec = importlib.util.spec_from_file_location({STANDALONE_NAME!r}, {__file__!r})\n"
+        "module = importlib.util.module_from_spec(spec)\n"
+        f"sys.modules[{STANDALONE_NAME!r}] = module\n"
+        "spec.loader.exec_module(module)\n"
+    )
+
+
+def get_workers() -> int:
+    return max(1, min((os.cpu_count() or 1) - 1, 8))
+
+
+# 捕获异常，返回 (结果, 错误信息)
+def _call(func_name, filepath):
+    try:
+        return getattr(sys.modules[STANDALONE_NAME], func_name)(filepath), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+# 对多个文件调用本模块的函数，按输入顺序逐个产出 (文件, 结果, 错误信息)
+def map_files(func_name, files, workers=0):
+    if workers <= 0:
+        workers = get_workers()
+    done = 0
+    if workers > 1 and len(files) >= PARALLEL_MIN_FILES:
+        for result in _iter_parallel(func_name, files, workers):
+            yield (files[done], *result)
+            done += 1
+        if done == len(files):
+            return
+    # 串行处理，或并行不可用时处理剩余部分
+    get_standalone()
+    for filepath in files[done:]:
+        yield (filepath, *_call(func_name, filepath))
+
+
+def _iter_parallel(func_name, files, workers):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+
+    module = get_standalone()
+    chunksize = max(1, min(16, len(files) // (workers * 4)))
+    executor = None
+    finished = False
+    try:
+        executor = ProcessPoolExecutor(
+            max_workers=min(workers, len(files)),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=exec,
+            initargs=(_bootstrap_code(), {}),
+        )
+        yield from executor.map(
+            functools.partial(module._call, func_name), files, chunksize=chunksize
+        )
+        finished = True
+    except (BrokenProcessPool, OSError) as e:
+        print(f"\nParallel processing unavailable, fallback to serial: {e}")
+    finally:
+        # 中止时取消剩余任务，不等待子进程
+        if executor is not None:
+            executor.shutdown(wait=finished, cancel_futures=not finished)
@@ -0,0 +1,167 @@
+# Author: Sryml
+# Email: sryml@hotmail.com
+# Python Version: 3.11
+# License: GPL-3.0
+
+# 模型库元数据索引，不依赖bpy
+# 按路径记录BOD和模型.blend文件的大小、修改时间、哈希和结构信息:
+# 顶点/面/骨骼/锚点/灯光/火焰数量、纹理名称、包围球 (Blender坐标，米)
+# 索引保存在磁盘上，更新时只重新扫描大小或修改时间变化的文件，BOD在子进程中并行扫描
+
+from __future__ import annotations
+
+import os
+import pickle
+
+from . import entity_bod
+
+############################
+# 索引版本，记录格式或扫描规则变化时递增
+INDEX_VERSION = 1
+
+MODEL_SUFFIXES = (".bod", ".blend")
+
+############################
+
+
+def normpath(filepath) -> str:
+    return os.path.normcase(os.path.abspath(filepath))
+
+
+# 文件的缓存键: (大小, 修改时间)
+def file_key(filepath) -> tuple[int, int]:
+    stat = os.stat(filepath)
+    return stat.st_size, stat.st_mtime_ns
+
+
+# 收集文件和目录(不递归)中的模型文件
+def collect_models(paths) -> list[str]:
+    # type: (list[str]) -> list[str]
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for entry in sorted(os.scandir(path), key=lambda e: e.name.lower()):
+                if entry.is_file() and entry.name.lower().endswith(MODEL_SUFFIXES):
+                    files.append(normpath(entry.path))
+        elif os.path.isfile(path) and path.lower().endswith(MODEL_SUFFIXES):
+            files.append(normpath(path))
+    return list(dict.fromkeys(files))
+
+
+class ModelIndex:
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self.entries = {}  # type: dict[str, dict]
+        self.changed = False
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, filepath):
+        return normpath(filepath) in self.entries
+
+    def get(self, filepath):
+        # type: (str) -> dict | None
+        return self.entries.get(normpath(filepath))
+
+    def load(self):
+        self.entries = {}
+        self.changed = False
+        if not os.path.exists(self.cache_file):
+            return self
+        try:
+            with open(self.cache_file, "rb") as f:
+                cache = pickle.load(f)
+        except Exception as e:
+            print(f"Failed to load model index: {e}")
+            return self
+        if isinstance(cache, dict) and cache.get("index_version") == INDEX_VERSION:
+            self.entries = cache["entries"]
+        return self
+
+    def save(self):
+        if not self.changed:
+            return
+        cache = {"index_version": INDEX_VERSION, "entries": self.entries}
+        temp_file = f"{self.cache_file}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+            with open(temp_file, "wb") as f:
+                pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, self.cache_file)
+            self.changed = False
+        except OSError as e:
+            print(f"Failed to save model index: {e}")
+
+    def is_stale(self, filepath, key, blend_scanner=None):
+        entry = self.entries.get(filepath)
+        if entry is None or (entry["size"], entry["mtime"]) != key:
+            return True
+        # 之前没有扫描.blend的元数据
+        return blend_scanner is not None and "type" not in entry
+
+    def update(self, paths, blend_scanner=None, workers=0, progress=None):
+        """更新文件和目录中的模型，返回 (重新扫描的文件, 扫描失败的文件和错误信息)
+
+        blend_scanner(文件)在当前线程中读取.blend文件的元数据字典，未提供时只记录哈希
+        progress(完成数, 总数)在每个文件扫描后调用
+        """
+        paths = list(paths)
+        files = collect_models(paths)
+        # 移除已删除的文件
+        found = set(files)
+        roots = {normpath(p) for p in paths if os.path.isdir(p)}
+        targets = {normpath(p) for p in paths}
+        for filepath in list(self.entries):
+            if filepath in found:
+                continue
+            if os.path.dirname(filepath) in roots or filepath in targets:
+                del self.entries[filepath]
+                self.changed = True
+        #
+        keys = {}
+        stale = []
+        for filepath in files:
+            keys[filepath] = file_key(filepath)
+            if self.is_stale(filepath, keys[filepath], blend_scanner):
+                stale.append(filepath)
+
+        errors = {}  # type: dict[str, str]
+        total = len(stale)
+        for count, (filepath, record, error) in enumerate(
+            entity_bod.map_files("scan_file", stale, workers), 1
+        ):
+            if error is None and blend_scanner and filepath.lower().endswith(".blend"):
+                try:
+                    record.update(blend_scanner(filepath))
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+            if error is not None:
+                errors[filepath] = error
+                self.entries.pop(filepath, None)
+            else:
+                record["path"] = filepath
+                record["size"], record["mtime"] = keys[filepath]
+                self.entries[filepath] = record
+            self.changed = True
+            if progress:
+                progress(count, total)
+        return stale, errors
+
+    def query(self, predicate=None, sort_key=None, reverse=False):
+        """筛选并排序索引记录，predicate(记录)返回是否保留，sort_key可以是字段名或函数"""
+        entries = [e for e in self.entries.values() if predicate is None or predicate(e)]
+        if isinstance(sort_key, str):
+            field = sort_key
+            sort_key = lambda e: (e.get(field) is None, e.get(field))
+        if sort_key is not None:
+            entries.sort(key=sort_key, reverse=reverse)
+        return entries
+
+    def find_texture(self, texture):
+        # type: (str) -> list[dict]
+        """使用指定纹理的模型"""
+        texture = texture.lower()
+        return self.query(
+            lambda e: any(t.lower() == texture for t in e.get("textures", ()))
+        )
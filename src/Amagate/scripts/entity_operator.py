@@ -9,16 +9,17 @@ import sys
 import os
 import math
 import pickle
-import struct
 import contextlib
 import shutil
 import threading
 import time
 import json
+import numpy as np
+from array import array
 from datetime import datetime
 from pathlib import Path
 from pprint import pprint
-from io import StringIO, BytesIO
+from io import StringIO
 from typing import Any, TYPE_CHECKING
 
 import bpy
@@ -39,8 +40,8 @@ from bpy.props import (
 from mathutils import *  # type: ignore
 from bpy_extras.io_utils import ExportHelper
 
-from . import data, entity_data
-from . import ag_utils
+from . import data, entity_data, L3D_data
+from . import ag_utils, ag_binio, entity_bod, entity_index
 
 
 if TYPE_CHECKING:
@@ -56,124 +57,327 @@ if TYPE_CHECKING:
 ############################
 logger = data.logger
 
-unpack = ag_utils.unpack
+MODEL_INDEX = None  # type: entity_index.ModelIndex | None
+
 
 ############################
 
 
-# 解析BOD
+# 解析BOD，结构遍历由 entity_bod.scan_bod 完成，返回元数据
 def parse_bod(filepath: Path):
-    def final():
-        pass
-        # if f.tell() != file_size:
-        #     if num:=unpack("I", f)[0] != 0:
-        #         remain_byte = file_size - f.tell()
-        #         logger.warning(f"{filepath.name:<20}: 未解析完毕, 剩余{remain_byte:<4}字节, num={num}, data_num_remain={data_num_remain}")
-        # logger.warning(f"{filepath.name:<20}: 未解析完毕, 剩余{remain_byte:<4}字节, data_num_remain={data_num_remain}")
-
-    with open(filepath, "rb") as f:
-        file_size = os.fstat(f.fileno()).st_size
-        # 内部名称
-        length = unpack("I", f)[0]
-        inter_name = unpack(f"{length}s", f)
-        # 顶点
-        verts_num = unpack("I", f)[0]
-        f.seek(48 * verts_num, 1)
-        # 面
-        faces_num = unpack("I", f)[0]
-        for i in range(faces_num):
-            # vert_idx
-            f.seek(12, 1)
-            length = unpack("I", f)[0]
-            # img_name = unpack(f"{length}s", f)
-            f.seek(length, 1)
-            # uv_list
-            f.seek(24, 1)
-            # 跳过0
-            f.seek(4, 1)
-        # 骨架
-        bones_num = unpack("I", f)[0]
-        for i in range(bones_num):
-            if bones_num != 1:
-                length = unpack("I", f)[0]
-                f.seek(length, 1)
-                # name = unpack(f"{length}s", f)
-            f.seek(140, 1)
-            # parent_idx = unpack("i", f)[0]  # type: int
-            # lst = unpack("dddd" * 4, f)
-            # lst = [lst[i * 4 : (i + 1) * 4] for i in range(4)]
-            # matrix = Matrix(lst)
-            # matrix.transpose()  # 转置
-            # matrix.translation /= 1000  # 转换位置单位
-            # # 清除缩放
-            # loc, rot, scale = matrix.decompose()
-            # matrix = Matrix.LocRotScale(loc, rot, None)
-            # if (
-            #     matrix.to_quaternion().dot(Quaternion()) < 0.999
-            #     or matrix.translation.length > 0.001
-            # ):
-            #     logger.debug(f"{filepath.name}: {tuple(matrix.to_euler())}, {matrix.translation.to_tuple(1)}")  # type: ignore
-            num = unpack("I", f)[0]
-            for j in range(num):
-                f.seek(40, 1)
-        # 几何中心
-        f.seek(32, 1)
-        # 火焰
-        num = unpack("I", f)[0]
-        for idx in range(num):
-            verts_num = unpack("I", f)[0]
-            for i in range(verts_num):
-                f.seek(28, 1)
-            f.seek(8, 1)
-        # 灯光
-        num = unpack("I", f)[0]
-        for idx in range(num):
-            f.seek(36, 1)
-        # 锚点
-        num = unpack("I", f)[0]
-        for idx in range(num):
-            length = unpack("I", f)[0]
-            f.seek(length, 1)
-            f.seek(132, 1)
-        # 剩余数据种类
-        data_num_remain = data_num = unpack("I", f)[0]
-        if data_num == 0:
-            return final()
-
-        # 边缘
-        num = unpack("I", f)[0]
-        for idx in range(num):
-            f.seek(80, 1)
+    return entity_bod.scan_bod(str(filepath))
+
+
+# 用三角面数组批量创建网格
+def build_bod_mesh(mesh, coords, loops, uvs, material_index):
+    # type: (bpy.types.Mesh, np.ndarray, list[int], np.ndarray, np.ndarray) -> None
+    faces_num = len(material_index)
+    mesh.vertices.add(len(coords))
+    mesh.vertices.foreach_set("co", coords.astype(np.float32).ravel())
+    mesh.loops.add(faces_num * 3)
+    mesh.loops.foreach_set("vertex_index", np.array(loops, dtype=np.int32))
+    mesh.polygons.add(faces_num)
+    mesh.polygons.foreach_set(
+        "loop_start", np.arange(0, faces_num * 3, 3, dtype=np.int32)
+    )
+    mesh.polygons.foreach_set("material_index", material_index)
+    uv_layer = mesh.uv_layers.new(name="UVMap")
+    uv_layer.data.foreach_set("uv", uvs.astype(np.float32).ravel())
+    mesh.update(calc_edges=True)
+
+
+# BOD面记录的定长部分: 顶点索引和纹理名称长度、UV和固定0
+BOD_FACE_HEAD_DTYPE = np.dtype([("verts", "<u4", 3), ("length", "<u4")])
+BOD_FACE_TAIL_DTYPE = np.dtype([("uv", "<f4", 6), ("zero", "<f4")])
+
+
+# 按mathutils的单精度运算计算 Matrix @ Vector，与逐顶点变换的结果一致
+def matrix_mul_co(mat, co):
+    # type: (np.ndarray, np.ndarray) -> np.ndarray
+    result = np.empty_like(co)
+    for row in range(3):
+        dot = np.zeros(len(co))  # 双精度累加
+        for col in range(3):
+            dot += mat[row, col] * co[:, col]
+        dot += mat[row, 3]
+        result[:, row] = dot
+    return result
+
+
+# 按mathutils的单精度运算计算 Quaternion @ Vector
+def quat_mul_co(quat, co):
+    # type: (np.ndarray, np.ndarray) -> np.ndarray
+    w, x, y, z = quat
+    r0, r1, r2 = co[:, 0], co[:, 1], co[:, 2]
+    t0 = -x * r0 - y * r1 - z * r2
+    t1 = w * r0 + y * r2 - z * r1
+    t2 = w * r1 + z * r0 - x * r2
+    t3 = w * r2 + x * r1 - y * r0
+    return np.column_stack(
+        (
+            t0 * -x + t1 * w - t2 * z + t3 * y,
+            t0 * -y + t2 * w - t3 * x + t1 * z,
+            t0 * -z + t3 * w - t1 * y + t2 * x,
+        )
+    )
 
-        data_num -= 1
-        if data_num == 0:
-            return final()
 
-        # 尖刺
-        num = unpack("I", f)[0]
-        for idx in range(num):
-            f.seek(56, 1)
+# BOD骨骼分块记录: 中心、最长边距、顶点起始位置和数量
+BOD_CHUNK_DTYPE = np.dtype(
+    [("center", "<f8", 3), ("radius", "<f8"), ("start", "<u4"), ("num", "<u4")]
+)
 
-        data_num -= 1
-        if data_num == 0:
-            return final()
 
-        # 组
-        num = unpack("I", f)[0]
-        f.seek(num, 1)
-        # 肢解组
-        num = unpack("I", f)[0]
-        f.seek(num * 4, 1)
+# 顶点组成员表，只遍历一次网格，之后的查询都是数组运算
+class GroupMembers:
+    def __init__(self, mesh, groups_num):
+        # type: (bpy.types.Mesh, int) -> None
+        verts = array("i")
+        groups = array("i")
+        for v in mesh.vertices:
+            for g in v.groups:
+                verts.append(v.index)
+                groups.append(g.group)
+        self.verts_num = len(mesh.vertices)
+        self.groups_num = groups_num
+        self.verts = np.frombuffer(verts, dtype=np.int32)
+        self.groups = np.frombuffer(groups, dtype=np.int32)
+        # 按顶点组排序，组内保持顶点索引升序
+        order = np.argsort(self.groups, kind="stable")
+        self.sorted_verts = self.verts[order]
+        sorted_groups = self.groups[order]
+        group_range = np.arange(groups_num)
+        self.group_start = np.searchsorted(sorted_groups, group_range)
+        self.group_end = np.searchsorted(sorted_groups, group_range, side="right")
+
+    def get(self, group_idx, limit=None):
+        """顶点组中的顶点索引 (升序)"""
+        start = self.group_start[group_idx]
+        end = self.group_end[group_idx]
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.sorted_verts[start:end]
+
+    def vert_bone(self, groups_idx):
+        # type: (list[int]) -> np.ndarray
+        """每个顶点所属的骨骼，不属于或属于多个骨骼顶点组时为-1"""
+        group_bone = np.full(self.groups_num, -1, dtype=np.int32)
+        group_bone[groups_idx] = np.arange(len(groups_idx))
+        bone = group_bone[self.groups]
+        mask = bone >= 0
+        count = np.bincount(self.verts[mask], minlength=self.verts_num)
+        vert_bone = np.full(self.verts_num, -1, dtype=np.int32)
+        vert_bone[self.verts[mask]] = bone[mask]
+        vert_bone[count != 1] = -1
+        return vert_bone
+
+
+# 骨骼顶点的分块 (起始位置, 数量)
+# 手动分块的顶点组以前两个成员顶点标记范围，按顺序衔接；剩余的顶点按chunk_size自动分块
+def get_bod_chunks(start, num, chunk_groups, chunk_size):
+    # type: (int, int, list[np.ndarray], int) -> np.ndarray
+    chunks = []
+    chunk_start = start
+    end = start + num
+    for members in chunk_groups:
+        if len(members) < 2 or members[0] != chunk_start:
+            continue
+        chunk_num = min(int(members[1]) - chunk_start + 1, end - chunk_start)
+        chunks.append((chunk_start, chunk_num))
+        chunk_start += chunk_num
+        if chunk_start >= end:
+            break
+    # 自动分块
+    auto_start = np.arange(chunk_start, end, chunk_size)
+    auto_num = np.minimum(chunk_size, end - auto_start)
+    return np.concatenate(
+        (
+            np.array(chunks, dtype=np.int64).reshape(-1, 2),
+            np.column_stack((auto_start, auto_num)),
+        )
+    )
 
-        data_num -= 1
-        if data_num == 0:
-            return final()
 
-        # 轨迹
-        num = unpack("I", f)[0]
-        for idx in range(num):
-            f.seek(56, 1)
-        return final()
+# 打包分块表，所有分块使用相同的中心和边距
+def pack_bod_chunks(chunks, center, radius):
+    # type: (np.ndarray, Any, float) -> bytes
+    records = np.empty(len(chunks), dtype=BOD_CHUNK_DTYPE)
+    records["center"] = tuple(center)
+    records["radius"] = radius
+    records["start"] = chunks[:, 0]
+    records["num"] = chunks[:, 1]
+    return records.tobytes()
+
+
+# 打包BOD顶点表: 按骨骼顺序排列顶点，同一骨骼内坐标相同(5位小数)的顶点只导出一次
+# bones为每个骨骼的 (逆矩阵, 逆矩阵旋转)，没有骨架时为None
+# 返回顶点记录、网格顶点到导出顶点的映射和每个骨骼的 (顶点数量, 起始位置, 中心, 最大长度)
+def pack_bod_verts(co, normal, vert_bone, bones):
+    # type: (np.ndarray, np.ndarray, np.ndarray, list[tuple[np.ndarray, np.ndarray]] | None) -> tuple[np.ndarray, np.ndarray, list[tuple[int, int, tuple[float, float, float], float]]]
+    order = np.argsort(vert_bone, kind="stable")
+    # 加0.0消除负零
+    keys = np.round(co[order].astype(np.float64), 5) + 0.0
+    rows = np.column_stack((vert_bone[order], keys))
+    _, first, inverse = np.unique(
+        rows, axis=0, return_index=True, return_inverse=True
+    )
+    # 按首次出现的顺序编号
+    unique_order = np.argsort(first)
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[unique_order] = np.arange(len(first))
+    vert_map = np.empty(len(co), dtype=np.int64)
+    vert_map[order] = rank[inverse.ravel()]
+    src = order[first[unique_order]]
+    # 转换到Blade坐标 (x, -z, y)
+    src_co = co[src][:, [0, 2, 1]] * np.array((1, -1, 1), dtype=np.float32)
+    src_normal = normal[src][:, [0, 2, 1]] * np.array((1, -1, 1), dtype=np.float32)
+    records = np.empty(len(src), dtype=entity_bod.BOD_VERT_DTYPE)
+    bones_list = []
+    if bones is None:
+        records["co"] = src_co * np.float32(1000)
+        records["normal"] = src_normal
+        return records, vert_map, bones_list
+    #
+    bone_end = np.searchsorted(vert_bone[src], np.arange(len(bones)), side="right")
+    bone_start = 0
+    for bone_idx, (matrix, quat) in enumerate(bones):
+        end = bone_end[bone_idx]
+        sel = slice(bone_start, end)
+        bone_co = matrix_mul_co(matrix, src_co[sel]) * np.float32(1000)
+        records["co"][sel] = bone_co
+        records["normal"][sel] = quat_mul_co(quat, src_normal[sel])
+        bone_verts_num = end - bone_start
+        if bone_verts_num == 0:
+            bone_center = (0.0, 0.0, 0.0)
+            max_length = 0
+        else:
+            total = bone_co.cumsum(axis=0, dtype=np.float32)[-1]
+            scale = np.float32(1) / np.float32(bone_verts_num)
+            bone_center = tuple((total * scale).tolist())
+            # 单精度乘积按z,y,x的顺序双精度累加
+            squared = (bone_co * bone_co).astype(np.float64)
+            length = np.sqrt(squared[:, 2] + squared[:, 1] + squared[:, 0])
+            max_length = max(0, float(length.max()))
+        bones_list.append((int(bone_verts_num), bone_start, bone_center, max_length))
+        bone_start = int(end)
+    return records, vert_map, bones_list
+
+
+# 打包BOD面表，slot_index为每个面的纹理名称索引
+def pack_bod_faces(vert_idx, uvs, slot_index, slot_names):
+    # type: (np.ndarray, np.ndarray, np.ndarray, list[bytes]) -> np.ndarray
+    faces_num = len(vert_idx)
+    names_len = np.array([len(i) for i in slot_names], dtype=np.int64)
+    name_len = names_len[slot_index]
+    head = np.zeros(faces_num, dtype=BOD_FACE_HEAD_DTYPE)
+    head["verts"] = vert_idx
+    head["length"] = name_len
+    tail = np.zeros(faces_num, dtype=BOD_FACE_TAIL_DTYPE)
+    tail["uv"] = uvs
+    head_size = BOD_FACE_HEAD_DTYPE.itemsize
+    tail_size = BOD_FACE_TAIL_DTYPE.itemsize
+    record_size = head_size + name_len + tail_size
+    offset = np.cumsum(record_size) - record_size
+    result = np.empty(int(record_size.sum()), dtype=np.uint8)
+    result[offset[:, None] + np.arange(head_size)] = head.view(np.uint8).reshape(
+        -1, head_size
+    )
+    # 纹理名称
+    names = np.frombuffer(b"".join(slot_names), dtype=np.uint8)
+    name_start = (np.cumsum(names_len) - names_len)[slot_index]
+    face = np.repeat(np.arange(faces_num), name_len)
+    pos = np.arange(len(face)) - np.repeat(np.cumsum(name_len) - name_len, name_len)
+    result[offset[face] + head_size + pos] = names[name_start[face] + pos]
+    #
+    result[(offset + head_size + name_len)[:, None] + np.arange(tail_size)] = (
+        tail.view(np.uint8).reshape(-1, tail_size)
+    )
+    return result
+
+
+# 模型库元数据索引，首次使用时从磁盘加载
+def get_model_index() -> entity_index.ModelIndex:
+    global MODEL_INDEX
+    if MODEL_INDEX is None:
+        try:
+            cache_dir = bpy.utils.extension_path_user(data.PACKAGE, create=True)
+        except ValueError:
+            cache_dir = os.path.join(data.ADDON_PATH, "Models")
+        MODEL_INDEX = entity_index.ModelIndex(
+            os.path.join(cache_dir, "model_index.cache")
+        ).load()
+    return MODEL_INDEX
+
+
+# 在临时数据中读取模型.blend，统计实体的结构信息，不影响当前文件
+def scan_model_blend(filepath):
+    # type: (str) -> dict[str, Any]
+    prefixes = {
+        "anchors": "blade_anchor_",
+        "lights": "blade_light_",
+        "fires": "b_fire_fuego_",
+        "edges": "blade_edge_",
+        "spikes": "blade_spike_",
+        "trails": "blade_trail_",
+    }
+    with bpy.data.temp_data(filepath=filepath) as temp_data:
+        with temp_data.libraries.load(filepath) as (data_from, data_to):
+            data_to.objects = data_from.objects
+        objects = [obj for obj in data_to.objects if obj is not None]
+        record = {key: 0 for key in prefixes}  # type: dict[str, Any]
+        record["anchor_names"] = []
+        entity = None
+        for obj in objects:
+            name = obj.name.lower()
+            kind = next((k for k, v in prefixes.items() if name.startswith(v)), None)
+            if kind is not None:
+                record[kind] += 1
+                if kind == "anchors":
+                    record["anchor_names"].append(obj.name[13:])
+            elif obj.type == "MESH" and entity is None:
+                entity = obj
+        #
+        bones = 0
+        vertices = faces = 0
+        textures = []
+        center = (0.0, 0.0, 0.0)
+        radius = 0.0
+        if entity is not None:
+            armature_obj = next(
+                (m.object for m in entity.modifiers if m.type == "ARMATURE"), None  # type: ignore
+            )
+            if armature_obj is not None:
+                bones = len(armature_obj.data.bones)  # type: ignore
+            mesh = entity.data  # type: bpy.types.Mesh # type: ignore
+            mesh.calc_loop_triangles()
+            vertices = len(mesh.vertices)
+            faces = len(mesh.loop_triangles)  # 导出时三角化
+            textures = sorted(
+                {ag_utils.remove_dup_suffix(mat.name) for mat in mesh.materials if mat}
+            )
+            if vertices:
+                co = np.empty(vertices * 3, dtype=np.float32)
+                mesh.vertices.foreach_get("co", co)
+                co = co.reshape(-1, 3).astype(np.float64)
+                matrix = np.array(entity.matrix_world)
+                co = co @ matrix[:3, :3].T + matrix[:3, 3]
+                # 与导出相同: 几何中心到包围盒角点的最大距离
+                geom_center = co.mean(axis=0)
+                bound = np.stack((co.min(axis=0), co.max(axis=0)))
+                corners = bound[np.indices((2, 2, 2)).reshape(3, -1).T, [0, 1, 2]]
+                center = tuple(geom_center.tolist())
+                radius = float(np.linalg.norm(corners - geom_center, axis=1).max())
+        record.update(
+            type="BLEND",
+            name=entity.name if entity is not None else "",
+            vertices=vertices,
+            faces=faces,
+            bones=bones,
+            textures=textures,
+            center=center,
+            radius=radius,
+        )
+    return record
 
 
 # 确保材质
@@ -263,7 +467,7 @@ class OT_Inventory_Select(bpy.types.Operator):
     def execute(self, context: Context):
         if context.view_layer.objects.get(self.obj_name) is not None:
             ag_utils.select_active(context, bpy.data.objects[self.obj_name])
-            bpy.ops.ed.undo_push(message="Select Item")
+            L3D_data.undo_push("Select Item")
         return {"FINISHED"}
 
 
@@ -298,7 +502,7 @@ class OT_Entity_Kind_Search(bpy.types.Operator):
             OP_L3D.OT_EntityCreate.add(None, context, inter_name, entity=ent)
 
         data.region_redraw("UI")
-        bpy.ops.ed.undo_push(message="Change Kind")
+        L3D_data.undo_push("Change Kind")
         return {"FINISHED"}
 
     def invoke(self, context: Context, event: bpy.types.Event):
@@ -341,7 +545,7 @@ class OT_Character_Search(bpy.types.Operator):
             )
 
         # data.region_redraw("UI")
-        bpy.ops.ed.undo_push(message="Change Skin")
+        L3D_data.undo_push("Change Skin")
         return {"FINISHED"}
 
     def invoke(self, context: Context, event: bpy.types.Event):
@@ -378,7 +582,7 @@ class OT_Skin_Reset(bpy.types.Operator):
                 None, context, ent_data.Kind, entity=ent, change_skin=True
             )
 
-        bpy.ops.ed.undo_push(message="Reset Skin")
+        L3D_data.undo_push("Reset Skin")
         return {"FINISHED"}
 
 
@@ -477,7 +681,7 @@ class OT_Equipment_Remove(bpy.types.Operator):
             new_index = index
         wm_data.active_equipment = new_index
 
-        bpy.ops.ed.undo_push(message="Remove Inventory")
+        L3D_data.undo_push("Remove Inventory")
         return {"FINISHED"}
 
 
@@ -524,7 +728,7 @@ class OT_Equipment_Move(bpy.types.Operator):
             inv_list.move(index, new_index)
 
         wm_data.active_equipment = new_index
-        bpy.ops.ed.undo_push(message="Move Inventory")
+        L3D_data.undo_push("Move Inventory")
         return {"FINISHED"}
 
 
@@ -608,7 +812,7 @@ class OT_Prop_Remove(bpy.types.Operator):
             new_index = index
         wm_data.active_prop = new_index
 
-        bpy.ops.ed.undo_push(message="Remove Inventory")
+        L3D_data.undo_push("Remove Inventory")
         return {"FINISHED"}
 
 
@@ -655,7 +859,7 @@ class OT_Prop_Move(bpy.types.Operator):
             inv_list.move(index, new_index)
 
         wm_data.active_prop = new_index
-        bpy.ops.ed.undo_push(message="Move Inventory")
+        L3D_data.undo_push("Move Inventory")
         return {"FINISHED"}
 
 
@@ -744,7 +948,7 @@ class OT_ContainedItem_Remove(bpy.types.Operator):
             new_index = index
         wm_data.active_contained_item = new_index
 
-        bpy.ops.ed.undo_push(message="Remove Item")
+        L3D_data.undo_push("Remove Item")
         return {"FINISHED"}
 
 
@@ -813,7 +1017,7 @@ class OT_CreateColl(bpy.types.Operator):
         context.view_layer.active_layer_collection = (
             context.view_layer.layer_collection.children[coll.name]
         )
-        bpy.ops.ed.undo_push(message="New Collection")
+        L3D_data.undo_push("New Collection")
         return {"FINISHED"}
 
 
@@ -950,7 +1154,7 @@ class OT_AddAnchor(bpy.types.Operator):
         anchor.empty_display_type = "ARROWS"
         anchor.show_in_front = True
         data.link2coll(anchor, context.collection)
-        bpy.ops.ed.undo_push(message="Add Anchor")
+        L3D_data.undo_push("Add Anchor")
         return {"FINISHED"}
 
 
@@ -1005,7 +1209,7 @@ class OT_AddComponent(bpy.types.Operator):
             obj_data.ent_comp_type = int(self.action)
             obj.show_in_front = True
             data.link2coll(obj, context.collection)
-        bpy.ops.ed.undo_push(message="Add Component")
+        L3D_data.undo_push("Add Component")
         return {"FINISHED"}
 
 
@@ -1046,7 +1250,7 @@ class OT_SelectByGroup(bpy.types.Operator):
                 face.select_set(True)
 
         bmesh.update_edit_mesh(mesh, loop_triangles=False, destructive=False)
-        bpy.ops.ed.undo_push(message=self.bl_label)
+        L3D_data.undo_push(self.bl_label)
 
         return {"FINISHED"}
 
@@ -1076,7 +1280,7 @@ class OT_DeselectByGroup(bpy.types.Operator):
                 face.select_set(False)
 
         bmesh.update_edit_mesh(mesh, loop_triangles=False, destructive=False)
-        bpy.ops.ed.undo_push(message=self.bl_label)
+        L3D_data.undo_push(self.bl_label)
 
         return {"FINISHED"}
 
@@ -1111,7 +1315,7 @@ class OT_SelectByMutilateGroup(bpy.types.Operator):
         # edit_bm.select_flush_mode()
         # edit_bm.select_flush(True)
         bmesh.update_edit_mesh(mesh, loop_triangles=False, destructive=False)
-        bpy.ops.ed.undo_push(message=self.bl_label)
+        L3D_data.undo_push(self.bl_label)
 
         return {"FINISHED"}
 
@@ -1145,7 +1349,7 @@ class OT_DeselectByMutilateGroup(bpy.types.Operator):
         # edit_bm.select_flush_mode()
         # edit_bm.select_flush(True)
         bmesh.update_edit_mesh(mesh, loop_triangles=False, destructive=False)
-        bpy.ops.ed.undo_push(message=self.bl_label)
+        L3D_data.undo_push(self.bl_label)
 
         return {"FINISHED"}
 
@@ -1215,7 +1419,7 @@ class OT_EntityNote(bpy.types.Operator):
 class OT_ImportBOD(bpy.types.Operator):
     bl_idname = "amagate.import_bod"
     bl_label = "Import BOD"
-    bl_description = "Import BOD"
+    bl_description = "Import BOD, select multiple files or a folder to import in batch"
     bl_options = {"INTERNAL"}
 
     # 转换坐标空间
@@ -1223,16 +1427,51 @@ class OT_ImportBOD(bpy.types.Operator):
     filter_glob: StringProperty(default="*.bod", options={"HIDDEN"})  # type: ignore
     directory: StringProperty(subtype="DIR_PATH")  # type: ignore
     filepath: StringProperty(subtype="FILE_PATH")  # type: ignore
+    files: CollectionProperty(type=bpy.types.OperatorFileListElement)  # type: ignore
+
+    # 选择的BOD文件，没有选择文件时为目录中的所有BOD文件
+    def get_files(self) -> list[str]:
+        files = [
+            os.path.join(self.directory, f.name)
+            for f in self.files
+            if f.name.lower().endswith(".bod")
+        ]
+        if files:
+            return files
+        # 文件名为空时路径为目录
+        if os.path.isdir(self.filepath):
+            return [
+                entry.path
+                for entry in sorted(
+                    os.scandir(self.filepath), key=lambda e: e.name.lower()
+                )
+                if entry.is_file() and entry.name.lower().endswith(".bod")
+            ]
+        return [self.filepath]
 
     def execute(self, context: Context):
-        filepath = Path(self.filepath)
+        files = self.get_files()
+        if len(files) > 1:
+            return self.import_batch(context, files)
+
+        filepath = Path(files[0] if files else self.filepath)
         if not (filepath.is_file() and filepath.suffix.lower() == ".bod"):
             self.report({"ERROR"}, f"{pgettext('Invalid file')}: {filepath.name}")
             return {"FINISHED"}
 
-        entity, lack_texture, folded_faces, multiple_folded_face, zero_width_faces = (
-            self.import_bod(context, filepath)
-        )
+        with L3D_data.bulk_transaction("Import BOD"):
+            (
+                entity,
+                lack_texture,
+                folded_faces,
+                multiple_folded_face,
+                zero_width_faces,
+            ) = self.import_bod(context, filepath)
+        self.report_faces(folded_faces, multiple_folded_face, zero_width_faces)
+
+        return {"FINISHED"}
+
+    def report_faces(self, folded_faces, multiple_folded_face, zero_width_faces):
         if folded_faces:
             self.report({"INFO"}, f"{pgettext('Folded face count')}: {folded_faces}")
         if multiple_folded_face:
@@ -1246,10 +1485,60 @@ class OT_ImportBOD(bpy.types.Operator):
                 f"{pgettext('Zero-width face count(deleted)')}: {zero_width_faces}",
             )
 
+    # 批量导入，BOD在子进程中解码，对象在主线程中按文件顺序创建
+    def import_batch(self, context: Context, files):
+        total = len(files)
+        errors = {}  # type: dict[str, str]
+        face_counts = [0, 0, 0]
+        wm = context.window_manager
+        wm.progress_begin(0, 100)
+        try:
+            with L3D_data.bulk_transaction("Import BOD"):
+                for count, (filepath, bod, error) in enumerate(
+                    entity_bod.map_files("read_bod", files), 1
+                ):
+                    if error is None:
+                        try:
+                            result = self.build_bod(context, bod, view_all=False)
+                            for i in range(3):
+                                face_counts[i] += result[i + 2]
+                        except Exception as e:
+                            error = f"{type(e).__name__}: {e}"
+                    if error is not None:
+                        errors[filepath] = error
+                        logger.warning(f"{os.path.basename(filepath)}: {error}")
+                    wm.progress_update(count * 100 // total)
+                if context.mode != "OBJECT":
+                    bpy.ops.object.mode_set(mode="OBJECT")
+                bpy.ops.view3d.view_all(center=True)
+        finally:
+            wm.progress_end()
+
+        self.report_faces(*face_counts)
+        self.report(
+            {"WARNING"} if errors else {"INFO"},
+            f"{pgettext('Imported')}: {total - len(errors)}/{total}"
+            + (f", {pgettext('Failed')}: {len(errors)}" if errors else ""),
+        )
+        if errors:
+            lines = [f"{os.path.basename(p)}: {e}" for p, e in errors.items()]
+            if len(lines) > 30:
+                lines[29:] = [f"... (+{len(lines) - 29})"]
+
+            def draw(menu, context):
+                for line in lines:
+                    menu.layout.label(text=line)
+
+            wm.popup_menu(draw, title=pgettext("Failed"), icon="ERROR")
         return {"FINISHED"}
 
     @staticmethod
     def import_bod(context: Context, filepath):
+        return OT_ImportBOD.build_bod(context, entity_bod.read_bod(filepath))
+
+    # 根据read_bod解码的数据创建实体
+    @staticmethod
+    def build_bod(context: Context, bod, view_all=True):
         def _final():
             ag_utils.select_active(context, entity)  # type: ignore
             for obj in ent_coll.objects:
@@ -1265,7 +1554,8 @@ class OT_ImportBOD(bpy.types.Operator):
             bpy.ops.object.transform_apply(location=False, rotation=True, scale=True)
             bpy.ops.object.select_all(action="DESELECT")
             #
-            bpy.ops.view3d.view_all(center=True)
+            if view_all:
+                bpy.ops.view3d.view_all(center=True)
             return (
                 entity,
                 lack_texture,
@@ -1280,9 +1570,9 @@ class OT_ImportBOD(bpy.types.Operator):
         context.space_data.shading.type = "WIREFRAME"  # type: ignore
         #
         lack_texture = False
-        folded_faces = 0
-        multiple_folded_face = 0
-        zero_width_faces = 0
+        folded_faces = bod["folded_faces"]
+        multiple_folded_face = bod["multiple_folded_face"]
+        zero_width_faces = bod["zero_width_faces"]
         # 局部空间
         local_space = Matrix.Rotation(-math.pi / 2, 4, "X")
         # local_space_inv = local_space.inverted()
@@ -1290,612 +1580,439 @@ class OT_ImportBOD(bpy.types.Operator):
         path = os.path.join(data.ADDON_PATH, "bin/ent_component.dat")
         mesh_dict = pickle.load(open(path, "rb"))
 
-        ent_bm = bmesh.new()
-        uv_layer = ent_bm.loops.layers.uv.verify()  # 获取或创建UV图层
-        bm_verts = []  # type: list[bmesh.types.BMVert]
-        bm_verts_dup = {}
-        verts_dup_count = 0
-        with open(filepath, "rb") as f:
-            file_size = os.fstat(f.fileno()).st_size
-            # 内部名称
-            length = unpack("I", f)[0]
-            inter_name = unpack(f"{length}s", f)
-            #
-            ent_mesh = bpy.data.meshes.new(inter_name)
-            entity = bpy.data.objects.new(inter_name, ent_mesh)
-            #
-            ent_coll = bpy.data.collections.new(
-                f"Blade_Object_{inter_name}"
-            )  # type: Collection # type: ignore
-            context.scene.collection.children.link(ent_coll)
-            data.link2coll(entity, ent_coll)
-            entity["AG.ambient_color"] = (1.0, 1.0, 1.0)
-            # entity.id_properties_ensure()  # 确保属性存在
-            entity.id_properties_ui("AG.ambient_color").update(
-                subtype="COLOR", min=0.0, max=1.0, default=(1, 1, 1), step=0.1
-            )
-            # 顶点
-            verts_num = unpack("I", f)[0]
-            for i in range(verts_num):
-                co = Vector(unpack("ddd", f)) / 1000
-                # if transform_space:
-                #     co.yz = co.z, -co.y
-                bm_verts.append(ent_bm.verts.new(co))
-                # 跳过法线
-                f.seek(24, 1)
-            # 面
-            faces_num = unpack("I", f)[0]
-            for i in range(faces_num):
-                vert_idx = unpack("III", f)
-                if len(set(vert_idx)) != 3:
-                    face = None
-                    zero_width_faces += 1
-                else:
-                    try:
-                        face = ent_bm.faces.new([bm_verts[i] for i in vert_idx])
-                    except:
-                        level = 0
-                        while True:
-                            verts = [
-                                bm_verts[bm_verts_dup[i][level]]
-                                for i in vert_idx
-                                if i in bm_verts_dup and level < len(bm_verts_dup[i])
-                            ]
-                            if len(verts) == 3:
-                                try:
-                                    face = ent_bm.faces.new(verts)
-                                except:
-                                    level += 1
-                                    continue
-                            else:
-                                verts = []
-                                for i in vert_idx:
-                                    if i in bm_verts_dup and level < len(
-                                        bm_verts_dup[i]
-                                    ):
-                                        verts.append(bm_verts[bm_verts_dup[i][level]])
-                                    else:
-                                        vert = ent_bm.verts.new(bm_verts[i].co)
-                                        index = verts_num + verts_dup_count
-                                        bm_verts_dup.setdefault(i, []).append(index)
-                                        verts.append(vert)
-                                        bm_verts.append(vert)
-                                        verts_dup_count += 1
-                                        if level != 0:
-                                            multiple_folded_face += 1
-                                face = ent_bm.faces.new(verts)
-                            break
-                        #
-                        if level == 0:
-                            folded_faces += 1
+        # 内部名称
+        inter_name = bod["name"]
+        #
+        ent_mesh = bpy.data.meshes.new(inter_name)
+        entity = bpy.data.objects.new(inter_name, ent_mesh)
+        #
+        ent_coll = bpy.data.collections.new(
+            f"Blade_Object_{inter_name}"
+        )  # type: Collection # type: ignore
+        context.scene.collection.children.link(ent_coll)
+        data.link2coll(entity, ent_coll)
+        entity["AG.ambient_color"] = (1.0, 1.0, 1.0)
+        # entity.id_properties_ensure()  # 确保属性存在
+        entity.id_properties_ui("AG.ambient_color").update(
+            subtype="COLOR", min=0.0, max=1.0, default=(1, 1, 1), step=0.1
+        )
+        # 顶点和面
+        verts_num = bod["verts_num"]
+        coords = bod["coords"]
+        dup_src = bod["dup_src"]
+        face_images = bod["face_images"]
+        # 材质槽按面首次出现的顺序添加
+        material_index = np.zeros(len(face_images), dtype=np.int32)
+        slots = {}  # type: dict[str, int]
+        for idx, img_name in enumerate(face_images):
+            slot_index = slots.get(img_name)
+            if slot_index is None:
+                img = bpy.data.images.get(img_name)  # type: Image # type: ignore
+                if img is None:
+                    img = bpy.data.images.new(img_name, 256, 256)
+                    img.source = "FILE"
+                    img.filepath = f"//textures/{img_name}.bmp"
+                mat = ensure_material(img)
                 #
-                length = unpack("I", f)[0]
-                img_name = unpack(f"{length}s", f)
-                uv_list = unpack("ffffff", f)
-                if face is not None:
-                    uv_list = [
-                        (uv_list[0], uv_list[3]),
-                        (uv_list[1], uv_list[4]),
-                        (uv_list[2], uv_list[5]),
-                    ]
-                    for idx, loop in enumerate(face.loops):
-                        loop[uv_layer].uv = uv_list[idx]
-                    #
-                    img = bpy.data.images.get(img_name)  # type: Image # type: ignore
-                    if img is None:
-                        img = bpy.data.images.new(img_name, 256, 256)
-                        img.source = "FILE"
-                        img.filepath = f"//textures/{img_name}.bmp"
-                    mat = ensure_material(img)
-                    #
-                    slot_index = ent_mesh.materials.find(img_name)
-                    if slot_index == -1:
-                        ent_mesh.materials.append(mat)
-                        slot_index = len(ent_mesh.materials) - 1
-                    face.material_index = slot_index
-                    # 调试代码
-                    # if not os.path.exists(
-                    #     bpy.path.abspath(f"//textures/{img_name}.bmp")
-                    # ):
-                    #     if not Path("D:/tmp/temp").joinpath(f"{img_name}.bmp").exists():
-                    #         lack_texture = True
-                # 跳过0
-                f.seek(4, 1)
-            # 骨架
-            bones_num = unpack("I", f)[0]
-            bones_name = []
-            bones_vert_idx = []
-            bone_matrix = {}  # type: dict[str, Matrix]
-            armature = None
-            if bones_num != 1:
-                # bmesh.ops.transform(
-                #     ent_bm, matrix=Matrix.Rotation(math.pi / 2, 4, "X"), verts=bm_verts
-                # )
-                # 创建骨架
-                armature = bpy.data.armatures.new("Blade_Skeleton")
-                armature.show_names = True
-                armature.show_axes = True
-                armature.collections.new("Blade_Bones")
-                # armature.display_type = "STICK"
-                armature_obj = bpy.data.objects.new("Blade_Skeleton", armature)
-                armature_obj.show_in_front = True
-                data.link2coll(armature_obj, ent_coll)
-                ag_utils.select_active(context, armature_obj)  # type: ignore
-                bpy.ops.object.mode_set(mode="EDIT")
-            # elif transform_space:
-            #     bmesh.ops.transform(
-            #         ent_bm,
-            #         matrix=local_space,
-            #         verts=ent_bm.verts,  # type: ignore
-            #     )
+                slot_index = ent_mesh.materials.find(img_name)
+                if slot_index == -1:
+                    ent_mesh.materials.append(mat)
+                    slot_index = len(ent_mesh.materials) - 1
+                slots[img_name] = slot_index
+            material_index[idx] = slot_index
+            # 调试代码
+            # if not os.path.exists(
+            #     bpy.path.abspath(f"//textures/{img_name}.bmp")
+            # ):
+            #     if not Path("D:/tmp/temp").joinpath(f"{img_name}.bmp").exists():
+            #         lack_texture = True
+        # 骨架
+        bones_num = len(bod["bones"])
+        bones_name = []
+        bones_vert_idx = []
+        bone_matrix = {}  # type: dict[str, Matrix]
+        armature = None
+        if bones_num != 1:
+            # 创建骨架
+            armature = bpy.data.armatures.new("Blade_Skeleton")
+            armature.show_names = True
+            armature.show_axes = True
+            armature.collections.new("Blade_Bones")
+            # armature.display_type = "STICK"
+            armature_obj = bpy.data.objects.new("Blade_Skeleton", armature)
+            armature_obj.show_in_front = True
+            data.link2coll(armature_obj, ent_coll)
+            ag_utils.select_active(context, armature_obj)  # type: ignore
+            bpy.ops.object.mode_set(mode="EDIT")
 
-            for i in range(bones_num):
-                if bones_num != 1:
-                    length = unpack("I", f)[0]
-                    name = unpack(f"{length}s", f)
-                else:
-                    name = ""
-                #
-                parent_idx = unpack("i", f)[0]  # type: int
-                lst = unpack("dddd" * 4, f)
-                lst = [lst[i * 4 : (i + 1) * 4] for i in range(4)]
-                matrix = Matrix(lst)
-                matrix.transpose()  # 转置
-                matrix.translation /= 1000  # 转换位置单位
-                # 清除缩放
-                loc, rot, scale = matrix.decompose()
-                matrix = Matrix.LocRotScale(loc, rot, None)
+        for name, parent_idx, lst, numverts, vert_start in bod["bones"]:
+            lst = [lst[i * 4 : (i + 1) * 4] for i in range(4)]
+            matrix = Matrix(lst)
+            matrix.transpose()  # 转置
+            matrix.translation /= 1000  # 转换位置单位
+            # 清除缩放
+            loc, rot, scale = matrix.decompose()
+            matrix = Matrix.LocRotScale(loc, rot, None)
 
-                numverts = unpack("I", f)[0]
-                vert_start = unpack("I", f)[0]
-                # 添加骨骼
-                if armature is not None:
-                    # pose_matrix_list.append(matrix)
-                    bone = armature.edit_bones.new(name)
-                    armature.collections["Blade_Bones"].assign(bone)
-                    bones_name.append(name)
-                    bone.length = 0.1
-                    if parent_idx != -1:
-                        parent_bone = armature.edit_bones[
-                            bones_name[parent_idx]
-                        ]  # type: bpy.types.EditBone
-                        bone.parent = parent_bone
-                        # bone.use_connect = True
-                        # if transform_space:
-                        # matrix = bone_matrix[parent_bone.name] @ matrix
-                        # bone_matrix[name] = matrix
-                        matrix = bone_matrix[parent_bone.name] @ matrix
-                        # else:
-                        #     matrix = parent_bone.matrix @ matrix
-                        # matrix = (
-                        #     parent_matrix.to_quaternion().to_matrix().to_4x4() @ matrix
-                        # )
-                        # matrix.translation += parent_matrix.translation
-                        dir = (parent_bone.tail - parent_bone.head).normalized()
-                        dot = dir.dot(matrix.translation - parent_bone.head)
-                        if dot > 0:
-                            parent_bone.length = max(0.01, dot)
-                    # elif transform_space:
-                    #     matrix = local_space @ matrix
-                    bone_matrix[name] = matrix
-                    # if transform_space:
-                    #     bone_matrix[name][0] = local_space @ matrix
-
-                    # if transform_space:
-                    #     bm_matrix = local_space @ bone_matrix[name]
-                    # else:
-                    #     bm_matrix = matrix
-                    # 设置骨骼矩阵
-                    bone.matrix = matrix
-                    vert_end = vert_start + numverts
-                    verts = bm_verts[vert_start:vert_end]
-                    verts_dup_idx = []
-                    for k, v in bm_verts_dup.items():
-                        if vert_start <= k < vert_end:
-                            verts_dup_idx.extend(v)
-                    verts.extend([bm_verts[i] for i in verts_dup_idx])
-                    bmesh.ops.transform(
-                        ent_bm,
-                        matrix=matrix,
-                        verts=verts,
-                    )
-                    # 保存顶点索引
-                    bones_vert_idx.append((vert_start, vert_end, verts_dup_idx))
+            # 添加骨骼
+            if armature is not None:
+                # pose_matrix_list.append(matrix)
+                bone = armature.edit_bones.new(name)
+                armature.collections["Blade_Bones"].assign(bone)
+                bones_name.append(name)
+                bone.length = 0.1
+                if parent_idx != -1:
+                    parent_bone = armature.edit_bones[
+                        bones_name[parent_idx]
+                    ]  # type: bpy.types.EditBone
+                    bone.parent = parent_bone
+                    # bone.use_connect = True
+                    matrix = bone_matrix[parent_bone.name] @ matrix
+                    dir = (parent_bone.tail - parent_bone.head).normalized()
+                    dot = dir.dot(matrix.translation - parent_bone.head)
+                    if dot > 0:
+                        parent_bone.length = max(0.01, dot)
+                bone_matrix[name] = matrix
+                # 设置骨骼矩阵
+                bone.matrix = matrix
+                vert_end = vert_start + numverts
+                verts_dup_idx = (
+                    np.flatnonzero((dup_src >= vert_start) & (dup_src < vert_end))
+                    + verts_num
+                ).tolist()
+                # 变换骨骼的顶点
+                bone_mat = np.array(matrix)
+                for sel in (slice(vert_start, vert_end), verts_dup_idx):
+                    coords[sel] = coords[sel] @ bone_mat[:3, :3].T + bone_mat[:3, 3]
+                # 保存顶点索引
+                bones_vert_idx.append((vert_start, vert_end, verts_dup_idx))
+        #
+        if context.mode != "OBJECT":
+            bpy.ops.object.mode_set(mode="OBJECT")
+        #
+        build_bod_mesh(ent_mesh, coords, bod["loops"], bod["uvs"], material_index)
+        ent_mesh.shade_smooth()  # 平滑着色
+
+        # 添加顶点组
+        if multiple_folded_face:
+            group = entity.vertex_groups.new(name="Multiple Folded Face")
+            group.add(
+                list([i for v in bod["verts_dup"].values() for i in v[1:]]),
+                1.0,
+                "REPLACE",
+            )
+        if armature is not None:
+            for idx, name in enumerate(bones_name):
+                group = entity.vertex_groups.new(name=name)
+                start, end, verts_dup_idx = bones_vert_idx[idx]
+                group.add(list(range(start, end)), 1.0, "REPLACE")
+                group.add(verts_dup_idx, 1.0, "ADD")
+            # 添加骨架修改器
+            modifier = entity.modifiers.new("Armature", "ARMATURE")
+            modifier.object = armature_obj  # type: ignore
+            # 检查没有顶点组或者顶点组大于1的顶点
+            verts_no_group = []
+            verts_multi_group = []
+            for v in ent_mesh.vertices:
+                if len(v.groups) == 0:
+                    verts_no_group.append(v.index)
+                elif len(v.groups) > 1:
+                    verts_multi_group.append(v.index)
+            if verts_no_group:
+                logger.debug(f"verts_no_group: {verts_no_group}")
+            if verts_multi_group:
+                logger.debug(f"verts_multi_group: {verts_multi_group}")
+            #
+        context.view_layer.update()
+        # 火焰
+        for idx, (verts, parent_idx, idx_mark) in enumerate(bod["fires"]):
+            bm = bmesh.new()
+            prev_vert = None
+            for co, mark in zip(verts["co"].tolist(), verts["mark"].tolist()):
+                vert = bm.verts.new(Vector(co) / 1000)
+                if prev_vert is not None:
+                    bm.edges.new([prev_vert, vert])
+                prev_vert = vert
                 #
-                num = unpack("I", f)[0]
-                for j in range(num):
-                    pos = Vector(unpack("ddd", f)) / 1000
-                    pos = matrix @ pos
-                    dist = unpack("d", f)[0] / 1000
-                    #
-                    # empty = bpy.data.objects.new(name, None)
-                    # empty.location = pos
-                    # empty.empty_display_size = dist
-                    # data.link2coll(empty, context.collection)
-                    #
-                    vert_start = unpack("I", f)[0]
-                    numverts = unpack("I", f)[0]
+                if mark != 3:
+                    logger.debug(f"Fire - mark not 3: {mark}")
             #
-            if context.mode != "OBJECT":
-                bpy.ops.object.mode_set(mode="OBJECT")
+            obj_name = data.get_object_name("B_Fire_Fuego_")
+            mesh = bpy.data.meshes.new(obj_name)
+            obj = bpy.data.objects.new(obj_name, mesh)  # type: Object # type: ignore
+            # fire_obj.amagate_data.ent_comp_type = 4
+            obj.show_in_front = True
+            data.link2coll(obj, ent_coll)
+
+            if parent_idx != -1:
+                if armature is not None:
+                    bone_name = bones_name[parent_idx]
+                    bmesh.ops.transform(bm, matrix=bone_matrix[bone_name], verts=bm.verts)  # type: ignore
+                    obj.parent = armature_obj  # type: ignore
+                    obj.parent_type = "BONE"
+                    obj.parent_bone = bone_name
+                    obj.matrix_world = Matrix()
+                logger.debug(f"Fire - parent_idx not -1: {parent_idx}")
+
+            bm.to_mesh(mesh)
+            bm.free()
+
             #
-            ent_bm.to_mesh(ent_mesh)
-            ent_bm.free()
-            ent_mesh.shade_smooth()  # 平滑着色
-            # 几何中心
-            geom_center = Vector(unpack("ddd", f)) / 1000
-            # if transform_space:
-            #     center.yz = center.z, -center.y
-            dist = unpack("d", f)[0] / 1000
+            if idx_mark != idx:
+                logger.debug(f"Fire - idx_mark not idx: {idx_mark} {idx}")
 
+        # 灯光
+        for light in bod["lights"]:
+            co = Vector(light["co"].tolist()) / 1000
             #
-            # empty = bpy.data.objects.new("t.center", None)
-            # empty.location = center
-            # empty.empty_display_size = dist
-            # data.link2coll(empty, context.scene.collection)
+            obj_name = data.get_object_name("Blade_Light_")
+            obj = bpy.data.objects.new(obj_name, None)  # type: Object # type: ignore
+            obj.empty_display_size = 0.1
+            obj.empty_display_type = "ARROWS"
+            obj.show_in_front = True
+            data.link2coll(obj, ent_coll)
+            #
+            parent_idx = int(light["parent"])
+            if parent_idx != -1:
+                if armature is not None:
+                    bone_name = bones_name[parent_idx]
+                    co = bone_matrix[bone_name] @ co
+                    obj.parent = armature_obj  # type: ignore
+                    obj.parent_type = "BONE"
+                    obj.parent_bone = bone_name
+                logger.debug(f"Light - parent_idx not -1: {parent_idx}")
             #
+            obj.matrix_world = Matrix.Translation(co)
 
-            # 添加顶点组
-            if multiple_folded_face:
-                group = entity.vertex_groups.new(name="Multiple Folded Face")
-                group.add(
-                    list([i for v in bm_verts_dup.values() for i in v[1:]]),
-                    1.0,
-                    "REPLACE",
+        # 锚点
+        for name, lst, parent_idx in bod["anchors"]:
+            lst = [lst[i * 4 : (i + 1) * 4] for i in range(4)]
+            matrix = Matrix(lst)
+            matrix.transpose()  # 转置
+            matrix.translation /= 1000  # 转换位置单位
+            # 清除缩放
+            loc, rot, scale = matrix.decompose()
+            matrix = Matrix.LocRotScale(loc, rot, None)
+            #
+            obj_name = f"Blade_Anchor_{name}"
+            obj = bpy.data.objects.new(obj_name, None)  # type: Object # type: ignore
+            obj.empty_display_size = 0.1
+            obj.empty_display_type = "ARROWS"
+            obj.show_in_front = True
+            data.link2coll(obj, ent_coll)
+            #
+            parent_matrix = local_space if transform_space else None
+            if parent_idx != -1:
+                if armature is not None:
+                    bone_name = bones_name[parent_idx]
+                    parent_matrix = bone_matrix[bone_name]
+                    obj.parent = armature_obj  # type: ignore
+                    obj.parent_type = "BONE"
+                    obj.parent_bone = bone_name
+                else:
+                    obj.parent = entity  # type: ignore
+            #
+            if parent_matrix:
+                matrix = parent_matrix @ matrix
+            # XXX 有BUG，没有父对象时，矩阵设置不生效
+            if not obj.parent:
+                obj.parent = entity  # type: ignore
+                obj.matrix_world = matrix
+                bpy.app.timers.register(
+                    lambda obj=obj: setattr(obj, "parent", None), first_interval=0.2
                 )
-            if armature is not None:
-                for idx, name in enumerate(bones_name):
-                    group = entity.vertex_groups.new(name=name)
-                    start, end, verts_dup_idx = bones_vert_idx[idx]
-                    group.add(list(range(start, end)), 1.0, "REPLACE")
-                    group.add(verts_dup_idx, 1.0, "ADD")
-                # 添加骨架修改器
-                modifier = entity.modifiers.new("Armature", "ARMATURE")
-                modifier.object = armature_obj  # type: ignore
-                # 检查没有顶点组或者顶点组大于1的顶点
-                verts_no_group = []
-                verts_multi_group = []
-                for v in ent_mesh.vertices:
-                    if len(v.groups) == 0:
-                        verts_no_group.append(v.index)
-                    elif len(v.groups) > 1:
-                        verts_multi_group.append(v.index)
-                if verts_no_group:
-                    logger.debug(f"verts_no_group: {verts_no_group}")
-                if verts_multi_group:
-                    logger.debug(f"verts_multi_group: {verts_multi_group}")
-                #
-            context.view_layer.update()
-            # 火焰
-            num = unpack("I", f)[0]
-            for idx in range(num):
-                verts_num = unpack("I", f)[0]
-                bm = bmesh.new()
-                prev_vert = None
-                for i in range(verts_num):
-                    co = Vector(unpack("ddd", f)) / 1000
-                    # if transform_space:
-                    #     co.yz = co.z, -co.y
-                    vert = bm.verts.new(co)
-                    if prev_vert is not None:
-                        bm.edges.new([prev_vert, vert])
-                    prev_vert = vert
-                    #
-                    mark = unpack("I", f)[0]
-                    if mark != 3:
-                        logger.debug(f"Fire - mark not 3: {mark}")
-                #
-                obj_name = data.get_object_name("B_Fire_Fuego_")
-                mesh = bpy.data.meshes.new(obj_name)
-                obj = bpy.data.objects.new(
-                    obj_name, mesh
-                )  # type: Object # type: ignore
-                # fire_obj.amagate_data.ent_comp_type = 4
-                obj.show_in_front = True
-                data.link2coll(obj, ent_coll)
-
-                parent_idx = unpack("i", f)[0]  # type: int
-                if parent_idx != -1:
-                    if armature is not None:
-                        bone_name = bones_name[parent_idx]
-                        bmesh.ops.transform(bm, matrix=bone_matrix[bone_name], verts=bm.verts)  # type: ignore
-                        obj.parent = armature_obj  # type: ignore
-                        obj.parent_type = "BONE"
-                        obj.parent_bone = bone_name
-                        obj.matrix_world = Matrix()
-                    logger.debug(f"Fire - parent_idx not -1: {parent_idx}")
-
-                bm.to_mesh(mesh)
-                bm.free()
+            else:
+                obj.matrix_world = matrix
 
-                #
-                idx_mark = unpack("I", f)[0]
-                if idx_mark != idx:
-                    logger.debug(f"Fire - idx_mark not idx: {idx_mark} {idx}")
+        # 剩余数据种类
+        data_num = bod["data_num"]
+        # logger.debug(f"data_num: {data_num}")
+        if data_num == 0:
+            return _final()
 
-            # 灯光
-            num = unpack("I", f)[0]
-            for idx in range(num):
-                strength = unpack("f", f)[0]
-                precision = unpack("f", f)[0]
-                co = Vector(unpack("ddd", f)) / 1000
-                # if transform_space:
-                #     co.yz = co.z, -co.y
-                #
-                obj_name = data.get_object_name("Blade_Light_")
-                obj = bpy.data.objects.new(
-                    obj_name, None
-                )  # type: Object # type: ignore
-                obj.empty_display_size = 0.1
-                obj.empty_display_type = "ARROWS"
-                obj.show_in_front = True
-                data.link2coll(obj, ent_coll)
-                #
-                parent_idx = unpack("i", f)[0]  # type: int
-                if parent_idx != -1:
-                    if armature is not None:
-                        bone_name = bones_name[parent_idx]
-                        co = bone_matrix[bone_name] @ co
-                        obj.parent = armature_obj  # type: ignore
-                        obj.parent_type = "BONE"
-                        obj.parent_bone = bone_name
-                    logger.debug(f"Light - parent_idx not -1: {parent_idx}")
-                #
-                obj.matrix_world = Matrix.Translation(co)
-
-            # 锚点
-            num = unpack("I", f)[0]
-            for idx in range(num):
-                length = unpack("I", f)[0]
-                name = unpack(f"{length}s", f)
-                lst = unpack("dddd" * 4, f)
-                lst = [lst[i * 4 : (i + 1) * 4] for i in range(4)]
-                matrix = Matrix(lst)
-                matrix.transpose()  # 转置
-                matrix.translation /= 1000  # 转换位置单位
-                # 清除缩放
-                loc, rot, scale = matrix.decompose()
-                matrix = Matrix.LocRotScale(loc, rot, None)
-                #
-                obj_name = f"Blade_Anchor_{name}"
-                obj = bpy.data.objects.new(
-                    obj_name, None
-                )  # type: Object # type: ignore
-                obj.empty_display_size = 0.1
-                obj.empty_display_type = "ARROWS"
-                obj.show_in_front = True
-                data.link2coll(obj, ent_coll)
-                #
-                parent_matrix = local_space if transform_space else None
-                parent_idx = unpack("i", f)[0]  # type: int
-                if parent_idx != -1:
-                    if armature is not None:
-                        bone_name = bones_name[parent_idx]
-                        parent_matrix = bone_matrix[bone_name]
-                        obj.parent = armature_obj  # type: ignore
-                        obj.parent_type = "BONE"
-                        obj.parent_bone = bone_name
-                    else:
-                        obj.parent = entity  # type: ignore
-                #
-                if parent_matrix:
-                    matrix = parent_matrix @ matrix
-                # XXX 有BUG，没有父对象时，矩阵设置不生效
-                if not obj.parent:
-                    obj.parent = entity  # type: ignore
-                    obj.matrix_world = matrix
-                    bpy.app.timers.register(
-                        lambda obj=obj: setattr(obj, "parent", None), first_interval=0.2
-                    )
+        # 边缘
+        for edge in bod["edges"]:
+            mark = int(edge["mark"])  # 默认0
+            if mark != 0:
+                logger.debug(f"Edge - mark not 0: {mark}")
+            #
+            parent_idx = int(edge["parent"])
+            pt1, pt2, pt3 = (Vector(p) / 1000 for p in edge["points"].tolist())
+            #
+            obj_name = data.get_object_name("Blade_Edge_")
+            mesh = bpy.data.meshes.new(obj_name)
+            obj = bpy.data.objects.new(obj_name, mesh)  # type: Object # type: ignore
+            obj.show_in_front = True
+            obj.amagate_data.ent_comp_type = 1
+            data.link2coll(obj, ent_coll)
+            #
+            parent_matrix = local_space if transform_space else None
+            if parent_idx != -1:
+                if armature is not None:
+                    bone_name = bones_name[parent_idx]
+                    parent_matrix = bone_matrix[bone_name]
+                    obj.parent = armature_obj  # type: ignore
+                    obj.parent_type = "BONE"
+                    obj.parent_bone = bone_name
                 else:
-                    obj.matrix_world = matrix
-
-            # 剩余数据种类
-            data_num = unpack("I", f)[0]
-            # logger.debug(f"data_num: {data_num}")
-            if data_num == 0:
-                return _final()
-
-            # 边缘
-            num = unpack("I", f)[0]
-            for idx in range(num):
-                mark = unpack("I", f)[0]  # 默认0
-                if mark != 0:
-                    logger.debug(f"Edge - mark not 0: {mark}")
-                #
-                parent_idx = unpack("i", f)[0]  # type: int
-                pt1 = Vector(unpack("ddd", f)) / 1000
-                pt2 = Vector(unpack("ddd", f)) / 1000
-                pt3 = Vector(unpack("ddd", f)) / 1000
-                #
-                obj_name = data.get_object_name("Blade_Edge_")
-                mesh = bpy.data.meshes.new(obj_name)
-                obj = bpy.data.objects.new(
-                    obj_name, mesh
-                )  # type: Object # type: ignore
-                obj.show_in_front = True
-                obj.amagate_data.ent_comp_type = 1
-                data.link2coll(obj, ent_coll)
-                #
-                parent_matrix = local_space if transform_space else None
-                if parent_idx != -1:
-                    if armature is not None:
-                        bone_name = bones_name[parent_idx]
-                        parent_matrix = bone_matrix[bone_name]
-                        obj.parent = armature_obj  # type: ignore
-                        obj.parent_type = "BONE"
-                        obj.parent_bone = bone_name
-                    else:
-                        obj.parent = entity  # type: ignore
-                #
-                if parent_matrix:
-                    quat = parent_matrix.to_quaternion()
-                    pt1 = parent_matrix @ pt1
-                    pt2 = quat @ pt2
-                    pt3 = quat @ pt3
-                #
-                mesh_data = mesh_dict["Blade_Edge_1"]
-                bm = bmesh.new()
-                verts = []
-                for co in mesh_data["vertices"]:
-                    verts.append(bm.verts.new(co))
-                for idx in mesh_data["edges"]:
-                    bm.edges.new([verts[i] for i in idx])
-                # 调整大小
-                scale_y = pt2.length * 2 / 0.8
-                bmesh.ops.scale(bm, vec=(1, scale_y, 1), verts=bm.verts)  # type: ignore
-                move_x = pt3.length - 0.3
-                bmesh.ops.translate(bm, vec=(move_x, 0, 0), verts=[verts[i] for i in range(2, 8)])  # type: ignore
-                # 调整朝向
-                x_axis = pt3.normalized()
-                y_axis = pt2.normalized()
-                z_axis = x_axis.cross(y_axis).normalized()
-                bm_matrix = Matrix((x_axis, y_axis, z_axis)).transposed()
-                # quat = pt2.normalized().to_track_quat("Y", "Z")
-                # quat = pt3.normalized().to_track_quat("X", "Z") @ quat
-                bmesh.ops.rotate(bm, cent=(0, 0, 0), matrix=bm_matrix, verts=bm.verts)  # type: ignore
-
-                bm.to_mesh(mesh)
-                bm.free()
-                #
-                obj.matrix_world.translation = pt1
+                    obj.parent = entity  # type: ignore
+            #
+            if parent_matrix:
+                quat = parent_matrix.to_quaternion()
+                pt1 = parent_matrix @ pt1
+                pt2 = quat @ pt2
+                pt3 = quat @ pt3
+            #
+            mesh_data = mesh_dict["Blade_Edge_1"]
+            bm = bmesh.new()
+            verts = []
+            for co in mesh_data["vertices"]:
+                verts.append(bm.verts.new(co))
+            for idx in mesh_data["edges"]:
+                bm.edges.new([verts[i] for i in idx])
+            # 调整大小
+            scale_y = pt2.length * 2 / 0.8
+            bmesh.ops.scale(bm, vec=(1, scale_y, 1), verts=bm.verts)  # type: ignore
+            move_x = pt3.length - 0.3
+            bmesh.ops.translate(bm, vec=(move_x, 0, 0), verts=[verts[i] for i in range(2, 8)])  # type: ignore
+            # 调整朝向
+            x_axis = pt3.normalized()
+            y_axis = pt2.normalized()
+            z_axis = x_axis.cross(y_axis).normalized()
+            bm_matrix = Matrix((x_axis, y_axis, z_axis)).transposed()
+            # quat = pt2.normalized().to_track_quat("Y", "Z")
+            # quat = pt3.normalized().to_track_quat("X", "Z") @ quat
+            bmesh.ops.rotate(bm, cent=(0, 0, 0), matrix=bm_matrix, verts=bm.verts)  # type: ignore
 
+            bm.to_mesh(mesh)
+            bm.free()
             #
-            data_num -= 1
-            if data_num == 0:
-                return _final()
+            obj.matrix_world.translation = pt1
 
-            # 尖刺
-            num = unpack("I", f)[0]
-            for idx in range(num):
-                mark = unpack("I", f)[0]  # 默认0
-                if mark != 0:
-                    logger.debug(f"Spike - mark not 0: {mark}")
-                #
-                parent_idx = unpack("i", f)[0]  # type: int
-                pt1 = Vector(unpack("ddd", f)) / 1000
-                pt2 = pt1 + Vector(unpack("ddd", f)) / 1000
-                #
-                obj_name = data.get_object_name("Blade_Spike_")
-                mesh = bpy.data.meshes.new(obj_name)
-                obj = bpy.data.objects.new(
-                    obj_name, mesh
-                )  # type: Object # type: ignore
-                obj.show_in_front = True
-                obj.amagate_data.ent_comp_type = 2
-                data.link2coll(obj, ent_coll)
-                #
-                parent_matrix = local_space if transform_space else None
-                if parent_idx != -1:
-                    if armature is not None:
-                        bone_name = bones_name[parent_idx]
-                        parent_matrix = bone_matrix[bone_name]
-                        obj.parent = armature_obj  # type: ignore
-                        obj.parent_type = "BONE"
-                        obj.parent_bone = bone_name
-                    else:
-                        obj.parent = entity  # type: ignore
-                #
-                if parent_matrix:
-                    pt1 = parent_matrix @ pt1
-                    pt2 = parent_matrix @ pt2
-                #
-                mesh_data = mesh_dict["Blade_Spike_1"]
-                bm = bmesh.new()
-                verts = []
-                for co in mesh_data["vertices"]:
-                    verts.append(bm.verts.new(co))
-                for idx in mesh_data["edges"]:
-                    bm.edges.new([verts[i] for i in idx])
-                # 调整大小
-                move_y = (pt2 - pt1).length - 0.1
-                bmesh.ops.translate(bm, vec=(0, move_y, 0), verts=[verts[i] for i in range(1, 6)])  # type: ignore
-                # 调整朝向
-                quat = (pt2 - pt1).normalized().to_track_quat("Y", "Z")
-                bmesh.ops.rotate(bm, cent=(0, 0, 0), matrix=quat.to_matrix(), verts=bm.verts)  # type: ignore
-
-                bm.to_mesh(mesh)
-                bm.free()
-                #
-                obj.matrix_world = Matrix.Translation(pt1)
+        #
+        if data_num == 1:
+            return _final()
 
-            ent_mesh.attributes.new(name="amagate_group", type="INT", domain="FACE")
-            ent_mesh.attributes.new(
-                name="amagate_mutilation_group", type="INT", domain="FACE"
-            )
+        # 尖刺
+        for spike in bod["spikes"]:
+            mark = int(spike["mark"])  # 默认0
+            if mark != 0:
+                logger.debug(f"Spike - mark not 0: {mark}")
+            #
+            parent_idx = int(spike["parent"])
+            pt1, offset = (Vector(p) / 1000 for p in spike["points"].tolist())
+            pt2 = pt1 + offset
+            #
+            obj_name = data.get_object_name("Blade_Spike_")
+            mesh = bpy.data.meshes.new(obj_name)
+            obj = bpy.data.objects.new(obj_name, mesh)  # type: Object # type: ignore
+            obj.show_in_front = True
+            obj.amagate_data.ent_comp_type = 2
+            data.link2coll(obj, ent_coll)
+            #
+            parent_matrix = local_space if transform_space else None
+            if parent_idx != -1:
+                if armature is not None:
+                    bone_name = bones_name[parent_idx]
+                    parent_matrix = bone_matrix[bone_name]
+                    obj.parent = armature_obj  # type: ignore
+                    obj.parent_type = "BONE"
+                    obj.parent_bone = bone_name
+                else:
+                    obj.parent = entity  # type: ignore
+            #
+            if parent_matrix:
+                pt1 = parent_matrix @ pt1
+                pt2 = parent_matrix @ pt2
+            #
+            mesh_data = mesh_dict["Blade_Spike_1"]
+            bm = bmesh.new()
+            verts = []
+            for co in mesh_data["vertices"]:
+                verts.append(bm.verts.new(co))
+            for idx in mesh_data["edges"]:
+                bm.edges.new([verts[i] for i in idx])
+            # 调整大小
+            move_y = (pt2 - pt1).length - 0.1
+            bmesh.ops.translate(bm, vec=(0, move_y, 0), verts=[verts[i] for i in range(1, 6)])  # type: ignore
+            # 调整朝向
+            quat = (pt2 - pt1).normalized().to_track_quat("Y", "Z")
+            bmesh.ops.rotate(bm, cent=(0, 0, 0), matrix=quat.to_matrix(), verts=bm.verts)  # type: ignore
 
+            bm.to_mesh(mesh)
+            bm.free()
             #
-            data_num -= 1
-            if data_num == 0:
-                return _final()
+            obj.matrix_world = Matrix.Translation(pt1)
 
-            # 组
-            num = unpack("I", f)[0]
-            for idx in range(num):
-                group = unpack("B", f)[0]
-                if idx >= len(ent_mesh.polygons):
-                    continue
-                ent_mesh.attributes["amagate_group"].data[idx].value = 0 if group == 0 else ag_utils.uint_to_int(1 << (group - 1))  # type: ignore
-
-            # 肢解组
-            num = unpack("I", f)[0]
-            for idx in range(num):
-                group = unpack("i", f)[0]
-                if idx >= len(ent_mesh.polygons):
-                    continue
-                ent_mesh.attributes["amagate_mutilation_group"].data[idx].value = group  # type: ignore
+        ent_mesh.attributes.new(name="amagate_group", type="INT", domain="FACE")
+        ent_mesh.attributes.new(
+            name="amagate_mutilation_group", type="INT", domain="FACE"
+        )
 
-            #
-            data_num -= 1
-            if data_num == 0:
-                return _final()
+        #
+        if data_num == 2:
+            return _final()
 
-            # 轨迹
-            num = unpack("I", f)[0]
-            for idx in range(num):
-                mark = unpack("I", f)[0]  # 默认0
-                if mark != 0:
-                    logger.debug(f"Track - mark not 0: {mark}")
-                parent_idx = unpack("i", f)[0]  # type: int
-                pt1 = Vector(unpack("ddd", f)) / 1000
-                pt2 = pt1 + Vector(unpack("ddd", f)) / 1000
-                #
-                obj_name = data.get_object_name("Blade_Trail_")
-                mesh = bpy.data.meshes.new(obj_name)
-                obj = bpy.data.objects.new(
-                    obj_name, mesh
-                )  # type: Object # type: ignore
-                obj.show_in_front = True
-                obj.amagate_data.ent_comp_type = 3
-                data.link2coll(obj, ent_coll)
-                #
-                parent_matrix = local_space if transform_space else None
-                if parent_idx != -1:
-                    if armature is not None:
-                        bone_name = bones_name[parent_idx]
-                        parent_matrix = bone_matrix[bone_name]
-                        obj.parent = armature_obj  # type: ignore
-                        obj.parent_type = "BONE"
-                        obj.parent_bone = bone_name
-                    else:
-                        obj.parent = entity  # type: ignore
-                #
-                if parent_matrix:
-                    pt1 = parent_matrix @ pt1
-                    pt2 = parent_matrix @ pt2
-                #
-                obj.matrix_world = Matrix()
-                bm = bmesh.new()
-                bm.verts.new(pt1)
-                bm.verts.new(pt2)
-                bm.edges.new(bm.verts)
+        faces_num = len(face_images)
+        # 组
+        group = bod["groups"][:faces_num].astype(np.int64)
+        value = np.zeros(faces_num, dtype=np.int64)
+        value[: len(group)] = np.where(group == 0, 0, 1 << np.maximum(group - 1, 0))
+        ent_mesh.attributes["amagate_group"].data.foreach_set("value", value.astype(np.uint32).view(np.int32))  # type: ignore
 
-                bm.to_mesh(mesh)
-                bm.free()
+        # 肢解组
+        group = bod["mutilation_groups"][:faces_num]
+        value = np.zeros(faces_num, dtype=np.int32)
+        value[: len(group)] = group
+        ent_mesh.attributes["amagate_mutilation_group"].data.foreach_set("value", value)  # type: ignore
 
-            #
+        #
+        if data_num == 3:
             return _final()
 
+        # 轨迹
+        for trail in bod["trails"]:
+            mark = int(trail["mark"])  # 默认0
+            if mark != 0:
+                logger.debug(f"Track - mark not 0: {mark}")
+            parent_idx = int(trail["parent"])
+            pt1, offset = (Vector(p) / 1000 for p in trail["points"].tolist())
+            pt2 = pt1 + offset
+            #
+            obj_name = data.get_object_name("Blade_Trail_")
+            mesh = bpy.data.meshes.new(obj_name)
+            obj = bpy.data.objects.new(obj_name, mesh)  # type: Object # type: ignore
+            obj.show_in_front = True
+            obj.amagate_data.ent_comp_type = 3
+            data.link2coll(obj, ent_coll)
+            #
+            parent_matrix = local_space if transform_space else None
+            if parent_idx != -1:
+                if armature is not None:
+                    bone_name = bones_name[parent_idx]
+                    parent_matrix = bone_matrix[bone_name]
+                    obj.parent = armature_obj  # type: ignore
+                    obj.parent_type = "BONE"
+                    obj.parent_bone = bone_name
+                else:
+                    obj.parent = entity  # type: ignore
+            #
+            if parent_matrix:
+                pt1 = parent_matrix @ pt1
+                pt2 = parent_matrix @ pt2
+            #
+            obj.matrix_world = Matrix()
+            bm = bmesh.new()
+            bm.verts.new(pt1)
+            bm.verts.new(pt2)
+            bm.edges.new(bm.verts)
+
+            bm.to_mesh(mesh)
+            bm.free()
+
+        #
+        return _final()
+
     def invoke(self, context: Context, event):
         # 设为上次选择目录，文件名为空
         # self.filepath = self.directory
@@ -1903,6 +2020,46 @@ class OT_ImportBOD(bpy.types.Operator):
         return {"RUNNING_MODAL"}
 
 
+# 更新模型库元数据索引
+class OT_UpdateModelIndex(bpy.types.Operator):
+    bl_idname = "amagate.update_model_index"
+    bl_label = "Update Model Index"
+    bl_description = "Rescan changed models and update the model metadata index"
+    bl_options = {"INTERNAL"}
+
+    # 额外索引的目录，例如游戏的3DObjs
+    directory: StringProperty(subtype="DIR_PATH", options={"HIDDEN", "SKIP_SAVE"})  # type: ignore
+
+    def execute(self, context: Context):
+        models_path = os.path.join(data.ADDON_PATH, "Models")
+        paths = [os.path.join(models_path, d) for d in ("3DChars", "3DObjs", "Custom")]
+        if self.directory:
+            paths.append(self.directory)
+        paths = [p for p in paths if os.path.isdir(p)]
+
+        index = get_model_index()
+        wm = context.window_manager
+        wm.progress_begin(0, 100)
+        try:
+            stale, errors = index.update(
+                paths,
+                scan_model_blend,
+                progress=lambda count, total: wm.progress_update(count * 100 // total),
+            )
+        finally:
+            wm.progress_end()
+        index.save()
+
+        for filepath, error in errors.items():
+            logger.warning(f"{os.path.basename(filepath)}: {error}")
+        self.report(
+            {"WARNING"} if errors else {"INFO"},
+            f"{pgettext('Model index updated')}: {len(stale) - len(errors)}/{len(index)}"
+            + (f", {pgettext('Failed')}: {len(errors)}" if errors else ""),
+        )
+        return {"FINISHED"}
+
+
 ############################
 ############################ 导出操作
 ############################
@@ -2028,9 +2185,20 @@ class OT_ExportBOD(bpy.types.Operator, ExportHelper):
         )  # type: bpy.types.Mesh # type: ignore
         entity_eval = entity.evaluated_get(depsgraph)
         ent_matrix = entity_eval.matrix_world.copy()
+        # 顶点、法线和循环
+        verts_co = np.empty(len(ent_mesh.vertices) * 3, dtype=np.float32)
+        ent_mesh.vertices.foreach_get("co", verts_co)
+        verts_co = verts_co.reshape(-1, 3)
+        verts_normal = np.empty(len(ent_mesh.vertices) * 3, dtype=np.float32)
+        ent_mesh.vertices.foreach_get("normal", verts_normal)
+        verts_normal = verts_normal.reshape(-1, 3)
+        loop_verts = np.empty(len(ent_mesh.loops), dtype=np.int32)
+        ent_mesh.loops.foreach_get("vertex_index", loop_verts)
         # 计算几何中心
-        verts_co = [v.co for v in ent_mesh.vertices]
-        geom_center = Vector(sum(verts_co, Vector()) / len(verts_co))
+        geom_center = (
+            Vector(verts_co.cumsum(axis=0, dtype=np.float32)[-1].tolist())
+            / len(verts_co)
+        )
         #
         origin = ent_matrix.to_translation()
         bounds_length = [
@@ -2044,6 +2212,10 @@ class OT_ExportBOD(bpy.types.Operator, ExportHelper):
         # quat = matrix.to_quaternion()
         # uv_layer = ent_mesh.uv_layers.active.data
         uv_layer = next(i.data for i in ent_mesh.uv_layers if i.active_render)
+        loop_uvs = np.empty(len(ent_mesh.loops) * 2, dtype=np.float32)
+        uv_layer.foreach_get("uv", loop_uvs)
+        loop_uvs = loop_uvs.reshape(-1, 2)
+        group_members = GroupMembers(ent_mesh, len(entity.vertex_groups))
         #
         cursor = context.scene.cursor
         if armature_obj is not None:
@@ -2053,15 +2225,13 @@ class OT_ExportBOD(bpy.types.Operator, ExportHelper):
                 self.report({"ERROR"}, "Missing bone vertex group")
                 return _final()
             groups_idx = [entity.vertex_groups[name].index for name in bones_name]
-            for v in ent_mesh.vertices:
-                # has_vg = next((1 for g in v.groups if g.group in groups_idx), 0)
-                vert_groups = [1 for g in v.groups if g.group in groups_idx]
-                if len(vert_groups) != 1:
-                    self.report(
-                        {"ERROR"},
-                        "Each vertex must be assigned to a bone vertex group and can only belong to one vertex group",
-                    )
-                    return _final()
+            vert_bone = group_members.vert_bone(groups_idx)
+            if len(vert_bone) and vert_bone.min() < 0:
+                self.report(
+                    {"ERROR"},
+                    "Each vertex must be assigned to a bone vertex group and can only belong to one vertex group",
+                )
+                return _final()
 
             #
             # prev_cursor = cursor.location.copy()
@@ -2088,58 +2258,33 @@ class OT_ExportBOD(bpy.types.Operator, ExportHelper):
                 prefix = f"chunk_"
             else:
                 prefix = f"chunk_{bone_name}_"
-            Chunks = []
-            chunk_start = bone_verts_start
-            bone_verts_end = bone_verts_start + bone_verts_num
-            for name in vertex_groups:
-                if not name.lower().startswith(prefix):
-                    continue
-                vertex_indices = ag_utils.get_vertex_in_group(entity, name)
-                if vertex_indices[0] == chunk_start:
-                    chunk_num = vertex_indices[1] - chunk_start + 1
-                    if (chunk_start + chunk_num) > bone_verts_end:
-                        chunk_num = bone_verts_end - chunk_start
-                    Chunks.append([chunk_start, chunk_num])
-                    chunk_start += chunk_num
-                    if chunk_start >= bone_verts_end:
-                        break
-            # 自动分块
-            if Chunks:
-                chunk_range = Chunks[-1]
-                chunk_start = chunk_range[0] + chunk_range[1]
-                unchunked_num = bone_verts_end - chunk_start
-            else:
-                unchunked_num = bone_verts_num
-                chunk_start = bone_verts_start
-            if unchunked_num:
-                chunk_num = wm_data.ent_chunk_size  # 最大512
-                for i in range((unchunked_num - 1) // chunk_num + 1):
-                    if (chunk_start + chunk_num) > bone_verts_end:
-                        chunk_num = bone_verts_end - chunk_start
-                    Chunks.append([chunk_start, chunk_num])
-                    chunk_start += chunk_num
+            chunk_groups = [
+                group_members.get(entity.vertex_groups[name].index, 2)
+                for name in vertex_groups
+                if name.lower().startswith(prefix)
+            ]
+            Chunks = get_bod_chunks(
+                bone_verts_start,
+                bone_verts_num,
+                chunk_groups,
+                wm_data.ent_chunk_size,  # 最大512
+            )
             # logger.debug(f"Chunks: {Chunks}")
             return Chunks
 
         # 导出BOD
-        buffer = BytesIO()
-        bone_verts_map = {}
-        global_verts_map = {}
-        global_verts_count = 0
+        buffer = ag_binio.Segment()
         # 写入内部名称
         inter_name = ent_dict["kind"].encode("utf-8")
-        buffer.write(struct.pack("I", len(inter_name)))
+        buffer.pack("I", len(inter_name))
         buffer.write(inter_name)
 
         # 写入顶点数据
-        verts_num = 0
-        s_pos_verts_num = buffer.tell()
-        buffer.write(struct.pack("I", verts_num))
         bones_list = []
         bones_matrix = {}  # type: dict[str, tuple[Matrix, Matrix]]
         # 如果有骨架
         if armature is not None:
-            bone_verts_start = 0
+            bones = []
             for name in bones_name:
                 bone = armature_obj.pose.bones[name]
                 matrix = armature_matrix @ bone.matrix
@@ -2155,137 +2300,57 @@ class OT_ExportBOD(bpy.types.Operator, ExportHelper):
                     ),
                 )[1]
                 bone_quat = bone_matrix.to_quaternion()
-                # bone_matrix = bone.matrix.inverted()  # type: Matrix
-                vertex_indices = ag_utils.get_vertex_in_group(
-                    entity, name
-                )  # type: list[int]
-                co_list = []
-                max_length = 0
-                bone_verts_map[name] = {}
-                for idx in vertex_indices:
-                    # if idx in global_verts_map:
-                    #     continue
-
-                    #
-                    vert = ent_mesh.vertices[idx]
-                    co = vert.co.copy()
-                    co_key = co.to_tuple(5)
-                    # 优化重叠顶点
-                    if (v := bone_verts_map[name].get(co_key, None)) is not None:
-                        global_verts_map[idx] = v
-                        continue
-                    else:
-                        bone_verts_map[name][co_key] = global_verts_count
-                        global_verts_map[idx] = global_verts_count
-                        global_verts_count += 1
-
-                    normal = vert.normal.copy()
-                    normal.yz = -normal.z, normal.y
-                    normal = bone_quat @ normal
-
-                    co.yz = -co.z, co.y
-                    co = bone_matrix @ co
-                    co *= 1000
-                    # if vert.index == 0:
-                    #     print(f"co: {co}")
-                    co_list.append(co)
-                    length = co.length
-                    if length > max_length:
-                        max_length = length
-                    #
-                    buffer.write(struct.pack("ddd", *co))
-                    buffer.write(struct.pack("ddd", *normal))
-                    verts_num += 1
-                #
-                bone_verts_num = len(co_list)
-                if bone_verts_num == 0:
-                    bone_center = Vector()
-                else:
-                    bone_center = sum(co_list, Vector()) / bone_verts_num
-                bones_list.append(
-                    (bone_verts_num, bone_verts_start, bone_center, max_length)
+                bones.append(
+                    (
+                        np.array(bone_matrix, dtype=np.float32),
+                        np.array(bone_quat, dtype=np.float32),
+                    )
                 )
-                bone_verts_start += bone_verts_num
-                # if bone_verts_num > 512:
-                #     self.report(
-                #         {"ERROR"},
-                #         pgettext("Bone [{}] has more than 512 vertices!").format(name),
-                #     )
-        else:
-            bone_verts_map["Default"] = {}
-            for vert in ent_mesh.vertices:
-                idx = vert.index
-                co = vert.co.copy()
-                co_key = co.to_tuple(5)
-                # 优化重叠顶点
-                if (v := bone_verts_map["Default"].get(co_key, None)) is not None:
-                    global_verts_map[idx] = v
-                    continue
-                else:
-                    bone_verts_map["Default"][co_key] = global_verts_count
-                    global_verts_map[idx] = global_verts_count
-                    global_verts_count += 1
-
-                normal = vert.normal.copy()
-                normal.yz = -normal.z, normal.y
-                co *= 1000
-                co.yz = -co.z, co.y
-                # co = co.to_tuple(1)
-                buffer.write(struct.pack("ddd", *co))
-                buffer.write(struct.pack("ddd", *normal))
-                verts_num += 1
-            # if verts_num > 512:
+            verts_data, verts_map, bones_list = pack_bod_verts(
+                verts_co, verts_normal, vert_bone, bones
+            )
+            # if bone_verts_num > 512:
             #     self.report(
             #         {"ERROR"},
-            #         pgettext("Bone [{}] has more than 512 vertices!").format("Default"),
+            #         pgettext("Bone [{}] has more than 512 vertices!").format(name),
             #     )
-        # 更新顶点数
-        s_pos = buffer.tell()
-        buffer.seek(s_pos_verts_num)
-        buffer.write(struct.pack("I", verts_num))
-        buffer.seek(s_pos)
+        else:
+            verts_data, verts_map, bones_list = pack_bod_verts(
+                verts_co,
+                verts_normal,
+                np.zeros(len(verts_co), dtype=np.int32),
+                None,
+            )
+        verts_num = len(verts_data)
+        buffer.pack("I", verts_num)
+        buffer.write(verts_data.tobytes())
 
         # 写入面数据
         faces_num = len(ent_mesh.polygons)
-        buffer.write(struct.pack("I", faces_num))
-        for poly in ent_mesh.polygons:
-            # 写顶点索引
-            buffer.write(
-                struct.pack("III", *[global_verts_map[i] for i in poly.vertices])
+        buffer.pack("I", faces_num)
+        # 已三角化，每个面3个循环
+        loop_start = np.empty(faces_num, dtype=np.int32)
+        ent_mesh.polygons.foreach_get("loop_start", loop_start)
+        face_loops = loop_start[:, None] + np.arange(3)
+        material_index = np.empty(faces_num, dtype=np.int32)
+        ent_mesh.polygons.foreach_get("material_index", material_index)
+        # 材质槽的纹理名称，最后一项用于超出范围的材质索引
+        slot_names = []
+        for slot in entity.material_slots:
+            mat = slot.material
+            slot_names.append(ag_utils.remove_dup_suffix(mat.name) if mat else "")
+        slot_names.append("")
+        slot_index = np.minimum(material_index, len(slot_names) - 1)
+        if not all(slot_names[i] for i in np.unique(slot_index)):
+            lack_texture = True
+        slot_names = [(name or "NULL").encode("utf-8") for name in slot_names]
+        # UV (u0, u1, u2, v0, v1, v2)
+        face_uvs = loop_uvs[face_loops].transpose(0, 2, 1).reshape(-1, 6)
+        buffer.write(
+            pack_bod_faces(
+                verts_map[loop_verts[face_loops]], face_uvs, slot_index, slot_names
             )
-            # if armature is not None:
-            #     buffer.write(
-            #         struct.pack("III", *[global_verts_map[i] for i in poly.vertices])
-            #     )
-            # else:
-            #     buffer.write(struct.pack("III", *poly.vertices))
-            # 写材质
-            img_name = ""
-            if poly.material_index < len(entity.material_slots):
-                mat = entity.material_slots[poly.material_index].material
-                if mat:
-                    img_name = ag_utils.remove_dup_suffix(mat.name)
-                    # img_node = mat.node_tree.nodes.get(
-                    #     "Image Texture"
-                    # )  # type: bpy.types.ShaderNodeTexImage # type: ignore
-                    # if img_node and img_node.image:
-                    #     img_name = Path(bpy.path.basename(img_node.image.filepath)).stem
-
-            if not img_name:
-                img_name = "NULL"
-                if not lack_texture:
-                    lack_texture = True
-            img_name = img_name.encode("utf-8")
-            buffer.write(struct.pack("I", len(img_name)))
-            buffer.write(img_name)
-            # 写UV
-            uv_list = []
-            for loop_idx in poly.loop_indices:
-                uv_list.append(uv_layer[loop_idx].uv.to_tuple())
-            uv_list = tuple(zip(*uv_list))
-            buffer.write(struct.pack("ffffff", *uv_list[0], *uv_list[1]))
-            #
-            buffer.write(struct.pack("f", 0))
+        )
 
         vertex_groups = entity.vertex_groups.keys()
         vertex_groups.sort(key=ag_utils.natural_sort_key)
@@ -2298,11 +2363,11 @@ class OT_ExportBOD(bpy.types.Operator, ExportHelper):
             # # 原点到几何中心
             # bpy.ops.object.origin_set(type="ORIGIN_GEOMETRY", center="MEDIAN")
             #
-            buffer.write(struct.pack("I", len(bones_name)))
+            buffer.pack("I", len(bones_name))
             for index, bone_name in enumerate(bones_name):
                 bone = armature_obj.pose.bones[bone_name]
                 name = bone_name.encode("utf-8")
-                buffer.write(struct.pack("I", len(name)))
+                buffer.pack("I", len(name))
                 buffer.write(name)
                 # 父节点索引
                 parent_bone = bone.parent
@@ -2317,66 +2382,51 @@ class OT_ExportBOD(bpy.types.Operator, ExportHelper):
 
                 matrix.translation *= 1000  # 转换位置单位
                 matrix.transpose()  # 转置
-                buffer.write(struct.pack("i", parent_idx))
+                buffer.pack("i", parent_idx)
                 for row in matrix:
-                    buffer.write(struct.pack("dddd", *row))
+                    buffer.pack("dddd", *row)
                 bone_verts_num, bone_verts_start, bone_center, max_length = bones_list[
                     index
                 ]
                 # 写入顶点数量
-                buffer.write(struct.pack("I", bone_verts_num))
+                buffer.pack("I", bone_verts_num)
                 # 写入顶点起始位置
-                buffer.write(struct.pack("I", bone_verts_start))
+                buffer.pack("I", bone_verts_start)
 
                 Chunks = GetChunkData(bone_name)
-                num = len(Chunks)
-                buffer.write(struct.pack("I", num))
-                for i in range(num):
-                    chunk_range = Chunks[i]
-                    buffer.write(
-                        struct.pack("ddd", *bone_center)
-                    )  # 字块实体的中心，似乎无用，直接用骨骼顶点中心
-                    buffer.write(
-                        struct.pack("d", max_length)
-                    )  # 子块实体的最长边距，似乎无用，直接用骨骼顶点边距
-                    buffer.write(struct.pack("I", chunk_range[0]))
-                    buffer.write(struct.pack("I", chunk_range[1]))
+                buffer.pack("I", len(Chunks))
+                # 子块实体的中心和最长边距，似乎无用，直接用骨骼顶点中心和边距
+                buffer.write(pack_bod_chunks(Chunks, bone_center, max_length))
         else:
-            buffer.write(struct.pack("I", 1))  # 骨骼为1
+            buffer.pack("I", 1)  # 骨骼为1
             parent_idx = -1
-            buffer.write(struct.pack("i", parent_idx))
+            buffer.pack("i", parent_idx)
             for row in armature_matrix:
-                buffer.write(struct.pack("dddd", *row))
+                buffer.pack("dddd", *row)
             #
             bone_verts_num, bone_verts_start = verts_num, 0
-            buffer.write(struct.pack("I", bone_verts_num))  # 顶点数量
-            buffer.write(struct.pack("I", bone_verts_start))  # 顶点起始位置
+            buffer.pack("I", bone_verts_num)  # 顶点数量
+            buffer.pack("I", bone_verts_start)  # 顶点起始位置
             #
             Chunks = GetChunkData("")
-            num = len(Chunks)
-            buffer.write(struct.pack("I", num))
-            for i in range(num):
-                chunk_range = Chunks[i]
-                buffer.write(struct.pack("ddd", *center_data))
-                buffer.write(struct.pack("d", bound_max_length))
-                buffer.write(struct.pack("I", chunk_range[0]))
-                buffer.write(struct.pack("I", chunk_range[1]))
-            # buffer.write(struct.pack("I", 1))
-            # buffer.write(struct.pack("dddd", *center_data, bound_max_length))
-            # buffer.write(struct.pack("II", 0, verts_num))
+            buffer.pack("I", len(Chunks))
+            buffer.write(pack_bod_chunks(Chunks, center_data, bound_max_length))
+            # buffer.pack("I", 1)
+            # buffer.pack("dddd", *center_data, bound_max_length)
+            # buffer.pack("II", 0, verts_num)
 
         # 几何中心
-        buffer.write(struct.pack("dddd", *center_data, bound_max_length))
+        buffer.pack("dddd", *center_data, bound_max_length)
 
         obj: Object
         # 火焰
-        buffer.write(struct.pack("I", len(ent_dict["fires"])))
+        buffer.pack("I", len(ent_dict["fires"]))
         for index, obj in enumerate(ent_dict["fires"]):
             obj = obj.evaluated_get(depsgraph)
             matrix_world = glob_rot_inv @ obj.matrix_world
             # matrix_world.translation -= origin
             mesh = obj.data  # type: bpy.types.Mesh # type: ignore
-            buffer.write(struct.pack("I", len(mesh.vertices)))
+            buffer.pack("I", len(mesh.vertices))
             #
             parent_matrix = None
             parent_idx = -1
@@ -2394,18 +2444,18 @@ class OT_ExportBOD(bpy.types.Operator, ExportHelper):
                     co = parent_matrix @ co
                 #
                 co *= 1000
-                buffer.write(struct.pack("ddd", *co))
-                buffer.write(struct.pack("I", 3))  # 固定3
-            buffer.write(struct.pack("i", parent_idx))
-            buffer.write(struct.pack("I", index))
+                buffer.pack("ddd", *co)
+                buffer.pack("I", 3)  # 固定3
+            buffer.pack("i", parent_idx)
+            buffer.pack("I", index)
 
         # 灯光
-        buffer.write(struct.pack("I", len(ent_dict["lights"])))
+        buffer.pack("I", len(ent_dict["lights"]))
         for obj in ent_dict["lights"]:
             obj = obj.evaluated_get(depsgraph)
             strength = 1  # 创建实体时灯光强度默认为10，不会被该值影响
             precision = bytes.fromhex("0000003D")  # 0.03125
-            buffer.write(struct.pack("f", strength))
+            buffer.pack("f", strength)
             buffer.write(precision)
 
             co = (glob_rot_inv @ obj.matrix_world).translation
@@ -2424,15 +2474,15 @@ class OT_ExportBOD(bpy.types.Operator, ExportHelper):
                 co = parent_matrix @ co
             #
             co *= 1000
-            buffer.write(struct.pack("ddd", *co))
-            buffer.write(struct.pack("i", parent_idx))
+            buffer.pack("ddd", *co)
+            buffer.pack("i", parent_idx)
 
         # 锚点
-        buffer.write(struct.pack("I", len(ent_dict["anchors"])))
+        buffer.pack("I", len(ent_dict["anchors"]))
         for obj in ent_dict["anchors"]:
             obj = obj.evaluated_get(depsgraph)
             name = ag_utils.remove_dup_suffix(obj.name[13:]).encode("utf-8")
-            buffer.write(struct.pack("I", len(name)))
+            buffer.pack("I", len(name))
             buffer.write(name)
             #
             parent_matrix = None
@@ -2457,14 +2507,14 @@ class OT_ExportBOD(bpy.types.Operator, ExportHelper):
             matrix.translation *= 1000  # 转换位置单位
             matrix.transpose()  # 转置
             for row in matrix:
-                buffer.write(struct.pack("dddd", *row))
-            buffer.write(struct.pack("i", parent_idx))
+                buffer.pack("dddd", *row)
+            buffer.pack("i", parent_idx)
 
         #
-        buffer.write(struct.pack("I", 4))  # 写4种数据：边缘，尖刺，组，轨迹
+        buffer.pack("I", 4)  # 写4种数据：边缘，尖刺，组，轨迹
 
         # 边缘
-        buffer.write(struct.pack("I", len(ent_dict["edges"])))
+        buffer.pack("I", len(ent_dict["edges"]))
         for obj in ent_dict["edges"]:
             obj = obj.evaluated_get(depsgraph)
             matrix_world = glob_rot_inv @ obj.matrix_world.copy()
@@ -2500,14 +2550,14 @@ class OT_ExportBOD(bpy.types.Operator, ExportHelper):
             pt1 *= 1000
             pt2 *= 1000
             pt3 *= 1000
-            buffer.write(struct.pack("I", 0))  # 固定0
-            buffer.write(struct.pack("i", parent_idx))
-            buffer.write(struct.pack("ddd", *pt1))
-            buffer.write(struct.pack("ddd", *pt2))
-            buffer.write(struct.pack("ddd", *pt3))
+            buffer.pack("I", 0)  # 固定0
+            buffer.pack("i", parent_idx)
+            buffer.pack("ddd", *pt1)
+            buffer.pack("ddd", *pt2)
+            buffer.pack("ddd", *pt3)
 
         # 尖刺
-        buffer.write(struct.pack("I", len(ent_dict["spikes"])))
+        buffer.pack("I", len(ent_dict["spikes"]))
         for obj in ent_dict["spikes"]:
             obj = obj.evaluated_get(depsgraph)
             matrix_world = glob_rot_inv @ obj.matrix_world.copy()
@@ -2535,29 +2585,32 @@ class OT_ExportBOD(bpy.types.Operator, ExportHelper):
             pt2 = pt2 - pt1
             pt1 *= 1000
             pt2 *= 1000
-            buffer.write(struct.pack("I", 0))  # 固定0
-            buffer.write(struct.pack("i", parent_idx))
-            buffer.write(struct.pack("ddd", *pt1))
-            buffer.write(struct.pack("ddd", *pt2))
+            buffer.pack("I", 0)  # 固定0
+            buffer.pack("i", parent_idx)
+            buffer.pack("ddd", *pt1)
+            buffer.pack("ddd", *pt2)
 
         # 组
-        buffer.write(struct.pack("I", faces_num))
-        for i in range(faces_num):
-            group = ent_mesh.attributes["amagate_group"].data[i].value  # type: ignore
-            group = next((i + 1 for i in range(32) if (1 << i) & group), 0)
-            buffer.write(struct.pack("B", group))
+        buffer.pack("I", faces_num)
+        group = np.empty(faces_num, dtype=np.int32)
+        ent_mesh.attributes["amagate_group"].data.foreach_get("value", group)  # type: ignore
+        # 最低位的组号，0表示无
+        group = group.view(np.uint32).astype(np.int64)
+        lowest_bit = group & -group
+        group = np.where(group == 0, 0, np.log2(np.maximum(lowest_bit, 1)) + 1)
+        buffer.write(group.astype(np.uint8).tobytes())
 
         # 肢解组
         if armature is not None:
-            buffer.write(struct.pack("I", faces_num))
-            for i in range(faces_num):
-                group = ent_mesh.attributes["amagate_mutilation_group"].data[i].value  # type: ignore
-                buffer.write(struct.pack("i", group))
+            buffer.pack("I", faces_num)
+            group = np.empty(faces_num, dtype=np.int32)
+            ent_mesh.attributes["amagate_mutilation_group"].data.foreach_get("value", group)  # type: ignore
+            buffer.write(group.astype("<i4").tobytes())
         else:
-            buffer.write(struct.pack("I", 0))
+            buffer.pack("I", 0)
 
         # 轨迹
-        buffer.write(struct.pack("I", len(ent_dict["trails"])))
+        buffer.pack("I", len(ent_dict["trails"]))
         for obj in ent_dict["trails"]:
             obj = obj.evaluated_get(depsgraph)
             matrix_world = glob_rot_inv @ obj.matrix_world.copy()
@@ -2585,15 +2638,14 @@ class OT_ExportBOD(bpy.types.Operator, ExportHelper):
             pt2 = pt2 - pt1
             pt1 *= 1000
             pt2 *= 1000
-            buffer.write(struct.pack("I", 0))  # 固定0
-            buffer.write(struct.pack("i", parent_idx))
-            buffer.write(struct.pack("ddd", *pt1))
-            buffer.write(struct.pack("ddd", *pt2))
+            buffer.pack("I", 0)  # 固定0
+            buffer.pack("i", parent_idx)
+            buffer.pack("ddd", *pt1)
+            buffer.pack("ddd", *pt2)
 
         # 写入文件
         with open(self.filepath, "wb") as f:
-            f.write(buffer.getvalue())
-        buffer.close()
+            f.write(buffer.view())
         #
         if lack_texture:
             self.report({"WARNING"}, "The object lacks texture")
@@ -9,7 +9,6 @@ import sys
 import os
 import math
 import pickle
-import struct
 import contextlib
 import shutil
 import threading
@@ -18,7 +17,7 @@ import json
 import re
 from pprint import pprint
 from pathlib import Path
-from io import StringIO, BytesIO
+from io import StringIO
 from typing import Any, TYPE_CHECKING
 
 import bpy
@@ -41,7 +40,7 @@ from bpy_extras.io_utils import ExportHelper
 from bpy_extras import anim_utils
 
 from . import data, entity_data
-from . import ag_utils
+from . import ag_utils, ag_binio
 from .ag_utils import epsilon, epsilon2
 
 if TYPE_CHECKING:
@@ -56,7 +55,6 @@ if TYPE_CHECKING:
 
 ############################
 logger = data.logger
-unpack = ag_utils.unpack
 
 ############################
 ############################ 通用操作
@@ -327,84 +325,84 @@ class OT_PakPack(bpy.types.Operator):
         b_physicalDirectoryPath = f"{physicalDirectoryPath.as_posix()}\x00".encode(
             "utf-8"
         )
-        #
-        pak_file.write(b"\x00" * 8)
-        pak_file.write(b"\x04")
-        pak_file.write(b"fileDescriptorTable\x00")
-        pak_file.write(b"\xf0")  # 未知
-        pak_file.write(struct.pack("H", len(paths) - 2))
+        # 文件头
+        head = ag_binio.Segment()
+        head.write(b"\x00" * 8)
+        head.write(b"\x04")
+        head.write(b"fileDescriptorTable\x00")
+        head.write(b"\xf0")  # 未知
+        head.pack("H", len(paths) - 2)
         #
         data_offset = 0
         for idx, filepath in enumerate(paths):
             file_size = filepath.stat().st_size
             rel_path = filepath.relative_to(directory)
 
-            pak_file.write(b"\x00\x03")
-            pak_file.write(f"{idx}\x00".encode("ascii"))
-            pak_file.write(b"\xf0")  # 未知
-            pak_file.write(bytes.fromhex("00000010"))
+            head.write(b"\x00\x03")
+            head.write(f"{idx}\x00".encode("ascii"))
+            head.write(b"\xf0")  # 未知
+            head.write(bytes.fromhex("00000010"))
 
-            pak_file.write(b"byteCount\x00")
-            pak_file.write(struct.pack("I", file_size))
-            pak_file.write(b"\x10")
+            head.write(b"byteCount\x00")
+            head.pack("I", file_size)
+            head.write(b"\x10")
 
-            pak_file.write(b"byteIndex\x00")
-            pak_file.write(struct.pack("I", data_offset))
+            head.write(b"byteIndex\x00")
+            head.pack("I", data_offset)
             data_offset += file_size
-            pak_file.write(b"\x02")
+            head.write(b"\x02")
 
-            pak_file.write(b"compression\x00")
-            pak_file.write(struct.pack("I", 5))
+            head.write(b"compression\x00")
+            head.pack("I", 5)
 
-            pak_file.write(b"None\x00")
-            pak_file.write(struct.pack("B", 8))
+            head.write(b"None\x00")
+            head.pack("B", 8)
 
-            pak_file.write(b"isReadOnly\x00")
-            pak_file.write(struct.pack("B", 0))
-            pak_file.write(b"\x08")
+            head.write(b"isReadOnly\x00")
+            head.pack("B", 0)
+            head.write(b"\x08")
 
-            pak_file.write(b"isVirtual\x00")
-            pak_file.write(struct.pack("B", 1))
-            pak_file.write(b"\x02")
+            head.write(b"isVirtual\x00")
+            head.pack("B", 1)
+            head.write(b"\x02")
             #
-            pak_file.write(b"logicalDirectoryPath\x00")
+            head.write(b"logicalDirectoryPath\x00")
             b_str = f"{rel_path.parent.as_posix()}/\x00".encode("utf-8")
-            pak_file.write(struct.pack("I", len(b_str)))
-            pak_file.write(b_str)
-            pak_file.write(b"\x02")
+            head.pack("I", len(b_str))
+            head.write(b_str)
+            head.write(b"\x02")
 
-            pak_file.write(b"logicalName\x00")
+            head.write(b"logicalName\x00")
             b_str = f"{rel_path.name}\x00".encode("utf-8")
-            pak_file.write(struct.pack("I", len(b_str)))
-            pak_file.write(b_str)
-            pak_file.write(b"\x02")
-
-            pak_file.write(b"physicalDirectoryPath\x00")
-            pak_file.write(struct.pack("I", len(b_physicalDirectoryPath)))
-            pak_file.write(b_physicalDirectoryPath)
-            pak_file.write(b"\x02")
-
-            pak_file.write(b"physicalName\x00")
-            pak_file.write(struct.pack("I", 1))
-            pak_file.write(b"\x00")
-            pak_file.write(b"\x02")
+            head.pack("I", len(b_str))
+            head.write(b_str)
+            head.write(b"\x02")
+
+            head.write(b"physicalDirectoryPath\x00")
+            head.pack("I", len(b_physicalDirectoryPath))
+            head.write(b_physicalDirectoryPath)
+            head.write(b"\x02")
+
+            head.write(b"physicalName\x00")
+            head.pack("I", 1)
+            head.write(b"\x00")
+            head.write(b"\x02")
             #
-            pak_file.write(b"type\x00")
-            pak_file.write(struct.pack("I", 5))
+            head.write(b"type\x00")
+            head.pack("I", 5)
 
-            pak_file.write(b"File\x00")
+            head.write(b"File\x00")
             #
-        pak_file.write(b"\x00" * 3)
+        head.write(b"\x00" * 3)
 
-        head_end_pos = pak_file.tell()
-        head_size = head_end_pos - 4
-        pak_file.seek(0, 0)
-        pak_file.write(struct.pack("II", head_size, head_size))
-        pak_file.seek(head_end_pos, 0)
+        head_size = len(head) - 4
+        head.patch(0, "II", head_size, head_size)
         #
-        for filepath in paths:
-            with open(filepath, "rb") as f:
-                pak_file.write(f.read())
+        with pak_file:
+            pak_file.write(head.view())
+            for filepath in paths:
+                with open(filepath, "rb") as f:
+                    pak_file.write(f.read())
         #
         self.report({"INFO"}, "Done")
         return {"FINISHED"}
@@ -454,15 +452,15 @@ class OT_PakUnpack(bpy.types.Operator):
             folderpath.mkdir(parents=True, exist_ok=True)
             files_dict = {}
             #
-            with open(filepath, "rb") as f:
-                head_size = unpack("I", f)[0]
-                f.seek(5, 1)  # 重复头大小 b'\x04'
-                f.seek(20, 1)  # b"fileDescriptorTable\x00"
-                flag1 = unpack("B", f)[0]  # 未知
-                file_count = unpack("H", f)[0] + 2
+            with ag_binio.open_reader(filepath) as f:
+                head_size = f.unpack("I")[0]
+                f.skip(5)  # 重复头大小 b'\x04'
+                f.skip(20)  # b"fileDescriptorTable\x00"
+                flag1 = f.unpack("B")[0]  # 未知
+                file_count = f.unpack("H")[0] + 2
                 for index in range(file_count):
                     # print(index)
-                    f.seek(2, 1)  # 跳过 b'\x00\x03'
+                    f.skip(2)  # 跳过 b'\x00\x03'
 
                     buffer = f.read(1)
                     while (b_str := f.read(1)) != b"\x00":
@@ -472,53 +470,53 @@ class OT_PakUnpack(bpy.types.Operator):
                         logger.debug(f"Invalid index: {idx} != {index}")
                     # f.seek(1, 1) # 跳过 b'\x00'
 
-                    flag2 = unpack("B", f)[0]  # 未知
-                    f.seek(4, 1)  # 跳过 00000010
-                    f.seek(10, 1)  # byteCount\x00
-                    file_size = unpack("I", f)[0]
-                    f.seek(1, 1)  # 跳过 b'\x10'
-                    f.seek(10, 1)  # byteIndex\x00
-                    data_offset = unpack("I", f)[0]
-                    f.seek(1, 1)  # 跳过 b'\x02'
-
-                    f.seek(12, 1)  # compression\x00
-                    compression = unpack("I", f)[0]  # 默认5
-                    f.seek(5, 1)  # None\x00
-                    none = unpack("B", f)[0]  # 默认8
-                    f.seek(11, 1)  # isReadOnly\x00
-                    isReadOnly = unpack("B", f)[0]  # 默认0
-                    f.seek(1, 1)  # 跳过 b'\x08'
-                    f.seek(10, 1)  # isVirtual\x00
-                    f.seek(1, 1)  # 跳过 b'\x01'
-                    f.seek(1, 1)  # 跳过 b'\x02'
-
-                    f.seek(21, 1)  # logicalDirectoryPath\x00
-                    length = unpack("I", f)[0]
+                    flag2 = f.unpack("B")[0]  # 未知
+                    f.skip(4)  # 跳过 00000010
+                    f.skip(10)  # byteCount\x00
+                    file_size = f.unpack("I")[0]
+                    f.skip(1)  # 跳过 b'\x10'
+                    f.skip(10)  # byteIndex\x00
+                    data_offset = f.unpack("I")[0]
+                    f.skip(1)  # 跳过 b'\x02'
+
+                    f.skip(12)  # compression\x00
+                    compression = f.unpack("I")[0]  # 默认5
+                    f.skip(5)  # None\x00
+                    none = f.unpack("B")[0]  # 默认8
+                    f.skip(11)  # isReadOnly\x00
+                    isReadOnly = f.unpack("B")[0]  # 默认0
+                    f.skip(1)  # 跳过 b'\x08'
+                    f.skip(10)  # isVirtual\x00
+                    f.skip(1)  # 跳过 b'\x01'
+                    f.skip(1)  # 跳过 b'\x02'
+
+                    f.skip(21)  # logicalDirectoryPath\x00
+                    length = f.unpack("I")[0]
                     logicalDirectoryPath = folderpath / f.read(length).decode(
                         "utf-8"
                     ).strip("\x00")
-                    f.seek(1, 1)  # 跳过 b'\x02'
+                    f.skip(1)  # 跳过 b'\x02'
 
-                    f.seek(12, 1)  # logicalName\x00
-                    length = unpack("I", f)[0]
+                    f.skip(12)  # logicalName\x00
+                    length = f.unpack("I")[0]
                     logicalName = f.read(length).decode("utf-8").strip("\x00")
-                    f.seek(1, 1)  # 跳过 b'\x02'
+                    f.skip(1)  # 跳过 b'\x02'
 
-                    f.seek(22, 1)  # physicalDirectoryPath\x00
-                    length = unpack("I", f)[0]
+                    f.skip(22)  # physicalDirectoryPath\x00
+                    length = f.unpack("I")[0]
                     physicalDirectoryPath = f.read(length).decode("utf-8").strip("\x00")
                     # f.seek(length, 1)
-                    f.seek(1, 1)  # 跳过 b'\x02'
+                    f.skip(1)  # 跳过 b'\x02'
 
-                    f.seek(13, 1)  # physicalName\x00
-                    length = unpack("I", f)[0]
-                    # physicalName = unpack("B", f)[0]
-                    f.seek(1, 1)  # 跳过 b'\x00'
-                    f.seek(1, 1)  # 跳过 b'\x02'
+                    f.skip(13)  # physicalName\x00
+                    length = f.unpack("I")[0]
+                    # physicalName = f.unpack("B")[0]
+                    f.skip(1)  # 跳过 b'\x00'
+                    f.skip(1)  # 跳过 b'\x02'
 
-                    f.seek(5, 1)  # type\x00
-                    f.seek(4, 1)  # 默认5
-                    f.seek(5, 1)  # File\x00
+                    f.skip(5)  # type\x00
+                    f.skip(4)  # 默认5
+                    f.skip(5)  # File\x00
                     #
                     files_dict[data_offset] = [
                         flag2,
@@ -530,7 +528,7 @@ class OT_PakUnpack(bpy.types.Operator):
                         logicalName,
                     ]
                 #
-                f.seek(3, 1)  # 000
+                f.skip(3)  # 000
                 # pprint(files_dict)
                 for k in sorted(files_dict.keys()):
                     (
@@ -545,7 +543,7 @@ class OT_PakUnpack(bpy.types.Operator):
                     logicalDirectoryPath.mkdir(parents=True, exist_ok=True)
                     try:
                         with open(logicalDirectoryPath / logicalName, "wb") as fw:
-                            fw.write(f.read(file_size))
+                            fw.write(f.view(file_size))
                     except:
                         pass
 
@@ -951,80 +949,80 @@ class OT_Test(bpy.types.Operator):
             pass
 
         def parse():
-            with open(bod_file, "rb") as f:
-                file_size = os.fstat(f.fileno()).st_size
+            with ag_binio.open_reader(bod_file) as f:
+                file_size = len(f)
                 # 内部名称
-                length = unpack("I", f)[0]
-                inter_name = unpack(f"{length}s", f)
+                length = f.unpack("I")[0]
+                inter_name = f.string(length)
                 # 顶点
-                verts_num = unpack("I", f)[0]
-                f.seek(48 * verts_num, 1)
+                verts_num = f.unpack("I")[0]
+                f.skip(48 * verts_num)
                 # 面
-                faces_num = unpack("I", f)[0]
+                faces_num = f.unpack("I")[0]
                 for i in range(faces_num):
                     # vert_idx
-                    f.seek(12, 1)
-                    length = unpack("I", f)[0]
-                    # img_name = unpack(f"{length}s", f)
-                    f.seek(length, 1)
+                    f.skip(12)
+                    length = f.unpack("I")[0]
+                    # img_name = f.string(length)
+                    f.skip(length)
                     # uv_list
-                    f.seek(24, 1)
+                    f.skip(24)
                     # 跳过0
-                    f.seek(4, 1)
+                    f.skip(4)
                 # 骨架
-                bones_num = unpack("I", f)[0]
+                bones_num = f.unpack("I")[0]
                 for i in range(bones_num):
                     if bones_num != 1:
-                        length = unpack("I", f)[0]
-                        f.seek(length, 1)
-                        # name = unpack(f"{length}s", f)
-                    f.seek(140, 1)
-                    num = unpack("I", f)[0]
+                        length = f.unpack("I")[0]
+                        f.skip(length)
+                        # name = f.string(length)
+                    f.skip(140)
+                    num = f.unpack("I")[0]
                     for j in range(num):
-                        f.seek(40, 1)
+                        f.skip(40)
                 # 几何中心
-                f.seek(32, 1)
+                f.skip(32)
                 # 火焰
-                num = unpack("I", f)[0]
+                num = f.unpack("I")[0]
                 for idx in range(num):
-                    verts_num = unpack("I", f)[0]
+                    verts_num = f.unpack("I")[0]
                     for i in range(verts_num):
-                        f.seek(28, 1)
-                    f.seek(8, 1)
+                        f.skip(28)
+                    f.skip(8)
                 # 灯光
-                num = unpack("I", f)[0]
+                num = f.unpack("I")[0]
                 for idx in range(num):
-                    f.seek(36, 1)
+                    f.skip(36)
                 # 锚点
-                num = unpack("I", f)[0]
+                num = f.unpack("I")[0]
                 for idx in range(num):
-                    length = unpack("I", f)[0]
-                    f.seek(length, 1)
-                    f.seek(132, 1)
+                    length = f.unpack("I")[0]
+                    f.skip(length)
+                    f.skip(132)
                 # 剩余数据种类
-                data_num_remain = data_num = unpack("I", f)[0]
+                data_num_remain = data_num = f.unpack("I")[0]
                 if data_num == 0:
                     return final()
 
                 # 边缘
-                num = unpack("I", f)[0]
+                num = f.unpack("I")[0]
                 for idx in range(num):
-                    f.seek(80, 1)
+                    f.skip(80)
 
                 data_num -= 1
                 if data_num == 0:
                     return final()
 
                 # 尖刺
-                num = unpack("I", f)[0]
+                num = f.unpack("I")[0]
                 for idx in range(num):
-                    mark = unpack("I", f)[0]  # 默认0
+                    mark = f.unpack("I")[0]  # 默认0
                     if mark != 0:
                         logger.debug(f"Spike - mark not 0: {mark}")
                     #
-                    parent_idx = unpack("i", f)[0]  # type: int
-                    pt1 = Vector(unpack("ddd", f)) / 1000
-                    pt2 = pt1 + Vector(unpack("ddd", f)) / 1000
+                    parent_idx = f.unpack("i")[0]  # type: int
+                    pt1 = Vector(f.unpack("ddd")) / 1000
+                    pt2 = pt1 + Vector(f.unpack("ddd")) / 1000
                     #
                     obj_name = data.get_object_name("Blade_Spike_")
                     mesh = bpy.data.meshes.new(obj_name)
@@ -1075,25 +1073,25 @@ class OT_Test(bpy.types.Operator):
                     return final()
 
                 # 组
-                num = unpack("I", f)[0]
-                f.seek(num, 1)
+                num = f.unpack("I")[0]
+                f.skip(num)
                 # 肢解组
-                num = unpack("I", f)[0]
-                f.seek(num * 4, 1)
+                num = f.unpack("I")[0]
+                f.skip(num * 4)
 
                 data_num -= 1
                 if data_num == 0:
                     return final()
 
                 # 轨迹
-                num = unpack("I", f)[0]
+                num = f.unpack("I")[0]
                 for idx in range(num):
-                    mark = unpack("I", f)[0]  # 默认0
+                    mark = f.unpack("I")[0]  # 默认0
                     if mark != 0:
                         logger.debug(f"Track - mark not 0: {mark}")
-                    parent_idx = unpack("i", f)[0]  # type: int
-                    pt1 = Vector(unpack("ddd", f)) / 1000
-                    pt2 = pt1 + Vector(unpack("ddd", f)) / 1000
+                    parent_idx = f.unpack("i")[0]  # type: int
+                    pt1 = Vector(f.unpack("ddd")) / 1000
+                    pt2 = pt1 + Vector(f.unpack("ddd")) / 1000
                     #
                     obj_name = data.get_object_name("Blade_Trail_")
                     mesh = bpy.data.meshes.new(obj_name)
@@ -411,6 +411,7 @@ class AMAGATE_PT_ModelPackage(AG_Panel, bpy.types.Panel):
         )
         column.operator(OP.OT_ModelPackOpen.bl_idname, icon="FILE_FOLDER")
         column.operator(OP.OT_ModelPackImport.bl_idname, icon="IMPORT")
+        column.operator(OP_ENTITY.OT_UpdateModelIndex.bl_idname, icon="FILE_REFRESH")
 
 
 ############################
@@ -253,7 +253,7 @@ def knife_project_done():
         bpy.ops.amagate.report_message(message="Separate Done")  # type: ignore
 
     if SEPARATE_DATA["undo"]:
-        bpy.ops.ed.undo_push(message="Separate Convex")
+        L3D_data.undo_push("Separate Convex")
 
     scene_data = context.scene.amagate_data
     auto_connect = scene_data.operator_props.sec_separate_connect
@@ -677,7 +677,7 @@ class OT_Sector_Connect(bpy.types.Operator):
             self.report({"INFO"}, "Sectors connected successfully")
 
         if self.undo:
-            bpy.ops.ed.undo_push(message="Connect Sectors")
+            L3D_data.undo_push("Connect Sectors")
         return {"FINISHED"}
 
     def connect(self, context: Context, sectors: list[Object]):
@@ -1379,7 +1379,7 @@ class OT_Sector_Connect_VM(bpy.types.Operator):
                 self.report({"INFO"}, "Sectors connected successfully")
 
         if self.undo:
-            bpy.ops.ed.undo_push(message="Connect Sectors (Vertex Matching)")
+            L3D_data.undo_push("Connect Sectors (Vertex Matching)")
 
         return {"FINISHED"}
 
@@ -1531,7 +1531,7 @@ class OT_Sector_Disconnect(bpy.types.Operator):
             self.report({"INFO"}, pgettext("Disconnect", "Operator"))
 
         if self.undo:
-            bpy.ops.ed.undo_push(message="Disconnect")
+            L3D_data.undo_push("Disconnect")
 
         return {"FINISHED"}
 
@@ -1808,7 +1808,7 @@ class OT_Sector_SeparateConvex(bpy.types.Operator):
         if not complex_list:
             self.report({"INFO"}, "No need to separate")
         if self.undo:
-            bpy.ops.ed.undo_push(message="Separate Convex")
+            L3D_data.undo_push("Separate Convex")
         return ret
 
 
@@ -1998,7 +1998,7 @@ class OT_Bulb_Add(bpy.types.Operator):
         scene_data.bulb_operator.active = len(sec_data.bulb_light) - 1
 
         if undo:
-            bpy.ops.ed.undo_push(message="Add Bulb")
+            L3D_data.undo_push("Add Bulb")
 
         return item
 
@@ -2041,7 +2041,7 @@ class OT_Bulb_Del(bpy.types.Operator):
                 scene_data.bulb_operator.active = len(sec_data.bulb_light) - 1
 
         if self.undo:
-            bpy.ops.ed.undo_push(message="Delete Bulb")
+            L3D_data.undo_push("Delete Bulb")
 
         return {"FINISHED"}
 
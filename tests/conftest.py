@@ -0,0 +1,47 @@
+# 以包的方式加载不依赖bpy的脚本模块，使模块间的相对导入可用
+# 本目录中的operator.py会遮蔽标准库，不能把scripts目录加入sys.path
+
+import os
+import sys
+import types
+import importlib
+
+import pytest
+
+SCRIPTS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "Amagate", "scripts"
+)
+PACKAGE_NAME = "amagate_scripts"
+
+
+def load_module(name):
+    if PACKAGE_NAME not in sys.modules:
+        package = types.ModuleType(PACKAGE_NAME)
+        package.__path__ = [SCRIPTS_DIR]
+        sys.modules[PACKAGE_NAME] = package
+    return importlib.import_module(f"{PACKAGE_NAME}.{name}")
+
+
+@pytest.fixture(scope="session")
+def ag_binio():
+    return load_module("ag_binio")
+
+
+@pytest.fixture(scope="session")
+def L3D_bwmodel():
+    return load_module("L3D_bwmodel")
+
+
+@pytest.fixture(scope="session")
+def L3D_bwparse():
+    return load_module("L3D_bwparse")
+
+
+@pytest.fixture(scope="session")
+def L3D_compile():
+    return load_module("L3D_compile")
+
+
+@pytest.fixture(scope="session")
+def entity_bod():
+    return load_module("entity_bod")
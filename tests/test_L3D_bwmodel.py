@@ -0,0 +1,145 @@
+import os
+from array import array
+
+import pytest
+
+
+# 两个扇区的关卡，包含全部面类型和两种光源，单精度字段使用可精确表示的值
+def make_level(m):
+    level = m.Level()
+    level.atmospheres = [m.Atmosphere("ext", (100, 115, 143), 0.015625)]
+    level.vertices = array(
+        "d",
+        [
+            c * 1000.0
+            for v in (
+                (0, 0, 0),
+                (1, 0, 0),
+                (1, 0, 1),
+                (0, 0, 1),
+                (0, 1, 0),
+                (1, 1, 0),
+                (1, 1, 1),
+                (0, 1, 1),
+            )
+            for c in v
+        ],
+    )
+
+    def texture(name):
+        return m.Texture(name, (1.0, 0.0, 0.0), (0.0, 0.0, 1.0), 0.25, 0.5)
+
+    hole = m.Hole((0, 1, 2), 1, [((0.0, 1.0, 0.0), 500.0)])
+    faces = [
+        m.Face(m.FACE_PLAIN, (0.0, -1.0, 0.0), 0.0, (0, 1, 2, 3), texture="floor"),
+        m.Face(m.FACE_FULL, (0.0, 1.0, 0.0), 1000.0, (4, 5, 6, 7), conn=1),
+        m.Face(m.FACE_HOLE, (1.0, 0.0, 0.0), 1000.0, (1, 5, 6, 2), hole=hole),
+        m.Face(
+            m.FACE_SPLIT,
+            (-1.0, 0.0, 0.0),
+            0.0,
+            (0, 3, 7, 4),
+            holes=[hole],
+            tree=[
+                m.MARK_INNER,
+                m.Leaf([(0, (0,))]),
+                m.CutRecord((0.0, 0.0, 1.0), 500.0, texture("cut")),
+            ],
+        ),
+        m.Face(m.FACE_SKY, (0.0, 0.0, 1.0), 1000.0, (3, 2, 6, 7)),
+    ]
+    for face in faces:
+        if face.type != m.FACE_SKY:
+            face.texture = texture(face.texture or "wall")
+    level.sectors = [
+        m.Sector(
+            "ext",
+            m.SectorLight((255, 255, 255), 0.75, 0.015625),
+            m.SectorLight((10, 20, 30), 0.125, 0.015625),
+            (0.0, -1.0, 0.0),
+            faces,
+        ),
+        m.Sector("ext", faces=[faces[0]]),
+    ]
+    level.lights = [
+        m.Light(m.LIGHT_EXTERNAL, (255, 200, 100), 1.5, 0.03125, vector=(0.0, -1.0, 0.0), sectors=(0, 1)),
+        m.Light(m.LIGHT_BULB, (1, 2, 3), 2.0, 1.0, position=(500.0, -500.0, 500.0), sector=1),
+    ]
+    level.trailer = bytes(range(m.TRAILER_SIZE))
+    level.groups = array("i", [0, -1])
+    level.names = ["Room", "Sky"]
+    return level
+
+
+def test_level_roundtrip(L3D_bwmodel):
+    level = make_level(L3D_bwmodel)
+    data = L3D_bwmodel.level_bytes(level)
+    level_2 = L3D_bwmodel.read_level(data)
+    assert level_2 == level
+    # 写回与原文件逐字节一致
+    assert L3D_bwmodel.level_bytes(level_2) == data
+
+
+def test_bw_file_roundtrip(L3D_bwmodel, tmp_path):
+    filepath = str(tmp_path / "test.bw")
+    level = make_level(L3D_bwmodel)
+    L3D_bwmodel.write_bw(level, filepath)
+    assert L3D_bwmodel.read_bw(filepath) == level
+
+
+def test_invalid_level(L3D_bwmodel, L3D_bwparse):
+    data = L3D_bwmodel.level_bytes(make_level(L3D_bwmodel))
+    with pytest.raises(L3D_bwparse.BWParseError):
+        L3D_bwmodel.read_level(data[:-3])
+    with pytest.raises(L3D_bwparse.BWParseError):
+        L3D_bwmodel.read_level(data + b"\x00")
+
+
+def test_parse_bw(L3D_bwmodel, L3D_bwparse, tmp_path):
+    filepath = str(tmp_path / "test.bw")
+    L3D_bwmodel.write_bw(make_level(L3D_bwmodel), filepath)
+    level = L3D_bwparse.parse_bw(filepath)
+    faces = level["sectors"][0]["faces"]
+    assert [f["type"] for f in faces] == [7001, 7002, 7003, 7004, 7005]
+    # 扇区ID从1开始
+    assert faces[1]["conn"] == 2
+    assert faces[2]["hole"] == ([((0.0, 1.0, 0.0), 500.0)], 2)
+    assert level["groups"] == [0, -1]
+    assert level["names"] == ["Room", "Sky"]
+
+
+def test_index_sidecar(L3D_bwmodel, L3D_bwparse, tmp_path):
+    filepath = str(tmp_path / "test.bw")
+    L3D_bwmodel.write_bw(make_level(L3D_bwmodel), filepath)
+    index_file = filepath + L3D_bwparse.INDEX_SUFFIX
+    with L3D_bwparse.BWFile(filepath) as bw:
+        assert bw.face_count(1) == 5 and bw.face_count(2) == 1
+        assert bw.read_face(1, 4)["type"] == L3D_bwparse.FACE_SKY
+        arrays = bw.index.arrays()
+    assert os.path.exists(index_file)
+
+    index = L3D_bwparse.load_index(filepath)
+    assert index is not None
+    assert index.arrays() == arrays
+    # 扇区摘要: 包围盒和连接的扇区ID (索引中保存为ID + 1)
+    assert list(index.bounds[:6]) == [0.0] * 3 + [1000.0] * 3
+    assert list(index.conns[index.conn_start[0] : index.conn_start[1]]) == [2]
+
+    lazy = L3D_bwparse.parse_bw_lazy(filepath)
+    assert lazy["sectors"][0] == {"min": (0.0,) * 3, "max": (1000.0,) * 3, "conn": [2]}
+
+    # 损坏或截断的索引视为过期
+    data = open(index_file, "rb").read()
+    with open(index_file, "wb") as f:
+        f.write(data[:-8])
+    assert L3D_bwparse.load_index(filepath) is None
+    with open(index_file, "wb") as f:
+        f.write(b"\x80\x04" + data[2:])
+    assert L3D_bwparse.load_index(filepath) is None
+
+    # bw文件修改后索引过期
+    with open(index_file, "wb") as f:
+        f.write(data)
+    stat = os.stat(filepath)
+    os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert L3D_bwparse.load_index(filepath) is None
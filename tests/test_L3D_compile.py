@@ -0,0 +1,152 @@
+import copy
+import math
+
+import numpy as np
+import pytest
+
+VERSION = "1.0.0"
+
+
+# 立方体扇区的快照，第一个面连接扇区5
+def make_snapshot():
+    co = [(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0), (0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)]
+    polys = [(0, 2, 1), (0, 3, 2), (4, 5, 6, 7), (0, 1, 5, 4), (1, 2, 6, 5), (2, 3, 7, 6), (3, 0, 4, 7)]
+    edges = set()
+    for p in polys:
+        for i in range(len(p)):
+            a, b = p[i], p[(i + 1) % len(p)]
+            edges.add((min(a, b), max(a, b)))
+
+    def normal(p):
+        a, b, c = [co[i] for i in p[:3]]
+        u = [b[k] - a[k] for k in range(3)]
+        v = [c[k] - a[k] for k in range(3)]
+        n = (u[1] * v[2] - u[2] * v[1], u[2] * v[0] - u[0] * v[2], u[0] * v[1] - u[1] * v[0])
+        length = math.sqrt(sum(x * x for x in n))
+        return tuple(x / length for x in n)
+
+    normals = [normal(p) for p in polys]
+    n = len(polys)
+    tex_attrs = {k: [1.0] * n for k in ("xpos", "ypos", "xzoom", "yzoom", "angle")}
+    tex_attrs["vx"] = [(1.0, 0.0, 0.0)] * n
+    tex_attrs["vy"] = [(0.0, 1.0, 0.0)] * n
+    return {
+        "name": "Sector",
+        "co": co,
+        "co_world": co,
+        "keys": [(x * 1000.0, -z * 1000.0, y * 1000.0) for x, y, z in co],
+        "polys": polys,
+        "edges": sorted(edges),
+        "normals": normals,
+        "w_normals": normals,
+        "conn": [5, 0, 0, 0, 0, 0, 0],
+        "tex_id": [1] * n,
+        "tex_attrs": tex_attrs,
+        "v_dist": [0.0] * n,
+        "tex_names": {1: "stone"},
+    }
+
+
+@pytest.fixture(scope="module")
+def blob(L3D_compile):
+    return L3D_compile.compile_sector(make_snapshot())
+
+
+def test_compile_sector(L3D_compile, blob):
+    assert not blob["errors"]
+    # 两个三角形合并为底面
+    assert blob["face_num"] == 6
+    assert len(blob["keys"]) == 8
+    assert [sid for _, sid in blob["sec_patches"]] == [5]
+    data = L3D_compile.relocate(blob, list(range(10, 18)), {5: 3})
+    offset = blob["sec_patches"][0][0]
+    assert data[offset : offset + 4] == (3).to_bytes(4, "little")
+
+
+def test_parallel_matches_serial(L3D_compile, blob, monkeypatch):
+    snapshots = [make_snapshot() for _ in range(4)]
+    monkeypatch.setattr(L3D_compile, "PARALLEL_MIN_SECTORS", 1)
+    blobs = list(L3D_compile.iter_compile_sectors(snapshots, 2))
+    assert len(blobs) == 4
+    for blob_2 in blobs:
+        blob_2.pop("profile", None)
+        assert blob_2 == blob
+
+
+def test_snapshot_key(L3D_compile):
+    key = L3D_compile.snapshot_key(make_snapshot())
+    assert L3D_compile.snapshot_key(make_snapshot()) == key
+    # 任何影响编译结果的字段变化都使缓存键失效
+    changes = [
+        ("co_world", lambda s: s["co_world"].__setitem__(0, (0, 0, 0.5))),
+        ("keys", lambda s: s["keys"].__setitem__(0, (1.0, 0.0, 0.0))),
+        ("conn", lambda s: s["conn"].__setitem__(0, 6)),
+        ("tex_id", lambda s: s["tex_id"].__setitem__(1, 2)),
+        ("tex_attrs", lambda s: s["tex_attrs"]["angle"].__setitem__(0, 90.0)),
+        ("v_dist", lambda s: s["v_dist"].__setitem__(0, 1.0)),
+        ("tex_names", lambda s: s["tex_names"].__setitem__(1, "wood")),
+    ]
+    for name, change in changes:
+        snapshot = make_snapshot()
+        change(snapshot)
+        assert L3D_compile.snapshot_key(snapshot) != key, name
+
+
+def assert_blob_equal(blob, blob_2):
+    for key in ("data", "vert_patches", "sec_patches", "face_num", "steep"):
+        assert blob_2[key] == blob[key]
+    assert np.array_equal(blob_2["keys"], blob["keys"])
+
+
+def test_cache_roundtrip(L3D_compile, blob, tmp_path):
+    filepath = str(tmp_path / "map.agcache")
+    key = L3D_compile.snapshot_key(make_snapshot())
+    L3D_compile.save_cache(filepath, VERSION, {1: (key, blob), 7: (key, blob)})
+    sectors = L3D_compile.load_cache(filepath, VERSION)
+    assert sorted(sectors) == [1, 7]
+    key_2, blob_2 = sectors[7]
+    assert key_2 == key
+    assert_blob_equal(blob, blob_2)
+    local_map = list(range(len(blob["keys"])))
+    assert L3D_compile.relocate(blob_2, local_map, {5: 0}) == L3D_compile.relocate(
+        blob, local_map, {5: 0}
+    )
+
+
+def test_cache_invalidation(L3D_compile, blob, tmp_path, monkeypatch):
+    filepath = str(tmp_path / "map.agcache")
+    key = L3D_compile.snapshot_key(make_snapshot())
+    L3D_compile.save_cache(filepath, VERSION, {1: (key, blob)})
+    data = open(filepath, "rb").read()
+    # 插件版本不同
+    assert L3D_compile.load_cache(filepath, "1.0.1") == {}
+    # 缓存格式版本不同
+    monkeypatch.setattr(L3D_compile, "CACHE_VERSION", L3D_compile.CACHE_VERSION + 1)
+    assert L3D_compile.load_cache(filepath, VERSION) == {}
+    monkeypatch.undo()
+    assert L3D_compile.load_cache(filepath, VERSION) != {}
+    # 截断、多余数据和非缓存文件
+    for bad in (data[:-1], data + b"\x00", b"\x80\x04\x95" + data[3:], b""):
+        with open(filepath, "wb") as f:
+            f.write(bad)
+        assert L3D_compile.load_cache(filepath, VERSION) == {}
+    assert L3D_compile.load_cache(str(tmp_path / "missing.agcache"), VERSION) == {}
+
+
+def test_cache_rejects_bad_patches(L3D_compile, blob, tmp_path):
+    filepath = str(tmp_path / "map.agcache")
+    bad = copy.deepcopy(blob)
+    bad["vert_patches"] = [(len(bad["data"]), 0)]  # 修补偏移超出面数据
+    L3D_compile.save_cache(filepath, VERSION, {1: ("key", bad)})
+    assert L3D_compile.load_cache(filepath, VERSION) == {}
+
+
+def test_weld_euclidean(L3D_compile):
+    table = L3D_compile.VertexTable(1.0)
+    verts = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0.7, 0.7, 0]], dtype=np.float64)
+    # 每个顶点属于不同的扇区；(1,1,0) 与 (0,0,0) 的距离为sqrt(2)，不焊接
+    root = table.weld(verts, np.arange(4), np.arange(4))
+    assert root.tolist() == [0, 0, 2, 0]
+    # 同一扇区中的顶点不焊接
+    root = table.weld(verts, np.arange(4), np.zeros(4, dtype=np.int64))
+    assert root.tolist() == [0, 1, 2, 3]
@@ -0,0 +1,55 @@
+import struct
+from array import array
+
+import numpy as np
+import pytest
+
+
+def test_segment_reader_roundtrip(ag_binio):
+    seg = ag_binio.Segment(8)  # 容量不足时自动增长
+    seg.pack("<I", 7)
+    offset = seg.pack("<I", 0)
+    seg.pack("<BBB", 1, 2, 3)
+    seg.pack("<f", 0.5)
+    seg.pack("<ddd", 1.0, -2.0, 3.5)
+    seg.write_str("sector")
+    seg.write(array("d", [4.0, 5.0]))
+    seg.write(np.arange(3, dtype="<i4"))
+    seg.patch(offset, "<I", 99)
+
+    r = ag_binio.Reader(bytes(seg.view()))
+    assert r.u32() == 7
+    assert r.u32() == 99
+    assert r.unpack("<BBB") == (1, 2, 3)
+    assert r.f32() == 0.5
+    assert r.vec3() == (1.0, -2.0, 3.5)
+    assert r.lstring() == "sector"
+    assert r.array("d", 2).tolist() == [4.0, 5.0]
+    assert r.ndarray("<i4", 3).tolist() == [0, 1, 2]
+    assert r.tell() == len(r) == len(seg)
+
+
+def test_reader_bounds(ag_binio):
+    r = ag_binio.Reader(b"\x02\x00\x00\x00ab")
+    with pytest.raises(struct.error):
+        r.string(r.u32() + 1)
+    r.seek(4)
+    assert bytes(r.view(2)) == b"ab"
+    with pytest.raises(struct.error):
+        r.read(1)
+
+
+def test_segment_writer(ag_binio, tmp_path):
+    writer = ag_binio.SegmentWriter()
+    writer.segment().pack("<I", 1)
+    writer.append(b"abc")
+    writer.append(np.array([2], dtype="<u4"))
+    filepath = tmp_path / "out.bin"
+    writer.write_to(str(filepath))
+    data = filepath.read_bytes()
+    assert data == struct.pack("<I", 1) + b"abc" + struct.pack("<I", 2)
+    assert writer.nbytes() == len(data)
+    assert not (tmp_path / "out.bin.tmp").exists()
+    with ag_binio.open_reader(str(filepath)) as r:
+        assert r.u32() == 1
+        assert r.read(3) == b"abc"
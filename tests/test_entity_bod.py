@@ -0,0 +1,126 @@
+import struct
+
+import numpy as np
+import pytest
+
+IDENTITY = (1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+
+
+# 两个骨骼的BOD: 4个顶点，包含一个折叠面和一个零宽度面，以及全部附加数据
+def make_bod(ag_binio):
+    seg = ag_binio.Segment()
+
+    def lstring(text):
+        seg.pack("<I", len(text))
+        seg.write(text.encode("Latin1"))
+
+    lstring("Test")
+    verts = ((0.0, 0.0, 0.0), (1000.0, 0.0, 0.0), (0.0, -1000.0, 0.0), (0.0, 0.0, 2000.0))
+    seg.pack("<I", len(verts))
+    for co in verts:
+        seg.pack("<6d", *co, 0.0, 0.0, 1.0)
+    faces = ((0, 1, 2), (2, 1, 0), (0, 0, 3), (1, 2, 3))
+    seg.pack("<I", len(faces))
+    for i, face in enumerate(faces):
+        seg.pack("<3I", *face)
+        lstring("tex_b" if i == 3 else "tex_a")
+        seg.pack("<6f", 0.0, 0.5, 1.0, 0.0, 0.25, 1.0)
+        seg.pack("<I", 0)
+    # 骨骼: 名称、父骨骼索引、矩阵、顶点数量和起始位置、分块
+    seg.pack("<I", 2)
+    for name, parent, num, start, chunks in (("Root", -1, 2, 0, 1), ("Arm", 0, 2, 2, 0)):
+        lstring(name)
+        seg.pack("<i", parent)
+        seg.pack("<16d", *IDENTITY)
+        seg.pack("<II", num, start)
+        seg.pack("<I", chunks)
+        for _ in range(chunks):
+            seg.pack("<II4d", 0, num, 0.0, 0.0, 0.0, 500.0)
+    seg.pack("<4d", 10.0, -20.0, 30.0, 1500.0)  # 几何中心和半径
+    # 火焰
+    seg.pack("<I", 1)
+    seg.pack("<I", 2)
+    seg.pack("<3dI", 0.0, 0.0, 0.0, 1)
+    seg.pack("<3dI", 0.0, 0.0, 100.0, 2)
+    seg.pack("<iI", 1, 0)
+    # 灯光
+    seg.pack("<I", 1)
+    seg.pack("<ff3di", 2.0, 0.5, 1.0, 2.0, 3.0, 0)
+    # 锚点
+    seg.pack("<I", 1)
+    lstring("L_Hand")
+    seg.pack("<16d", *IDENTITY)
+    seg.pack("<i", 1)
+    # 边缘、尖刺、组、轨迹
+    seg.pack("<I", 4)
+    seg.pack("<I", 1)
+    seg.pack("<Ii9d", 1, 0, *range(9))
+    seg.pack("<I", 2)
+    seg.pack("<Ii6d", 2, 1, *range(6))
+    seg.pack("<Ii6d", 3, 1, *range(6, 12))
+    seg.pack("<I", 3)
+    seg.write(b"\x01\x02\x03")
+    seg.pack("<I", 2)
+    seg.pack("<2i", -1, 5)
+    seg.pack("<I", 1)
+    seg.pack("<Ii6d", 4, 0, *range(6))
+    return bytes(seg.view())
+
+
+@pytest.fixture()
+def bod_file(ag_binio, tmp_path):
+    filepath = tmp_path / "test.bod"
+    filepath.write_bytes(make_bod(ag_binio))
+    return str(filepath)
+
+
+def test_scan_bod(entity_bod, bod_file):
+    info = entity_bod.scan_bod(bod_file)
+    assert info["name"] == "Test"
+    assert (info["vertices"], info["faces"], info["bones"]) == (4, 4, 2)
+    assert info["textures"] == ["tex_a", "tex_b"]
+    assert info["anchor_names"] == ["L_Hand"]
+    assert (info["fires"], info["lights"]) == (1, 1)
+    assert (info["edges"], info["spikes"], info["trails"]) == (1, 2, 1)
+    assert info["center"] == (0.01, 0.03, 0.02)
+    assert info["radius"] == 1.5
+    record = entity_bod.scan_file(bod_file)
+    assert record.pop("hash") == entity_bod.file_hash(bod_file)
+    assert record == info
+
+
+def test_read_bod(entity_bod, bod_file):
+    bod = entity_bod.read_bod(bod_file)
+    assert bod["name"] == "Test"
+    assert bod["verts_num"] == 4
+    # 反向的重复面为折叠面，使用复制的顶点；零宽度面被丢弃
+    assert (bod["folded_faces"], bod["zero_width_faces"]) == (1, 1)
+    assert bod["face_images"] == ["tex_a", "tex_a", "tex_b"]
+    assert bod["dup_src"].tolist() == [2, 1, 0]
+    assert bod["loops"].tolist() == [0, 1, 2, 4, 5, 6, 1, 2, 3]
+    assert bod["coords"].shape == (7, 3)
+    assert bod["coords"][1].tolist() == [1.0, 0.0, 0.0]
+    assert np.array_equal(bod["coords"][4:], bod["coords"][[2, 1, 0]])
+    assert bod["uvs"].shape == (3, 3, 2)
+    assert bod["uvs"][0].tolist() == [[0.0, 0.0], [0.5, 0.25], [1.0, 1.0]]
+    assert [b[:2] for b in bod["bones"]] == [("Root", -1), ("Arm", 0)]
+    assert [b[3:] for b in bod["bones"]] == [(2, 0), (2, 2)]
+    assert bod["center"] == (10.0, -20.0, 30.0) and bod["radius"] == 1500.0
+    verts, parent, idx = bod["fires"][0]
+    assert verts["mark"].tolist() == [1, 2] and (parent, idx) == (1, 0)
+    assert bod["lights"]["co"].tolist() == [[1.0, 2.0, 3.0]]
+    assert bod["anchors"] == [("L_Hand", IDENTITY, 1)]
+    assert bod["edges"]["points"].tolist() == [[[0, 1, 2], [3, 4, 5], [6, 7, 8]]]
+    assert bod["spikes"]["mark"].tolist() == [2, 3]
+    assert bod["groups"].tolist() == [1, 2, 3]
+    assert bod["mutilation_groups"].tolist() == [-1, 5]
+    assert bod["trails"]["parent"].tolist() == [0]
+
+
+def test_truncated_bod(entity_bod, ag_binio, tmp_path):
+    filepath = tmp_path / "bad.bod"
+    filepath.write_bytes(make_bod(ag_binio)[:-20])
+    with pytest.raises(struct.error):
+        entity_bod.scan_bod(str(filepath))
+    with pytest.raises(struct.error):
+        entity_bod.read_bod(str(filepath))